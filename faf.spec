@@ -47,6 +47,7 @@ BuildRequires: python3-fedora-messaging
 BuildRequires: python3-jsonschema
 BuildRequires: python3-koji
 BuildRequires: python3-psycopg2
+BuildRequires: python3-requests
 BuildRequires: python3-rpm
 BuildRequires: python3-satyr >= %{satyr_ver}
 BuildRequires: python3-setuptools
@@ -220,6 +221,7 @@ A plugin for %{name} implementing pull-releases action
 %package action-pull-reports
 Summary: %{name}'s pull-reports plugin
 Requires: %{name} = %{version}
+Requires: python3-requests
 
 %description action-pull-reports
 A plugin for %{name} implementing pull-reports action
@@ -269,6 +271,7 @@ A plugin for %{name} implementing find-report-solution action
 %package action-repo
 Summary: %{name}'s repo plugin
 Requires: %{name} = %{version}
+Requires: python3-requests
 
 %description action-repo
 A plugin for %{name} implementing repoadd, repolist and reposync actions
@@ -508,6 +511,8 @@ Requires: %{name}-fedmsg = %{version}
 
 %description fedmsg-realtime
 Support for sending Fedora Messaging notifications as reports are saved.
+The notifications are queued in the database and published by the
+fedmsg-drain action.
 
 %package celery-tasks
 Summary: %{name}'s task queue based on Celery
@@ -640,23 +645,29 @@ fi
 %dir %{python3_sitelib}/pyfaf
 %dir %{python3_sitelib}/pyfaf/__pycache__
 %{python3_sitelib}/pyfaf/__init__.py
+%{python3_sitelib}/pyfaf/btcache.py
 %{python3_sitelib}/pyfaf/checker.py
 %{python3_sitelib}/pyfaf/cmdline.py
 %{python3_sitelib}/pyfaf/common.py
 %{python3_sitelib}/pyfaf/config.py
 %{python3_sitelib}/pyfaf/local.py
 %{python3_sitelib}/pyfaf/retrace.py
+%{python3_sitelib}/pyfaf/snapshots.py
+%{python3_sitelib}/pyfaf/symbols.py
 %{python3_sitelib}/pyfaf/faf_rpm.py
 %{python3_sitelib}/pyfaf/queries.py
 %{python3_sitelib}/pyfaf/ureport.py
 %{python3_sitelib}/pyfaf/ureport_compat.py
 %{python3_sitelib}/pyfaf/__pycache__/__init__.*.pyc
+%{python3_sitelib}/pyfaf/__pycache__/btcache.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/checker.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/cmdline.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/common.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/config.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/local.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/retrace.*.pyc
+%{python3_sitelib}/pyfaf/__pycache__/snapshots.*.pyc
+%{python3_sitelib}/pyfaf/__pycache__/symbols.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/faf_rpm.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/queries.*.pyc
 %{python3_sitelib}/pyfaf/__pycache__/ureport.*.pyc
@@ -676,6 +687,7 @@ fi
 %{python3_sitelib}/pyfaf/actions/releaselist.py
 %{python3_sitelib}/pyfaf/actions/releasemod.py
 %{python3_sitelib}/pyfaf/actions/match_unknown_packages.py
+%{python3_sitelib}/pyfaf/actions/rollup_history.py
 %{python3_sitelib}/pyfaf/actions/__pycache__/__init__.*.pyc
 %{python3_sitelib}/pyfaf/actions/__pycache__/init.*.pyc
 %{python3_sitelib}/pyfaf/actions/__pycache__/componentadd.*.pyc
@@ -688,6 +700,7 @@ fi
 %{python3_sitelib}/pyfaf/actions/__pycache__/releaselist.*.pyc
 %{python3_sitelib}/pyfaf/actions/__pycache__/releasemod.*.pyc
 %{python3_sitelib}/pyfaf/actions/__pycache__/match_unknown_packages.*.pyc
+%{python3_sitelib}/pyfaf/actions/__pycache__/rollup_history.*.pyc
 
 %dir %{python3_sitelib}/pyfaf/bugtrackers
 %dir %{python3_sitelib}/pyfaf/bugtrackers/__pycache__
@@ -721,14 +734,18 @@ fi
 %{python3_sitelib}/pyfaf/storage/__init__.py
 %{python3_sitelib}/pyfaf/storage/bugzilla.py
 %{python3_sitelib}/pyfaf/storage/bugtracker.py
+%{python3_sitelib}/pyfaf/storage/cache.py
 %{python3_sitelib}/pyfaf/storage/custom_types.py
 %{python3_sitelib}/pyfaf/storage/debug.py
 %{python3_sitelib}/pyfaf/storage/externalfaf.py
 %{python3_sitelib}/pyfaf/storage/events.py
 %{python3_sitelib}/pyfaf/storage/generic_table.py
+%{python3_sitelib}/pyfaf/storage/history.py
 %{python3_sitelib}/pyfaf/storage/sf_prefilter.py
+%{python3_sitelib}/pyfaf/storage/snapshot.py
 %{python3_sitelib}/pyfaf/storage/llvm.py
 %{python3_sitelib}/pyfaf/storage/opsys.py
+%{python3_sitelib}/pyfaf/storage/outbox.py
 %{python3_sitelib}/pyfaf/storage/mantisbt.py
 %{python3_sitelib}/pyfaf/storage/problem.py
 %{python3_sitelib}/pyfaf/storage/project.py
@@ -740,14 +757,18 @@ fi
 %{python3_sitelib}/pyfaf/storage/__pycache__/__init__.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/bugzilla.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/bugtracker.*.pyc
+%{python3_sitelib}/pyfaf/storage/__pycache__/cache.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/custom_types.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/debug.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/externalfaf.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/events.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/generic_table.*.pyc
+%{python3_sitelib}/pyfaf/storage/__pycache__/history.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/sf_prefilter.*.pyc
+%{python3_sitelib}/pyfaf/storage/__pycache__/snapshot.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/llvm.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/opsys.*.pyc
+%{python3_sitelib}/pyfaf/storage/__pycache__/outbox.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/mantisbt.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/problem.*.pyc
 %{python3_sitelib}/pyfaf/storage/__pycache__/project.*.pyc
@@ -769,22 +790,30 @@ fi
 %dir %{python3_sitelib}/pyfaf/utils
 %dir %{python3_sitelib}/pyfaf/utils/__pycache__
 %{python3_sitelib}/pyfaf/utils/__init__.py
+%{python3_sitelib}/pyfaf/utils/cache.py
 %{python3_sitelib}/pyfaf/utils/contextmanager.py
 %{python3_sitelib}/pyfaf/utils/date.py
 %{python3_sitelib}/pyfaf/utils/decorators.py
+%{python3_sitelib}/pyfaf/utils/download.py
+%{python3_sitelib}/pyfaf/utils/elf.py
 %{python3_sitelib}/pyfaf/utils/format.py
 %{python3_sitelib}/pyfaf/utils/hash.py
+%{python3_sitelib}/pyfaf/utils/inotify.py
 %{python3_sitelib}/pyfaf/utils/parse.py
 %{python3_sitelib}/pyfaf/utils/proc.py
 %{python3_sitelib}/pyfaf/utils/storage.py
 %{python3_sitelib}/pyfaf/utils/user.py
 %{python3_sitelib}/pyfaf/utils/web.py
 %{python3_sitelib}/pyfaf/utils/__pycache__/__init__.*.pyc
+%{python3_sitelib}/pyfaf/utils/__pycache__/cache.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/contextmanager.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/date.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/decorators.*.pyc
+%{python3_sitelib}/pyfaf/utils/__pycache__/download.*.pyc
+%{python3_sitelib}/pyfaf/utils/__pycache__/elf.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/format.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/hash.*.pyc
+%{python3_sitelib}/pyfaf/utils/__pycache__/inotify.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/parse.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/proc.*.pyc
 %{python3_sitelib}/pyfaf/utils/__pycache__/storage.*.pyc
@@ -830,6 +859,7 @@ fi
 %{python3_sitelib}/webfaf/login.py
 %{python3_sitelib}/webfaf/problems.py
 %{python3_sitelib}/webfaf/reports.py
+%{python3_sitelib}/webfaf/response_cache.py
 %{python3_sitelib}/webfaf/stats.py
 %{python3_sitelib}/webfaf/summary.py
 %{python3_sitelib}/webfaf/user.py
@@ -842,6 +872,7 @@ fi
 %{python3_sitelib}/webfaf/__pycache__/login.*.pyc
 %{python3_sitelib}/webfaf/__pycache__/problems.*.pyc
 %{python3_sitelib}/webfaf/__pycache__/reports.*.pyc
+%{python3_sitelib}/webfaf/__pycache__/response_cache.*.pyc
 %{python3_sitelib}/webfaf/__pycache__/stats.*.pyc
 %{python3_sitelib}/webfaf/__pycache__/summary.*.pyc
 %{python3_sitelib}/webfaf/__pycache__/user.*.pyc
@@ -1183,6 +1214,8 @@ fi
 %files fedmsg-realtime
 %{python3_sitelib}/pyfaf/storage/events_fedmsg.py
 %{python3_sitelib}/pyfaf/storage/__pycache__/events_fedmsg.*.pyc
+%{python3_sitelib}/pyfaf/actions/fedmsg_drain.py
+%{python3_sitelib}/pyfaf/actions/__pycache__/fedmsg_drain.*.pyc
 
 %files celery-tasks
 %config(noreplace) %{_sysconfdir}/faf/plugins/celery_tasks.conf
@@ -16,17 +16,79 @@
 # You should have received a copy of the GNU General Public License
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
-import os
-from pyfaf.opsys import systems
 from pyfaf.queries import get_opsys_by_name
-from pyfaf.common import FafError, Plugin, import_dir, load_plugins
+from pyfaf.common import FafError, Plugin, PluginRegistry
 
 __all__ = ["Action", "actions"]
 
-# Invalid name "actions" for type constant
-# pylint: disable-msg=C0103
-actions = {}
-# pylint: enable-msg=C0103
+# Actions shipped with faf, mapped to "module:Class" in this package.
+# An action module is imported only when the action is used, so that
+# running one action does not load the dependencies of all the others.
+MANIFEST = {
+    "addcompathashes": "addcompathashes:AddCompatHashes",
+    "archadd": "archadd:ArchAdd",
+    "archive-reports": "archive_reports:ArchiveReports",
+    "archlist": "archlist:ArchList",
+    "assign-release-to-builds": "assign_release_to_builds:AssignReleaseToBuilds",
+    "attach-centos-bugs": "attach_centos_bugs:AttachCentosBugs",
+    "bugtrackerlist": "bugtrackerlist:BugtrackerList",
+    "c2p": "c2p:Coredump2Packages",
+    "check-repo": "check_repo:CheckRepo",
+    "cleanup-packages": "cleanup_packages:CleanupPackages",
+    "cleanup-task-results": "cleanup_task_results:CleanupTaskResults",
+    "cleanup-unassigned": "cleanup_unassigned:CleanupUnassigned",
+    "compadd": "componentadd:ComponentAdd",
+    "create-problems": "create_problems:CreateProblems",
+    "delete-invalid-ureports": "delete_invalid_ureports:DeleteInvalidUReports",
+    "extfafadd": "extfafadd:ExternalFafAdd",
+    "extfafclonebz": "extfafclonebz:ExternalFafCloneBZ",
+    "extfafdel": "extfafdelete:ExternalFafDelete",
+    "extfaflink": "extfaflink:ExternalFafLink",
+    "extfafmod": "extfafmodify:ExternalFafModify",
+    "extfafshow": "extfafshow:ExternalFafShow",
+    "fedmsg-drain": "fedmsg_drain:FedmsgDrain",
+    "fedmsg-notify": "fedmsg_notify:FedmsgNotify",
+    "find-components": "find_components:FindComponents",
+    "find-crashfn": "find_crash_function:FindCrashFunction",
+    "find-report-solution": "find_report_solution:FindReportSolution",
+    "hash-paths": "hash_paths:HashPaths",
+    "init": "init:Init",
+    "mark-probably-fixed": "mark_probably_fixed:MarkProbablyFixed",
+    "match-unknown-packages": "match_unknown_packages:MatchUnknownPackages",
+    "opsysadd": "opsysadd:OpSysAdd",
+    "opsysdel": "opsysdel:OpSysDel",
+    "opsyslist": "opsyslist:OpSysList",
+    "pull-abrt-bugs": "pull_abrt_bugs:PullAbrtBugs",
+    "pull-associates": "pull_associates:PullAssociates",
+    "pull-bug": "pull_bug:PullBug",
+    "pull-components": "pull_components:PullComponents",
+    "pull-releases": "pull_releases:PullReleases",
+    "pull-reports": "pull_reports:PullReports",
+    "releaseadd": "releaseadd:ReleaseAdd",
+    "releasedel": "releasedel:ReleaseDelete",
+    "releaselist": "releaselist:ReleaseList",
+    "releasemod": "releasemod:ReleaseModify",
+    "repoadd": "repoadd:RepoAdd",
+    "repoassign": "repoassign:RepoAssign",
+    "repodel": "repodel:RepoDel",
+    "repoimport": "repoimport:RepoImport",
+    "repoinfo": "repoinfo:RepoInfo",
+    "repolist": "repolist:RepoList",
+    "repomod": "repomod:RepoMod",
+    "reposync": "reposync:RepoSync",
+    "retrace": "retrace:Retrace",
+    "retrace-remote": "retrace_remote:RetraceRemote",
+    "rollup-history": "rollup_history:RollupHistory",
+    "sar": "sar:SubjectAccessRequest",
+    "save-reports": "save_reports:SaveReports",
+    "sf-prefilter-patadd": "sf_prefilter_patadd:SfPrefilterPatAdd",
+    "sf-prefilter-patshow": "sf_prefilter_patshow:SfPrefilterPatShow",
+    "sf-prefilter-soladd": "sf_prefilter_soladd:SfPrefilterSolAdd",
+    "sf-prefilter-solshow": "sf_prefilter_solshow:SfPrefilterSolShow",
+    "shell": "shell:Shell",
+    "stats": "stats:Stats",
+    "update-bugs": "update_bugs:UpdateBugs",
+}
 
 
 class Action(Plugin):
@@ -69,6 +131,10 @@ class Action(Plugin):
         or raise FafError if not available
         """
 
+        # Imported here not to load all operating system plugins
+        # with every action
+        from pyfaf.opsys import systems
+
         cmdline_opsys = cmdline_opsys.lower()
         if not cmdline_opsys in systems:
             raise FafError("Operating system '{0}' does not exist"
@@ -102,5 +168,7 @@ class Action(Plugin):
             self.log_info("Package does not have a LOB. Skipping.")
 
 
-import_dir(__name__, os.path.dirname(__file__))
-load_plugins(Action, actions)
+# Invalid name "actions" for type constant
+# pylint: disable-msg=C0103
+actions = PluginRegistry(Action, __name__, MANIFEST)
+# pylint: enable-msg=C0103
@@ -16,26 +16,101 @@
 # You should have received a copy of the GNU General Public License
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Dict, Generator, List, Optional, Set, Tuple
+from typing import Any, Dict, Generator, List, Optional, Set, Tuple
 
+import hashlib
+import multiprocessing
+import resource
+import time
 from operator import itemgetter
-from collections import defaultdict
-from concurrent.futures import as_completed, ThreadPoolExecutor
+from collections import Counter, defaultdict
+from concurrent.futures import as_completed, ProcessPoolExecutor, ThreadPoolExecutor
 
 import satyr
 
 from pyfaf.actions import Action
+from pyfaf.btcache import load_cached_reports
 from pyfaf.problemtypes import problemtypes
-from pyfaf.queries import (get_problems,
+from pyfaf.queries import (bump_cache_generations,
+                           get_problems,
                            get_problem_component,
                            get_empty_problems,
                            unassign_reports,
                            get_reports_by_type,
-                           remove_problem_from_low_count_reports_by_type,
+                           mark_problem_snapshots_stale,
                            get_reports_for_problems,
                            get_unassigned_reports,
-                           get_problem_by_id)
-from pyfaf.storage import Problem, ProblemComponent, Report, ReportBtThread
+                           get_low_count_report_problem_ids,
+                           move_history_rollups,
+                           get_problem_by_id,
+                           get_reports_for_clustering,
+                           get_cluster_function_counts,
+                           get_problem_ids_by_cluster_functions,
+                           get_reports_by_problem_ids,
+                           delete_cluster_signatures,
+                           insert_ignore_conflicts)
+from pyfaf.snapshots import refresh_problem_snapshots
+from pyfaf.storage import (Problem,
+                           ProblemComponent,
+                           Report,
+                           ReportBtThread,
+                           ReportClusterFunction,
+                           ReportClusterSignature)
+
+# Maximal number of threads compared with each other at once
+MAX_CLUSTER_SIZE = 2000
+
+# Number of reports whose backtraces are loaded with one query
+LOAD_CHUNK_SIZE = 1000
+
+# Number of reassigned reports committed together with the history
+# rollups of their problems
+MOVE_BATCH_SIZE = 1000
+
+# Bump whenever the way clustering signatures are computed changes,
+# reports with older signatures are clustered again
+CLUSTER_SIGNATURE_VERSION = 1
+
+
+def function_hash(function_name) -> str:
+    """
+    Return the key of `function_name` in the inverted function index.
+    """
+
+    return hashlib.sha1(function_name.encode("utf-8")).hexdigest()
+
+
+def _cut_threads(threads, dendogram_cut) -> Tuple[List[List[int]], float, int]:
+    """
+    Compute distances and the dendrogram of satyr `threads` and return
+    a tuple (cut, elapsed seconds, growth of the peak memory of the process
+    in KiB). The peak only grows when the task needs more memory than any
+    earlier task of the process did. The cut is a list of lists of indices
+    into `threads`.
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    distances = satyr.Distances(threads, len(threads))
+    dendrogram = satyr.Dendrogram(distances)
+    cut = dendrogram.cut(dendogram_cut, 1)
+    elapsed = time.time() - start
+
+    return cut, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak
+
+
+def _cut_cluster(ptype, cached_reports, dendogram_cut) -> Tuple[List[List[int]], float, int]:
+    """
+    Convert pyfaf.btcache.CachedReport objects of one cluster to satyr
+    threads and return the result of `_cut_threads`. Executed in
+    a worker process, satyr objects can not be passed between processes.
+    """
+
+    problemplugin = problemtypes[ptype]
+    threads = [problemplugin.db_report_to_satyr(cached_report)
+               for cached_report in cached_reports]
+
+    return _cut_threads(threads, dendogram_cut)
 
 
 class HashableSet(set):
@@ -55,8 +130,79 @@ class CreateProblems(Action):
     def __init__(self) -> None:
         super().__init__()
         self._max_workers = 4
+        self._processes = 1
+        # satyr thread -> pyfaf.btcache.CachedReport, only kept with processes > 1
+        self._thread_sources = {}
+        # (report ID, old problem ID, new Problem, its ID or None) of reports
+        # reassigned since the last _apply_moves
+        self._moves = []
+        # IDs of problems that lost or gained reports
+        self._changed_problem_ids = set()
+
+    def _assign_report(self, db_report, db_problem) -> None:
+        """
+        Assign `db_report` to `db_problem`, a pyfaf.storage.Problem or its ID,
+        and remember the move for _apply_moves.
+        """
 
-    def _remove_empty_problems(self, db) -> None:
+        old_problem_id = db_report.problem_id
+        if isinstance(db_problem, Problem):
+            db_report.problem = db_problem
+            if db_problem.id is not None and db_problem.id == old_problem_id:
+                return
+        else:
+            db_report.problem_id = db_problem
+            if db_problem == old_problem_id:
+                return
+
+        self._moves.append((db_report.id, old_problem_id, db_problem))
+
+    def _unassign_reports(self, db, report_problem_ids) -> None:
+        """
+        Unassign reports from `report_problem_ids`, a dictionary mapping
+        report IDs to IDs of their problems, and move their history.
+        """
+
+        if not report_problem_ids:
+            return
+
+        self._apply_moves(db)
+        self._moves = [(report_id, problem_id, None)
+                       for report_id, problem_id in report_problem_ids.items()]
+        with db.session.begin(subtransactions=True):
+            unassign_reports(db, list(report_problem_ids))
+            self._apply_moves(db)
+
+    def _apply_moves(self, db, batch_size=0) -> None:
+        """
+        Flush the session and move the history of the reassigned reports
+        between the problem history rollups in one transaction, once at
+        least `batch_size` reports were reassigned.
+        """
+
+        if len(self._moves) < batch_size:
+            return
+
+        with db.session.begin(subtransactions=True):
+            db.session.flush()
+
+            moves = {}
+            for report_id, old_problem_id, db_problem in self._moves:
+                new_problem_id = db_problem.id if isinstance(db_problem, Problem) else db_problem
+                # a report moved twice keeps its original problem
+                old_problem_id = moves.get(report_id, (old_problem_id,))[0]
+                moves[report_id] = (old_problem_id, new_problem_id)
+
+            moves = {report_id: move for report_id, move in moves.items() if move[0] != move[1]}
+            if moves:
+                self.log_debug("Moving history of %d reports between problems", len(moves))
+                move_history_rollups(db, moves)
+
+        self._changed_problem_ids.update(problem_id for move in moves.values()
+                                         for problem_id in move)
+        self._moves = []
+
+    def _remove_empty_problems(self, db) -> int:
         self.log_info("Removing empty problems")
         empty_problems = get_empty_problems(db)
         self.log_info("Found {0} empty problems".format(len(empty_problems)))
@@ -64,6 +210,7 @@ class CreateProblems(Action):
             self.log_debug("Removing empty problem #%d", db_problem.id)
             db.session.delete(db_problem)
         db.session.flush()
+        return len(empty_problems)
 
     def _get_func_thread_map(self, threads) -> Dict[str, Set[ReportBtThread]]:
         self.log_debug("Creating mapping function name -> threads")
@@ -160,6 +307,109 @@ class CreateProblems(Action):
 
         return clusters
 
+    def _load_satyr_reports(self, db, problemplugin,
+                            db_reports) -> Generator[Tuple[Report, Optional[Any]], None, None]:
+        """
+        Yields (db_report, satyr_thread) tuples, satyr_thread is None
+        if the report could not be converted.
+
+        Backtraces are read from their serialized representation in chunks
+        of LOAD_CHUNK_SIZE reports instead of walking the ORM objects.
+        """
+
+        db_reports_len = len(db_reports)
+        n_processed = 1
+
+        for i in range(0, db_reports_len, LOAD_CHUNK_SIZE):
+            chunk = db_reports[i:i + LOAD_CHUNK_SIZE]
+            cached_reports = load_cached_reports(db, [db_report.id for db_report in chunk])
+
+            for db_report in chunk:
+                self.log_debug("[%d / %d] Loading report #%d", n_processed, db_reports_len, db_report.id)
+                n_processed += 1
+
+                cached_report = cached_reports[db_report.id]
+                thread = problemplugin.db_report_to_satyr(cached_report)
+                if thread is not None and self._processes > 1:
+                    self._thread_sources[thread] = cached_report
+
+                yield (db_report, thread)
+
+    def _cut_clusters(self, problemplugin, clusters,
+                      dendogram_cut) -> Generator[Tuple[List[Any], List[List[int]]], None, None]:
+        """
+        Yields (cluster, cut) tuples. With more than one process clusters
+        are cut in a process pool, the largest ones are scheduled first.
+        """
+
+        clusters = sorted(clusters, key=len, reverse=True)
+        clusters_len = len(clusters)
+
+        if self._processes <= 1:
+            for i, cluster in enumerate(clusters, start=1):
+                self.log_debug("[%d / %d] Computing distances and dendrogram", i, clusters_len)
+                cut, elapsed, growth = _cut_threads(cluster, dendogram_cut)
+                self.log_debug("Cluster of %d reports took %.2fs, raised peak memory by %d KiB",
+                               len(cluster), elapsed, growth)
+                yield (cluster, cut)
+
+            self.log_debug("Peak memory %d KiB",
+                           resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+            return
+
+        # Use fresh interpreters rather than forked copies that would share
+        # the database connection of this process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self._processes, mp_context=context) as executor:
+            futures = {
+                executor.submit(_cut_cluster, problemplugin.name,
+                                [self._thread_sources[thread] for thread in cluster],
+                                dendogram_cut): cluster
+                for cluster in clusters
+            }
+
+            for i, future in enumerate(as_completed(futures), start=1):
+                cluster = futures.pop(future)
+                cut, elapsed, growth = future.result()
+                self.log_debug("[%d / %d] Cluster of %d reports took %.2fs, "
+                               "raised peak memory of its worker by %d KiB",
+                               i, clusters_len, len(cluster), elapsed, growth)
+                yield (cluster, cut)
+
+        # The workers have exited and been waited for by now
+        self.log_debug("Peak memory of the largest child process %d KiB",
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+    def _cluster_reports(self, problemplugin, report_map, dendogram_cut) -> List[Set[Report]]:
+        """
+        Clusters satyr threads from `report_map` (satyr thread -> db_report)
+        and returns a list of sets of db_reports forming a problem.
+        """
+
+        self.log_debug("Clustering")
+        threads = list(report_map.keys())
+        clusters = self._create_clusters(threads, MAX_CLUSTER_SIZE)
+        # Threads that share no function with another thread
+        unique_func_threads = set(threads) - set().union(*clusters)
+
+        start = time.time()
+        problems = []
+        for cluster, cut in self._cut_clusters(problemplugin, clusters, dendogram_cut):
+            for dups in cut:
+                problems.append(set(report_map[cluster[dup]] for dup in dups))
+
+        if clusters:
+            self.log_info("Computed dendrograms of {0} clusters in {1:.2f}s"
+                          .format(len(clusters), time.time() - start))
+
+        # Unique threads form their own unique problems
+        for thread in unique_func_threads:
+            problems.append({report_map[thread]})
+
+        self._thread_sources.clear()
+
+        return problems
+
     def _find_problem_matches(self, db_problems, db_reports) -> List[Tuple[float, List[Report], Problem]]:
         """
         Returns a list of possible matches between old problems and a new one.
@@ -299,7 +549,7 @@ class CreateProblems(Action):
         for (problem_id, report_ids) in problem_report.items():
             reuse_problems[tuple(sorted(report_ids))] = problem_id
 
-        invalid_report_ids_to_clean = []
+        invalid_report_ids_to_clean = {}
         problems = []
         if not db_reports:
             self.log_info("No reports found")
@@ -309,70 +559,32 @@ class CreateProblems(Action):
                 problems.append([db_report])
         else:
             report_map = {}
-            _satyr_reports = []
-            db_reports_len = len(db_reports)
-            n_processed = 1
-
-            # split the work to multiple workers
-            with ThreadPoolExecutor(self._max_workers) as executor:
-                # schedule db_reports for processing
-                futures = {
-                    executor.submit(problemplugin.db_report_to_satyr, report): report
-                    for report in db_reports
-                }
-
-                for future in as_completed(futures):
-                    db_report = futures.pop(future)
-                    self.log_debug("[%d / %d] Loading report #%d", n_processed, db_reports_len, db_report.id)
-
-                    _satyr_report = future.result()
-                    if _satyr_report is None:
-                        self.log_debug("Unable to create satyr report")
-                        if db_report.problem_id is not None:
-                            invalid_report_ids_to_clean.append(db_report.id)
-                    else:
-                        _satyr_reports.append(_satyr_report)
-                        report_map[_satyr_report] = db_report
-
-                    n_processed += 1
-
-                db.session.expire_all()
-
-            self.log_debug("Clustering")
-            clusters = self._create_clusters(_satyr_reports, 2000)
-            # Threads that share no function with another thread
-            unique_func_threads = set(_satyr_reports) - set().union(*clusters)
-
-            dendrograms = []
-            clusters_len = len(clusters)
-            for i, cluster in enumerate(clusters, start=1):
-                self.log_debug("[%d / %d] Computing distances", i, clusters_len)
-                distances = satyr.Distances(cluster, len(cluster))
+            for db_report, _satyr_report in self._load_satyr_reports(db, problemplugin,
+                                                                    db_reports):
+                if _satyr_report is None:
+                    self.log_debug("Unable to create satyr report")
+                    if db_report.problem_id is not None:
+                        invalid_report_ids_to_clean[db_report.id] = db_report.problem_id
+                else:
+                    report_map[_satyr_report] = db_report
 
-                self.log_debug("Getting dendrogram")
-                dendrograms.append(satyr.Dendrogram(distances))
+            db.session.expire_all()
 
             dendogram_cut = 0.3
             if speedup:
                 dendogram_cut = dendogram_cut * 1.1
 
-            for dendrogram, cluster in zip(dendrograms, clusters):
-                problem = []
-                for dups in dendrogram.cut(dendogram_cut, 1):
-                    reports = set(report_map[cluster[dup]] for dup in dups)
-                    problem.append(reports)
-
-                problems.extend(problem)
-
-            # Unique threads form their own unique problems
-            for thread in unique_func_threads:
-                problems.append({report_map[thread]})
+            problems.extend(self._cluster_reports(problemplugin, report_map, dendogram_cut))
 
         self.log_info("Creating problems from clusters")
         if speedup:
             for problem in problems:
                 if not problem:
                     continue
+
+                # New problems are flushed below, the reports assigned
+                # so far are committed with their history first
+                self._apply_moves(db, batch_size=1)
                 first_report = next(iter(problem))
                 if len(problem) > 1:
                     # Find assigned report
@@ -390,7 +602,7 @@ class CreateProblems(Action):
                         first_occurrence = first_report.first_occurrence
                         last_occurrence = first_report.last_occurrence
                         for rep in problem:
-                            rep.problem_id = new.id
+                            self._assign_report(rep, new.id)
 
                             if first_occurrence > rep.first_occurrence:
                                 first_occurrence = rep.first_occurrence
@@ -410,7 +622,7 @@ class CreateProblems(Action):
                         last_occurrence = origin_report.last_occurrence
                         for rep in problem:
                             if not rep.problem_id:
-                                rep.problem_id = origin_report.problem_id
+                                self._assign_report(rep, origin_report.problem_id)
 
                                 if first_occurrence > rep.first_occurrence:
                                     first_occurrence = rep.first_occurrence
@@ -437,8 +649,8 @@ class CreateProblems(Action):
                     db.session.flush()
 
                     self.update_comps(db, {first_report.component: 1}, new)
-                    first_report.problem_id = new.id
-            db.session.flush()
+                    self._assign_report(first_report, new.id)
+            self._apply_moves(db)
 
         else:
             for problem, db_problem, reports_changed in self._iter_problems(
@@ -449,7 +661,7 @@ class CreateProblems(Action):
                 problem_last_occurrence = None
                 problem_first_occurrence = None
                 for db_report in problem:
-                    db_report.problem = db_problem
+                    self._assign_report(db_report, db_problem)
 
                     if (problem_last_occurrence is None or
                             problem_last_occurrence < db_report.last_occurrence):
@@ -474,18 +686,142 @@ class CreateProblems(Action):
                 if reports_changed:
                     self.update_comps(db, comps, db_problem)
 
+                self._apply_moves(db, batch_size=MOVE_BATCH_SIZE)
+
             self.log_debug("Removing %d invalid reports from problems",
                            len(invalid_report_ids_to_clean))
-            unassign_reports(db, invalid_report_ids_to_clean)
+            self._unassign_reports(db, invalid_report_ids_to_clean)
 
             if report_min_count > 0:
                 self.log_debug("Removing problems from low count reports")
-                remove_problem_from_low_count_reports_by_type(db,
-                                                              problemplugin.name,
-                                                              min_count=report_min_count)
+                self._unassign_reports(db, get_low_count_report_problem_ids(db,
+                                                                            problemplugin.name,
+                                                                            report_min_count))
 
             self.log_debug("Flushing session")
-            db.session.flush()
+            self._apply_moves(db)
+
+    def _store_cluster_signatures(self, db, signatures) -> None:
+        """
+        Replaces clustering signatures of reports from `signatures`
+        (db_report.id -> list of function names) and their entries
+        in the inverted function index.
+        """
+
+        delete_cluster_signatures(db, list(signatures.keys()))
+
+        insert_ignore_conflicts(db, ReportClusterSignature, [
+            {"report_id": report_id,
+             "version": CLUSTER_SIGNATURE_VERSION,
+             "functions": functions}
+            for report_id, functions in signatures.items()])
+
+        insert_ignore_conflicts(db, ReportClusterFunction, [
+            {"report_id": report_id, "function_hash": fhash}
+            for report_id, functions in signatures.items()
+            for fhash in {function_hash(f) for f in functions if f != "??"}])
+
+    def _create_problems_incremental(self, db, problemplugin, #pylint: disable=too-many-locals
+                                     report_min_count=0) -> None:
+        self.log_debug("[%s] Getting reports to cluster", problemplugin.name)
+        db_reports = get_reports_for_clustering(db, problemplugin.name,
+                                                CLUSTER_SIGNATURE_VERSION,
+                                                min_count=report_min_count)
+        if not db_reports:
+            self.log_info("No new or changed reports found")
+            return
+
+        self.log_info("Found {0} new or changed reports".format(len(db_reports)))
+
+        report_map = {}
+        signatures = {}
+        invalid_report_ids_to_clean = {}
+        for db_report, thread in self._load_satyr_reports(db, problemplugin, db_reports):
+            if thread is None:
+                self.log_debug("Unable to create satyr report")
+                signatures[db_report.id] = []
+                if db_report.problem_id is not None:
+                    invalid_report_ids_to_clean[db_report.id] = db_report.problem_id
+                continue
+
+            report_map[thread] = db_report
+            signatures[db_report.id] = [frame.function_name for frame in thread.frames]
+
+        self.log_debug("Storing %d clustering signatures", len(signatures))
+        self._store_cluster_signatures(db, signatures)
+
+        # Functions appearing in too many reports would pull huge problems
+        # in, they are too generic to tell anything about similarity anyway
+        fhashes = {function_hash(f) for functions in signatures.values()
+                   for f in functions if f != "??"}
+        fcounts = get_cluster_function_counts(db, problemplugin.name, fhashes)
+        fhashes = {fhash for fhash in fhashes
+                   if fcounts.get(fhash, 0) <= MAX_CLUSTER_SIZE}
+
+        self.log_debug("Looking up candidate problems")
+        problem_ids = get_problem_ids_by_cluster_functions(db, problemplugin.name, fhashes)
+        new_reports = set(report_map.values())
+        candidates = [db_report for db_report in get_reports_by_problem_ids(db, problem_ids)
+                      if db_report.id not in signatures]
+        self.log_info("Comparing with {0} reports from {1} candidate problems"
+                      .format(len(candidates), len(problem_ids)))
+
+        for db_report, thread in self._load_satyr_reports(db, problemplugin, candidates):
+            if thread is not None:
+                report_map[thread] = db_report
+
+        created_count = 0
+        attached_count = 0
+        for problem in self._cluster_reports(problemplugin, report_map, 0.3):
+            new = problem & new_reports
+            if not new:
+                continue
+
+            # Prefer the problem most of the already clustered reports
+            # belong to, then the one most of the new reports belong to
+            old_ids = Counter(db_report.problem_id for db_report in problem - new)
+            new_ids = Counter(db_report.problem_id for db_report in new
+                              if db_report.problem_id is not None)
+            if old_ids:
+                db_problem = get_problem_by_id(db, old_ids.most_common(1)[0][0])
+                attached_count += 1
+            elif new_ids:
+                db_problem = get_problem_by_id(db, new_ids.most_common(1)[0][0])
+                attached_count += 1
+            else:
+                db_problem = Problem()
+                db.session.add(db_problem)
+                created_count += 1
+
+            comps = Counter(db_report.component for db_report in new)
+            for db_report in new:
+                self._assign_report(db_report, db_problem)
+
+                if (db_problem.first_occurrence is None or
+                        db_problem.first_occurrence > db_report.first_occurrence):
+                    db_problem.first_occurrence = db_report.first_occurrence
+                if (db_problem.last_occurrence is None or
+                        db_problem.last_occurrence < db_report.last_occurrence):
+                    db_problem.last_occurrence = db_report.last_occurrence
+
+            self.update_comps(db, comps, db_problem)
+            self._apply_moves(db, batch_size=MOVE_BATCH_SIZE)
+
+        self.log_debug("Attached to existing: %d  Created: %d",
+                       attached_count, created_count)
+
+        self.log_debug("Removing %d invalid reports from problems",
+                       len(invalid_report_ids_to_clean))
+        self._unassign_reports(db, invalid_report_ids_to_clean)
+
+        if report_min_count > 0:
+            self.log_debug("Removing problems from low count reports")
+            self._unassign_reports(db, get_low_count_report_problem_ids(db,
+                                                                        problemplugin.name,
+                                                                        report_min_count))
+
+        self.log_debug("Flushing session")
+        self._apply_moves(db)
 
     def update_comps(self, db, comps, db_problem) -> None:
         db_comps = sorted(comps,
@@ -504,34 +840,63 @@ class CreateProblems(Action):
                 db_pcomp.order = order
                 db.session.add(db_pcomp)
 
-    def run(self, cmdline, db) -> None:
+    def run(self, cmdline, db) -> int:
         if not cmdline.problemtype:
             ptypes = list(problemtypes.keys())
         else:
             ptypes = cmdline.problemtype
 
+        if cmdline.incremental and cmdline.speedup:
+            self.log_error("--incremental and --speedup are mutually exclusive")
+            return 1
+
+        if cmdline.processes < 1:
+            self.log_error("Argument --processes must be a positive number.")
+            return 1
+
         self._max_workers = cmdline.max_workers
+        self._processes = cmdline.processes
 
+        self._moves = []
+        self._changed_problem_ids = set()
         ptypes_len = len(ptypes)
         for i, ptype in enumerate(ptypes, start=1):
             problemplugin = problemtypes[ptype]
             self.log_info("[{0} / {1}] Processing problem type: {2}"
                           .format(i, ptypes_len, problemplugin.nice_name))
 
-            self._create_problems(db,
-                                  problemplugin,
-                                  cmdline.report_min_count,
-                                  cmdline.speedup)
+            if cmdline.incremental:
+                self._create_problems_incremental(db,
+                                                  problemplugin,
+                                                  cmdline.report_min_count)
+            else:
+                self._create_problems(db,
+                                      problemplugin,
+                                      cmdline.report_min_count,
+                                      cmdline.speedup)
+
+        removed = self._remove_empty_problems(db)
+
+        self.log_info("Refreshing problem snapshots")
+        mark_problem_snapshots_stale(db, self._changed_problem_ids)
+        refresh_problem_snapshots(db)
 
-        self._remove_empty_problems(db)
+        if self._changed_problem_ids or removed:
+            bump_cache_generations(db, ["problems"])
+        return 0
 
     def tweak_cmdline_parser(self, parser) -> None:
         parser.add_problemtype(multiple=True)
         parser.add_argument("-w", "--max-workers", type=int,
                             default=4,
                             help="Maximal number of worker threads to use during problem processing.")
+        parser.add_argument("--processes", type=int, default=1,
+                            help="Number of worker processes computing dendrograms of clusters.")
         parser.add_argument("--report-min-count", type=int,
                             default=-1,
                             help="Ignore reports with count less than this.")
         parser.add_argument("--speedup", action="store_true",
                             help="Only attach new reports to existing problems")
+        parser.add_argument("--incremental", action="store_true",
+                            help="Only cluster new and changed reports against "
+                                 "problems sharing a function with them")
@@ -0,0 +1,264 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from fedora_messaging.api import publish
+from fedora_messaging.exceptions import ConnectionException, PublishReturned
+from fedora_messaging.message import Message
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+
+from faf_schema.schema import FafReportMessage, FafProblemMessage
+from pyfaf.actions import Action
+from pyfaf.storage import NotificationOutbox, Problem, Report
+from pyfaf.storage.events_fedmsg import levels, notify_problems, notify_reports
+from pyfaf.utils import web
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# (id, report_id, problem_id, old_count, new_count) of a NotificationOutbox row
+OutboxRow = Tuple[int, int, int, int, int]
+
+# first key of the advisory locks serializing drainers per problem
+PROBLEM_LOCK = 0x6661660a
+
+
+class FedmsgDrain(Action):
+    name = "fedmsg-drain"
+
+    def run(self, cmdline, db) -> int:
+        batch_size = max(cmdline.batch_size, 1)
+
+        while True:
+            try:
+                drained = self._drain(db, batch_size, max(cmdline.tries, 1), cmdline.delay)
+            except ConnectionException as ex:
+                self.log_error("Unable to publish notifications: {0}".format(ex))
+                if not cmdline.follow:
+                    return 1
+
+                time.sleep(cmdline.interval)
+                continue
+
+            if drained:
+                self.log_info("Published notifications for {0} report count changes".format(drained))
+
+            if drained < batch_size:
+                if not cmdline.follow:
+                    return 0
+
+                time.sleep(cmdline.interval)
+
+    def _drain(self, db, batch_size, tries, delay) -> int:
+        """
+        Publish notifications of one batch of outbox rows and delete them.
+
+        The rows stay locked until the transaction ends, so several drainers
+        may run at once. Rows of a problem are drained by one drainer at
+        a time, the rows of problems drained elsewhere are left for later.
+        When publishing fails, the transaction is rolled back and the whole
+        batch is published again by the next attempt.
+        """
+
+        if db.session.autocommit:
+            db.session.begin()
+
+        try:
+            rows = (db.session.query(NotificationOutbox.id,
+                                     NotificationOutbox.report_id,
+                                     NotificationOutbox.problem_id,
+                                     NotificationOutbox.old_count,
+                                     NotificationOutbox.new_count)
+                    .order_by(NotificationOutbox.id)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                    .all())
+
+            if notify_problems:
+                rows = self._lock_problems(db, rows)
+
+            messages = []
+            if notify_reports:
+                messages.extend(self._report_messages(db, rows))
+            if notify_problems:
+                messages.extend(self._problem_messages(db, rows))
+
+            for msg in messages:
+                self._publish(msg, tries, delay)
+
+            if rows:
+                (db.session.query(NotificationOutbox)
+                 .filter(NotificationOutbox.id.in_([row[0] for row in rows]))
+                 .delete(synchronize_session=False))
+
+            db.session.commit()
+        except: #pylint: disable=bare-except
+            db.session.rollback()
+            raise
+
+        return len(rows)
+
+    def _report_messages(self, db, rows: List[OutboxRow]) -> List[Message]:
+        crossings = [(report_id, level, new_count)
+                     for _, report_id, _, old_count, new_count in rows
+                     for level in levels
+                     if old_count < level <= new_count]
+        if not crossings:
+            return []
+
+        db_reports = {db_report.id: db_report for db_report in
+                      (db.session.query(Report)
+                       .filter(Report.id.in_(set(crossing[0] for crossing in crossings)))
+                       .options(joinedload(Report.component),
+                                selectinload("hashes"),
+                                selectinload("backtraces")))}
+
+        result = []
+        for report_id, level, count in crossings:
+            db_report = db_reports.get(report_id)
+            if db_report is None:
+                continue
+
+            self.log_debug("Notifying about report #{0} level {1}".format(report_id, level))
+            msg_body = {
+                "report_id": db_report.id,
+                "function": db_report.crash_function,
+                "components": [db_report.component.name],
+                "first_occurrence": db_report.first_occurrence.strftime(DATE_FORMAT),
+                "count": count,
+                "type": db_report.type,
+                "level": level,
+            }
+            if web.webfaf_installed() and db_report.hashes:
+                msg_body["url"] = web.reverse("reports.bthash_forward",
+                                              bthash=db_report.hashes[0].hash)
+
+            if db_report.problem_id:
+                msg_body["problem_id"] = db_report.problem_id
+
+            result.append(FafReportMessage(topic="faf.report.threshold{0}".format(level),
+                                           body=msg_body))
+
+        return result
+
+    def _lock_problems(self, db, rows: List[OutboxRow]) -> List[OutboxRow]:
+        """
+        Lock problems of `rows` for this transaction and return the rows
+        of the problems locked successfully and of no problem.
+        """
+
+        locked = {None}
+        for problem_id in sorted({row[2] for row in rows if row[2] is not None}):
+            if db.session.query(func.pg_try_advisory_xact_lock(PROBLEM_LOCK, problem_id)).scalar():
+                locked.add(problem_id)
+            else:
+                self.log_debug("Problem #{0} is drained by another process".format(problem_id))
+
+        return [row for row in rows if row[2] in locked]
+
+    def _problem_messages(self, db, rows: List[OutboxRow]) -> List[Message]:
+        deltas: Dict[int, int] = defaultdict(int)
+        for _, _, problem_id, old_count, new_count in rows:
+            if problem_id is not None:
+                deltas[problem_id] += new_count - old_count
+        if not deltas:
+            return []
+
+        # The counts of all reports are already stored, the problem count
+        # before the batch is the current one without all changes not
+        # published yet. The problems are locked by _lock_problems, so
+        # the changes left out of the batch are published by later batches
+        # from where this one ends.
+        totals = dict(db.session.query(Report.problem_id, func.sum(Report.count))
+                      .filter(Report.problem_id.in_(deltas.keys()))
+                      .group_by(Report.problem_id))
+        pending = dict(db.session.query(NotificationOutbox.problem_id,
+                                        func.sum(NotificationOutbox.new_count - NotificationOutbox.old_count))
+                       .filter(NotificationOutbox.problem_id.in_(deltas.keys()))
+                       .group_by(NotificationOutbox.problem_id))
+
+        crossings = []
+        for problem_id, delta in deltas.items():
+            old_count = totals.get(problem_id, 0) - pending.get(problem_id, 0)
+            new_count = old_count + delta
+            crossings.extend((problem_id, level, new_count) for level in levels
+                             if old_count < level <= new_count)
+        if not crossings:
+            return []
+
+        db_problems = {db_problem.id: db_problem for db_problem in
+                       (db.session.query(Problem)
+                        .filter(Problem.id.in_(set(crossing[0] for crossing in crossings)))
+                        .options(selectinload(Problem.components),
+                                 selectinload("reports").selectinload("backtraces")))}
+
+        result = []
+        for problem_id, level, count in crossings:
+            db_problem = db_problems.get(problem_id)
+            if db_problem is None or not db_problem.reports:
+                continue
+
+            self.log_debug("Notifying about problem #{0} level {1}".format(problem_id, level))
+            msg_body = {
+                "problem_id": db_problem.id,
+                "function": db_problem.crash_function,
+                "components": list(db_problem.unique_component_names),
+                "first_occurrence": db_problem.first_occurrence.strftime(DATE_FORMAT),
+                "count": count,
+                "type": db_problem.type,
+                "level": level,
+            }
+            if web.webfaf_installed():
+                msg_body["url"] = web.reverse("problems.item", problem_id=db_problem.id)
+
+            result.append(FafProblemMessage(topic="faf.problem.threshold{0}".format(level),
+                                            body=msg_body))
+
+        return result
+
+    def _publish(self, msg, tries, delay) -> None:
+        for attempt in range(1, tries + 1):
+            try:
+                publish(msg)
+                return
+            except PublishReturned as ex:
+                # retrying a rejected message would not help
+                self.log_warn("Fedora Messaging broker rejected message {0}: {1}".format(msg.id, ex))
+                return
+            except ConnectionException as ex:
+                if attempt == tries:
+                    raise
+
+                self.log_warn("Error sending message {0}: {1}, retrying in {2} seconds"
+                              .format(msg.id, ex, delay))
+                time.sleep(delay)
+                delay *= 2
+
+    def tweak_cmdline_parser(self, parser) -> None:
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Number of report count changes published in one transaction")
+        parser.add_argument("--tries", type=int, default=3,
+                            help="Attempts to publish a message before giving up on the batch")
+        parser.add_argument("--delay", type=float, default=5,
+                            help="Seconds to wait before the first retry, doubled for each next one")
+        parser.add_argument("--follow", action="store_true", default=False,
+                            help="Keep draining the outbox until interrupted")
+        parser.add_argument("--interval", type=float, default=10,
+                            help="Seconds to wait for new notifications with --follow")
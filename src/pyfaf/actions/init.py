@@ -16,6 +16,12 @@
 # You should have received a copy of the GNU General Public License
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
+# Plugins installed by the action, actions are loaded on demand
+# pylint: disable=unused-import
+import pyfaf.bugtrackers
+import pyfaf.opsys
+import pyfaf.problemtypes
+# pylint: enable=unused-import
 from pyfaf.actions import Action
 from pyfaf.common import Plugin, log
 from pyfaf.queries import get_arch_by_name
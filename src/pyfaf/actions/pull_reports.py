@@ -16,22 +16,88 @@
 # You should have received a copy of the GNU General Public License
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Any, Dict, List, Optional, Union
-import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Generator, Iterable, Optional, Set
+import codecs
+import hashlib
 import os
 import pickle
-import urllib.error
-import urllib.request
+import tempfile
 import uuid
 
+import requests
+from requests.adapters import HTTPAdapter
+
 from pyfaf.actions import Action
 from pyfaf.common import ensure_dirs, FafError
+from pyfaf.utils.parse import iter_json_array
+
+
+class PullIndex:
+    """
+    Set of names of reports pulled from a single master, stored on disk
+    as an append-only list with one name per line. Every pulled report
+    is appended right away, so an interrupted pull resumes where it
+    stopped. `compact` rewrites the file once the master's report list
+    has been read completely.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.known: Set[str] = set()
+
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.known = set(line.rstrip("\n") for line in f)
+            self.known.discard("")
+
+        self._file = open(self.path, "a+", encoding="utf-8") #pylint: disable=consider-using-with
+        # a name might have been cut short by an interrupted write
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.known
+
+    def __len__(self) -> int:
+        return len(self.known)
+
+    def add(self, name: str) -> None:
+        self.known.add(name)
+        self._file.write("{0}\n".format(name))
+        self._file.flush()
+
+    def compact(self, names: Iterable[str]) -> None:
+        """
+        Forget all names missing in `names` and atomically rewrite the file.
+        """
+
+        self.known.intersection_update(names)
+        self._file.close()
+
+        tmpfilename = "{0}.tmp".format(self.path)
+        with open(tmpfilename, "w", encoding="utf-8") as f:
+            for name in sorted(self.known):
+                f.write("{0}\n".format(name))
+
+        os.rename(tmpfilename, self.path)
+        self._file = open(self.path, "a", encoding="utf-8") #pylint: disable=consider-using-with
+
+    def close(self) -> None:
+        self._file.close()
 
 
 class PullReports(Action):
     name = "pull-reports"
 
+    # Set of known reports of all masters used before the per-master index
     KNOWN_FILE_NAME = "pull.pickle"
+    INDEX_FILE_NAME = "pull-{0}.idx"
+    MANIFEST_CHUNK_SIZE = 64 * 1024
+    # (connect, read) timeouts of HTTP requests in seconds
+    TIMEOUT = (30, 300)
 
     def __init__(self) -> None:
         super().__init__()
@@ -43,133 +109,211 @@ class PullReports(Action):
         self.load_config_to_self("basedir", ["ureport.directory"],
                                  "/var/spool/faf")
 
-        self.known_file = os.path.join(self.basedir, "reports",
+        self.reports_dir = os.path.join(self.basedir, "reports")
+        self.known_file = os.path.join(self.reports_dir,
                                        PullReports.KNOWN_FILE_NAME)
-        self.incoming_dir = os.path.join(self.basedir, "reports", "incoming")
+        self.incoming_dir = os.path.join(self.reports_dir, "incoming")
         try:
             ensure_dirs([self.incoming_dir])
         except FafError:
             self.log_error("Required directories can't be created")
             raise
 
-    def _load_known(self) -> None:
-        if not os.path.isfile(self.known_file):
-            self.known = set()
-            self._full_pickle = {}
-            return
+    def _open_index(self) -> PullIndex:
+        master_hash = hashlib.sha1(self.master.encode("utf-8")).hexdigest()
+        path = os.path.join(self.reports_dir,
+                            PullReports.INDEX_FILE_NAME.format(master_hash))
+
+        if os.path.isfile(path) or not os.path.isfile(self.known_file):
+            return PullIndex(path)
 
+        # Import reports known from the pickle used by previous versions
         with open(self.known_file, "rb") as f:
-            self._full_pickle = pickle.load(f)
+            known = pickle.load(f).get(self.master, set())
+
+        self.log_info("Importing {0} known reports from {1}"
+                      .format(len(known), self.known_file))
+        index = PullIndex(path)
+        for report in known:
+            index.add(report)
+
+        return index
+
+    def _create_session(self, workers: int) -> requests.Session:
+        """
+        Return a session keeping alive a connection for each of the `workers`
+        and one for the report list.
+        """
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers + 1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _list_reports(self, session: requests.Session) -> Generator[str, None, None]:
+        """
+        Yield names of reports available at the master as the list
+        is being downloaded.
+        """
 
-        self.known = self._full_pickle.get(self.master, set())
+        url = "{0}/reports".format(self.master)
 
-    def _save_known(self) -> None:
-        self._full_pickle[self.master] = self.known
-        tmpfilename = "{0}.tmp".format(self.known_file)
-        with open(tmpfilename, "wb") as f:
-            pickle.dump(self._full_pickle, f)
+        with session.get(url, stream=True, timeout=PullReports.TIMEOUT) as response:
+            if response.status_code != 200:
+                raise FafError("Unexpected HTTP response code {0}"
+                               .format(response.status_code))
 
-        os.rename(tmpfilename, self.known_file)
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            chunks = (decoder.decode(chunk) for chunk in
+                      response.iter_content(PullReports.MANIFEST_CHUNK_SIZE))
 
-    def _list_reports(self) -> Union[List[None], Dict[str, Any]]:
-        url = "{0}/reports".format(self.master)
+            for report in iter_json_array(chunks):
+                if not isinstance(report, str) or os.path.basename(report) != report:
+                    self.log_warn("Ignoring invalid report name {0!r}".format(report))
+                    continue
+
+                yield report
+
+    def _get_report(self, session: requests.Session, report_id: str) -> Optional[bytes]:
+        url = "{0}/report/{1}".format(self.master, report_id)
 
         try:
-            with urllib.request.urlopen(url) as response:
-                if response.getcode() != 200:
-                    self.log_warn("Unable to get reports: Unexpected HTTP response code {0}"
-                                .format(response.getcode()))
-                    return []
-
-                return json.load(response)
-        except urllib.error.URLError as ex:
+            response = session.get(url, timeout=PullReports.TIMEOUT)
+            if response.status_code != 200:
+                self.log_warn("Unable to get report #{0}: Unexpected HTTP response code {1}"
+                              .format(report_id, response.status_code))
+                return None
+
+            return response.content
+        except requests.RequestException as ex:
             self.log_warn("Unable to open URL '{0}': {1}".format(url, str(ex)))
-        except json.decoder.JSONDecodeError as ex:
-            self.log_warn("Unable to read report list JSON: {0}".format(str(ex)))
-        except Exception as ex: # pylint: disable=broad-except
-            self.log_warn("Unable to load report list: {0}".format(str(ex)))
 
-        return []
+        return None
+
+    def _save_report(self, report_id: str, ureport: bytes) -> str:
+        """
+        Write `ureport` to the incoming directory atomically. Return
+        the path of the new file.
+        """
 
-    def _get_report(self, report_id) -> Optional[bytes]:
-        url = "{0}/report/{1}".format(self.master, report_id)
+        fd, tmpfilename = tempfile.mkstemp(dir=self.reports_dir, prefix=".pull-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                os.fchmod(f.fileno(), 0o644)
+                f.write(ureport)
+
+            # We prefer that the incoming report be named the same as on the master
+            filename = os.path.join(self.incoming_dir, report_id)
+            # If a report with the same name already exists in the directory, keep
+            # generating a name at random until one that is available is found
+            while True:
+                try:
+                    os.link(tmpfilename, filename)
+                    return filename
+                except FileExistsError:
+                    filename = os.path.join(self.incoming_dir, uuid.uuid4().hex)
+        finally:
+            os.unlink(tmpfilename)
+
+    def _pull_report(self, session: requests.Session, report_id: str) -> Optional[str]:
+        ureport = self._get_report(session, report_id)
+        if ureport is None:
+            return None
 
         try:
-            with urllib.request.urlopen(url) as response:
-                if response.getcode() != 200:
-                    self.log_warn("Unable to get report #{0}: Unexpected HTTP response code {1}"
-                                .format(report_id, response.getcode()))
-                    return None
-
-                return response.read()
-        except urllib.error.URLError as ex:
-            self.log_warn("Unable to open URL '{0}': {1}".format(url, str(ex)))
-        except Exception as ex: # pylint: disable=broad-except
-            self.log_warn("Unable to get report #{0}: {1}"
-                          .format(report_id, str(ex)))
+            return self._save_report(report_id, ureport)
+        except OSError as ex:
+            self.log_warn("Unable to save report #{0}: {1}".format(report_id, str(ex)))
 
         return None
 
+    def _collect(self, futures: Iterable, pending: Dict, index: PullIndex) -> int:
+        """
+        Record reports pulled by finished `futures` in the `index`
+        and return their count.
+        """
+
+        pulled = 0
+        for future in futures:
+            report = pending.pop(future)
+            if future.cancelled():
+                continue
+
+            filename = future.result()
+            if filename is None:
+                # Ignore if the report can't be downloaded -- don't add it to the
+                # known set.
+                continue
+
+            self.log_debug("Pulled %s to %s", report, filename)
+            index.add(report)
+            pulled += 1
+
+        return pulled
+
     def run(self, cmdline, db) -> int:
         if cmdline.master is not None:
             self.master = cmdline.master
 
+        if cmdline.workers < 1:
+            self.log_error("At least 1 worker is required")
+            return 1
+
         # Load set of reports we have already downloaded from this master
-        self._load_known()
+        index = self._open_index()
+        session = self._create_session(cmdline.workers)
 
-        # Download list of all reports available at the master
         self.log_info("Pulling reports from master {0}".format(self.master))
-        reports = set(self._list_reports())
-
-        # Subset of master's reports which are new to us
-        new_reports = reports - self.known
-
-        # Update our set of known reports by forgetting those reports we downloaded
-        # before but which are not available anymore.
-        self.known = reports.intersection(self.known)
-
-        if new_reports:
-
-            self.log_info("Found {0} new reports among {1} available"
-                          .format(len(new_reports), len(reports)))
-
-            pulled = 0
-            try:
-                new_reports_len = len(new_reports)
-                for i, report in enumerate(sorted(new_reports), start=1):
-                    self.log_debug("[%d / %d] Pulling %s...", i, new_reports_len, report)
-                    # Fetch the uReport from the server
-                    ureport = self._get_report(report)
-                    if ureport is None:
-                        # Ignore if the report can't be found -- don't add it to the
-                        # knonw set.
-                        continue
-
-                    # We prefer that the incoming report be named the same as on the master
-                    filename = os.path.join(self.incoming_dir, report)
-                    # If a report with the same name already exists directory, keep
-                    # generating a name at random until one that is available is found
-                    while os.path.isfile(filename):
-                        filename = os.path.join(self.incoming_dir, uuid.uuid4().hex)
-
-                    with open(filename, "wb") as f:
-                        f.write(ureport)
-
-                    self.log_debug("Saved to %s", filename)
-                    self.known.add(report)
-                    pulled += 1
-            finally:
-                self._save_known()
-                self.log_info("Successfully pulled {0} new reports".format(pulled))
-
-        # If there are no new reports, only save the (possibly updated) set of known
-        # ones
-        else:
-            self.log_info("No new reports found")
-            self._save_known()
+
+        available = set()
+        pending: Dict = {}
+        pulled = 0
+        complete = False
+        try:
+            with ThreadPoolExecutor(max_workers=cmdline.workers) as executor:
+                try:
+                    for report in self._list_reports(session):
+                        if report in available:
+                            continue
+
+                        available.add(report)
+                        if report in index:
+                            continue
+
+                        pending[executor.submit(self._pull_report, session, report)] = report
+                        # Do not read ahead of the downloads too much
+                        if len(pending) >= 2 * cmdline.workers:
+                            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            pulled += self._collect(done, pending, index)
+
+                    complete = True
+                except (requests.RequestException, FafError, ValueError) as ex:
+                    self.log_warn("Unable to load report list: {0}".format(str(ex)))
+                finally:
+                    if not complete:
+                        for future in pending:
+                            future.cancel()
+
+                    done, _ = wait(pending)
+                    pulled += self._collect(done, pending, index)
+        finally:
+            session.close()
+            if complete:
+                # Forget reports we downloaded before but which are not
+                # available anymore.
+                index.compact(available)
+            index.close()
+            self.log_info("Successfully pulled {0} new reports among {1} available"
+                          .format(pulled, len(available)))
+
+        if not complete:
+            return 1
 
         return 0
 
     def tweak_cmdline_parser(self, parser) -> None:
         parser.add_argument("-m", "--master", default=None,
                             help="Master server to sync")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Number of reports downloaded concurrently")
@@ -22,6 +22,8 @@ import pyfaf.storage as st
 from pyfaf.queries import (get_opsys_by_name,
                            get_osrelease,
                            get_empty_problems,
+                           get_history_rollup_target,
+                           mark_problem_snapshots_stale,
                            get_builds_by_opsysrelease_id,
                            delete_mantis_bugzilla,
                            delete_bugzilla)
@@ -162,6 +164,21 @@ class ReleaseDelete(Action):
          .filter(st.ReportHistoryMonthly.opsysrelease_id == opsysrelease_id)
          .delete(False))
 
+        mark_problem_snapshots_stale(
+            db, [problem_id for (problem_id,) in
+                 (db.session.query(st.Report.problem_id)
+                  .join(st.ReportOpSysRelease)
+                  .filter(st.ReportOpSysRelease.opsysrelease_id == opsysrelease_id)
+                  .filter(st.Report.problem_id.isnot(None))
+                  .distinct())])
+
+        for level in ["problem", "component", "release"]:
+            for history in ["daily", "weekly", "monthly"]:
+                hist_table, _ = get_history_rollup_target(level, history)
+                (db.session.query(hist_table)
+                 .filter(hist_table.opsysrelease_id == opsysrelease_id)
+                 .delete(False))
+
         (db.session.query(st.ReportOpSysRelease)
          .filter(st.ReportOpSysRelease.opsysrelease_id == opsysrelease_id)
          .delete(False))
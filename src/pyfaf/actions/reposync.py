@@ -16,25 +16,33 @@
 # You should have received a copy of the GNU General Public License
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
-from typing import Dict, Generator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Generator, List, Tuple
 import itertools
-from urllib.error import URLError
-from urllib.request import urlopen
 
-from pyfaf.common import FafError
-from pyfaf.faf_rpm import store_rpm_provides
+from pyfaf.common import FafError, get_temp_dir
+from pyfaf.faf_rpm import read_rpm_provides, save_rpm_provides
 from pyfaf.repos import repo_types
 from pyfaf.actions import Action
-from pyfaf.storage.opsys import (Repo, Build, BuildArch, Package, OpSys,
-                                 BuildOpSysReleaseArch, OpSysRelease, Arch)
-from pyfaf.queries import get_archs
-from pyfaf.utils.decorators import retry
+from pyfaf.storage.opsys import Repo, Build, BuildArch, Package, BuildOpSysReleaseArch
+from pyfaf.queries import (get_archs, get_build_ids_by_nevrs, get_osrelease,
+                           get_packages_by_build_ids, insert_ignore_conflicts,
+                           insert_returning)
+from pyfaf.utils.download import Downloader
+
+# Number of rows inserted by a single statement
+BATCH_SIZE = 1000
+
 
 class RepoSync(Action):
     name = "reposync"
 
 
-    def run(self, cmdline, db) -> None:
+    def run(self, cmdline, db) -> int:
+        if cmdline.download_workers < 1 or cmdline.parse_workers < 1:
+            self.log_error("At least 1 worker is required")
+            return 1
+
         repo_instances = []
 
         for repo in db.session.query(Repo):
@@ -113,165 +121,241 @@ class RepoSync(Action):
             if cmdline.no_cache:
                 repo_instance["instance"].cache_lifetime = 0
 
-            pkglist = \
-                repo_instance["instance"].list_packages(list(architectures.keys()))
-            total = len(pkglist)
+            # Skipped packages must not be remembered as synchronized
+            incremental = not cmdline.full and not cmdline.name_prefix
+            if incremental:
+                pkglist = repo_instance["instance"].list_changed_packages(list(architectures.keys()))
+            else:
+                pkglist = repo_instance["instance"].list_packages(list(architectures.keys()))
 
-            self.log_info("Repository has {0} packages".format(total))
+            if self._sync_packages(db, cmdline, repo_instance, pkglist, architectures) and incremental:
+                repo_instance["instance"].mark_synced()
 
-            for num, pkg in enumerate(pkglist, start=1):
-                self.log_info("[%d / %d] Processing package %s", num, total, pkg["name"])
+        return 0
 
-                if not pkg["name"].lower().startswith(cmdline.name_prefix):
-                    self.log_debug("Skipped package %s", pkg["name"])
-                    continue
-                arch = architectures.get(pkg["arch"], None)
-                if not arch:
-                    self.log_error("Architecture '{0}' not found, skipping"
-                                   .format(pkg["arch"]))
+    def _sync_packages(self, db, cmdline, repo_instance, pkglist, architectures) -> bool:
+        """
+        Import packages from `pkglist` as yielded by `list_packages`
+        or `list_changed_packages`. Return True if all of them were
+        imported successfully, False if any was skipped for an unknown
+        architecture, its build could not be linked with the operating
+        system release or its download failed.
+
+        The packages are diffed against the existing builds and packages
+        with a few bulk queries and only the missing rows are inserted,
+        in batches of `BATCH_SIZE`. Only the new packages and the known
+        ones without a stored RPM are downloaded.
+        """
 
-                    continue
+        repo_arch = architectures.get(repo_instance["arch"], None)
+        if not repo_arch:
+            self.log_error("Architecture '{0}' not found, skipping"
+                           .format(repo_instance["arch"]))
+            return False
+
+        packages = {}
+        unknown_archs = set()
+        listed = 0
+        removed = 0
+        for pkg in pkglist:
+            listed += 1
+            if pkg.get("removed", False):
+                # Packages are kept in storage for the reports referring to them
+                self.log_debug("Package %s was removed from the repository", pkg["filename"])
+                removed += 1
+                continue
 
-                repo_arch = architectures.get(repo_instance["arch"], None)
-                if not repo_arch:
+            if not pkg["name"].lower().startswith(cmdline.name_prefix):
+                self.log_debug("Skipped package %s", pkg["name"])
+                continue
+
+            arch = architectures.get(pkg["arch"], None)
+            if not arch:
+                if pkg["arch"] not in unknown_archs:
                     self.log_error("Architecture '{0}' not found, skipping"
-                                   .format(repo_instance["arch"]))
+                                   .format(pkg["arch"]))
+                    unknown_archs.add(pkg["arch"])
 
-                    continue
+                continue
 
-                build = (db.session.query(Build)
-                         .filter(Build.base_package_name ==
-                                 pkg["base_package_name"])
-                         .filter(Build.version == pkg["version"])
-                         .filter(Build.release == pkg["release"])
-                         .filter(Build.epoch == pkg["epoch"])
-                         .first())
-
-                if not build:
-                    self.log_debug("Adding build %s-%s", pkg["base_package_name"], pkg["version"])
-
-                    build = Build()
-                    build.base_package_name = pkg["base_package_name"]
-                    build.version = pkg["version"]
-                    build.release = pkg["release"]
-                    build.epoch = pkg["epoch"]
-
-                    db.session.add(build)
-                    db.session.flush()
-
-                build_arch = (db.session.query(BuildArch)
-                              .filter(BuildArch.build_id == build.id)
-                              .filter(BuildArch.arch_id == arch.id)
-                              .first())
-
-                if not build_arch:
-                    build_arch = BuildArch()
-                    build_arch.build = build
-                    build_arch.arch = arch
-
-                    db.session.add(build_arch)
-                    db.session.flush()
-
-                build_opsysrelease_arch = (
-                    db.session.query(BuildOpSysReleaseArch)
-                    .join(Build)
-                    .join(OpSysRelease)
-                    .join(Arch)
-                    .filter(Build.id == build.id)
-                    .filter(OpSys.name == repo_instance["opsys"])
-                    .filter(OpSysRelease.version == repo_instance["release"])
-                    .filter(Arch.name == repo_instance["arch"])
-                    .first())
-
-                if not build_opsysrelease_arch and repo_instance["release"] and repo_instance["opsys"]:
-                    self.log_info("Adding link between build '{0}-{1}' "
-                                  "and operating system '{2} {3} {4}'"
-                                  .format(pkg["base_package_name"], pkg["version"],
-                                          repo_instance["opsys"], repo_instance["release"],
-                                          repo_instance["arch"]))
-
-                    opsysrelease = (
-                        db.session.query(OpSysRelease)
-                        .filter(OpSys.name == repo_instance["opsys"])
-                        .filter(OpSysRelease.version == repo_instance["release"])
-                        .first())
-
-                    bosra = BuildOpSysReleaseArch()
-                    bosra.build = build
-                    bosra.opsysrelease = opsysrelease
-                    bosra.arch = repo_arch
-
-                    db.session.add(bosra)
-                    db.session.flush()
-
-                package = (db.session.query(Package)
-                           .filter(Package.name == pkg["name"])
-                           .filter(Package.pkgtype == pkg["type"])
-                           .filter(Package.build == build)
-                           .filter(Package.arch == arch)
-                           .first())
-
-                if not package:
-                    self.log_info("Adding package {0}".format(pkg["filename"]))
-
-                    package = Package()
-                    package.name = pkg["name"]
-                    package.pkgtype = pkg["type"]
-                    package.arch = arch
-                    package.build = build
-
-                    db.session.add(package)
-                    db.session.flush()
-
-                    if cmdline.no_download_rpm:
-                        continue
+            packages[(self._nevr(pkg), arch.id, pkg["name"], pkg["type"])] = pkg
+
+        self.log_info("Repository listed {0} packages, {1} of them removed"
+                      .format(listed, removed))
+
+        # The repository is not marked as synced until the skipped packages
+        # can be imported
+        complete = not unknown_archs
+
+        nevrs = {nevr for nevr, _, _, _ in packages}
+        build_ids = get_build_ids_by_nevrs(db, nevrs)
+
+        new_builds = list(nevrs - set(build_ids))
+        self.log_info("Adding {0} builds".format(len(new_builds)))
+        for batch in self._batches(new_builds):
+            rows = [{"base_package_name": name, "epoch": epoch,
+                     "version": version, "release": release,
+                     "semver": version, "semrel": release}
+                    for name, epoch, version, release in batch]
+
+            for build_id, *nevr in insert_returning(db, Build, rows,
+                                                    ["id", "base_package_name", "epoch",
+                                                     "version", "release"]):
+                build_ids[tuple(nevr)] = build_id
+
+        build_archs = sorted({(build_ids[nevr], arch_id) for nevr, arch_id, _, _ in packages})
+        for batch in self._batches(build_archs):
+            insert_ignore_conflicts(db, BuildArch,
+                                    [{"build_id": build_id, "arch_id": arch_id}
+                                     for build_id, arch_id in batch])
+
+        if repo_instance["release"] and repo_instance["opsys"]:
+            opsysrelease = get_osrelease(db, repo_instance["opsys"], repo_instance["release"])
+            if opsysrelease:
+                self.log_info("Linking {0} builds with operating system '{1} {2} {3}'"
+                              .format(len(nevrs), repo_instance["opsys"],
+                                      repo_instance["release"], repo_instance["arch"]))
+
+                for batch in self._batches(sorted(set(build_ids[nevr] for nevr in nevrs))):
+                    insert_ignore_conflicts(db, BuildOpSysReleaseArch,
+                                            [{"build_id": build_id,
+                                              "opsysrelease_id": opsysrelease.id,
+                                              "arch_id": repo_arch.id}
+                                             for build_id in batch])
+            else:
+                self.log_error("Operating system '{0} {1}' not found, not linking builds"
+                               .format(repo_instance["opsys"], repo_instance["release"]))
+                complete = False
+
+        known = get_packages_by_build_ids(db, set(build_ids[nevr] for nevr in nevrs))
+        new_packages = []
+        missing_lobs = []
+        for (nevr, arch_id, name, pkgtype), pkg in packages.items():
+            package = known.get((build_ids[nevr], arch_id, name, pkgtype), None)
+            if package is None:
+                new_packages.append((build_ids[nevr], arch_id, name, pkgtype))
+            elif not cmdline.no_download_rpm and not package.has_lob("package"):
+                missing_lobs.append((package, pkg))
+
+        self.log_info("Adding {0} packages, {1} known packages skipped"
+                      .format(len(new_packages), len(packages) - len(new_packages)))
+
+        added = []
+        for batch in self._batches(new_packages):
+            rows = [{"build_id": build_id, "arch_id": arch_id, "name": name, "pkgtype": pkgtype}
+                    for build_id, arch_id, name, pkgtype in batch]
+            added += insert_returning(db, Package, rows, ["id"])
+
+        if cmdline.no_download_rpm:
+            return complete
+
+        pkg_by_key = {(build_ids[nevr], arch_id, name, pkgtype): pkg
+                      for (nevr, arch_id, name, pkgtype), pkg in packages.items()}
+        jobs = []
+        added_ids = sorted(package_id for package_id, in added)
+        for batch in self._batches(added_ids):
+            for package in db.session.query(Package).filter(Package.id.in_(batch)):
+                key = (package.build_id, package.arch_id, package.name, package.pkgtype)
+                jobs.append((package, pkg_by_key[key], True))
+
+        for package, pkg in missing_lobs:
+            self.log_info("Package {} does not have a LOB. Re-downloading.".format(pkg["name"]))
+            jobs.append((package, pkg, False))
+
+        return self._download_packages(db, cmdline, repo_instance, jobs) == 0 and complete
+
+    def _download_packages(self, db, cmdline, repo_instance, jobs) -> int:
+        """
+        Download RPMs of `jobs`, a list of (package, pkg, new) tuples,
+        `cmdline.download_workers` at a time. Provides of new packages are
+        read in `cmdline.parse_workers` processes as soon as they are
+        downloaded and stored here. New packages that fail are deleted.
+        Return the number of failures.
+        """
 
-                    # Catching too general exception Exception
-                    # pylint: disable-msg=W0703
-                    try:
-                        self.log_info("Downloading {0}".format(pkg["url"]))
-                        self._download(package, "package", pkg["url"])
-                    except Exception as exc:
-                        self.log_error("Exception ({0}) after multiple attempts"
-                                       " while trying to download {1},"
-                                       " skipping.".format(exc, pkg["url"]))
-
-                        db.session.delete(package)
-                        db.session.flush()
-                        continue
-                    # pylint: enable-msg=W0703
-
-                    if pkg["type"] == "rpm":
-                        try:
-                            store_rpm_provides(db, package, repo_instance["nogpgcheck"])
-                        except FafError as ex:
-                            self.log_error("Post-processing failed, skipping: {}".format(ex))
-                            db.session.delete(package)
-                            db.session.flush()
-                            continue
-
-                    if cmdline.no_store_rpm:
-                        try:
-                            package.del_lob("package")
-                            self.log_info("Package deleted.")
-                        except Exception as exc: # pylint: disable=broad-except
-                            self.log_error("Error deleting the RPM file.")
-
-                else:
-                    self.log_debug("Known package %s", pkg["filename"])
-                    if not package.has_lob("package") and not cmdline.no_download_rpm:
-                        self.log_info("Package {} does not have a LOB. Re-downloading.".format(pkg["name"]))
-                        try:
-                            self._download(package, "package", pkg["url"])
-                        except (FafError, URLError) as exc:
-                            self.log_error("Exception ({0}) after multiple attempts"
-                                           " while trying to download {1},"
-                                           " skipping.".format(exc, pkg["url"]))
-
-    @retry(3, delay=5, backoff=3, verbose=True)
-    def _download(self, obj, lob, url) -> None:
-        with urlopen(url) as response:
-            obj.save_lob(lob, response.fp, truncate=True)
+        if not jobs:
+            return 0
+
+        # Everything needed by the workers is read before a flush expires the packages
+        jobs = [(package.id, package, package.get_lob_path("package"), pkg, new)
+                for package, pkg, new in jobs]
+
+        downloader = Downloader(get_temp_dir("reposync"), workers=cmdline.download_workers)
+        downloads = {}
+        parses = {}
+        finished = 0
+        failed = 0
+        try:
+            with ThreadPoolExecutor(max_workers=cmdline.download_workers) as download_pool, \
+                 ProcessPoolExecutor(max_workers=cmdline.parse_workers) as parse_pool:
+                for job in jobs:
+                    _, _, lob_path, pkg, _ = job
+                    future = download_pool.submit(downloader.download, pkg["url"], lob_path,
+                                                  pkg.get("checksum", None),
+                                                  Package.__lobs__["package"])
+                    downloads[future] = job
+
+                while downloads or parses:
+                    done, _ = wait(list(downloads) + list(parses), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in downloads:
+                            package_id, package, lob_path, pkg, new = downloads.pop(future)
+                            try:
+                                future.result()
+                            except FafError as ex:
+                                self.log_error("{0}, skipping.".format(ex))
+                                failed += 1
+                                if new:
+                                    self._delete_package(db, package)
+                                continue
+
+                            self.log_debug("Downloaded %s", pkg["url"])
+                            if not new:
+                                continue
+
+                            if pkg["type"] == "rpm":
+                                future = parse_pool.submit(read_rpm_provides, lob_path, pkg["name"],
+                                                           repo_instance["nogpgcheck"])
+                                parses[future] = (package_id, package, pkg)
+                                continue
+                        else:
+                            package_id, package, pkg = parses.pop(future)
+                            try:
+                                save_rpm_provides(db, package_id, future.result())
+                            except FafError as ex:
+                                self.log_error("Post-processing failed, skipping: {}".format(ex))
+                                failed += 1
+                                self._delete_package(db, package)
+                                continue
+
+                        finished += 1
+                        self.log_info("[{0} / {1}] Added package {2}"
+                                      .format(finished, len(jobs), pkg["filename"]))
+
+                        if cmdline.no_store_rpm:
+                            try:
+                                package.del_lob("package")
+                                self.log_info("Package deleted.")
+                            except Exception as exc: # pylint: disable=broad-except
+                                self.log_error("Error deleting the RPM file.")
+        finally:
+            downloader.close()
+
+        return failed
+
+    def _delete_package(self, db, package) -> None:
+        db.session.delete(package)
+        db.session.flush()
+
+    @staticmethod
+    def _nevr(pkg) -> Tuple[str, int, str, str]:
+        # Repository plugins differ in the type of epoch
+        return (pkg["base_package_name"], int(pkg["epoch"]), pkg["version"], pkg["release"])
+
+    @staticmethod
+    def _batches(rows) -> Generator[List, None, None]:
+        for i in range(0, len(rows), BATCH_SIZE):
+            yield rows[i:i + BATCH_SIZE]
 
     def _get_parametrized_variants(self, repo) -> Generator[Dict[str, str], None, None]:
         """
@@ -342,3 +426,10 @@ class RepoSync(Action):
                                  "contain given string")
         parser.add_argument("--no-cache", action="store_true",
                             help="Re-download repository metadata")
+        parser.add_argument("--full", action="store_true",
+                            help="Process all packages of the repositories, not only "
+                                 "those changed since the last sync")
+        parser.add_argument("--download-workers", type=int, default=4,
+                            help="Number of RPMs downloaded concurrently")
+        parser.add_argument("--parse-workers", type=int, default=2,
+                            help="Number of processes reading RPM headers")
@@ -79,6 +79,15 @@ class Retrace(Action):
             self.log_error("At least 1 worker is required")
             return 1
 
+        if cmdline.processes < 1:
+            self.log_error("At least 1 process is required")
+            return 1
+
+        if cmdline.prefetch < 0 or cmdline.disk_budget < 0 or cmdline.commit_batch < 1:
+            self.log_error("Arguments --prefetch and --disk-budget must not be "
+                           "negative, --commit-batch must be a positive number")
+            return 1
+
         if not cmdline.problemtype:
             ptypes = list(problemtypes.keys())
         else:
@@ -118,7 +127,11 @@ class Retrace(Action):
 
             self.log_info("Starting the retracing process")
 
-            retrace = RetracePool(db, tasks, problemplugin, cmdline.workers)
+            retrace = RetracePool(db, tasks, problemplugin, cmdline.workers,
+                                  processes=cmdline.processes,
+                                  prefetch=cmdline.prefetch,
+                                  disk_budget=cmdline.disk_budget * 1024 * 1024,
+                                  commit_batch=cmdline.commit_batch)
             retrace.run()
 
             self.log_info("All done")
@@ -126,9 +139,25 @@ class Retrace(Action):
 
     def tweak_cmdline_parser(self, parser) -> None:
         parser.add_problemtype(multiple=True)
+        # The stages share the CPUs by default
+        processes = max(1, multiprocessing.cpu_count() // 2)
         parser.add_argument("--workers", type=int,
-                            default=multiprocessing.cpu_count(),
+                            default=max(1, multiprocessing.cpu_count() - processes),
                             help="Number of threads unpacking RPMs")
+        parser.add_argument("--processes", type=int,
+                            default=processes,
+                            help="Number of processes symbolizing unpacked tasks")
+        parser.add_argument("--prefetch", type=int,
+                            default=2,
+                            help="Number of tasks unpacked ahead of the symbolizing "
+                                 "processes")
+        parser.add_argument("--disk-budget", type=int,
+                            default=0,
+                            help="Maximal size of unpacked packages in MiB. "
+                                 "0 turns the limit off.")
+        parser.add_argument("--commit-batch", type=int,
+                            default=10,
+                            help="Store retrace results after this number of tasks")
         parser.add_argument("--max-fail-count", type=int,
                             default=-1,
                             help="Only retrace symbols which failed at most this"
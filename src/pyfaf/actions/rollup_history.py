@@ -0,0 +1,63 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+import argparse
+import datetime
+
+from pyfaf.actions import Action
+from pyfaf.queries import bump_cache_generations, rebuild_history_rollups
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class RollupHistory(Action):
+    name = "rollup-history"
+
+    levels = ["problem", "component", "release"]
+    histories = ["daily", "weekly", "monthly"]
+
+    def run(self, cmdline, db) -> int:
+        levels = cmdline.level or self.levels
+        histories = cmdline.history or self.histories
+
+        for level in levels:
+            for history in histories:
+                if cmdline.since is None:
+                    self.log_info("Rebuilding {0} {1} history".format(level, history))
+                else:
+                    self.log_info("Rebuilding {0} {1} history since {2}"
+                                  .format(level, history, cmdline.since))
+
+                rebuild_history_rollups(db, level, history, since=cmdline.since)
+
+        bump_cache_generations(db, ["reports", "problems"])
+        return 0
+
+    def tweak_cmdline_parser(self, parser) -> None:
+        def valid_date(s) -> datetime.date:
+            try:
+                return datetime.datetime.strptime(s, DATE_FORMAT).date()
+            except ValueError as ex:
+                msg = "Not a valid date: '{0}'.".format(s)
+                raise argparse.ArgumentTypeError(msg) from ex
+
+        parser.add_argument("--level", action="append", choices=self.levels,
+                            help="rollups to rebuild (default: all)")
+        parser.add_argument("--history", action="append", choices=self.histories,
+                            help="time units to rebuild (default: all)")
+        parser.add_argument("--since", type=valid_date, default=None,
+                            help="rebuild only dates since (YYYY-MM-DD)")
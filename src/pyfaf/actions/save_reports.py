@@ -22,18 +22,165 @@ import datetime
 import time
 import glob
 import hashlib
+import itertools
+import multiprocessing
 import signal
 import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy.exc import SQLAlchemyError
 
 from pyfaf.actions import Action
-from pyfaf.common import FafError, ensure_dirs
+from pyfaf.common import FafError, ensure_dirs, get_connect_string
 from pyfaf.opsys import systems
-from pyfaf.queries import get_unknown_opsys
-from pyfaf.storage import UnknownOpSys
-from pyfaf.ureport import save, save_attachment, validate, validate_attachment
+from pyfaf.problemtypes import problemtypes
+from pyfaf.queries import bump_cache_generations, get_unknown_opsys
+from pyfaf.snapshots import refresh_problem_snapshots
+from pyfaf.storage import DatabaseFactory, UnknownOpSys
+from pyfaf.ureport import (save,
+                           save_attachment,
+                           save_batch,
+                           ureport2,
+                           validate,
+                           validate_attachment)
+from pyfaf.utils.cache import cache_stats
+from pyfaf.utils.inotify import (Inotify,
+                                 IN_CLOSE_WRITE,
+                                 IN_MOVED_TO,
+                                 IN_Q_OVERFLOW)
 from pyfaf.utils.parse import str2bool
 from pyfaf.config import paths
 
+# How many times a worker of the parallel mode retries saving a uReport
+# after a database error, e.g. a deadlock or a unique violation caused by
+# another worker inserting the same symbol concurrently.
+PARALLEL_SAVE_RETRIES = 3
+
+# Batch size used by --daemon if --batch-size is not given
+DAEMON_BATCH_SIZE = 100
+
+# How many batches worth of file names --daemon keeps in memory. The rest
+# of a backlog is left in the incoming directory and read later.
+DAEMON_PENDING_BATCHES = 10
+
+
+def shard_for_hash(report_hash, shards) -> int:
+    """
+    Return the shard `report_hash` belongs to. All uReports with the same
+    hash always end up in the same shard, so rows keyed by report are only
+    ever written by a single worker.
+    """
+
+    return zlib.crc32(report_hash.encode("utf-8")) % shards
+
+
+def _read_ureport(filename):
+    """
+    Return (ureport, timestamp) of the uReport stored in `filename`.
+    Raise OSError or ValueError if the file cannot be read.
+    """
+
+    with open(filename, "r") as fil:
+        ureport = json.load(fil)
+
+    return ureport, datetime.datetime.fromtimestamp(os.path.getmtime(filename))
+
+
+def _hash_reports(filenames):
+    """
+    Load and validate uReports from `filenames`. Return a list of
+    (filename, report hash, error, opsys) tuples where report hash is None
+    for invalid uReports. Only the hashes are sent back, the uReports are
+    loaded again by the worker saving them. Executed in a worker process.
+    """
+
+    result = []
+    for filename in filenames:
+        try:
+            ureport, _ = _read_ureport(filename)
+        except (OSError, ValueError) as ex:
+            result.append((filename, None,
+                           "Failed to load uReport: {0}".format(str(ex)), None))
+            continue
+
+        try:
+            ureport = ureport2(ureport)
+            validate(ureport)
+        except FafError as ex:
+            opsys = ureport.get("os") if isinstance(ureport, dict) else None
+            result.append((filename, None,
+                           "uReport is invalid: {0}".format(str(ex)), opsys))
+            continue
+
+        problemplugin = problemtypes[ureport["problem"]["type"]]
+        result.append((filename, problemplugin.hash_ureport(ureport["problem"]),
+                       None, None))
+
+    return result
+
+
+def _save_shard(groups, create_components, connect_string):
+    """
+    Save uReports from `groups`, a dictionary mapping report hashes to lists
+    of file names of already validated uReports, through a separate database
+    session connected by `connect_string`. Every uReport is committed on its
+    own and retried on database errors. Return a rollup dictionary with
+    the numbers of saved, deferred and failed files. Executed in a worker
+    process.
+    """
+
+    action = SaveReports()
+    db = DatabaseFactory(connect_string=connect_string).get_database()
+    rollup = {"saved": 0, "deferred": 0, "failed": 0}
+
+    # Process reports in a stable order so that the workers take row locks
+    # on shared tables in a consistent order as much as possible
+    for report_hash in sorted(groups):
+        for filename in groups[report_hash]:
+            fname = os.path.basename(filename)
+
+            try:
+                ureport, timestamp = _read_ureport(filename)
+            except (OSError, ValueError) as ex:
+                action.log_warn("Failed to load uReport '{0}', leaving it "
+                                "in incoming: {1}".format(fname, str(ex)))
+                rollup["failed"] += 1
+                continue
+
+            ureport = ureport2(ureport)
+            for attempt in range(1, PARALLEL_SAVE_RETRIES + 1):
+                try:
+                    save(db, ureport, create_component=create_components,
+                         timestamp=timestamp)
+                    db.session.commit()
+                except FafError as ex:
+                    db.session.rollback()
+                    action.log_warn("Failed to save uReport '{0}': {1}"
+                                    .format(fname, str(ex)))
+                    action._move_report_to_deferred(fname) # pylint: disable=protected-access
+                    rollup["deferred"] += 1
+                except SQLAlchemyError as ex:
+                    db.session.rollback()
+                    action.log_debug("Database error while saving '%s' "
+                                     "(attempt %d): %s", fname, attempt, str(ex))
+                    if attempt < PARALLEL_SAVE_RETRIES:
+                        time.sleep(0.1 * attempt)
+                        continue
+
+                    action.log_warn("Failed to save uReport '{0}', leaving it "
+                                    "in incoming: {1}".format(fname, str(ex)))
+                    rollup["failed"] += 1
+                else:
+                    action._move_report_to_saved(fname) # pylint: disable=protected-access
+                    rollup["saved"] += 1
+
+                break
+
+    db.session.close()
+
+    return rollup
+
 
 class SaveReports(Action):
     name = "save-reports"
@@ -63,6 +210,10 @@ class SaveReports(Action):
         self.dir_attach_saved = paths["attachments_saved"]
         self.dir_attach_deferred = paths["attachments_deferred"]
 
+        # Files saved into the database by this run, cached views
+        # are invalidated only if there are any
+        self.saved_count = 0
+
         try:
             ensure_dirs([self.dir_report_incoming, self.dir_report_saved,
                          self.dir_report_deferred, self.dir_attach_incoming,
@@ -77,6 +228,7 @@ class SaveReports(Action):
         path_to = os.path.join(self.dir_report_saved, filename)
 
         self.log_debug("Moving file '%s' to saved", path_from)
+        self.saved_count += 1
 
         try:
             os.rename(path_from, path_to)
@@ -109,6 +261,7 @@ class SaveReports(Action):
         path_to = os.path.join(self.dir_attach_saved, filename)
 
         self.log_debug("Moving file '%s' to saved", path_from)
+        self.saved_count += 1
 
         try:
             os.rename(path_from, path_to)
@@ -146,41 +299,87 @@ class SaveReports(Action):
         db_unknown_opsys.count += 1
         db.session.flush()
 
-    def _save_reports(self, db, pattern="*") -> None:
+    def _save_batch(self, db, batch) -> None:
+        """
+        Save `batch`, a list of (ureport, timestamp, filenames) tuples,
+        at once and move the files to saved or deferred.
+        """
+
+        if not batch:
+            return
+
+        self.log_info("Saving a batch of {0} uReports".format(len(batch)))
+
+        failed = save_batch(db, [(ureport, timestamp, len(filenames))
+                                 for ureport, timestamp, filenames in batch],
+                            create_component=self.create_components)
+
+        for i, (_, _, filenames) in enumerate(batch):
+            if i in failed:
+                self.log_warn("Failed to save uReport: {0}"
+                              .format(str(failed[i])))
+                self._move_reports_to_deferred(filenames)
+            else:
+                self._move_reports_to_saved(filenames)
+
+    def _load_report(self, db, fname):
+        """
+        Load and validate the uReport stored in `fname` in incoming. Return
+        (ureport, timestamp) or None if the uReport has been deferred.
+        """
+
+        filename = os.path.join(self.dir_report_incoming, fname)
+
+        try:
+            with open(filename, "r") as fil:
+                ureport = json.load(fil)
+        except (OSError, ValueError) as ex:
+            self.log_warn("Failed to load uReport: {0}".format(str(ex)))
+            self._move_report_to_deferred(fname)
+            return None
+
+        try:
+            ureport = ureport2(ureport)
+            validate(ureport)
+        except FafError as ex:
+            self.log_warn("uReport is invalid: {0}".format(str(ex)))
+
+            if ("os" in ureport and
+                    "name" in ureport["os"] and
+                    ureport["os"]["name"] not in systems and
+                    ureport["os"]["name"].lower() not in systems):
+                self._save_unknown_opsys(db, ureport["os"])
+
+            self._move_report_to_deferred(fname)
+            return None
+
+        mtime = os.path.getmtime(filename)
+        return ureport, datetime.datetime.fromtimestamp(mtime)
+
+    def _save_reports(self, db, pattern="*", batch_size=0) -> None:
         self.log_info("Saving reports")
 
         report_filenames = glob.glob(os.path.join(self.dir_report_incoming, pattern))
 
+        batch = []
         for i, filename in enumerate(sorted(report_filenames), start=1):
             fname = os.path.basename(filename)
             self.log_info("[{0} / {1}] Processing file '{2}'"
                           .format(i, len(report_filenames), filename))
 
-            try:
-                with open(filename, "r") as fil:
-                    ureport = json.load(fil)
-            except (OSError, ValueError) as ex:
-                self.log_warn("Failed to load uReport: {0}".format(str(ex)))
-                self._move_report_to_deferred(fname)
+            loaded = self._load_report(db, fname)
+            if loaded is None:
                 continue
 
-            try:
-                validate(ureport)
-            except FafError as ex:
-                self.log_warn("uReport is invalid: {0}".format(str(ex)))
-
-                if ("os" in ureport and
-                        "name" in ureport["os"] and
-                        ureport["os"]["name"] not in systems and
-                        ureport["os"]["name"].lower() not in systems):
-                    self._save_unknown_opsys(db, ureport["os"])
+            ureport, timestamp = loaded
 
-                self._move_report_to_deferred(fname)
+            if batch_size > 0:
+                batch.append((ureport, timestamp, [fname]))
+                if len(batch) >= batch_size:
+                    self._save_batch(db, batch)
+                    batch = []
                 continue
 
-            mtime = os.path.getmtime(filename)
-            timestamp = datetime.datetime.fromtimestamp(mtime)
-
             try:
                 save(db, ureport, create_component=self.create_components,
                      timestamp=timestamp)
@@ -191,7 +390,9 @@ class SaveReports(Action):
 
             self._move_report_to_saved(fname)
 
-    def _save_reports_speedup(self, db) -> None:
+        self._save_batch(db, batch)
+
+    def _save_reports_speedup(self, db, batch_size=0) -> None:
         self.log_info("Saving reports (--speedup)")
 
         # This creates a lock file and only works on file modified between the
@@ -271,6 +472,7 @@ class SaveReports(Action):
                 self._move_report_to_deferred(fname)
                 continue
 
+        batch = []
         for i, unique in enumerate(reports.values(), start=1):
             self.log_info("[{0} / {1}] Processing unique file '{2}'"
                           .format(i, len(reports), unique["filenames"][0]))
@@ -292,6 +494,13 @@ class SaveReports(Action):
             mtime = unique["mtime"]
             timestamp = datetime.datetime.fromtimestamp(mtime)
 
+            if batch_size > 0:
+                batch.append((ureport, timestamp, unique["filenames"]))
+                if len(batch) >= batch_size:
+                    self._save_batch(db, batch)
+                    batch = []
+                continue
+
             try:
                 save(db, ureport, create_component=self.create_components,
                      timestamp=timestamp, count=len(unique["filenames"]))
@@ -302,9 +511,209 @@ class SaveReports(Action):
 
             self._move_reports_to_saved(unique["filenames"])
 
+        self._save_batch(db, batch)
+
         self.log_debug("Removing lock %s", self.lock_filename)
         os.remove(self.lock_filename)
 
+    def _save_reports_parallel(self, db, processes, pattern="*") -> None:
+        self.log_info("Saving reports using {0} processes".format(processes))
+
+        report_filenames = sorted(glob.glob(os.path.join(self.dir_report_incoming,
+                                                         pattern)))
+        if not report_filenames:
+            return
+
+        rollup = {"saved": 0, "deferred": 0, "failed": 0}
+        shards = [{} for _ in range(processes)]
+
+        # Use fresh interpreters rather than forked copies that would share
+        # the database connection of this process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(processes, mp_context=context) as executor:
+            chunks = [report_filenames[i::processes] for i in range(processes)]
+            hashed = executor.map(_hash_reports, chunks)
+
+            for filename, report_hash, error, opsys in itertools.chain(*hashed):
+                if report_hash is None:
+                    self.log_warn(error)
+
+                    if (opsys is not None and
+                            "name" in opsys and
+                            opsys["name"] not in systems and
+                            opsys["name"].lower() not in systems):
+                        self._save_unknown_opsys(db, opsys)
+
+                    self._move_report_to_deferred(os.path.basename(filename))
+                    rollup["deferred"] += 1
+                    continue
+
+                shard = shards[shard_for_hash(report_hash, processes)]
+                shard.setdefault(report_hash, []).append(filename)
+
+            self.log_info("Partitioned {0} uReports into shards of sizes {1}"
+                          .format(len(report_filenames),
+                                  ", ".join(str(sum(len(f) for f in shard.values()))
+                                            for shard in shards)))
+
+            # The workers load the uReports of their shards and save them
+            # into the database this process is connected to
+            results = executor.map(_save_shard, shards,
+                                   itertools.repeat(self.create_components),
+                                   itertools.repeat(get_connect_string()))
+            for result in results:
+                for key, value in result.items():
+                    rollup[key] += value
+
+        self.saved_count += rollup["saved"]
+
+        self.log_info("Saved {saved}, deferred {deferred} and failed {failed} "
+                      "uReports".format(**rollup))
+
+    def _save_reports_daemon(self, db, batch_size, batch_window,
+                             attachments=True, max_pending=None) -> None:
+        """
+        Watch the incoming directory with inotify and save new reports in
+        micro-batches of up to `batch_size` reports, or whatever arrived
+        within `batch_window` seconds. Runs until SIGTERM or SIGINT, then
+        saves the reports received so far and exits.
+
+        At most `max_pending` file names are kept in memory. A backlog
+        exceeding that is read from the directory as the batches are saved.
+        """
+
+        if max_pending is None:
+            max_pending = DAEMON_PENDING_BATCHES * batch_size
+
+        self.log_info("Watching '{0}' for new reports"
+                      .format(self.dir_report_incoming))
+
+        stop = []
+
+        def handle_term(signum, _) -> None:
+            self.log_info("Signal {0} caught, draining pending reports"
+                          .format(signum))
+            stop.append(signum)
+        old_handlers = [(signum, signal.signal(signum, handle_term))
+                        for signum in [signal.SIGTERM, signal.SIGINT]]
+
+        # Insertion ordered and free of duplicates
+        pending = {}
+
+        def rescan() -> bool:
+            """
+            Add files from the incoming directory to pending until it is
+            full. Return True if some files had to be left out.
+            """
+
+            with os.scandir(self.dir_report_incoming) as iterator:
+                for entry in iterator:
+                    if not entry.name.startswith(".") and entry.is_file():
+                        if len(pending) >= max_pending:
+                            return True
+                        pending[entry.name] = None
+
+            return False
+
+        try:
+            with Inotify() as inotify:
+                reports_wd = inotify.add_watch(self.dir_report_incoming,
+                                               IN_CLOSE_WRITE | IN_MOVED_TO)
+                inotify.add_watch(self.dir_attach_incoming,
+                                  IN_CLOSE_WRITE | IN_MOVED_TO)
+
+                # Pick up whatever arrived while nobody was watching
+                backlog = rescan()
+                new_attachments = attachments
+                first_pending = time.time()
+
+                while not stop or pending:
+                    # Backpressure: do not take more events from the kernel queue
+                    # until the current batch is committed
+                    if not stop and len(pending) < batch_size:
+                        timeout = batch_window
+                        if pending:
+                            timeout = max(0, first_pending + batch_window - time.time())
+
+                        for wd, mask, _, name in inotify.read_events(timeout):
+                            if mask & IN_Q_OVERFLOW:
+                                self.log_warn("inotify queue overflowed, rescanning "
+                                              "'{0}'".format(self.dir_report_incoming))
+                                backlog = True
+                                new_attachments = attachments
+                            elif wd == reports_wd:
+                                if name and not name.startswith("."):
+                                    if len(pending) >= max_pending:
+                                        # Read from the directory later
+                                        backlog = True
+                                        continue
+                                    if not pending:
+                                        first_pending = time.time()
+                                    pending[name] = None
+                            else:
+                                new_attachments = attachments
+
+                    if backlog and not stop and len(pending) < max_pending:
+                        if not pending:
+                            first_pending = time.time()
+                        backlog = rescan()
+
+                    if (pending and
+                            (stop or len(pending) >= batch_size or
+                             time.time() >= first_pending + batch_window)):
+                        fnames = list(itertools.islice(pending, batch_size))
+                        for fname in fnames:
+                            del pending[fname]
+
+                        self._save_daemon_batch(db, fnames)
+                        first_pending = time.time()
+
+                    if new_attachments and not pending:
+                        self._save_attachments(db)
+                        new_attachments = False
+        finally:
+            for signum, handler in old_handlers:
+                signal.signal(signum, handler)
+
+        self.log_info("All pending reports saved, exiting")
+
+    def _save_daemon_batch(self, db, fnames) -> None:
+        """
+        Load and save the reports `fnames` as one batch. A failure of the
+        batch is logged and its files are deferred, the daemon keeps running.
+        """
+
+        batch = []
+        for fname in fnames:
+            if not os.path.isfile(os.path.join(self.dir_report_incoming, fname)):
+                # Already processed by someone else
+                continue
+
+            loaded = self._load_report(db, fname)
+            if loaded is not None:
+                batch.append((loaded[0], loaded[1], [fname]))
+
+        if not batch:
+            return
+
+        try:
+            self._save_batch(db, batch)
+        except Exception as ex: # pylint: disable=broad-except
+            db.session.rollback()
+            self.log_error("Failed to save a batch of {0} uReports, deferring "
+                           "them: {1}".format(len(batch), str(ex)))
+            for _, _, filenames in batch:
+                self._move_reports_to_deferred(filenames)
+            return
+
+        try:
+            bump_cache_generations(db, ["reports"])
+            refresh_problem_snapshots(db)
+        except SQLAlchemyError as ex:
+            db.session.rollback()
+            self.log_warn("Failed to refresh caches after a batch: {0}"
+                          .format(str(ex)))
+
     def _save_attachments(self, db) -> None:
         self.log_info("Saving attachments")
 
@@ -336,28 +745,77 @@ class SaveReports(Action):
 
                 self._move_attachment_to_saved(entry.name)
 
+    def _log_cache_stats(self) -> None:
+        for name, stats in cache_stats().items():
+            self.log_debug("Lookup cache '{0}': {1} hits, {2} misses, "
+                           "{3} entries".format(name, stats["hits"],
+                                                stats["misses"], stats["size"]))
+
     def run(self, cmdline, db) -> int:
+        self.saved_count = 0
 
         if cmdline.pattern and cmdline.speedup:
             self.log_error("Argument --pattern not allowed with --speedup.")
             return 1
 
+        if cmdline.processes < 1:
+            self.log_error("Argument --processes must be a positive number.")
+            return 1
+
+        if cmdline.daemon and (cmdline.speedup or cmdline.pattern or
+                               cmdline.processes > 1 or cmdline.no_reports):
+            self.log_error("Argument --daemon not allowed with --speedup, "
+                           "--pattern, --processes or --no-reports.")
+            return 1
+
+        if cmdline.daemon:
+            try:
+                self._save_reports_daemon(db,
+                                          cmdline.batch_size or DAEMON_BATCH_SIZE,
+                                          cmdline.batch_window,
+                                          attachments=not cmdline.no_attachments)
+            except OSError as ex:
+                self.log_error("Unable to watch the incoming directory: {0}"
+                               .format(str(ex)))
+                return 1
+
+            self._log_cache_stats()
+            return 0
+
+        if cmdline.processes > 1 and (cmdline.speedup or cmdline.batch_size):
+            self.log_error("Argument --processes not allowed with --speedup "
+                           "or --batch-size.")
+            return 1
+
         if not cmdline.no_reports:
-            if cmdline.speedup:
+            if cmdline.processes > 1:
+                self._save_reports_parallel(db, cmdline.processes,
+                                            cmdline.pattern or "*")
+            elif cmdline.speedup:
                 try:
-                    self._save_reports_speedup(db)
+                    self._save_reports_speedup(db, cmdline.batch_size)
                 except:
                     self.log_debug("Uncaught exception. Removing lock %s", self.lock_filename)
                     os.remove(self.lock_filename)
                     raise
             elif cmdline.pattern:
-                self._save_reports(db, cmdline.pattern)
+                self._save_reports(db, cmdline.pattern, cmdline.batch_size)
             else:
-                self._save_reports(db)
+                self._save_reports(db, batch_size=cmdline.batch_size)
+
+            self._log_cache_stats()
 
         if not cmdline.no_attachments:
             self._save_attachments(db)
 
+        if self.saved_count:
+            bump_cache_generations(db, ["reports"])
+
+        # Snapshots of problems whose reports occurred again
+        refreshed = refresh_problem_snapshots(db)
+        if refreshed:
+            self.log_debug("Refreshed {0} problem snapshots".format(refreshed))
+
         return 0
 
     def tweak_cmdline_parser(self, parser) -> None:
@@ -371,3 +829,15 @@ class SaveReports(Action):
                            "May be less accurate.")
         group.add_argument("--pattern", help="Save reports matched with pattern. "
                            "Does not work with speedup. E.g. --pattern \"123*\"")
+        parser.add_argument("--batch-size", type=int, default=0,
+                            help="Save valid reports in batches of this size "
+                            "using set-based queries. 0 saves them one by one.")
+        parser.add_argument("--processes", type=int, default=1,
+                            help="Number of worker processes. Reports are "
+                            "partitioned among them by their hash.")
+        parser.add_argument("--daemon", action="store_true", default=False,
+                            help="Keep running and save new reports as they "
+                            "arrive in the incoming directory.")
+        parser.add_argument("--batch-window", type=float, default=5.0,
+                            help="Maximal number of seconds a new report waits "
+                            "for its batch to fill up in --daemon mode.")
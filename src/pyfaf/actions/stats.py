@@ -29,6 +29,7 @@ from pyfaf.actions import Action
 from pyfaf.queries import (get_release_ids,
                            query_hot_problems,
                            query_longterm_problems,
+                           get_history_rollup_target,
                            get_history_target,
                            get_history_sum,
                            get_report_count_by_component,
@@ -36,8 +37,6 @@ from pyfaf.queries import (get_release_ids,
                            get_crashed_unknown_package_nevr_for_report,
                            get_crashed_package_for_report)
 
-from pyfaf.storage.opsys import OpSysComponent
-from pyfaf.storage.report import Report
 from pyfaf.utils.date import prev_days
 from pyfaf.utils.web import webfaf_installed, reverse
 from pyfaf.utils.parse import cmp_evr
@@ -60,14 +59,16 @@ class Stats(Action):
         """
 
         _, hist_field = get_history_target(self.history_type)
-        total = get_history_sum(db, opsys, release)
-        comps = get_report_count_by_component(db, opsys, release)
+        _, release_field = get_history_rollup_target("release", self.history_type)
+        _, comp_field = get_history_rollup_target("component", self.history_type)
+        total = get_history_sum(db, opsys, release, self.history_type)
+        comps = get_report_count_by_component(db, opsys, release, self.history_type)
 
         if cmdline.last:
             now = datetime.datetime.now()
             since = now - datetime.timedelta(days=int(cmdline.last))
-            comps = comps.filter(hist_field >= since)
-            total = total.filter(hist_field >= since)
+            comps = comps.filter(comp_field >= since)
+            total = total.filter(release_field >= since)
 
         total_num = total.first()[0]
 
@@ -135,7 +136,7 @@ class Stats(Action):
         Get trends for crashing components
         """
 
-        hist_table, hist_field = get_history_target(self.history_type)
+        hist_table, hist_field = get_history_rollup_target("component", self.history_type)
 
         num_days = 7
         if cmdline.last:
@@ -145,21 +146,17 @@ class Stats(Action):
 
         comp_detail = []
 
-        comps = get_report_count_by_component(db, opsys, release)
+        comps = get_report_count_by_component(db, opsys, release, self.history_type)
         comps = comps.filter(hist_field >= last_date)
 
         for (comp, _) in comps:
             if comp.name in self.comps_filter:
                 continue
 
-            report_ids = (db.session.query(Report.id)
-                          .join(OpSysComponent)
-                          .filter(OpSysComponent.id == comp.id)).subquery()
-
             history = (db.session.query(hist_field,
                                         func.sum(hist_table.count)
                                         .label("count"))
-                       .filter(hist_table.report_id.in_(report_ids))
+                       .filter(hist_table.component_id == comp.id)
                        .filter(hist_field >= last_date)
                        .filter(hist_field < datetime.date.today())
                        .group_by(hist_field)
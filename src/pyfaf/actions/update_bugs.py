@@ -19,6 +19,7 @@
 from pyfaf.actions import Action
 from pyfaf.bugtrackers import bugtrackers
 from pyfaf.storage.bugtracker import Bugtracker
+from pyfaf.storage.bugzilla import BzBug
 from pyfaf.queries import get_bugtracker_by_name
 
 
@@ -26,24 +27,59 @@ class UpdateBugs(Action):
     name = "update-bugs"
 
     def run(self, cmdline, db) -> int:
+        if cmdline.batch_size < 1:
+            self.log_error("Batch size must be at least 1")
+            return 1
+
+        if cmdline.workers < 1:
+            self.log_error("At least 1 worker is required")
+            return 1
+
         if cmdline.bugtracker:
             tracker = bugtrackers[cmdline.bugtracker]
             if not tracker.installed(db):
                 self.log_error("Bugtracker is not installed")
                 return 1
 
-            dbtracker = get_bugtracker_by_name(db, cmdline.bugtracker)
-            buglist = dbtracker.bugs + dbtracker.mantis_bugs
-            self.update_bugs(db, tracker, buglist)
-
+            dbtrackers = [get_bugtracker_by_name(db, cmdline.bugtracker)]
         else:
-            for dbtracker in db.session.query(Bugtracker):
-                tracker = bugtrackers[dbtracker.name]
+            dbtrackers = db.session.query(Bugtracker).all()
+
+        for dbtracker in dbtrackers:
+            tracker = bugtrackers[dbtracker.name]
+            if cmdline.incremental:
+                self.sync_bugs(db, tracker, dbtracker, cmdline.batch_size,
+                               cmdline.workers)
+            else:
                 buglist = dbtracker.bugs + dbtracker.mantis_bugs
                 self.update_bugs(db, tracker, buglist)
 
         return 0
 
+    def sync_bugs(self, db, tracker, dbtracker, batch_size, workers) -> None:
+        bug_ids = [bug_id for (bug_id,) in
+                   db.session.query(BzBug.id).filter(BzBug.tracker_id == dbtracker.id)]
+
+        self.log_info("Synchronizing {0} bugs of '{1}' changed since {2}"
+                      .format(len(bug_ids), dbtracker.name, dbtracker.synced_until))
+
+        try:
+            mark = tracker.sync_bugs(db, bug_ids, since=dbtracker.synced_until,
+                                     batch_size=batch_size, workers=workers)
+        except NotImplementedError:
+            self.log_info("Bugtracker '{0}' does not support incremental updates"
+                          .format(dbtracker.name))
+            self.update_bugs(db, tracker, dbtracker.bugs + dbtracker.mantis_bugs)
+            return
+
+        if mark is None:
+            self.log_warn("Some bugs of '{0}' were not updated, keeping the"
+                          " synchronization mark".format(dbtracker.name))
+            return
+
+        dbtracker.synced_until = mark
+        db.session.flush()
+
     def update_bugs(self, db, tracker, buglist) -> None:
         if not buglist:
             self.log_info("Found no bugs associated with this bugtracker")
@@ -66,3 +102,11 @@ class UpdateBugs(Action):
 
     def tweak_cmdline_parser(self, parser) -> None:
         parser.add_bugtracker(help="update bugs only from this bug tracker")
+        parser.add_argument("--incremental", action="store_true", default=False,
+                            help="only update bugs changed since the previous "
+                                 "incremental run, in batches")
+        parser.add_argument("--batch-size", type=int, default=200,
+                            help="number of bugs downloaded by a single request "
+                                 "in incremental mode")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="number of concurrent requests in incremental mode")
@@ -0,0 +1,258 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+from typing import Any, Dict, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import subqueryload
+
+from pyfaf.storage import (Report,
+                           ReportBacktrace,
+                           ReportBtFrame,
+                           ReportBtThread,
+                           SymbolSource)
+
+__all__ = ["BTCACHE_VERSION", "CachedReport", "get_cached_backtrace",
+           "load_cached_reports", "serialize_backtrace"]
+
+
+# Bump whenever the serialized format changes, outdated
+# backtraces are serialized again on the next access
+BTCACHE_VERSION = 1
+
+# Order of the values of a serialized frame
+FRAME_FIELDS = ("order", "inlined", "reliable", "symbolsource_id", "build_id",
+                "path", "offset", "func_offset", "source_path", "line_number",
+                "srcline", "symbol_id", "name", "nice_name", "normalized_path")
+
+
+class CachedSymbol:
+    """
+    Read-only counterpart of pyfaf.storage.Symbol.
+    """
+
+    __slots__ = ("id", "name", "nice_name", "normalized_path")
+
+    def __init__(self, id_, name, nice_name, normalized_path) -> None:
+        self.id = id_
+        self.name = name
+        self.nice_name = nice_name
+        self.normalized_path = normalized_path
+
+
+class CachedSymbolSource:
+    """
+    Read-only counterpart of pyfaf.storage.SymbolSource.
+    """
+
+    __slots__ = ("id", "build_id", "path", "offset", "func_offset", "source_path",
+                 "line_number", "srcline", "symbol_id", "symbol")
+
+    def __init__(self, values) -> None:
+        self.id = values["symbolsource_id"]
+        self.build_id = values["build_id"]
+        self.path = values["path"]
+        self.offset = values["offset"]
+        self.func_offset = values["func_offset"]
+        self.source_path = values["source_path"]
+        self.line_number = values["line_number"]
+        self.srcline = values["srcline"]
+        self.symbol_id = values["symbol_id"]
+        self.symbol = None
+        if values["symbol_id"] is not None:
+            self.symbol = CachedSymbol(values["symbol_id"], values["name"],
+                                       values["nice_name"], values["normalized_path"])
+
+
+class CachedFrame:
+    """
+    Read-only counterpart of pyfaf.storage.ReportBtFrame.
+    """
+
+    __slots__ = ("order", "inlined", "reliable", "symbolsource", "nice_order")
+
+    def __init__(self, values) -> None:
+        values = dict(zip(FRAME_FIELDS, values))
+        self.order = values["order"]
+        self.inlined = values["inlined"]
+        self.reliable = values["reliable"]
+        self.symbolsource = CachedSymbolSource(values)
+        self.nice_order = None
+
+
+class CachedThread:
+    """
+    Read-only counterpart of pyfaf.storage.ReportBtThread.
+    """
+
+    __slots__ = ("id", "number", "crashthread", "frames")
+
+    def __init__(self, data) -> None:
+        self.id = data["id"]
+        self.number = data["number"]
+        self.crashthread = data["crashthread"]
+        self.frames = [CachedFrame(values) for values in data["frames"]]
+
+
+class CachedBacktrace:
+    """
+    Read-only counterpart of pyfaf.storage.ReportBacktrace.
+    """
+
+    __slots__ = ("id", "threads")
+
+    def __init__(self, id_, data) -> None:
+        self.id = id_
+        self.threads = [CachedThread(thread) for thread in data["threads"]]
+
+    @property
+    def frames(self) -> List[CachedFrame]:
+        crashthreads = [t for t in self.threads if t.crashthread]
+
+        if not crashthreads:
+            return []
+
+        return crashthreads[0].frames
+
+
+class CachedReport:
+    """
+    Read-only counterpart of pyfaf.storage.Report providing only
+    the attributes needed to work with its backtraces. Accepted by
+    problem plugins in place of the pyfaf.storage.Report object.
+    """
+
+    __slots__ = ("id", "type", "errname", "backtraces")
+
+    def __init__(self, id_, type_, errname) -> None:
+        self.id = id_
+        self.type = type_
+        self.errname = errname
+        self.backtraces = []
+
+
+def _serialize_frame(db_frame) -> List[Any]:
+    db_ssource = db_frame.symbolsource
+    db_symbol = db_ssource.symbol
+
+    values = [db_frame.order, db_frame.inlined, db_frame.reliable,
+              db_ssource.id, db_ssource.build_id, db_ssource.path,
+              db_ssource.offset, db_ssource.func_offset, db_ssource.source_path,
+              db_ssource.line_number, db_ssource.srcline]
+
+    if db_symbol is None:
+        values += [None, None, None, None]
+    else:
+        values += [db_symbol.id, db_symbol.name, db_symbol.nice_name,
+                   db_symbol.normalized_path]
+
+    return values
+
+
+def serialize_backtrace(db_backtrace) -> Dict[str, Any]:
+    """
+    Return the compact representation of a pyfaf.storage.ReportBacktrace
+    object stored in its `serialized` column.
+    """
+
+    return {
+        "version": BTCACHE_VERSION,
+        "threads": [{"id": db_thread.id,
+                     "number": db_thread.number,
+                     "crashthread": db_thread.crashthread,
+                     "frames": [_serialize_frame(db_frame)
+                                for db_frame in db_thread.frames]}
+                    for db_thread in db_backtrace.threads],
+    }
+
+
+def _is_current(data) -> bool:
+    return data is not None and data.get("version") == BTCACHE_VERSION
+
+
+def get_cached_backtrace(db_backtrace) -> CachedBacktrace:
+    """
+    Return CachedBacktrace for a pyfaf.storage.ReportBacktrace object,
+    serializing the backtrace if the stored representation is missing
+    or outdated. The session needs to be flushed to save it.
+    """
+
+    data = db_backtrace.serialized
+    if not _is_current(data):
+        data = serialize_backtrace(db_backtrace)
+        db_backtrace.serialized = data
+
+    return CachedBacktrace(db_backtrace.id, data)
+
+
+def load_cached_reports(db, report_ids) -> Dict[int, CachedReport]:
+    """
+    Return a dictionary mapping IDs from `report_ids` to CachedReport
+    objects holding the first backtrace of each report.
+
+    Stored representations are read with a single query. Missing or
+    outdated ones are serialized from eagerly loaded backtraces and
+    saved with a single bulk update.
+    """
+
+    report_ids = list(report_ids)
+    if not report_ids:
+        return {}
+
+    first_backtraces = (db.session.query(func.min(ReportBacktrace.id))
+                        .filter(ReportBacktrace.report_id.in_(report_ids))
+                        .group_by(ReportBacktrace.report_id))
+
+    rows = (db.session.query(Report.id, Report.type, Report.errname,
+                             ReportBacktrace.id, ReportBacktrace.serialized)
+            .outerjoin(ReportBacktrace,
+                       (ReportBacktrace.report_id == Report.id) &
+                       ReportBacktrace.id.in_(first_backtraces))
+            .filter(Report.id.in_(report_ids))
+            .all())
+
+    result = {}
+    outdated = {}
+    for report_id, report_type, errname, backtrace_id, data in rows:
+        result[report_id] = CachedReport(report_id, report_type, errname)
+        if backtrace_id is None:
+            continue
+
+        if _is_current(data):
+            result[report_id].backtraces.append(CachedBacktrace(backtrace_id, data))
+        else:
+            outdated[backtrace_id] = report_id
+
+    if outdated:
+        db_backtraces = (db.session.query(ReportBacktrace)
+                         .filter(ReportBacktrace.id.in_(list(outdated.keys())))
+                         .options(subqueryload(ReportBacktrace.threads)
+                                  .subqueryload(ReportBtThread.frames)
+                                  .joinedload(ReportBtFrame.symbolsource)
+                                  .joinedload(SymbolSource.symbol))
+                         .all())
+
+        mappings = []
+        for db_backtrace in db_backtraces:
+            data = serialize_backtrace(db_backtrace)
+            mappings.append({"id": db_backtrace.id, "serialized": data})
+            result[outdated[db_backtrace.id]].backtraces.append(
+                CachedBacktrace(db_backtrace.id, data))
+
+        db.session.bulk_update_mappings(ReportBacktrace, mappings)
+
+    return result
@@ -89,6 +89,16 @@ class BugTracker(Plugin):
         raise NotImplementedError("download_bug_to_storage is not implemented "
                                   "for {0}".format(self.__class__.__name__))
 
+    def sync_bugs(self, db, bug_ids, since=None, **kwargs) -> None:
+        """
+        Update stored bugs with IDs from `bug_ids` that have changed
+        since `since` in bulk. Return the new synchronization mark
+        or None if the run was not complete.
+        """
+
+        raise NotImplementedError("sync_bugs is not implemented for "
+                                  "{0}".format(self.__class__.__name__))
+
     def create_bug(self, **data) -> None:
         """
         Creates a new bug with given data.
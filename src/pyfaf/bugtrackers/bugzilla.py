@@ -21,9 +21,11 @@ from __future__ import unicode_literals
 
 import time
 import datetime
+import threading
 import xmlrpc.client # type: ignore
 
-from typing import Any, Dict, Generator, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple, Union
 
 
 import bugzilla
@@ -47,6 +49,11 @@ from pyfaf.utils.parse import str2bool
 
 __all__ = ["Bugzilla"]
 
+# Bugs changed shortly before the previous synchronization mark are queried
+# again, so that clock skew or changes made during the previous run
+# are not missed. Bugs that turn out to be up-to-date are not downloaded.
+SYNC_OVERLAP = datetime.timedelta(hours=1)
+
 
 class Bugzilla(BugTracker):
     """
@@ -85,6 +92,29 @@ class Bugzilla(BugTracker):
         self.load_config_to_self("save_attachments", f"{self.name}.save_attachments",
                                  False, callback=str2bool)
 
+        # Clients used by the worker threads of sync_bugs
+        self._thread_local = threading.local()
+
+    def _create_client(self) -> bugzilla.Bugzilla:
+        """
+        Return a new client of the Bugzilla instance.
+        """
+
+        return bugzilla.Bugzilla(url=str(self.api_url), api_key=self.api_key)
+
+    def _thread_client(self) -> bugzilla.Bugzilla:
+        """
+        Return the client of the current thread. Bugzilla clients are not
+        thread-safe, so the workers downloading bugs must not share `bz`.
+        """
+
+        client = getattr(self._thread_local, "bz", None)
+        if client is None:
+            client = self._create_client()
+            self._thread_local.bz = client
+
+        return client
+
     def connect(self) -> None:
         if self.connected:
             return
@@ -96,7 +126,7 @@ class Bugzilla(BugTracker):
 
         self.log_debug("Opening bugzilla connection for '%s'", self.name)
 
-        self.bz = bugzilla.Bugzilla(url=str(self.api_url), api_key=self.api_key)
+        self.bz = self._create_client()
 
         if self.api_key:
             self.log_debug("Logging into bugzilla '%s' with API key", self.name)
@@ -241,11 +271,15 @@ class Bugzilla(BugTracker):
         return datetime.datetime.fromtimestamp(
             time.mktime(bz_datetime.timetuple()))
 
-    def preprocess_bug(self, bug: Bug) -> Optional[Dict[str, Any]]:
+    def preprocess_bug(self, bug: Bug,
+                       history: Optional[List[Dict[str, Any]]] = None) \
+            -> Optional[Dict[str, Any]]:
         """
         Process the bug instance and return
         dictionary with fields required by lower logic.
 
+        Bug `history` is downloaded unless it is passed in.
+
         Returns `None` if there are missing fields.
         """
 
@@ -281,8 +315,9 @@ class Bugzilla(BugTracker):
         for field in ["creation_time", "last_change_time"]:
             bug_dict[field] = self._convert_datetime(bug_dict[field])
 
-        history = bug.get_history_raw()
-        bug_dict["history"] = history["bugs"][0]["history"]
+        if history is None:
+            history = bug.get_history_raw()["bugs"][0]["history"]
+        bug_dict["history"] = history
         if bug.resolution == "DUPLICATE":
             bug_dict["dupe_id"] = bug.dupe_id
 
@@ -407,6 +442,315 @@ class Bugzilla(BugTracker):
 
         return new_bug
 
+    def sync_bugs(self, db: Database, bug_ids: Iterable[int], #pylint: disable=arguments-differ,too-many-locals
+                  since: Optional[datetime.datetime] = None,
+                  batch_size: int = 200, workers: int = 4) -> Optional[datetime.datetime]:
+        """
+        Update stored bugs with IDs from `bug_ids` in bulk.
+
+        Only bugs changed after `since` are downloaded, `batch_size` bugs
+        per request with up to `workers` requests running concurrently.
+        The bugs are saved by the calling thread as the batches arrive.
+
+        Return the time bugs need to be synchronized from next time:
+        last_change_time of the newest bug seen, of the oldest bug that
+        could not be saved, `since` or the current time if there were no
+        bugs at all. Return None if some of the batches could not be
+        downloaded.
+        """
+
+        tracker = queries.get_bugtracker_by_name(db, self.name)
+        if not tracker:
+            raise FafError("Tracker with name '{0}' is not installed"
+                           .format(self.name))
+
+        bug_ids = sorted(set(bug_ids))
+        complete = True
+        mark = since
+        oldest_skipped = None
+        changed = []
+        for start in range(0, len(bug_ids), batch_size):
+            batch = bug_ids[start:start + batch_size]
+            try:
+                change_times = self._query_changed_bugs(batch, since)
+            except Exception as ex: # pylint: disable=broad-except
+                self.log_error("Unable to query bugs #{0} - #{1}: {2}"
+                               .format(batch[0], batch[-1], str(ex)))
+                complete = False
+                continue
+
+            stored = queries.get_bz_bug_change_times(db, change_times.keys())
+            for bug_id, last_change_time in change_times.items():
+                if mark is None or last_change_time > mark:
+                    mark = last_change_time
+
+                if stored.get(bug_id) != last_change_time:
+                    changed.append(bug_id)
+
+        self.log_info("{0} of {1} bugs changed since {2}"
+                      .format(len(changed), len(bug_ids), since))
+
+        batches = [changed[start:start + batch_size]
+                   for start in range(0, len(changed), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._fetch_bugs, batch): batch
+                       for batch in batches}
+            for num, future in enumerate(as_completed(futures), start=1):
+                batch = futures[future]
+                try:
+                    bug_dicts = future.result()
+                except Exception as ex: # pylint: disable=broad-except
+                    self.log_error("Unable to download bugs #{0} - #{1}: {2}"
+                                   .format(batch[0], batch[-1], str(ex)))
+                    complete = False
+                    continue
+
+                self.log_debug("[%d / %d] Saving %d bugs", num, len(futures), len(bug_dicts))
+                for last_change_time in self._save_bugs(db, tracker, bug_dicts):
+                    if oldest_skipped is None or last_change_time < oldest_skipped:
+                        oldest_skipped = last_change_time
+
+        if not complete:
+            return None
+
+        # Bugs that could not be saved are tried again next time
+        if oldest_skipped is not None and (mark is None or oldest_skipped < mark):
+            mark = oldest_skipped
+
+        if mark is None:
+            mark = datetime.datetime.utcnow()
+
+        return mark
+
+    @retry(3, delay=10, backoff=3, verbose=True)
+    def _query_changed_bugs(self, bug_ids: List[int],
+                            since: Optional[datetime.datetime]) \
+            -> Dict[int, datetime.datetime]:
+        """
+        Return a dictionary mapping IDs of bugs from `bug_ids` changed
+        after `since` to their last_change_time. All of the bugs
+        are returned if `since` is None.
+        """
+
+        params: Dict[str, Any] = dict(
+            id=bug_ids,
+            include_fields=["id", "last_change_time"],
+            limit=len(bug_ids),
+        )
+
+        if since is not None:
+            params["last_change_time"] = (since - SYNC_OVERLAP).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        self.connect()
+        return {bug.bug_id: self._convert_datetime(bug.last_change_time)
+                for bug in self.bz.query(params)}
+
+    @retry(3, delay=10, backoff=3, verbose=True)
+    def _fetch_bugs(self, bug_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Download bugs with IDs from `bug_ids` together with their history
+        and return them pre-processed. Bugs that are not accessible are
+        left out.
+
+        Runs in worker threads, so it must not touch the database
+        or the shared client.
+        """
+
+        self.log_debug("Downloading bugs #%d - #%d", bug_ids[0], bug_ids[-1])
+        client = self._thread_client()
+        extra_fields = ["attachments"] if self.save_attachments else None
+        bugs = client.getbugs(bug_ids, extra_fields=extra_fields, permissive=True)
+        history = {entry["id"]: entry["history"]
+                   for entry in client.bugs_history_raw(bug_ids)["bugs"]}
+
+        result = []
+        for bug_id, bug in zip(bug_ids, bugs):
+            if bug is None:
+                self.log_warn("Bug #{0} is not accessible, skipping".format(bug_id))
+                continue
+
+            bug_dict = self.preprocess_bug(bug, history=history.get(bug.bug_id, []))
+            if not bug_dict:
+                self.log_error("Pre-processing of bug #{0} failed".format(bug_id))
+                continue
+
+            result.append(bug_dict)
+
+        return result
+
+    def _get_release_component(self, db: Database, product: str, version: str,
+                               component: str) -> Optional[Tuple[int, int]]:
+        """
+        Return IDs of the OpSysRelease and the OpSysComponent a bug
+        is filed against or None if either of them is unknown.
+        """
+
+        opsysrelease = queries.get_osrelease(db, product, version)
+        if not opsysrelease:
+            self.log_error("Unknown release '{0} {1}'".format(product, version))
+            return None
+
+        relcomponent = queries.get_component_by_name_release(db, opsysrelease, component)
+        if not relcomponent:
+            self.log_error("Unknown component '{0}'".format(component))
+            return None
+
+        return opsysrelease.id, relcomponent.component.id
+
+    def _get_users(self, db: Database, user_emails: Iterable[str]) -> Dict[str, BzUser]:
+        """
+        Return a dictionary mapping `user_emails` to BzUser objects.
+        Users missing in the database are downloaded with a single request.
+        """
+
+        users = queries.get_bz_users_by_emails(db, user_emails)
+        missing = [email for email in user_emails
+                   if email not in users and "@" in email]
+
+        if missing:
+            self.log_debug("Downloading %d users", len(missing))
+            try:
+                downloaded = self._download_users(missing)
+            except Exception as ex: # pylint: disable=broad-except
+                self.log_error("Unable to download users: {0}".format(str(ex)))
+                downloaded = []
+
+            for user in downloaded:
+                users[user.email] = self._save_user(db, user)
+
+        return users
+
+    def _save_bugs(self, db: Database, tracker, #pylint: disable=too-many-locals,too-many-branches
+                   bug_dicts: List[Dict[str, Any]]) -> List[datetime.datetime]:
+        """
+        Save pre-processed `bug_dicts` to the database. Bugs are upserted
+        and their new CCs and history events inserted with single
+        statements. Bugs filed against unknown releases or components
+        or by unknown reporters are skipped.
+
+        Return last_change_time of the skipped bugs.
+        """
+
+        emails = set()
+        for bug_dict in bug_dicts:
+            emails.add(bug_dict["reporter"])
+            emails.update(bug_dict["cc"])
+            emails.update(event["who"] for event in bug_dict["history"])
+
+        users = self._get_users(db, emails)
+
+        components: Dict[Tuple[str, str, str], Optional[Tuple[int, int]]] = {}
+        rows = []
+        saved = []
+        skipped = []
+        for bug_dict in bug_dicts:
+            key = (bug_dict["product"], bug_dict["version"], bug_dict["component"])
+            if key not in components:
+                components[key] = self._get_release_component(db, *key)
+
+            if not components[key]:
+                self.log_error("Unable to save bug #{0}".format(bug_dict["bug_id"]))
+                skipped.append(bug_dict["last_change_time"])
+                continue
+
+            reporter = users.get(bug_dict["reporter"])
+            if not reporter:
+                self.log_error("Unable to save bug #{0} due to unknown reporter"
+                               .format(bug_dict["bug_id"]))
+                skipped.append(bug_dict["last_change_time"])
+                continue
+
+            opsysrelease_id, component_id = components[key]
+            resolution = None
+            if bug_dict["status"] == "CLOSED":
+                resolution = bug_dict["resolution"]
+
+            rows.append(dict(
+                id=bug_dict["bug_id"],
+                summary=bug_dict["summary"],
+                status=bug_dict["status"],
+                resolution=resolution,
+                duplicate=None,
+                creation_time=bug_dict["creation_time"],
+                last_change_time=bug_dict["last_change_time"],
+                private=bool(bug_dict["groups"]),
+                tracker_id=tracker.id,
+                opsysrelease_id=opsysrelease_id,
+                component_id=component_id,
+                whiteboard=bug_dict["status_whiteboard"],
+                creator_id=reporter.id,
+            ))
+            saved.append(bug_dict)
+
+        # Duplicates are resolved once the whole batch is known,
+        # only those missing both in the batch and in the database
+        # are downloaded one by one.
+        saved_ids = set(row["id"] for row in rows)
+        dupe_ids = set(bug_dict["dupe_id"] for bug_dict in saved
+                       if bug_dict["status"] == "CLOSED" and
+                       bug_dict["resolution"] == "DUPLICATE")
+        known = saved_ids | set(queries.get_bz_bug_change_times(db, dupe_ids - saved_ids))
+        for dupe_id in dupe_ids - known:
+            self.log_debug("Duplicate #%d not found", dupe_id)
+            try:
+                self.download_bug_to_storage(db, dupe_id)
+                known.add(dupe_id)
+            except Exception as ex: # pylint: disable=broad-except
+                self.log_error("Unable to download duplicate #{0}: {1}"
+                               .format(dupe_id, str(ex)))
+
+        for row, bug_dict in zip(rows, saved):
+            if row["resolution"] == "DUPLICATE" and bug_dict["dupe_id"] in known:
+                row["duplicate"] = bug_dict["dupe_id"]
+
+        queries.upsert_rows(db, BzBug, rows, ["id"])
+
+        cc_pairs = queries.get_bz_bug_cc_pairs(db, saved_ids)
+        history_keys = queries.get_bz_bug_history_keys(db, saved_ids)
+        added_len = column_len(BzBugHistory, "added")
+        removed_len = column_len(BzBugHistory, "removed")
+        cc_rows = []
+        history_rows = []
+        for bug_dict in saved:
+            bug_id = bug_dict["bug_id"]
+            for user_email in bug_dict["cc"]:
+                user = users.get(user_email)
+                if not user or (bug_id, user.id) in cc_pairs:
+                    continue
+
+                cc_pairs.add((bug_id, user.id))
+                cc_rows.append(dict(bug_id=bug_id, user_id=user.id))
+
+            for event in bug_dict["history"]:
+                user = users.get(event["who"])
+                if not user:
+                    continue
+
+                chtime = self._convert_datetime(event["when"])
+                for change in event["changes"]:
+                    history_key = (bug_id, user.id, chtime, change["field_name"],
+                                   change["added"][:added_len],
+                                   change["removed"][:removed_len])
+                    if history_key in history_keys:
+                        continue
+
+                    history_keys.add(history_key)
+                    history_rows.append(dict(zip(("bug_id", "user_id", "time", "field",
+                                                  "added", "removed"), history_key)))
+
+        db.session.bulk_insert_mappings(BzBugCc, cc_rows)
+        db.session.bulk_insert_mappings(BzBugHistory, history_rows)
+
+        for bug_dict in saved:
+            if self.save_attachments:
+                self._save_attachments(db, bug_dict["attachments"], bug_dict["bug_id"])
+            if self.save_comments:
+                self._save_comments(db, bug_dict["comments"], bug_dict["bug_id"])
+
+        db.session.flush()
+
+        return skipped
+
     def _save_ccs(self, db: Database, ccs: List[str], new_bug_id: int) -> None:
         """
         Save CC"ed users to the database.
@@ -631,6 +975,16 @@ class Bugzilla(BugTracker):
         user = self.bz.getuser(user_email)
         return user
 
+    @retry(3, delay=10, backoff=3, verbose=True)
+    def _download_users(self, user_emails: List[str]) -> List[User]:
+        """
+        Return users with `user_emails` downloaded from bugzilla
+        with a single request.
+        """
+
+        self.connect()
+        return self.bz.getusers(user_emails)
+
     def _save_user(self, db: Database, user: User) -> BzUser:
         """
         Save bugzilla `user` to the database. Return persisted
@@ -17,13 +17,20 @@
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
 import re
+from contextlib import contextmanager
 from numbers import Integral
+from typing import Any, Callable, Iterator
 from pyfaf.common import FafError
 
 __all__ = ["CheckError", "CheckerError", "Checker", "DictChecker",
            "IntChecker", "ListChecker", "StringChecker"]
 
 
+# Nesting of generated blocks before nested checkers are called as separate
+# predicates, Python limits statically nested blocks to 20
+_MAX_DEPTH = 12
+
+
 class CheckerError(FafError):
     """
     Exception raised for errors in checker configuration.
@@ -40,6 +47,12 @@ class Checker:
     """
     Generic checker. Checks that the object is of the required type
     and gives the possibility to specify allowed values whitelist.
+
+    The checker tree is compiled into a predicate on the first check, so
+    checkers must not be modified afterwards. Valid objects only pass the
+    predicate, invalid ones are walked again by `diagnose` to describe
+    the problem. Subclasses extending `diagnose` must extend `emit`
+    accordingly.
     """
 
     def __init__(self, checktype, allowed=None, mandatory=True) -> None:
@@ -59,8 +72,56 @@ class Checker:
         self.checktype = checktype
         self.allowed = allowed
         self.mandatory = mandatory
+        self._valid = None
 
     def check(self, obj) -> None:
+        """
+        Raise CheckError if `obj` does not pass the check.
+        """
+
+        if self._valid is None:
+            self._valid = self.compile()
+
+        if not self._valid(obj):
+            self.diagnose(obj)
+            # diagnose is not expected to miss anything the predicate
+            # rejects, but the object must never pass in that case
+            raise CheckError("Object does not pass the check")
+
+    def compile(self) -> Callable[[Any], bool]:
+        """
+        Return a predicate telling whether an object passes the check.
+        The whole checker tree is generated into the body of a single
+        function with no calls for the nested checkers.
+        """
+
+        gen = _Generator()
+        self.emit(gen, "obj", 1)
+        gen.line(1, "return True")
+        return gen.build()
+
+    def emit(self, gen, var, depth) -> None:
+        """
+        Generate statements returning False from the predicate if
+        the object in variable `var` does not pass the check.
+        """
+
+        if self.checktype is not object:
+            # exact type comparison first, isinstance() of abstract
+            # types such as Integral is slow
+            exact = int if self.checktype is Integral else self.checktype
+            gen.line(depth, "if type({0}) is not {1} and not isinstance({0}, {2}): return False"
+                     .format(var, gen.constant(exact), gen.constant(self.checktype)))
+
+        if self.allowed:
+            gen.line(depth, "if {0} not in {1}: return False"
+                     .format(var, gen.constant(_lookup(self.allowed))))
+
+    def diagnose(self, obj) -> None:
+        """
+        Raise CheckError describing why `obj` does not pass the check.
+        """
+
         if not isinstance(obj, self.checktype):
             raise CheckError("Expected '{0}', got '{1}'"
                              .format(self.checktype.__name__,
@@ -84,8 +145,17 @@ class IntChecker(Checker):
         self.minval = minval
         self.maxval = maxval
 
-    def check(self, obj) -> None:
-        super().check(obj)
+    def emit(self, gen, var, depth) -> None:
+        super().emit(gen, var, depth)
+
+        if self.minval is not None:
+            gen.line(depth, "if {0} < {1!r}: return False".format(var, self.minval))
+
+        if self.maxval is not None:
+            gen.line(depth, "if {0} > {1!r}: return False".format(var, self.maxval))
+
+    def diagnose(self, obj) -> None:
+        super().diagnose(obj)
 
         if self.minval is not None and obj < self.minval:
             raise CheckError("Expected number greater or equal to {0}, "
@@ -112,8 +182,18 @@ class StringChecker(Checker):
 
         self.maxlen = maxlen
 
-    def check(self, obj) -> None:
-        super().check(obj)
+    def emit(self, gen, var, depth) -> None:
+        super().emit(gen, var, depth)
+
+        if self.maxlen > 0:
+            gen.line(depth, "if len({0}) > {1}: return False".format(var, self.maxlen))
+
+        if self.re is not None:
+            gen.line(depth, "if {0}({1}) is None: return False"
+                     .format(gen.constant(self.re.match), var))
+
+    def diagnose(self, obj) -> None:
+        super().diagnose(obj)
 
         if self.maxlen > 0 and len(obj) > self.maxlen:
             raise CheckError("String '{0}' is too long, the limit is {1} "
@@ -143,8 +223,25 @@ class ListChecker(Checker):
         self.minlen = minlen
         self.maxlen = maxlen
 
-    def check(self, obj) -> None:
-        super().check(obj)
+    def emit(self, gen, var, depth) -> None:
+        if depth > _MAX_DEPTH:
+            gen.call(self, var, depth)
+            return
+
+        super().emit(gen, var, depth)
+
+        if self.minlen > 0:
+            gen.line(depth, "if len({0}) < {1}: return False".format(var, self.minlen))
+
+        if self.maxlen > 0:
+            gen.line(depth, "if len({0}) > {1}: return False".format(var, self.maxlen))
+
+        elem = gen.variable()
+        with gen.block(depth, "for {0} in {1}:".format(elem, var)):
+            self.elemchecker.emit(gen, elem, depth + 1)
+
+    def diagnose(self, obj) -> None:
+        super().diagnose(obj)
 
         if self.minlen > 0 and len(obj) < self.minlen:
             raise CheckError("The list must contain at least {0} elements"
@@ -156,7 +253,7 @@ class ListChecker(Checker):
 
         for elem in obj:
             try:
-                self.elemchecker.check(elem)
+                self.elemchecker.diagnose(elem)
             except CheckError as ex:
                 raise CheckError("List element is invalid: {0}"
                                  .format(str(ex))) from ex
@@ -177,16 +274,95 @@ class DictChecker(Checker):
 
         self.elements = elements
 
-    def check(self, obj) -> None:
-        super().check(obj)
+    def emit(self, gen, var, depth) -> None:
+        if depth > _MAX_DEPTH:
+            gen.call(self, var, depth)
+            return
+
+        super().emit(gen, var, depth)
+
+        for name, checker in self.elements.items():
+            value = gen.variable()
+            get = "{0} = {1}.get({2}, MISSING)".format(value, var, gen.constant(name))
+            if checker.mandatory:
+                gen.line(depth, get)
+                gen.line(depth, "if {0} is MISSING: return False".format(value))
+                checker.emit(gen, value, depth)
+            else:
+                with gen.block(depth, get, "if {0} is not MISSING:".format(value)):
+                    checker.emit(gen, value, depth + 1)
+
+    def diagnose(self, obj) -> None:
+        super().diagnose(obj)
 
         for name, checker in self.elements.items():
             if name in obj:
                 try:
-                    checker.check(obj[name])
+                    checker.diagnose(obj[name])
                 except CheckError as ex:
                     raise CheckError("Element '{0}' is invalid: {1}"
                                      .format(name, str(ex))) from ex
 
             elif checker.mandatory:
                 raise CheckError("Element '{0}' is missing".format(name))
+
+
+def _lookup(values) -> Any:
+    """
+    Return a container for fast membership tests of `values`.
+    """
+
+    try:
+        return frozenset(values)
+    except TypeError:
+        return values
+
+
+class _Generator:
+    """
+    Source of a predicate generated by Checker.compile().
+    """
+
+    def __init__(self) -> None:
+        self.lines = ["def valid(obj):"]
+        self.namespace = {"MISSING": object()}
+        self._names = 0
+
+    def _name(self, prefix) -> str:
+        self._names += 1
+        return "{0}{1}".format(prefix, self._names)
+
+    def variable(self) -> str:
+        return self._name("v")
+
+    def constant(self, value) -> str:
+        name = self._name("c")
+        self.namespace[name] = value
+        return name
+
+    def line(self, depth, text) -> None:
+        self.lines.append("    " * depth + text)
+
+    def call(self, checker, var, depth) -> None:
+        self.line(depth, "if not {0}({1}): return False".format(self.constant(checker.compile()), var))
+
+    @contextmanager
+    def block(self, depth, *header) -> Iterator[None]:
+        """
+        Add `header` lines, the last one opening a block filled in the body
+        of the with statement. The lines are dropped if the block is empty.
+        """
+
+        start = len(self.lines)
+        for text in header:
+            self.line(depth, text)
+        end = len(self.lines)
+
+        yield
+
+        if len(self.lines) == end:
+            del self.lines[start:]
+
+    def build(self) -> Callable[[Any], bool]:
+        exec("\n".join(self.lines), self.namespace) # pylint: disable=exec-used
+        return self.namespace["valid"]
@@ -17,12 +17,11 @@
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import os
 import sys
 from argparse import _SubParsersAction, ArgumentParser, HelpFormatter, Namespace
 from pyfaf.actions import actions
 from pyfaf.common import log
-from pyfaf.bugtrackers import bugtrackers
-from pyfaf.solutionfinders import solution_finders
 
 
 class FafHelpFormatter(HelpFormatter):
@@ -97,12 +96,34 @@ class CmdlineParser(ArgumentParser):
         self.add_argument("--dry-run", action="store_true", default=False,
                           help="do not flush any changes to the database")
 
+        # Parsers of actions that have not been set up by the action yet
+        self._action_parsers = {}
         if toplevel:
             action_parsers = self.add_subparsers(title="action")
-            for action_name, action_object in actions.items():
-                action_parser = action_parsers.add_parser(action_name)
-                action_object.tweak_cmdline_parser(action_parser)
-                action_parser.set_defaults(func=action_object.run)
+            for action_name in actions:
+                self._action_parsers[action_name] = action_parsers.add_parser(action_name)
+
+            # Shell completion needs the options of all actions
+            if "_ARGCOMPLETE" in os.environ:
+                for action_name in list(self._action_parsers):
+                    self._setup_action_parser(action_name)
+
+    def _setup_action_parser(self, action_name) -> None:
+        """
+        Load the action and let it add its options to its parser.
+        """
+
+        action_parser = self._action_parsers.pop(action_name, None)
+        if action_parser is None:
+            return
+
+        try:
+            action_object = actions[action_name]
+        except KeyError:
+            self.error("Unable to load action '{0}'".format(action_name))
+
+        action_object.tweak_cmdline_parser(action_parser)
+        action_parser.set_defaults(func=action_object.run)
 
     def add_argument(self, *args, **kwargs) -> None:
         """
@@ -120,6 +141,14 @@ class CmdlineParser(ArgumentParser):
         Parse command line arguments and set loglevel accordingly.
         """
 
+        if self._action_parsers:
+            # Only the chosen action is loaded. The global options are
+            # flags, so the action is the first positional argument.
+            for arg in (sys.argv[1:] if args is None else args):
+                if not arg.startswith("-"):
+                    self._setup_action_parser(arg)
+                    break
+
         result = ArgumentParser.parse_args(self, args=args, namespace=namespace)
         log.setLevel(result.verbose)
         return result
@@ -136,6 +165,8 @@ class CmdlineParser(ArgumentParser):
         Add the `-b` argument for specifying bug tracker.
         """
 
+        from pyfaf.bugtrackers import bugtrackers
+
         defaults = dict(
             help="bug tracker",
             choices=bugtrackers,
@@ -244,6 +275,8 @@ class CmdlineParser(ArgumentParser):
         """
         Add the `-s` argument for specifying solution finders.
         """
+        from pyfaf.solutionfinders import solution_finders
+
         defaults = dict(
             help="solution finder",
             choices=solution_finders,
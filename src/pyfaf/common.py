@@ -17,18 +17,21 @@
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
 import errno
+import importlib
 import logging
 import os
 import pwd
 import re
 import tempfile
 
-from typing import Any, Dict, Optional
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from pyfaf.config import config, configure_logging
 
 __all__ = ["FafError",
            "Plugin",
+           "PluginRegistry",
            "get_temp_dir",
            "import_dir",
            "load_plugins",
@@ -50,10 +53,11 @@ thread_logger = logging.getLogger("faf.thread")
 # pylint: enable-msg=C0103
 
 
-def import_dir(module, dirname, prefix=None) -> None:
+def import_dir(module, dirname, prefix=None, skip=None) -> None:
     """
     Imports python files from `dirname` into `module`.
-    Ignores files whose name starts with underscore.
+    Ignores files whose name starts with underscore and modules
+    whose names are in `skip`.
     """
 
     for filename in os.listdir(dirname):
@@ -63,6 +67,8 @@ def import_dir(module, dirname, prefix=None) -> None:
             continue
         if prefix and not filename.startswith(prefix):
             continue
+        if skip and filename[:-3] in skip:
+            continue
 
         plugin = "{0}.{1}".format(module, filename[:-3])
 
@@ -137,6 +143,103 @@ def load_plugin_types(cls, result=None) -> Dict[str, Any]:
     return result
 
 
+class PluginRegistry(Mapping):
+    """
+    Read-only dictionary of plugins (instances of subclasses of `cls`)
+    keyed by plugin names.
+
+    `manifest` maps names of the plugins shipped in `package` to
+    "module:Class" strings. A listed plugin is imported and instantiated
+    when it is accessed for the first time. Modules of the package not
+    referenced by the manifest, e.g. plugins added by administrators,
+    are imported and loaded by load_plugins only when a name missing
+    in the manifest is looked up or the registry is enumerated.
+    """
+
+    def __init__(self, cls, package, manifest) -> None:
+        self._cls = cls
+        self._package = package
+        self._manifest = dict(manifest)
+        self._plugins: Dict[str, Any] = {}
+        self._failed = set()
+        self._unlisted = None
+
+    def _load_unlisted(self) -> Dict[str, Any]:
+        if self._unlisted is None:
+            listed = {spec.split(":")[0] for spec in self._manifest.values()}
+            dirname = os.path.dirname(importlib.import_module(self._package).__file__)
+            import_dir(self._package, dirname, skip=listed)
+            self._unlisted = {name: plugin for name, plugin in
+                              load_plugins(self._cls, init=False).items()
+                              if name not in self._manifest}
+
+        return self._unlisted
+
+    def _load(self, name) -> Any:
+        if name in self._manifest:
+            module, classname = self._manifest[name].split(":")
+            module = "{0}.{1}".format(self._package, module)
+            try:
+                return getattr(importlib.import_module(module), classname)
+            except Exception as ex: # pylint: disable=broad-except
+                log.error("Unable to import plugin %s: %s", module, str(ex))
+                return None
+
+        return self._load_unlisted().get(name)
+
+    def __getitem__(self, name) -> Any:
+        plugin = self._plugins.get(name)
+        if plugin is not None:
+            return plugin
+
+        if name in self._failed:
+            raise KeyError(name)
+
+        plugin_cls = self._load(name)
+        if plugin_cls is None:
+            if name in self._manifest:
+                self._failed.add(name)
+            raise KeyError(name)
+
+        plugin = plugin_cls()
+        self._plugins[name] = plugin
+        return plugin
+
+    def __contains__(self, name) -> bool:
+        if name in self._manifest:
+            return name not in self._failed
+
+        return name in self._load_unlisted()
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self._manifest:
+            if name not in self._failed:
+                yield name
+
+        yield from self._load_unlisted()
+
+    def __len__(self) -> int:
+        return len(list(iter(self)))
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """
+        Return (name, plugin) tuples of all plugins that can be loaded.
+        Every plugin gets imported and instantiated.
+        """
+
+        result = []
+        for name in list(self):
+            try:
+                result.append((name, self[name]))
+            except KeyError:
+                continue
+
+        return result
+
+    def values(self) -> List[Any]:
+        return [plugin for _, plugin in self.items()]
+
+
 def ensure_dirs(dirnames) -> None:
     for dirname in dirnames:
         try:
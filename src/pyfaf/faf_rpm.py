@@ -20,7 +20,7 @@ import os
 import shutil
 import tempfile
 from subprocess import Popen, PIPE, TimeoutExpired
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import rpm
 
@@ -30,7 +30,8 @@ from pyfaf.storage.opsys import Package, PackageDependency
 
 log = log.getChild(__name__)
 
-__all__ = ["store_rpm_provides", "unpack_rpm_to_tmp"]
+__all__ = ["read_rpm_provides", "save_rpm_provides", "store_rpm_provides",
+           "unpack_rpm_to_tmp"]
 
 
 # https://github.com/rpm-software-management/rpm/commit/be0c4b5dce1630637c98002730d840cd6806c370
@@ -63,65 +64,87 @@ def parse_evr(evr_string: str) -> Tuple[Optional[int], Optional[str], Optional[s
     return (epoch, version, release)
 
 
-def store_rpm_provides(db: Database, package: Package, nogpgcheck: bool = False) -> None:
+def read_rpm_provides(rpm_path: str, name: str,
+                      nogpgcheck: bool = False) -> List[Dict[str, Any]]:
     """
-    Save RPM provides of `package` to storage.
+    Read RPM provides from the header of the RPM file at `rpm_path`.
+    Return a list of dictionaries with name, flags, epoch, version
+    and release items. `name` of the package is only used in messages.
 
-    Expects pyfaf.storage.opsys.Package object.
+    Does not access the storage, so it can run in a worker process.
     """
 
-    pkg_id = package.id
     transaction = rpm.ts()
-    rpm_file = package.get_lob_fd("package")
-    if not rpm_file:
-        raise FafError("Package {0} has no lob stored".format(package.name))
-
     if nogpgcheck:
         transaction.setVSFlags(rpm._RPMVSF_NOSIGNATURES) # pylint: disable=protected-access
 
     try:
-        header = transaction.hdrFromFdno(rpm_file.fileno())
+        with open(rpm_path, "rb") as rpm_file:
+            header = transaction.hdrFromFdno(rpm_file.fileno())
+    except OSError as exc:
+        raise FafError("Package {0} has no lob stored".format(name)) from exc
     except rpm.error as exc:
-        rpm_file.close()
         raise FafError("rpm error: {0}".format(exc)) from exc
 
-    files = header.fiFromHeader()
-    log.debug("%s contains %d files", package.nvra(), len(files))
+    result = []
 
     # Invalid name for type variable
     # pylint: disable-msg=C0103
-    for f in files:
-        new = PackageDependency()
-        new.package_id = pkg_id
-        new.type = "PROVIDES"
-        new.name = f[0]
-        new.flags = 0
-        db.session.add(new)
+    for f in header.fiFromHeader():
+        result.append({"name": f[0], "flags": 0,
+                       "epoch": None, "version": None, "release": None})
 
     provides = header.dsFromHeader("providename")
     for p in provides:
         if len(p.N()) > 1024:
             log.warning("Provides item in RPM header of %s longer than 1024 "
-                        "characters. Skipping", package.name)
+                        "characters. Skipping", name)
             continue
 
-        new = PackageDependency()
-        new.package_id = pkg_id
-        new.type = "PROVIDES"
-        new.name = p.N()
-        new.flags = p.Flags()
+        new = {"name": p.N(), "flags": p.Flags(),
+               "epoch": None, "version": None, "release": None}
         evr = p.EVR()
         if evr:
             try:
-                new.epoch, new.version, new.release = parse_evr(evr)
+                new["epoch"], new["version"], new["release"] = parse_evr(evr)
             except ValueError as ex:
                 log.warning("Unparsable EVR ‘%s’ of %s in Provides of %s: %s. "
                             "Skipping",
-                            evr, p.N(), package.name, ex)
+                            evr, p.N(), name, ex)
                 continue
-        db.session.add(new)
+        result.append(new)
+
+    return result
+
+
+def save_rpm_provides(db: Database, package_id: int, provides: List[Dict[str, Any]]) -> None:
+    """
+    Save RPM provides as returned by `read_rpm_provides`
+    of the package with `package_id` to storage.
+    """
+
+    if not provides:
+        return
+
+    db.session.execute(PackageDependency.__table__.insert(),
+                       [dict(provide, package_id=package_id, type="PROVIDES")
+                        for provide in provides])
+
+
+def store_rpm_provides(db: Database, package: Package, nogpgcheck: bool = False) -> None:
+    """
+    Save RPM provides of `package` to storage.
+
+    Expects pyfaf.storage.opsys.Package object.
+    """
+
+    if not package.has_lob("package"):
+        raise FafError("Package {0} has no lob stored".format(package.name))
+
+    provides = read_rpm_provides(package.get_lob_path("package"), package.name, nogpgcheck)
+    log.debug("%s provides %d items", package.nvra(), len(provides))
 
-    rpm_file.close()
+    save_rpm_provides(db, package.id, provides)
     db.session.flush()
 
 
@@ -161,7 +161,8 @@ class Fedora(System):
                                                      package["release"],
                                                      package["architecture"])
                 if db_unknown_pkg is None:
-                    db_arch = get_arch_by_name(db, package["architecture"])
+                    db_arch = get_arch_by_name(db, package["architecture"],
+                                               cached=True)
                     if db_arch is None:
                         continue
 
@@ -214,7 +215,8 @@ class Fedora(System):
 
     def save_ureport(self, db, db_report, ureport, packages, flush=False, count=1) -> None:
         if "desktop" in ureport:
-            db_release = get_osrelease(db, Fedora.nice_name, ureport["version"])
+            db_release = get_osrelease(db, Fedora.nice_name, ureport["version"],
+                                       cached=True)
             if db_release is None:
                 self.log_warn("Release '{0} {1}' not found"
                               .format(Fedora.nice_name, ureport["version"]))
@@ -18,7 +18,7 @@
 
 import os
 
-from typing import List, Union
+from typing import Any, List, Optional, Tuple, Union
 
 from pyfaf.common import FafError, Plugin, import_dir, load_plugins
 from pyfaf.storage import SymbolSource, YieldQueryAdaptor
@@ -71,16 +71,29 @@ class ProblemType(Plugin):
         raise NotImplementedError("validate_ureport is not implemented for {0}"
                                   .format(self.__class__.__name__))
 
-    def save_ureport(self, db, db_report, ureport, flush=False, count=1) -> None:
+    def save_ureport(self, db, db_report, ureport, flush=False, count=1,
+                     resolver=None) -> None:
         """
         Save the custom part of uReport into database. Assumes that
         the given uReport is valid. `db_report` may be a new object not
         yet flushed into database and thus may have no `id` attribute.
+        `resolver` is an optional pyfaf.symbols.SymbolResolver shared
+        by multiple uReports.
         """
 
         raise NotImplementedError("save_ureport is not implemented for {0}"
                                   .format(self.__class__.__name__))
 
+    def collect_symbols(self, ureport, resolver) -> List[Tuple]: # pylint: disable=unused-argument
+        """
+        Register symbols and symbol sources of all backtrace frames
+        of the custom part of uReport in `resolver`
+        (pyfaf.symbols.SymbolResolver). Return the list of symbol source
+        keys in the order in which the frames are saved.
+        """
+
+        return []
+
     def save_ureport_post_flush(self) -> None:
         """
         Save the parts that need the objects to be flushed into database.
@@ -143,6 +156,33 @@ class ProblemType(Plugin):
         raise NotImplementedError("retrace is not implemented for {0}"
                                   .format(self.__class__.__name__))
 
+    def get_symbolize_payload(self, task) -> Optional[Any]: # pylint: disable=unused-argument
+        """
+        Return picklable data needed to symbolize the unpacked
+        pyfaf.retrace.RetraceTask in a worker process without database
+        access. None means the plugin only supports `retrace`.
+        """
+
+        return None
+
+    def symbolize(self, payload, symbolizer=None) -> Any: # pylint: disable=unused-argument
+        """
+        Symbolize `payload` returned by `get_symbolize_payload`.
+        Executed in a worker process, must not touch the database.
+        `symbolizer` is a pyfaf.retrace.Symbolizer kept by the worker
+        across tasks, plugins create their own if it is None.
+        Only called for plugins returning a payload, does nothing
+        by default.
+        """
+
+        return None
+
+    def apply_retrace(self, db, task, result) -> None: # pylint: disable=unused-argument
+        """
+        Store `result` of `symbolize` for the pyfaf.retrace.RetraceTask
+        to the database. Does nothing by default.
+        """
+
     def compare(self, db_report1, db_report2) -> None:
         """
         Compare 2 pyfaf.storage.Report objects returning an integer
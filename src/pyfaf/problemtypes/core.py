@@ -18,7 +18,7 @@
 
 from __future__ import unicode_literals
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import os
 import shutil
@@ -36,10 +36,8 @@ from pyfaf.queries import (get_package_by_file,
                            get_src_package_by_build,
                            get_ssource_by_bpo,
                            get_symbol_by_name_path)
-from pyfaf.retrace import (addr2line,
-                           demangle,
-                           get_base_address,
-                           ssource2funcname,
+from pyfaf.retrace import (Symbolizer,
+                           demangle_many,
                            usrmove)
 from pyfaf.storage import (OpSysComponent,
                            Report,
@@ -51,6 +49,7 @@ from pyfaf.storage import (OpSysComponent,
                            Symbol,
                            SymbolSource,
                            column_len)
+from pyfaf.symbols import SymbolResolver
 from pyfaf.utils.parse import str2bool
 from pyfaf.utils.hash import hash_list
 
@@ -316,7 +315,25 @@ class CoredumpProblem(ProblemType):
 
         return hash_list(hashbase)
 
-    def save_ureport(self, db, db_report, ureport, flush=False, count=1) -> None:
+    def collect_symbols(self, ureport, resolver) -> List[Tuple]:
+        result = []
+        for thread in ureport["stacktrace"]:
+            for frame in thread["frames"]:
+                path = os.path.abspath(frame["file_name"])
+
+                symbol = None
+                if "function_name" in frame:
+                    symbol = resolver.add_symbol(frame["function_name"],
+                                                 get_libname(path))
+
+                result.append(resolver.add_ssource_by_bpo(
+                    frame.get("build_id"), path, frame["build_id_offset"],
+                    symbol=symbol, hash=frame.get("fingerprint")))
+
+        return result
+
+    def save_ureport(self, db, db_report, ureport, flush=False, count=1,
+                     resolver=None) -> None:
         db_report.errname = str(ureport["signal"])
 
         db_reportexe = get_reportexe(db, db_report, ureport["executable"])
@@ -334,9 +351,6 @@ class CoredumpProblem(ProblemType):
             raise FafError("Unable to get backtrace hash")
 
         if not db_report.backtraces:
-            new_symbols = {}
-            new_symbolsources = {}
-
             db_backtrace = ReportBacktrace()
             db_backtrace.report = db_report
             db.session.add(db_backtrace)
@@ -348,6 +362,12 @@ class CoredumpProblem(ProblemType):
                 db_bthash.hash = bthash
                 db.session.add(db_bthash)
 
+            if resolver is None:
+                resolver = SymbolResolver(db)
+
+            ssource_keys = iter(self.collect_symbols(ureport, resolver))
+            resolver.resolve()
+
             tid = 0
             for thread in ureport["stacktrace"]:
                 tid += 1
@@ -360,7 +380,7 @@ class CoredumpProblem(ProblemType):
                 db.session.add(db_thread)
 
                 fid = 0
-                for frame in thread["frames"]:
+                for _ in thread["frames"]:
                     # OK, this is totally ugly.
                     # Frames may contain inlined functions, that would normally
                     # require shifting all frames by 1 and inserting a new one.
@@ -370,60 +390,10 @@ class CoredumpProblem(ProblemType):
                     # optimization.
                     fid += 10
 
-                    if "build_id" in frame:
-                        build_id = frame["build_id"]
-                    else:
-                        build_id = None
-
-                    if "fingerprint" in frame:
-                        fingerprint = frame["fingerprint"]
-                    else:
-                        fingerprint = None
-
-                    path = os.path.abspath(frame["file_name"])
-                    offset = frame["build_id_offset"]
-
-                    db_symbol = None
-                    if "function_name" in frame:
-                        norm_path = get_libname(path)
-
-                        db_symbol = \
-                            get_symbol_by_name_path(db,
-                                                    frame["function_name"],
-                                                    norm_path)
-                        if db_symbol is None:
-                            key = (frame["function_name"], norm_path)
-                            if key in new_symbols:
-                                db_symbol = new_symbols[key]
-                            else:
-                                db_symbol = Symbol()
-                                db_symbol.name = frame["function_name"]
-                                db_symbol.normalized_path = norm_path
-                                db.session.add(db_symbol)
-                                new_symbols[key] = db_symbol
-
-                    db_symbolsource = get_ssource_by_bpo(db, build_id,
-                                                         path, offset)
-
-                    if db_symbolsource is None:
-                        key = (build_id, path, offset)
-
-                        if key in new_symbolsources:
-                            db_symbolsource = new_symbolsources[key]
-                        else:
-                            db_symbolsource = SymbolSource()
-                            db_symbolsource.symbol = db_symbol
-                            db_symbolsource.build_id = build_id
-                            db_symbolsource.path = path
-                            db_symbolsource.offset = offset
-                            db_symbolsource.hash = fingerprint
-                            db.session.add(db_symbolsource)
-                            new_symbolsources[key] = db_symbolsource
-
                     db_frame = ReportBtFrame()
                     db_frame.thread = db_thread
                     db_frame.order = fid
-                    db_frame.symbolsource = db_symbolsource
+                    db_frame.symbolsource = resolver.get_ssource(next(ssource_keys))
                     db_frame.inlined = False
                     db.session.add(db_frame)
 
@@ -530,48 +500,74 @@ class CoredumpProblem(ProblemType):
 
         return db_ssource, (db_debug_package, db_bin_package, db_src_package)
 
-    def retrace(self, db, task) -> None:
-        new_symbols = {}
-        new_symbolsources = {}
+    def get_symbolize_payload(self, task) -> Dict[str, Any]:
+        payload = {"debug_path": os.path.join(task.debuginfo.unpacked_path,
+                                              "usr", "lib", "debug"),
+                   "binaries": []}
 
         for bin_pkg, db_ssources in task.binary_packages.items():
-            self.log_info("Retracing symbols from package {0}"
-                          .format(bin_pkg.nvra))
+            payload["binaries"].append(
+                (bin_pkg.nvra, bin_pkg.unpacked_path,
+                 [(db_ssource.id, db_ssource.path, db_ssource.offset)
+                  for db_ssource in db_ssources]))
 
-            i = 0
-            for db_ssource in db_ssources:
-                i += 1
+        return payload
 
-                self.log_debug("[%d / %d] Processing '%s' @ '%s'",
-                               i, len(db_ssources), ssource2funcname(db_ssource),
-                               db_ssource.path)
+    def symbolize(self, payload, symbolizer=None) -> Dict[str, Dict]:
+        if symbolizer is None:
+            with Symbolizer() as own_symbolizer:
+                return self.symbolize(payload, symbolizer=own_symbolizer)
 
-                norm_path = get_libname(db_ssource.path)
+        frames = {}
+
+        for nvra, unpacked_path, ssources in payload["binaries"]:
+            self.log_info("Retracing symbols from package {0}".format(nvra))
+
+            for i, (ssource_id, path, offset) in enumerate(ssources, start=1):
+                self.log_debug("[%d / %d] Processing '%s' @ 0x%x",
+                               i, len(ssources), path, offset)
 
-                if bin_pkg.unpacked_path is None:
+                frames[ssource_id] = None
+
+                if unpacked_path is None:
                     self.log_debug("fail: path to unpacked binary package not found")
-                    db_ssource.retrace_fail_count += 1
                     continue
 
-                binary = os.path.join(bin_pkg.unpacked_path, db_ssource.path[1:])
+                binary = os.path.join(unpacked_path, path[1:])
 
                 try:
-                    address = get_base_address(binary) + db_ssource.offset
+                    address = symbolizer.get_base_address(binary) + offset
                 except FafError as ex:
                     self.log_debug("get_base_address failed: %s", str(ex))
-                    db_ssource.retrace_fail_count += 1
                     continue
 
                 try:
-                    debug_path = os.path.join(task.debuginfo.unpacked_path,
-                                              "usr", "lib", "debug")
-                    results = addr2line(binary, address, debug_path)
+                    results = symbolizer.addr2line(binary, address, payload["debug_path"])
                     results.reverse()
                 except Exception as ex: # pylint: disable=broad-except
                     self.log_debug("addr2line failed: %s", str(ex))
+                    continue
+
+                frames[ssource_id] = results
+
+        funcnames = [funcname for results in frames.values() if results
+                     for funcname, _, _ in results]
+
+        return {"frames": frames, "nice_names": demangle_many(funcnames)}
+
+    def apply_retrace(self, db, task, result) -> None:
+        new_symbols = {}
+        new_symbolsources = {}
+
+        for _, db_ssources in task.binary_packages.items():
+            for db_ssource in db_ssources:
+                results = result["frames"].get(db_ssource.id)
+                if not results:
                     db_ssource.retrace_fail_count += 1
                     continue
 
+                norm_path = get_libname(db_ssource.path)
+
                 inl_id = 0
                 while len(results) > 1:
                     inl_id += 1
@@ -648,12 +644,15 @@ class CoredumpProblem(ProblemType):
                         new_symbols[key] = db_symbol
 
                 if db_symbol.nice_name is None:
-                    db_symbol.nice_name = demangle(funcname)
+                    db_symbol.nice_name = result["nice_names"].get(funcname)
 
                 db_ssource.symbol = db_symbol
                 db_ssource.source_path = srcfile
                 db_ssource.line_number = srcline
 
+    def retrace(self, db, task) -> None:
+        self.apply_retrace(db, task, self.symbolize(self.get_symbolize_payload(task)))
+
         if task.debuginfo.unpacked_path is not None:
             self.log_debug("Removing %s", task.debuginfo.unpacked_path)
             shutil.rmtree(task.debuginfo.unpacked_path, ignore_errors=True)
@@ -18,7 +18,7 @@
 
 from __future__ import unicode_literals
 
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import satyr
 from pyfaf.problemtypes import ProblemType
@@ -27,8 +27,6 @@ from pyfaf.checker import (Checker,
                            IntChecker,
                            ListChecker,
                            StringChecker)
-from pyfaf.queries import (get_symbol_by_name_path,
-                           get_symbolsource)
 from pyfaf.storage import (ReportBacktrace,
                            ReportBtFrame,
                            ReportBtHash,
@@ -37,6 +35,7 @@ from pyfaf.storage import (ReportBacktrace,
                            Symbol,
                            SymbolSource,
                            column_len)
+from pyfaf.symbols import SymbolResolver
 from pyfaf.utils.parse import str2bool
 from pyfaf.utils.hash import hash_list
 from pyfaf.common import FafError
@@ -220,7 +219,37 @@ class JavaProblem(ProblemType):
     def get_component_name(self, ureport) -> str:
         return ureport["component"]
 
-    def save_ureport(self, db, db_report, ureport, flush=False, count=1) -> None:
+    def collect_symbols(self, ureport, resolver) -> List[Tuple]:
+        result = []
+        for thread in ureport["threads"]:
+            for frame in thread["frames"]:
+                if "class_path" in frame:
+                    file_name = frame["class_path"]
+                elif frame["is_exception"]:
+                    file_name = JavaProblem.exception
+                elif frame["is_native"]:
+                    file_name = JavaProblem.native
+                else:
+                    file_name = JavaProblem.unknown
+
+                if "file_line" in frame:
+                    file_line = frame["file_line"]
+                else:
+                    file_line = 0
+
+                values = {"line_number": file_line}
+                if "file_name" in frame:
+                    values["source_path"] = frame["file_name"]
+
+                symbol = resolver.add_symbol(frame["name"], file_name)
+                result.append(resolver.add_ssource_by_symbol(symbol, file_name,
+                                                             file_line,
+                                                             **values))
+
+        return result
+
+    def save_ureport(self, db, db_report, ureport, flush=False, count=1,
+                     resolver=None) -> None:
         # at the moment we only send crash thread
         # we may need to identify the crash thread in the future
         crashthread = ureport["threads"][0]
@@ -258,8 +287,11 @@ class JavaProblem(ProblemType):
             db_bthash.hash = bthash
             db_bthash.backtrace = db_backtrace
 
-            new_symbols = {}
-            new_symbolsources = {}
+            if resolver is None:
+                resolver = SymbolResolver(db)
+
+            ssource_keys = iter(self.collect_symbols(ureport, resolver))
+            resolver.resolve()
 
             j = 0
             for thread in ureport["threads"]:
@@ -271,61 +303,11 @@ class JavaProblem(ProblemType):
                 db_thread.number = j
                 db.session.add(db_thread)
 
-                i = 0
-                for frame in thread["frames"]:
-                    i += 1
-
-                    function_name = frame["name"]
-
-                    if "class_path" in frame:
-                        file_name = frame["class_path"]
-                    elif frame["is_exception"]:
-                        file_name = JavaProblem.exception
-                    elif frame["is_native"]:
-                        file_name = JavaProblem.native
-                    else:
-                        file_name = JavaProblem.unknown
-
-                    if "file_line" in frame:
-                        file_line = frame["file_line"]
-                    else:
-                        file_line = 0
-
-                    db_symbol = get_symbol_by_name_path(db, function_name,
-                                                        file_name)
-                    if db_symbol is None:
-                        key = (function_name, file_name)
-                        if key in new_symbols:
-                            db_symbol = new_symbols[key]
-                        else:
-                            db_symbol = Symbol()
-                            db_symbol.name = function_name
-                            db_symbol.normalized_path = file_name
-                            db.session.add(db_symbol)
-                            new_symbols[key] = db_symbol
-
-                    db_symbolsource = get_symbolsource(db, db_symbol,
-                                                       file_name,
-                                                       file_line)
-                    if db_symbolsource is None:
-                        key = (function_name, file_name, file_line)
-                        if key in new_symbolsources:
-                            db_symbolsource = new_symbolsources[key]
-                        else:
-                            db_symbolsource = SymbolSource()
-                            db_symbolsource.path = file_name
-                            db_symbolsource.offset = file_line
-                            if "file_name" in frame:
-                                db_symbolsource.source_path = frame["file_name"]
-                            db_symbolsource.line_number = file_line
-                            db_symbolsource.symbol = db_symbol
-                            db.session.add(db_symbolsource)
-                            new_symbolsources[key] = db_symbolsource
-
+                for i, _ in enumerate(thread["frames"], start=1):
                     db_frame = ReportBtFrame()
                     db_frame.order = i
                     db_frame.inlined = False
-                    db_frame.symbolsource = db_symbolsource
+                    db_frame.symbolsource = resolver.get_ssource(next(ssource_keys))
                     db_frame.thread = db_thread
                     db.session.add(db_frame)
 
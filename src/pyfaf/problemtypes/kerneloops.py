@@ -19,10 +19,10 @@
 from __future__ import unicode_literals
 
 import os
-import pickle
 import shutil
+from contextlib import nullcontext
 
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import satyr
 
@@ -40,7 +40,7 @@ from pyfaf.queries import (get_archs,
                            get_ssource_by_bpo,
                            get_symbol_by_name_path,
                            get_taint_flag_by_ureport_name)
-from pyfaf.retrace import addr2line, demangle, get_function_offset_map
+from pyfaf.retrace import SymbolIndex, Symbolizer, demangle_many
 from pyfaf.storage import (KernelModule,
                            KernelTaintFlag,
                            PackageDependency,
@@ -55,6 +55,7 @@ from pyfaf.storage import (KernelModule,
                            Symbol,
                            SymbolSource,
                            column_len)
+from pyfaf.symbols import SymbolResolver
 from pyfaf.utils.parse import str2bool
 from pyfaf.utils.hash import hash_list
 
@@ -348,7 +349,40 @@ class KerneloopsProblem(ProblemType):
 
         return hash_list(hashbase)
 
-    def save_ureport(self, db, db_report, ureport, flush=False, count=1) -> None:
+    def collect_symbols(self, ureport, resolver) -> List[Optional[Tuple]]:
+        result = []
+        for frame in ureport["frames"]:
+            # nah, another hack, deals with wrong parsing
+            if frame["function_name"].startswith("0x"):
+                result.append(None)
+                continue
+
+            if not "module_name" in frame:
+                module = "vmlinux"
+            else:
+                module = frame["module_name"]
+
+            # this doesn't work well. on 64bit, kernel maps to
+            # the end of address space (64bit unsigned), but in
+            # postgres bigint is 64bit signed and can't save
+            # the value - let's just map it to signed
+            if "address" in frame:
+                if frame["address"] >= (1 << 63):
+                    address = frame["address"] - (1 << 64)
+                else:
+                    address = frame["address"]
+            else:
+                address = 0
+
+            symbol = resolver.add_symbol(frame["function_name"], module)
+            result.append(resolver.add_ssource_by_bpo(
+                ureport["version"], module, address, symbol=symbol,
+                func_offset=frame["function_offset"]))
+
+        return result
+
+    def save_ureport(self, db, db_report, ureport, flush=False, count=1,
+                     resolver=None) -> None:
         bthash1 = self._hash_koops(ureport["frames"], skip_unreliable=False)
         bthash2 = self._hash_koops(ureport["frames"], skip_unreliable=True)
 
@@ -375,11 +409,14 @@ class KerneloopsProblem(ProblemType):
                 db_bthash2.type = "NAMES"
                 db.session.add(db_bthash2)
 
-            new_symbols = {}
-            new_symbolsources = {}
+            if resolver is None:
+                resolver = SymbolResolver(db)
+
+            ssource_keys = self.collect_symbols(ureport, resolver)
+            resolver.resolve()
 
             i = 0
-            for frame in ureport["frames"]:
+            for frame, key in zip(ureport["frames"], ssource_keys):
                 # OK, this is totally ugly.
                 # Frames may contain inlined functions, that would normally
                 # require shifting all frames by 1 and inserting a new one.
@@ -389,66 +426,20 @@ class KerneloopsProblem(ProblemType):
                 # optimization.
                 i += 10
 
-                # nah, another hack, deals with wrong parsing
-                if frame["function_name"].startswith("0x"):
+                if key is None:
                     continue
 
-                if not "module_name" in frame:
-                    module = "vmlinux"
-                else:
-                    module = frame["module_name"]
-
-                db_symbol = get_symbol_by_name_path(db, frame["function_name"],
-                                                    module)
-                if db_symbol is None:
-                    key = (frame["function_name"], module)
-                    if key in new_symbols:
-                        db_symbol = new_symbols[key]
-                    else:
-                        db_symbol = Symbol()
-                        db_symbol.name = frame["function_name"]
-                        db_symbol.normalized_path = module
-                        db.session.add(db_symbol)
-                        new_symbols[key] = db_symbol
-
-                # this doesn't work well. on 64bit, kernel maps to
-                # the end of address space (64bit unsigned), but in
-                # postgres bigint is 64bit signed and can't save
-                # the value - let's just map it to signed
-                if "address" in frame:
-                    if frame["address"] >= (1 << 63):
-                        address = frame["address"] - (1 << 64)
-                    else:
-                        address = frame["address"]
-                else:
-                    address = 0
-
-                db_symbolsource = get_ssource_by_bpo(db, ureport["version"],
-                                                     module, address)
-                if db_symbolsource is None:
-                    key = (ureport["version"], module, address)
-                    if key in new_symbolsources:
-                        db_symbolsource = new_symbolsources[key]
-                    else:
-                        db_symbolsource = SymbolSource()
-                        db_symbolsource.path = module
-                        db_symbolsource.offset = address
-                        db_symbolsource.func_offset = frame["function_offset"]
-                        db_symbolsource.symbol = db_symbol
-                        db_symbolsource.build_id = ureport["version"]
-                        db.session.add(db_symbolsource)
-                        new_symbolsources[key] = db_symbolsource
-
                 db_frame = ReportBtFrame()
                 db_frame.thread = db_thread
                 db_frame.order = i
-                db_frame.symbolsource = db_symbolsource
+                db_frame.symbolsource = resolver.get_ssource(key)
                 db_frame.inlined = False
                 db_frame.reliable = frame["reliable"]
                 db.session.add(db_frame)
 
             for taintflag in ureport["taint_flags"]:
-                db_taintflag = get_taint_flag_by_ureport_name(db, taintflag)
+                db_taintflag = get_taint_flag_by_ureport_name(db, taintflag,
+                                                              cached=True)
                 if db_taintflag is None:
                     self.log_warn("Skipping unsupported taint flag '{0}'"
                                   .format(taintflag))
@@ -468,7 +459,8 @@ class KerneloopsProblem(ProblemType):
                     if idx >= 0:
                         module = module[:idx]
 
-                    db_module = get_kernelmodule_by_name(db, module)
+                    db_module = get_kernelmodule_by_name(db, module,
+                                                         cached=True)
                     if db_module is None:
                         if module in new_modules:
                             db_module = new_modules[module]
@@ -568,158 +560,174 @@ class KerneloopsProblem(ProblemType):
 
         return db_ssource, result
 
+    def _get_symbol_index(self, debuginfo, debug_paths) -> SymbolIndex:
+        """
+        Return the symbol index of the kernel debuginfo package, building
+        and storing it first if it does not exist. Offset maps stored
+        in the previous pickled format are rebuilt.
+        """
+
+        db_debug_pkg = debuginfo.db_package
+        if db_debug_pkg.has_lob("offset_map"):
+            try:
+                return SymbolIndex(db_debug_pkg.get_lob_path("offset_map"))
+            except FafError as ex:
+                self.log_debug("Rebuilding symbol index of '%s': %s", debuginfo.nvra, str(ex))
+
+        db_debug_pkg.save_lob("offset_map", SymbolIndex.build(sorted(debug_paths)), overwrite=True)
+        return SymbolIndex(db_debug_pkg.get_lob_path("offset_map"))
+
     def retrace(self, db, task) -> None:
         new_symbols = {}
         new_symbolsources = {}
 
         debug_paths = set(os.path.join(task.debuginfo.unpacked_path, fname[1:])
                           for fname in task.debuginfo.debug_files)
+        # function name -> symbols without nice name, demangled at once
+        to_demangle = {}
+        symbol_index = nullcontext()
         if task.debuginfo.debug_files is not None:
-            db_debug_pkg = task.debuginfo.db_package
-            if db_debug_pkg.has_lob("offset_map"):
-                with db_debug_pkg.get_lob_fd("offset_map") as fd:
-                    offset_map = pickle.load(fd)
-            else:
-                offset_map = get_function_offset_map(debug_paths)
-                db_debug_pkg.save_lob("offset_map", pickle.dumps(offset_map))
-        else:
-            offset_map = {}
-
-        for _, db_ssources in task.binary_packages.items():
-            i = 0
-            for db_ssource in db_ssources:
-                i += 1
-                module = db_ssource.path
-                self.log_info(u"[{0} / {1}] Processing '{2}' @ '{3}'"
-                              .format(i, len(db_ssources),
-                                      db_ssource.symbol.name, module))
-
-                if db_ssource.path == "vmlinux":
-                    address = db_ssource.offset
-                    if address < 0:
-                        address += (1 << 64)
-                else:
-                    if module not in offset_map:
-                        self.log_debug("Module '%s' not found in package '%s'",
-                                       module, task.debuginfo.nvra)
+            symbol_index = self._get_symbol_index(task.debuginfo, debug_paths)
+
+        with symbol_index as offset_map, Symbolizer() as symbolizer:
+            for _, db_ssources in task.binary_packages.items():
+                i = 0
+                for db_ssource in db_ssources:
+                    i += 1
+                    module = db_ssource.path
+                    self.log_info(u"[{0} / {1}] Processing '{2}' @ '{3}'"
+                                  .format(i, len(db_ssources),
+                                          db_ssource.symbol.name, module))
+
+                    if db_ssource.path == "vmlinux":
+                        address = db_ssource.offset
+                        if address < 0:
+                            address += (1 << 64)
+                    else:
+                        if offset_map is None or module not in offset_map:
+                            self.log_debug("Module '%s' not found in package '%s'",
+                                           module, task.debuginfo.nvra)
+                            db_ssource.retrace_fail_count += 1
+                            continue
+
+                        symbol_name = db_ssource.symbol.name
+                        address = offset_map.lookup(module, symbol_name)
+                        if address is None:
+                            address = offset_map.lookup(module, symbol_name.lstrip("_"))
+
+                        if address is None:
+                            self.log_debug("Function '%s' not found in module '%s'",
+                                           db_ssource.symbol.name, module)
+                            db_ssource.retrace_fail_count += 1
+                            continue
+
+                        address += db_ssource.func_offset
+
+                    debug_dirs = [os.path.join(task.debuginfo.unpacked_path,
+                                               "usr", "lib", "debug"),
+                                  os.path.join(task.debuginfo.unpacked_path,
+                                               "usr", "lib")]
+                    debug_path = self._get_debug_path(db, module,
+                                                      task.debuginfo.db_package)
+                    if debug_path is None:
                         db_ssource.retrace_fail_count += 1
                         continue
 
-                    module_map = offset_map[module]
-
-                    symbol_name = db_ssource.symbol.name
-                    if symbol_name not in module_map:
-                        symbol_name = symbol_name.lstrip("_")
-
-                    if symbol_name not in module_map:
-                        self.log_debug("Function '%s' not found in module '%s'",
-                                       db_ssource.symbol.name, module)
+                    try:
+                        abspath = os.path.join(task.debuginfo.unpacked_path,
+                                               debug_path[1:])
+                        results = symbolizer.addr2line(abspath, address, ":".join(debug_dirs))
+                        results.reverse()
+                    except FafError as ex:
+                        self.log_debug("addr2line failed: %s", str(ex))
                         db_ssource.retrace_fail_count += 1
                         continue
 
-                    address = module_map[symbol_name] + db_ssource.func_offset
-
-                debug_dirs = [os.path.join(task.debuginfo.unpacked_path,
-                                           "usr", "lib", "debug"),
-                              os.path.join(task.debuginfo.unpacked_path,
-                                           "usr", "lib")]
-                debug_path = self._get_debug_path(db, module,
-                                                  task.debuginfo.db_package)
-                if debug_path is None:
-                    db_ssource.retrace_fail_count += 1
-                    continue
-
-                try:
-                    abspath = os.path.join(task.debuginfo.unpacked_path,
-                                           debug_path[1:])
-                    results = addr2line(abspath, address, ":".join(debug_dirs))
-                    results.reverse()
-                except FafError as ex:
-                    self.log_debug("addr2line failed: %s", str(ex))
-                    db_ssource.retrace_fail_count += 1
-                    continue
-
-                inl_id = 0
-                while len(results) > 1:
-                    inl_id += 1
+                    inl_id = 0
+                    while len(results) > 1:
+                        inl_id += 1
+
+                        funcname, srcfile, srcline = results.pop()
+                        self.log_debug("Unwinding inlined function '%s'", funcname)
+                        # hack - we have no offset for inlined symbols
+                        # let's use minus source line to avoid collisions
+                        offset = -srcline
+
+                        db_ssource_inl = get_ssource_by_bpo(db, db_ssource.build_id,
+                                                            db_ssource.path, offset)
+                        if db_ssource_inl is None:
+                            key = (db_ssource.build_id, db_ssource.path, offset)
+                            if key in new_symbolsources:
+                                db_ssource_inl = new_symbolsources[key]
+                            else:
+                                db_symbol_inl = get_symbol_by_name_path(db,
+                                                                        funcname,
+                                                                        module)
+
+                                if db_symbol_inl is None:
+                                    sym_key = (funcname, module)
+                                    if sym_key in new_symbols:
+                                        db_symbol_inl = new_symbols[sym_key]
+                                    else:
+                                        db_symbol_inl = Symbol()
+                                        db_symbol_inl.name = funcname
+                                        db_symbol_inl.normalized_path = module
+                                        db.session.add(db_symbol_inl)
+                                        new_symbols[sym_key] = db_symbol_inl
+
+                                db_ssource_inl = SymbolSource()
+                                db_ssource_inl.symbol = db_symbol_inl
+                                db_ssource_inl.build_id = db_ssource.build_id
+                                db_ssource_inl.path = module
+                                db_ssource_inl.offset = offset
+                                db_ssource_inl.source_path = srcfile
+                                db_ssource_inl.line_number = srcline
+                                db.session.add(db_ssource_inl)
+                                new_symbolsources[key] = db_ssource_inl
+
+                        for db_frame in db_ssource.frames:
+                            db_frames = sorted(db_frame.thread.frames,
+                                               key=lambda f: f.order)
+                            idx = db_frames.index(db_frame)
+                            if idx > 0:
+                                prevframe = db_frame.thread.frames[idx - 1]
+                                if (prevframe.inlined and
+                                        prevframe.symbolsource == db_ssource_inl):
+                                    continue
+
+                            db_newframe = ReportBtFrame()
+                            db_newframe.symbolsource = db_ssource_inl
+                            db_newframe.thread = db_frame.thread
+                            db_newframe.inlined = True
+                            db_newframe.order = db_frame.order - inl_id
+                            db.session.add(db_newframe)
 
                     funcname, srcfile, srcline = results.pop()
-                    self.log_debug("Unwinding inlined function '%s'", funcname)
-                    # hack - we have no offset for inlined symbols
-                    # let's use minus source line to avoid collisions
-                    offset = -srcline
-
-                    db_ssource_inl = get_ssource_by_bpo(db, db_ssource.build_id,
-                                                        db_ssource.path, offset)
-                    if db_ssource_inl is None:
-                        key = (db_ssource.build_id, db_ssource.path, offset)
-                        if key in new_symbolsources:
-                            db_ssource_inl = new_symbolsources[key]
+                    self.log_debug("Result: %s", funcname)
+                    db_symbol = get_symbol_by_name_path(db, funcname, module)
+                    if db_symbol is None:
+                        key = (funcname, module)
+                        if key in new_symbols:
+                            db_symbol = new_symbols[key]
                         else:
-                            db_symbol_inl = get_symbol_by_name_path(db,
-                                                                    funcname,
-                                                                    module)
-
-                            if db_symbol_inl is None:
-                                sym_key = (funcname, module)
-                                if sym_key in new_symbols:
-                                    db_symbol_inl = new_symbols[sym_key]
-                                else:
-                                    db_symbol_inl = Symbol()
-                                    db_symbol_inl.name = funcname
-                                    db_symbol_inl.normalized_path = module
-                                    db.session.add(db_symbol_inl)
-                                    new_symbols[sym_key] = db_symbol_inl
-
-                            db_ssource_inl = SymbolSource()
-                            db_ssource_inl.symbol = db_symbol_inl
-                            db_ssource_inl.build_id = db_ssource.build_id
-                            db_ssource_inl.path = module
-                            db_ssource_inl.offset = offset
-                            db_ssource_inl.source_path = srcfile
-                            db_ssource_inl.line_number = srcline
-                            db.session.add(db_ssource_inl)
-                            new_symbolsources[key] = db_ssource_inl
-
-                    for db_frame in db_ssource.frames:
-                        db_frames = sorted(db_frame.thread.frames,
-                                           key=lambda f: f.order)
-                        idx = db_frames.index(db_frame)
-                        if idx > 0:
-                            prevframe = db_frame.thread.frames[idx - 1]
-                            if (prevframe.inlined and
-                                    prevframe.symbolsource == db_ssource_inl):
-                                continue
-
-                        db_newframe = ReportBtFrame()
-                        db_newframe.symbolsource = db_ssource_inl
-                        db_newframe.thread = db_frame.thread
-                        db_newframe.inlined = True
-                        db_newframe.order = db_frame.order - inl_id
-                        db.session.add(db_newframe)
-
-                funcname, srcfile, srcline = results.pop()
-                self.log_debug("Result: %s", funcname)
-                db_symbol = get_symbol_by_name_path(db, funcname, module)
-                if db_symbol is None:
-                    key = (funcname, module)
-                    if key in new_symbols:
-                        db_symbol = new_symbols[key]
-                    else:
-                        self.log_debug("Creating new symbol '%s' @ '%s'", funcname, module)
-                        db_symbol = Symbol()
-                        db_symbol.name = funcname
-                        db_symbol.normalized_path = module
-                        db.session.add(db_symbol)
+                            self.log_debug("Creating new symbol '%s' @ '%s'", funcname, module)
+                            db_symbol = Symbol()
+                            db_symbol.name = funcname
+                            db_symbol.normalized_path = module
+                            db.session.add(db_symbol)
+
+                            new_symbols[key] = db_symbol
 
-                        new_symbols[key] = db_symbol
+                    if db_symbol.nice_name is None:
+                        to_demangle.setdefault(funcname, []).append(db_symbol)
 
-                if db_symbol.nice_name is None:
-                    db_symbol.nice_name = demangle(funcname)
+                    db_ssource.symbol = db_symbol
+                    db_ssource.source_path = srcfile
+                    db_ssource.line_number = srcline
 
-                db_ssource.symbol = db_symbol
-                db_ssource.source_path = srcfile
-                db_ssource.line_number = srcline
+        for funcname, nice_name in demangle_many(list(to_demangle.keys())).items():
+            for db_symbol in to_demangle[funcname]:
+                db_symbol.nice_name = nice_name
 
         if task.debuginfo is not None:
             self.log_debug("Removing %s", task.debuginfo.unpacked_path)
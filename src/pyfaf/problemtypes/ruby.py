@@ -18,7 +18,7 @@
 
 from __future__ import unicode_literals
 
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import satyr
 from pyfaf.problemtypes import ProblemType
@@ -28,9 +28,7 @@ from pyfaf.checker import (CheckError,
                            ListChecker,
                            StringChecker)
 from pyfaf.common import get_libname
-from pyfaf.queries import (get_reportexe,
-                           get_symbol_by_name_path,
-                           get_symbolsource)
+from pyfaf.queries import get_reportexe
 from pyfaf.storage import (ReportBacktrace,
                            ReportBtFrame,
                            ReportBtHash,
@@ -40,6 +38,7 @@ from pyfaf.storage import (ReportBacktrace,
                            Symbol,
                            SymbolSource,
                            column_len)
+from pyfaf.symbols import SymbolResolver
 from pyfaf.utils.parse import str2bool
 from pyfaf.utils.hash import hash_list
 
@@ -183,7 +182,33 @@ class RubyProblem(ProblemType):
     def get_component_name(self, ureport) -> str:
         return ureport["component"]
 
-    def save_ureport(self, db, db_report, ureport, flush=False, count=1) -> None:
+    def collect_symbols(self, ureport, resolver) -> List[Tuple]:
+        result = []
+        for frame in ureport["stacktrace"]:
+            if "special_function" in frame:
+                function_name = "<{0}>".format(frame["special_function"])
+            else:
+                function_name = frame["function_name"]
+
+            if "special_file" in frame:
+                file_name = "<{0}>".format(frame["special_file"])
+            else:
+                file_name = frame["file_name"]
+
+            values = {"source_path": file_name,
+                      "line_number": frame["file_line"]}
+            if "line_contents" in frame:
+                values["srcline"] = frame["line_contents"]
+
+            symbol = resolver.add_symbol(function_name, get_libname(file_name))
+            result.append(resolver.add_ssource_by_symbol(symbol, file_name,
+                                                         frame["file_line"],
+                                                         **values))
+
+        return result
+
+    def save_ureport(self, db, db_report, ureport, flush=False, count=1,
+                     resolver=None) -> None:
         crashframe = ureport["stacktrace"][0]
         if "special_function" in crashframe:
             crashfn = "<{0}>".format(crashframe["special_function"])
@@ -220,63 +245,17 @@ class RubyProblem(ProblemType):
             db_thread.crashthread = True
             db.session.add(db_thread)
 
-            new_symbols = {}
-            new_symbolsources = {}
-
-            i = 0
-            for frame in ureport["stacktrace"]:
-                i += 1
-
-                if "special_function" in frame:
-                    function_name = "<{0}>".format(frame["special_function"])
-                else:
-                    function_name = frame["function_name"]
-
-                if "special_file" in frame:
-                    file_name = "<{0}>".format(frame["special_file"])
-                else:
-                    file_name = frame["file_name"]
-
-                norm_path = get_libname(file_name)
-
-                db_symbol = get_symbol_by_name_path(db, function_name,
-                                                    norm_path)
-                if db_symbol is None:
-                    key = (function_name, norm_path)
-                    if key in new_symbols:
-                        db_symbol = new_symbols[key]
-                    else:
-                        db_symbol = Symbol()
-                        db_symbol.name = function_name
-                        db_symbol.normalized_path = norm_path
-                        db.session.add(db_symbol)
-                        new_symbols[key] = db_symbol
-
-                db_symbolsource = get_symbolsource(db, db_symbol,
-                                                   file_name,
-                                                   frame["file_line"])
-                if db_symbolsource is None:
-                    key = (function_name, file_name,
-                           frame["file_line"])
-                    if key in new_symbolsources:
-                        db_symbolsource = new_symbolsources[key]
-                    else:
-                        db_symbolsource = SymbolSource()
-                        db_symbolsource.path = file_name
-                        db_symbolsource.offset = frame["file_line"]
-                        db_symbolsource.source_path = file_name
-                        db_symbolsource.symbol = db_symbol
-                        if "line_contents" in frame:
-                            db_symbolsource.srcline = frame["line_contents"]
-                        if "file_line" in frame:
-                            db_symbolsource.line_number = frame["file_line"]
-                        db.session.add(db_symbolsource)
-                        new_symbolsources[key] = db_symbolsource
+            if resolver is None:
+                resolver = SymbolResolver(db)
+
+            ssource_keys = self.collect_symbols(ureport, resolver)
+            resolver.resolve()
 
+            for i, key in enumerate(ssource_keys, start=1):
                 db_frame = ReportBtFrame()
                 db_frame.order = i
                 db_frame.inlined = False
-                db_frame.symbolsource = db_symbolsource
+                db_frame.symbolsource = resolver.get_ssource(key)
                 db_frame.thread = db_thread
                 db.session.add(db_frame)
 
@@ -19,20 +19,24 @@
 import datetime
 import functools
 
-from typing import List, Optional, Tuple, Union
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 
-from sqlalchemy import func, desc, inspect
+from sqlalchemy import and_, func, desc, inspect, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import load_only, aliased
 from sqlalchemy.orm.query import Query
 
-from pyfaf.opsys import systems
+from pyfaf.utils.cache import cached_lookup
 import pyfaf.storage as st
 
-__all__ = ["get_arch_by_name", "get_archs", "get_associate_by_name",
+__all__ = ["get_arch_by_name", "get_archs", "get_archs_by_names",
+           "get_associate_by_name",
            "get_backtrace_by_hash", "get_backtraces_by_type",
            "get_bugtracker_by_name", "get_bz_attachment", "get_bz_bug",
            "get_bz_comment", "get_bz_user",
-           "get_component_by_name", "get_components_by_opsys",
+           "get_component_by_name", "get_components_by_names",
+           "get_components_by_opsys",
            "get_contact_email", "get_report_contact_email",
            "get_crashed_package_for_report",
            "get_crashed_unknown_package_nevr_for_report",
@@ -40,6 +44,8 @@ __all__ = ["get_arch_by_name", "get_archs", "get_associate_by_name",
            "get_external_faf_by_id", "get_external_faf_by_name",
            "get_external_faf_instances", "get_history_day", "get_history_month",
            "get_history_sum", "get_history_target", "get_history_week",
+           "get_history_rollup_target", "update_history_rollups",
+           "rebuild_history_rollups", "move_history_rollups",
            "get_sf_prefilter_btpath_by_pattern", "get_sf_prefilter_btpaths",
            "get_sf_prefilter_btpaths_by_solution",
            "get_sf_prefilter_pkgname_by_pattern",
@@ -47,34 +53,52 @@ __all__ = ["get_arch_by_name", "get_archs", "get_associate_by_name",
            "get_sf_prefilter_sol", "get_sf_prefilter_sols",
            "get_sf_prefilter_sol_by_cause", "get_sf_prefilter_sol_by_id",
            "get_kernelmodule_by_name", "get_opsys_by_name", "get_osrelease",
+           "get_osreleases_by_names",
            "get_package_by_file", "get_packages_by_file",
            "get_package_by_file_build_arch", "get_packages_by_file_builds_arch",
            "get_package_by_name_build_arch", "get_package_by_nevra",
-           "get_problem_by_id", "get_problems", "get_problem_component",
+           "get_problem_by_id", "get_problem_ids", "get_problems", "get_problem_component",
            "get_empty_problems", "get_problem_opsysrelease",
-           "get_build_by_nevr", "get_release_ids", "get_releases", "get_report",
+           "get_build_by_nevr", "get_build_ids_by_nevrs", "get_packages_by_build_ids",
+           "insert_returning", "get_release_ids", "get_releases", "get_report",
+           "get_reports_by_hashes",
            "get_report_count_by_component", "get_report_release_desktop",
            "get_report_stats_by_component", "get_report_by_id",
            "get_reports_for_problems", "get_reportarch", "get_reportexe",
            "get_reportosrelease", "get_reportpackage", "get_reportreason",
-           "get_reports_by_type", "get_reportbz", "get_reportmantis",
-           "get_reports_for_opsysrelease", "get_repos_by_wildcards", "get_repos_for_opsys",
+           "get_reports_by_type", "get_reports_for_clustering",
+           "get_cluster_function_counts", "get_problem_ids_by_cluster_functions",
+           "get_reports_by_problem_ids", "delete_cluster_signatures",
+           "get_low_count_report_problem_ids",
+           "get_reportbz", "get_reportmantis",
+           "get_reports_for_opsysrelease", "get_reports_opsysreleases",
+           "get_repos_by_wildcards", "get_repos_for_opsys",
            "get_src_package_by_build", "get_ssource_by_bpo",
            "get_ssources_for_retrace", "get_supported_components",
-           "get_symbol_by_name_path", "get_symbolsource",
+           "get_symbol_by_name_path", "get_symbols_by_name_path",
+           "get_symbolsource", "get_ssources_by_bpo",
+           "get_ssources_by_symbol_path_offset", "insert_ignore_conflicts",
            "get_taint_flag_by_ureport_name", "get_unassigned_reports",
            "get_unknown_opsys", "get_unknown_package", "update_frame_ssource",
+           "upsert_counts",
            "query_hot_problems", "query_longterm_problems",
            "user_is_maintainer", "get_packages_by_osrelease", "get_all_report_hashes",
+           "get_report_hashes",
            "delete_bz_user", "get_reportcontactmails_by_id",
            "get_reportarchives_by_username", "get_problemreassigns_by_username",
            "get_user_by_mail", "delete_bugzilla", "get_bugzillas_by_uid",
            "get_bzattachments_by_uid", "get_bzbugccs_by_uid",
            "get_bzbughistory_by_uid", "get_bzcomments_by_uid",
-           "get_bz_comment", "get_bz_user", "get_builds_by_opsysrelease_id",
+           "get_bz_comment", "get_bz_user", "get_bz_users_by_emails",
+           "get_bz_bug_change_times", "get_bz_bug_cc_pairs", "get_bz_bug_history_keys",
+           "upsert_rows", "get_cache_generation", "get_cache_generations",
+           "bump_cache_generations", "mark_problem_snapshots_stale",
+           "get_stale_problem_snapshot_ids", "get_problem_snapshot_changes", "db_utcnow",
+           "get_builds_by_opsysrelease_id",
            "delete_mantis_bugzilla", "get_builds_by_arch_id", "get_bugtracker_report",]
 
 
+@cached_lookup("arch", st.Arch)
 def get_arch_by_name(db, arch_name) -> Optional[st.Arch]:
     """
     Return pyfaf.storage.Arch object from architecture
@@ -86,6 +110,21 @@ def get_arch_by_name(db, arch_name) -> Optional[st.Arch]:
             .first())
 
 
+def get_archs_by_names(db, arch_names) -> Dict[str, st.Arch]:
+    """
+    Return a dictionary mapping architecture names from `arch_names`
+    to pyfaf.storage.Arch objects. Unknown names are left out.
+    """
+
+    if not arch_names:
+        return {}
+
+    return {db_arch.name: db_arch for db_arch in
+            (db.session.query(st.Arch)
+             .filter(st.Arch.name.in_(arch_names))
+             .all())}
+
+
 def get_archs(db) -> List[st.Arch]:
     """
     Returns the list of all pyfaf.storage.Arch objects.
@@ -135,6 +174,7 @@ def get_backtraces_by_type(db, reporttype, query_all=True) -> List[st.ReportBack
     return query
 
 
+@cached_lookup("component", st.OpSysComponent)
 def get_component_by_name(db, component_name, opsys_name) -> Optional[st.OpSysComponent]:
     """
     Return pyfaf.storage.OpSysComponent from component name
@@ -148,6 +188,26 @@ def get_component_by_name(db, component_name, opsys_name) -> Optional[st.OpSysCo
             .first())
 
 
+def get_components_by_names(db, names) -> Dict[Tuple[str, str], st.OpSysComponent]:
+    """
+    Return a dictionary mapping (operating system name, component name)
+    tuples from `names` to pyfaf.storage.OpSysComponent objects.
+    Unknown components are left out.
+    """
+
+    if not names:
+        return {}
+
+    rows = (db.session.query(st.OpSys.name, st.OpSysComponent)
+            .select_from(st.OpSysComponent)
+            .join(st.OpSys)
+            .filter(tuple_(st.OpSys.name, st.OpSysComponent.name).in_(list(names)))
+            .all())
+
+    return {(opsys_name, db_component.name): db_component
+            for opsys_name, db_component in rows}
+
+
 def get_component_by_name_release(db, opsysrelease, component_name) -> st.OpSysReleaseComponent:
     """
     Return OpSysReleaseComponent instance matching `component_name`
@@ -283,12 +343,15 @@ def get_history_month(db, db_report, db_osrelease, month) -> Optional[st.ReportH
 def get_history_sum(db, opsys_name=None, opsys_version=None,
                     history="daily") -> Query:
     """
-    Return query summing ReportHistory(Daily|Weekly|Monthly)
+    Return query summing OpSysReleaseHistory(Daily|Weekly|Monthly)
     records optinaly filtered by `opsys_name` and `opsys_version`.
+
+    Use the date field returned by get_history_rollup_target("release", history)
+    to filter the query by dates.
     """
 
     opsysrelease_ids = get_release_ids(db, opsys_name, opsys_version)
-    hist_table, _ = get_history_target(history)
+    hist_table, _ = get_history_rollup_target("release", history)
     hist_sum = db.session.query(func.sum(hist_table.count).label("cnt"))
     if opsysrelease_ids:
         hist_sum = hist_sum.filter(
@@ -317,6 +380,36 @@ def get_history_target(target="daily") -> Tuple[Union[st.ReportHistoryDaily,
     return (st.ReportHistoryMonthly, st.ReportHistoryMonthly.month)
 
 
+# Levels of history rollups and the Report column they are grouped by
+HISTORY_ROLLUP_LEVELS = {
+    "problem": ("problem_id",
+                (st.ProblemHistoryDaily, st.ProblemHistoryWeekly, st.ProblemHistoryMonthly)),
+    "component": ("component_id",
+                  (st.ComponentHistoryDaily, st.ComponentHistoryWeekly, st.ComponentHistoryMonthly)),
+    "release": (None,
+                (st.OpSysReleaseHistoryDaily, st.OpSysReleaseHistoryWeekly, st.OpSysReleaseHistoryMonthly)),
+}
+
+
+def get_history_rollup_target(level, target="daily") -> Tuple[type, datetime.date]:
+    """
+    Return tuple of `(Problem|Component|OpSysRelease)History(Daily|Weekly|Monthly)`
+    and its date field summing report history over all reports of a problem,
+    a component or a release. `level` is one of `problem|component|release`,
+    `target` is the same as in get_history_target.
+    """
+
+    daily, weekly, monthly = HISTORY_ROLLUP_LEVELS[level][1]
+
+    if target in ["d", "daily"]:
+        return (daily, daily.day)
+
+    if target in ["w", "weekly"]:
+        return (weekly, weekly.week)
+
+    return (monthly, monthly.month)
+
+
 def get_history_week(db, db_report, db_osrelease, week) -> Optional[st.ReportHistoryWeekly]:
     """
     Return pyfaf.storage.ReportHistoryWeekly object for a given
@@ -363,6 +456,7 @@ def get_sf_prefilter_btpaths(db, db_opsys=None) -> List[st.SfPrefilterBacktraceP
     return (db.session.query(st.SfPrefilterBacktracePath)
             .filter((st.SfPrefilterBacktracePath.opsys_id.is_(None)) |
                     (st.SfPrefilterBacktracePath.opsys == db_opsys))
+            .order_by(st.SfPrefilterBacktracePath.id)
             .all())
 
 
@@ -397,6 +491,7 @@ def get_sf_prefilter_pkgnames(db, db_opsys=None) -> List[st.SfPrefilterBacktrace
     return (db.session.query(st.SfPrefilterPackageName)
             .filter((st.SfPrefilterPackageName.opsys_id.is_(None)) |
                     (st.SfPrefilterPackageName.opsys == db_opsys))
+            .order_by(st.SfPrefilterPackageName.id)
             .all())
 
 
@@ -444,6 +539,7 @@ def get_sf_prefilter_sol_by_id(db, solution_id) -> Optional[st.SfPrefilterSoluti
             .first())
 
 
+@cached_lookup("kernelmodule", st.KernelModule)
 def get_kernelmodule_by_name(db, module_name) -> Optional[st.KernelModule]:
     """
     Return pyfaf.storage.KernelModule from module name or None if not found.
@@ -454,6 +550,7 @@ def get_kernelmodule_by_name(db, module_name) -> Optional[st.KernelModule]:
             .first())
 
 
+@cached_lookup("opsys", st.OpSys)
 def get_opsys_by_name(db, name) -> Optional[st.OpSys]:
     """
     Return pyfaf.storage.OpSys from operating system
@@ -465,6 +562,7 @@ def get_opsys_by_name(db, name) -> Optional[st.OpSys]:
             .first())
 
 
+@cached_lookup("osrelease", st.OpSysRelease)
 def get_osrelease(db, name, version) -> Optional[st.OpSysRelease]:
     """
     Return pyfaf.storage.OpSysRelease from operating system
@@ -478,6 +576,26 @@ def get_osrelease(db, name, version) -> Optional[st.OpSysRelease]:
             .first())
 
 
+def get_osreleases_by_names(db, names) -> Dict[Tuple[str, str], st.OpSysRelease]:
+    """
+    Return a dictionary mapping (operating system name, version) tuples
+    from `names` to pyfaf.storage.OpSysRelease objects.
+    Unknown releases are left out.
+    """
+
+    if not names:
+        return {}
+
+    rows = (db.session.query(st.OpSys.name, st.OpSysRelease)
+            .select_from(st.OpSysRelease)
+            .join(st.OpSys)
+            .filter(tuple_(st.OpSys.name, st.OpSysRelease.version).in_(list(names)))
+            .all())
+
+    return {(opsys_name, db_release.version): db_release
+            for opsys_name, db_release in rows}
+
+
 def get_packages_by_osrelease(db, name, version, arch) -> Optional[st.Package]:
     """
     Return pyfaf.storage.Package objects assigned to specific osrelease
@@ -601,6 +719,54 @@ def get_build_by_nevr(db, name, epoch, version, release) -> Optional[st.Build]:
             .first())
 
 
+def get_build_ids_by_nevrs(db, nevrs, chunk_size=1000) -> Dict[Tuple[str, int, str, str], int]:
+    """
+    Return a dictionary mapping (base package name, epoch, version, release)
+    tuples from `nevrs` (a set) to IDs of pyfaf.storage.Build objects.
+    Unknown builds are left out. If there are several builds with the same
+    NEVR, the oldest one is used.
+
+    Builds are looked up by indexed base package names in chunks of
+    `chunk_size` and matched against `nevrs` afterwards.
+    """
+
+    result = {}
+    names = sorted({nevr[0] for nevr in nevrs})
+    for i in range(0, len(names), chunk_size):
+        rows = (db.session.query(st.Build.base_package_name, st.Build.epoch,
+                                 st.Build.version, st.Build.release, st.Build.id)
+                .filter(st.Build.base_package_name.in_(names[i:i + chunk_size]))
+                .order_by(st.Build.id.desc()))
+
+        for name, epoch, version, release, build_id in rows:
+            nevr = (name, epoch, version, release)
+            if nevr in nevrs:
+                result[nevr] = build_id
+
+    return result
+
+
+def get_packages_by_build_ids(db, build_ids, chunk_size=1000) -> Dict[Tuple[int, int, str, str], st.Package]:
+    """
+    Return a dictionary mapping (build ID, arch ID, name, package type)
+    tuples to pyfaf.storage.Package objects of builds with IDs from
+    `build_ids`. Only the key columns of the packages are loaded.
+    """
+
+    result = {}
+    build_ids = sorted(build_ids)
+    for i in range(0, len(build_ids), chunk_size):
+        packages = (db.session.query(st.Package)
+                    .options(load_only("id", "build_id", "arch_id", "name", "pkgtype"))
+                    .filter(st.Package.build_id.in_(build_ids[i:i + chunk_size]))
+                    .order_by(st.Package.id.desc()))
+
+        for package in packages:
+            result[(package.build_id, package.arch_id, package.name, package.pkgtype)] = package
+
+    return result
+
+
 def get_problems(db) -> List[st.Problem]:
     """
     Return a list of all pyfaf.storage.Problem in the storage.
@@ -609,6 +775,16 @@ def get_problems(db) -> List[st.Problem]:
     return (db.session.query(st.Problem)
             .all())
 
+def get_problem_ids(db) -> List[int]:
+    """
+    Return a sorted list of IDs of all pyfaf.storage.Problem in the storage.
+    """
+
+    return [problem_id for (problem_id,) in
+            (db.session.query(st.Problem.id)
+             .order_by(st.Problem.id)
+             .all())]
+
 def get_problem_by_id(db, looked_id) -> st.Problem:
     """
     Return pyfaf.storage.Problem corresponding to id.
@@ -638,13 +814,13 @@ def get_empty_problems(db, yield_num=0) -> List[st.Problem]:
 def query_problems(db, hist_table, opsysrelease_ids, component_ids,
                    rank_filter_fn=None, post_process_fn=None) -> List[st.Problem]:
     """
-    Return problems ordered by history counts
+    Return problems ordered by history counts from `hist_table`,
+    one of ProblemHistory(Daily|Weekly|Monthly).
     """
 
     rank_query = (db.session.query(st.Problem.id.label("id"),
                                    func.sum(hist_table.count).label("rank"))
-                  .join(st.Report, st.Report.problem_id == st.Problem.id)
-                  .join(hist_table)
+                  .join(hist_table, hist_table.problem_id == st.Problem.id)
                   .filter(hist_table.opsysrelease_id.in_(opsysrelease_ids)))
 
     if rank_filter_fn:
@@ -685,7 +861,7 @@ def query_hot_problems(db, opsysrelease_ids,
     if last_date is None:
         last_date = datetime.date.today() - datetime.timedelta(days=14)
 
-    hist_table, hist_field = get_history_target(history)
+    hist_table, hist_field = get_history_rollup_target("problem", history)
 
     return query_problems(db,
                           hist_table,
@@ -733,7 +909,7 @@ def query_longterm_problems(db, opsysrelease_ids, component_ids=None,
     min_fo = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
     min_fo = min_fo.replace(day=1)
 
-    hist_table, hist_field = get_history_target(history)
+    hist_table, hist_field = get_history_rollup_target("problem", history)
 
     return query_problems(
         db,
@@ -747,12 +923,7 @@ def query_longterm_problems(db, opsysrelease_ids, component_ids=None,
             .filter(st.Problem.first_occurrence <= hist_field)
             # do not take into account problems that don't have any
             # occurrence since last month
-            .filter(st.Problem.id.in_(
-                db.session.query(st.Problem.id)
-                .join(st.Report)
-                .join(hist_table)
-                .filter(st.Problem.last_occurrence >= min_fo)
-                .subquery()))
+            .filter(st.Problem.last_occurrence >= min_fo)
         ),
         functools.partial(prioritize_longterm_problems, min_fo))
 
@@ -833,6 +1004,9 @@ def get_report(db, report_hash, os_name=None, os_version=None, os_arch=None) ->
                 .filter(st.ReportHash.hash == report_hash))
 
     if os_name:
+        # Imported here not to load all operating system plugins
+        # with the queries
+        from pyfaf.opsys import systems
         osplugin = systems[os_name]
 
         db_query = (db_query
@@ -858,23 +1032,42 @@ def get_report(db, report_hash, os_name=None, os_version=None, os_arch=None) ->
     return db_query.first()
 
 
+def get_reports_by_hashes(db, report_hashes) -> Dict[str, st.Report]:
+    """
+    Return a dictionary mapping report hashes from `report_hashes`
+    to pyfaf.storage.Report objects. Unknown hashes are left out.
+    """
+
+    if not report_hashes:
+        return {}
+
+    rows = (db.session.query(st.ReportHash.hash, st.Report)
+            .select_from(st.ReportHash)
+            .join(st.Report, st.ReportHash.report_id == st.Report.id)
+            .filter(st.ReportHash.hash.in_(report_hashes))
+            .all())
+
+    return dict(rows)
+
+
 def get_report_count_by_component(db, opsys_name=None, opsys_version=None,
                                   history="daily") -> Query:
     """
     Return query for `OpSysComponent` and number of reports this
     component received.
 
-    Optionally filtered by `opsys_name` and `opsys_version`.
+    Optionally filtered by `opsys_name` and `opsys_version`. Use the date
+    field returned by get_history_rollup_target("component", history)
+    to filter the query by dates.
     """
 
     opsysrelease_ids = get_release_ids(db, opsys_name, opsys_version)
-    hist_table, _ = get_history_target(history)
+    hist_table, _ = get_history_rollup_target("component", history)
 
     comps = (
         db.session.query(st.OpSysComponent,
                          func.sum(hist_table.count).label("cnt"))
-        .join(st.Report, st.Report.component_id == st.OpSysComponent.id)
-        .join(hist_table)
+        .join(hist_table, hist_table.component_id == st.OpSysComponent.id)
         .group_by(st.OpSysComponent)
         .order_by(desc("cnt")))
 
@@ -1023,6 +1216,82 @@ def get_reports_for_problems(db, report_type) -> List[st.Report]:
                    .filter(query.c.min_id == st.Report.id))
     return final_query.all()
 
+def get_reports_for_clustering(db, report_type, version, min_count=0) -> List[st.Report]:
+    """
+    Return pyfaf.storage.Report objects list of given `report_type` that
+    need to be clustered, i.e. reports whose clustering signature is missing
+    or older than `version` and reports without a problem. Reports whose
+    current signature is empty could not be clustered and are left out
+    until their signature is removed.
+    """
+    query = (db.session.query(st.Report)
+             .outerjoin(st.ReportClusterSignature)
+             .filter(st.Report.type == report_type)
+             .filter(or_(st.ReportClusterSignature.version.is_(None),
+                         st.ReportClusterSignature.version < version,
+                         and_(st.Report.problem_id.is_(None),
+                              st.ReportClusterSignature.functions != []))))
+    if min_count > 0:
+        query = query.filter(st.Report.count >= min_count)
+    return query.all()
+
+def get_cluster_function_counts(db, report_type, function_hashes) -> Dict[str, int]:
+    """
+    Return a dictionary mapping function hashes from `function_hashes`
+    to the number of reports of given `report_type` whose clustering
+    signature contains the function.
+    """
+    if not function_hashes:
+        return {}
+
+    return dict(db.session.query(st.ReportClusterFunction.function_hash,
+                                 func.count(st.ReportClusterFunction.report_id))
+                .join(st.Report,
+                      st.Report.id == st.ReportClusterFunction.report_id)
+                .filter(st.Report.type == report_type)
+                .filter(st.ReportClusterFunction.function_hash.in_(list(function_hashes)))
+                .group_by(st.ReportClusterFunction.function_hash)
+                .all())
+
+def get_problem_ids_by_cluster_functions(db, report_type, function_hashes) -> Set[int]:
+    """
+    Return IDs of problems with a report of given `report_type` whose
+    clustering signature contains any of `function_hashes`.
+    """
+    if not function_hashes:
+        return set()
+
+    return {problem_id for (problem_id,) in
+            (db.session.query(st.Report.problem_id)
+             .join(st.ReportClusterFunction,
+                   st.Report.id == st.ReportClusterFunction.report_id)
+             .filter(st.Report.type == report_type)
+             .filter(st.Report.problem_id.isnot(None))
+             .filter(st.ReportClusterFunction.function_hash.in_(list(function_hashes)))
+             .distinct()
+             .all())}
+
+def get_reports_by_problem_ids(db, problem_ids) -> List[st.Report]:
+    """
+    Return pyfaf.storage.Report objects list of all reports
+    assigned to problems from `problem_ids`.
+    """
+    if not problem_ids:
+        return []
+
+    return (db.session.query(st.Report)
+            .filter(st.Report.problem_id.in_(list(problem_ids)))
+            .all())
+
+def delete_cluster_signatures(db, report_ids) -> int:
+    """
+    Remove clustering signatures of reports matched by `report_ids`
+    and return the number of signatures removed.
+    """
+    return (db.session.query(st.ReportClusterSignature)
+            .filter(st.ReportClusterSignature.report_id.in_(report_ids))
+            .delete(synchronize_session=False))
+
 def get_unassigned_reports(db, report_type, min_count=0) -> List[st.Report]:
     """
     Return pyfaf.storage.Report objects list of reports without problems.
@@ -1057,6 +1326,19 @@ def remove_problem_from_low_count_reports_by_type(db, report_type, min_count) ->
                     synchronize_session=False))
 
 
+def get_low_count_report_problem_ids(db, report_type, min_count) -> Dict[int, int]:
+    """
+    Return a dictionary mapping IDs of reports of given `report_type`
+    with count less than `min_count` assigned to a problem to IDs
+    of their problems.
+    """
+
+    return dict(db.session.query(st.Report.id, st.Report.problem_id)
+                .filter(st.Report.type == report_type)
+                .filter(st.Report.count < min_count)
+                .filter(st.Report.problem_id.isnot(None)))
+
+
 def get_reportbz(db, report_id, opsysrelease_id=None) -> Query:
     """
     Return pyfaf.storage.ReportBz objects of given `report_id`.
@@ -1208,6 +1490,78 @@ def get_symbol_by_name_path(db, name, path) -> Optional[st.Symbol]:
             .first())
 
 
+def get_symbols_by_name_path(db, keys) -> Dict[Tuple[str, str], st.Symbol]:
+    """
+    Return a dictionary mapping (symbol name, normalized path) tuples
+    from `keys` to pyfaf.storage.Symbol objects. Unknown symbols are left out.
+    """
+
+    if not keys:
+        return {}
+
+    return {(db_symbol.name, db_symbol.normalized_path): db_symbol
+            for db_symbol in
+            (db.session.query(st.Symbol)
+             .filter(tuple_(st.Symbol.name,
+                            st.Symbol.normalized_path).in_(list(keys)))
+             .all())}
+
+
+def get_ssources_by_bpo(db, keys) -> Dict[Tuple[Optional[str], str, int],
+                                          st.SymbolSource]:
+    """
+    Return a dictionary mapping (build id, path, offset) tuples from `keys`
+    to pyfaf.storage.SymbolSource objects. Build id may be None.
+    Unknown symbol sources are left out.
+    """
+
+    with_build_id = [key for key in keys if key[0] is not None]
+    without_build_id = [key[1:] for key in keys if key[0] is None]
+
+    result = {}
+    if with_build_id:
+        result.update(((db_ssource.build_id, db_ssource.path, db_ssource.offset),
+                       db_ssource) for db_ssource in
+                      (db.session.query(st.SymbolSource)
+                       .filter(tuple_(st.SymbolSource.build_id,
+                                      st.SymbolSource.path,
+                                      st.SymbolSource.offset)
+                               .in_(with_build_id))
+                       .all()))
+
+    if without_build_id:
+        result.update(((None, db_ssource.path, db_ssource.offset), db_ssource)
+                      for db_ssource in
+                      (db.session.query(st.SymbolSource)
+                       .filter(st.SymbolSource.build_id.is_(None))
+                       .filter(tuple_(st.SymbolSource.path,
+                                      st.SymbolSource.offset)
+                               .in_(without_build_id))
+                       .all()))
+
+    return result
+
+
+def get_ssources_by_symbol_path_offset(db, keys) -> Dict[Tuple[int, str, int],
+                                                         st.SymbolSource]:
+    """
+    Return a dictionary mapping (symbol id, path, offset) tuples from `keys`
+    to pyfaf.storage.SymbolSource objects. Unknown symbol sources
+    are left out.
+    """
+
+    if not keys:
+        return {}
+
+    return {(db_ssource.symbol_id, db_ssource.path, db_ssource.offset): db_ssource
+            for db_ssource in
+            (db.session.query(st.SymbolSource)
+             .filter(tuple_(st.SymbolSource.symbol_id,
+                            st.SymbolSource.path,
+                            st.SymbolSource.offset).in_(list(keys)))
+             .all())}
+
+
 def get_symbolsource(db, symbol, filename, offset) -> Optional[st.SymbolSource]:
     """
     Return pyfaf.storage.SymbolSource object from pyfaf.storage.Symbol,
@@ -1223,6 +1577,7 @@ def get_symbolsource(db, symbol, filename, offset) -> Optional[st.SymbolSource]:
             .first())
 
 
+@cached_lookup("taintflag", st.KernelTaintFlag)
 def get_taint_flag_by_ureport_name(db, ureport_name) -> Optional[st.KernelTaintFlag]:
     """
     Return pyfaf.storage.KernelTaintFlag from flag name or None if not found.
@@ -1297,6 +1652,277 @@ def update_frame_ssource(db, db_ssrc_from, db_ssrc_to) -> None:
     db.session.flush()
 
 
+def upsert_counts(db, table, rows, index_elements, update=None) -> None:
+    """
+    Insert `rows` (a list of dictionaries) into `table` with a single
+    multi-row statement. Rows conflicting on `index_elements` add their
+    `count` to the stored one instead. `update` is an optional callable
+    taking the table and the `excluded` pseudo-table and returning
+    additional column values to set on conflict.
+
+    Every key must be present at most once in `rows`.
+    """
+
+    if not rows:
+        return
+
+    stmt = insert(table.__table__).values(rows)
+    columns = table.__table__.c
+    set_ = {"count": columns["count"] + stmt.excluded["count"]}
+    if update is not None:
+        set_.update(update(columns, stmt.excluded))
+
+    db.session.execute(stmt.on_conflict_do_update(index_elements=index_elements,
+                                                  set_=set_))
+
+
+def upsert_rows(db, table, rows, index_elements) -> None:
+    """
+    Insert `rows` (a list of dictionaries) into `table` with a single
+    multi-row statement. Rows conflicting on `index_elements` overwrite
+    the remaining columns of the stored row.
+
+    Every key must be present at most once in `rows`.
+    """
+
+    if not rows:
+        return
+
+    stmt = insert(table.__table__).values(rows)
+    set_ = {name: stmt.excluded[name] for name in rows[0]
+            if name not in index_elements}
+
+    db.session.execute(stmt.on_conflict_do_update(index_elements=index_elements,
+                                                  set_=set_))
+
+
+def update_history_rollups(db, period, deltas) -> None:
+    """
+    Add report history counts to the history rollups of `period`
+    (one of day|week|month). `deltas` is an iterable of
+    (problem_id, component_id, opsysrelease_id, date, count) tuples,
+    problem_id is None for reports not assigned to any problem yet.
+    """
+
+    sums = {level: defaultdict(int) for level in HISTORY_ROLLUP_LEVELS}
+    for problem_id, component_id, opsysrelease_id, date, count in deltas:
+        if problem_id is not None:
+            sums["problem"][(problem_id, opsysrelease_id, date)] += count
+        sums["component"][(component_id, opsysrelease_id, date)] += count
+        sums["release"][(opsysrelease_id, date)] += count
+
+    for level, (column, _) in HISTORY_ROLLUP_LEVELS.items():
+        hist_table, _ = get_history_rollup_target(level, period[0])
+        index_elements = [column] if column else []
+        index_elements += ["opsysrelease_id", period]
+        # Sorted to lock the rows in the same order as concurrent writers
+        upsert_counts(db, hist_table,
+                      [dict(zip(index_elements, key), count=count)
+                       for key, count in sorted(sums[level].items())],
+                      index_elements)
+
+
+def rebuild_history_rollups(db, level, history="daily", since=None) -> None:
+    """
+    Recompute history rollups of `level` and `history` (see
+    get_history_rollup_target) from the report history, optionally only
+    for dates since `since`. Rows are updated in place and the stale ones
+    deleted afterwards, so readers never see the rollups empty.
+    """
+
+    column, _ = HISTORY_ROLLUP_LEVELS[level]
+    report_table, report_field = get_history_target(history)
+    hist_table, hist_field = get_history_rollup_target(level, history)
+
+    key_columns = [getattr(st.Report, column)] if column else []
+    source = (db.session.query(*(key_columns +
+                                 [report_table.opsysrelease_id,
+                                  report_field,
+                                  func.sum(report_table.count)]))
+              .select_from(report_table))
+    if column:
+        source = (source.join(st.Report, st.Report.id == report_table.report_id)
+                  .filter(getattr(st.Report, column).isnot(None)))
+    if since is not None:
+        source = source.filter(report_field >= since)
+    source = source.group_by(*(key_columns + [report_table.opsysrelease_id, report_field]))
+
+    index_elements = [column] if column else []
+    index_elements += ["opsysrelease_id", hist_field.key]
+    stmt = insert(hist_table.__table__).from_select(index_elements + ["count"], source.statement)
+    db.session.execute(stmt.on_conflict_do_update(index_elements=index_elements,
+                                                  set_={"count": stmt.excluded["count"]}))
+
+    keys = source.with_entities(*(key_columns + [report_table.opsysrelease_id, report_field]))
+    stale = db.session.query(hist_table).filter(
+        ~tuple_(*[getattr(hist_table, name) for name in index_elements]).in_(keys.statement))
+    if since is not None:
+        stale = stale.filter(hist_field >= since)
+    stale.delete(synchronize_session=False)
+
+
+def move_history_rollups(db, moves) -> None:
+    """
+    Move the report history of reports assigned to other problems between
+    the problem history rollups. `moves` maps report IDs to
+    (old problem_id, new problem_id) tuples, either of them may be None.
+    Counts are added and subtracted, so concurrent increments are kept.
+    """
+
+    if not moves:
+        return
+
+    for history in ["daily", "weekly", "monthly"]:
+        report_table, report_field = get_history_target(history)
+        hist_table, hist_field = get_history_rollup_target("problem", history)
+
+        sums = defaultdict(int)
+        for report_id, opsysrelease_id, date, count in (
+                db.session.query(report_table.report_id,
+                                 report_table.opsysrelease_id,
+                                 report_field,
+                                 report_table.count)
+                .filter(report_table.report_id.in_(list(moves)))):
+            old_problem_id, new_problem_id = moves[report_id]
+            if old_problem_id is not None:
+                sums[(old_problem_id, opsysrelease_id, date)] -= count
+            if new_problem_id is not None:
+                sums[(new_problem_id, opsysrelease_id, date)] += count
+
+        index_elements = ["problem_id", "opsysrelease_id", hist_field.key]
+        # Sorted to lock the rows in the same order as concurrent writers
+        upsert_counts(db, hist_table,
+                      [dict(zip(index_elements, key), count=count)
+                       for key, count in sorted(sums.items()) if count],
+                      index_elements)
+
+        old_problem_ids = {old for old, _ in moves.values() if old is not None}
+        if old_problem_ids:
+            (db.session.query(hist_table)
+             .filter(hist_table.problem_id.in_(list(old_problem_ids)))
+             .filter(hist_table.count <= 0)
+             .delete(synchronize_session=False))
+
+
+def get_cache_generations(db) -> Dict[str, int]:
+    """
+    Return a dictionary mapping names of datasets cached by webfaf
+    to their current generation.
+    """
+
+    return dict(db.session.query(st.CacheGeneration.dataset,
+                                 st.CacheGeneration.generation))
+
+
+def get_cache_generation(db, dataset) -> Optional[st.CacheGeneration]:
+    """
+    Return pyfaf.storage.CacheGeneration of `dataset` or None if the dataset
+    has never changed.
+    """
+
+    return (db.session.query(st.CacheGeneration)
+            .filter(st.CacheGeneration.dataset == dataset)
+            .first())
+
+
+def bump_cache_generations(db, datasets) -> None:
+    """
+    Increase generations of `datasets`, invalidating webfaf responses
+    computed from them.
+    """
+
+    if not datasets:
+        return
+
+    db.session.execute(st.CacheGeneration.bump_statement(datasets))
+
+
+def mark_problem_snapshots_stale(db, problem_ids=None) -> None:
+    """
+    Mark snapshots of problems from `problem_ids` or of all problems
+    if not given as outdated, so that they are built again.
+    """
+
+    query = db.session.query(st.ProblemSnapshot)
+    if problem_ids is not None:
+        problem_ids = [problem_id for problem_id in set(problem_ids)
+                       if problem_id is not None]
+        if not problem_ids:
+            return
+
+        query = query.filter(st.ProblemSnapshot.problem_id.in_(problem_ids))
+
+    # Always moved forward, a snapshot being built meanwhile must not
+    # clear a mark it has not seen, see ProblemSnapshot.save_statement
+    query.update({st.ProblemSnapshot.changed: func.greatest(st.ProblemSnapshot.changed, db_utcnow())},
+                 synchronize_session=False)
+
+
+def get_stale_problem_snapshot_ids(db) -> List[int]:
+    """
+    Return IDs of problems whose snapshots were marked as outdated.
+    """
+
+    return [problem_id for (problem_id,) in
+            (db.session.query(st.ProblemSnapshot.problem_id)
+             .filter(st.ProblemSnapshot.changed.isnot(None))
+             .order_by(st.ProblemSnapshot.problem_id)
+             .all())]
+
+
+def get_problem_snapshot_changes(db, problem_ids) -> Dict[int, datetime.datetime]:
+    """
+    Return a dictionary mapping IDs of problems from `problem_ids` whose
+    snapshots were marked as outdated to the time of the last mark.
+    """
+
+    if not problem_ids:
+        return {}
+
+    return dict(db.session.query(st.ProblemSnapshot.problem_id, st.ProblemSnapshot.changed)
+                .filter(st.ProblemSnapshot.problem_id.in_(list(problem_ids)))
+                .filter(st.ProblemSnapshot.changed.isnot(None)))
+
+
+def db_utcnow():
+    """
+    Return an SQL expression of the current UTC time on the database
+    clock, which unlike now() advances within a transaction.
+    """
+
+    return func.timezone("UTC", func.clock_timestamp())
+
+
+def insert_ignore_conflicts(db, table, rows) -> None:
+    """
+    Insert `rows` (a list of dictionaries) into `table` with a single
+    multi-row statement, silently skipping rows that violate a unique
+    constraint, e.g. because another process has just inserted them.
+    """
+
+    if not rows:
+        return
+
+    db.session.execute(insert(table.__table__).values(rows)
+                       .on_conflict_do_nothing())
+
+
+def insert_returning(db, table, rows, returning) -> List[Tuple]:
+    """
+    Insert `rows` (a list of dictionaries) into `table` with a single
+    multi-row statement and return the values of `returning` columns
+    of the inserted rows.
+    """
+
+    if not rows:
+        return []
+
+    columns = table.__table__.c
+    return (db.session.execute(insert(table.__table__).values(rows)
+                               .returning(*[columns[name] for name in returning]))
+            .fetchall())
+
+
 def get_bugtracker_by_name(db, name) -> st.Bugtracker:
     return (db.session.query(st.Bugtracker)
             .filter(st.Bugtracker.name == name)
@@ -1336,6 +1962,64 @@ def get_bz_user(db, user_email) -> st.BzUser:
             .first())
 
 
+def get_bz_users_by_emails(db, user_emails) -> Dict[str, st.BzUser]:
+    """
+    Return a dictionary mapping e-mail addresses from `user_emails`
+    to BzUser instances. Unknown addresses are left out.
+    """
+
+    if not user_emails:
+        return {}
+
+    return {user.email: user for user in
+            db.session.query(st.BzUser)
+            .filter(st.BzUser.email.in_(list(user_emails)))}
+
+
+def get_bz_bug_change_times(db, bug_ids) -> Dict[int, datetime.datetime]:
+    """
+    Return a dictionary mapping IDs of stored bugs from `bug_ids`
+    to their last_change_time.
+    """
+
+    if not bug_ids:
+        return {}
+
+    return dict(db.session.query(st.BzBug.id, st.BzBug.last_change_time)
+                .filter(st.BzBug.id.in_(list(bug_ids))))
+
+
+def get_bz_bug_cc_pairs(db, bug_ids) -> Set[Tuple[int, int]]:
+    """
+    Return a set of (bug_id, user_id) pairs of CC'ed users
+    for bugs with IDs from `bug_ids`.
+    """
+
+    if not bug_ids:
+        return set()
+
+    return set(db.session.query(st.BzBugCc.bug_id, st.BzBugCc.user_id)
+               .filter(st.BzBugCc.bug_id.in_(list(bug_ids))))
+
+
+def get_bz_bug_history_keys(db, bug_ids) -> Set[Tuple]:
+    """
+    Return a set of (bug_id, user_id, time, field, added, removed) tuples
+    identifying stored history events of bugs with IDs from `bug_ids`.
+    """
+
+    if not bug_ids:
+        return set()
+
+    return set(db.session.query(st.BzBugHistory.bug_id,
+                                st.BzBugHistory.user_id,
+                                st.BzBugHistory.time,
+                                st.BzBugHistory.field,
+                                st.BzBugHistory.added,
+                                st.BzBugHistory.removed)
+               .filter(st.BzBugHistory.bug_id.in_(list(bug_ids))))
+
+
 def get_bz_attachment(db, attachment_id) -> st.BzAttachment:
     """
     Return BzAttachment instance if there is an attachment in
@@ -1416,20 +2100,31 @@ def get_report_opsysrelease(db, report_id) -> st.OpSysRelease:
             .first())
 
 
-def get_all_report_hashes(db, date_from=None,
-                          date_to=None,
-                          opsys=None,
-                          opsys_releases=None,
-                          limit_from=None,
-                          limit_to=None
-                         ) -> List[st.ReportHash]:
+def get_reports_opsysreleases(db, report_ids) -> Dict[int, st.OpSysRelease]:
     """
-    Return ReportHash instance if there is at least one bug in database for selected date range
+    Return a dictionary mapping IDs from `report_ids` to the
+    pyfaf.storage.OpSysRelease of each report, loaded with one query.
+    Reports without any release are left out.
+    """
+
+    if not report_ids:
+        return {}
+
+    rows = (db.session.query(st.ReportOpSysRelease.report_id, st.OpSysRelease)
+            .join(st.OpSysRelease)
+            .filter(st.ReportOpSysRelease.report_id.in_(report_ids))
+            .distinct(st.ReportOpSysRelease.report_id)
+            .order_by(st.ReportOpSysRelease.report_id, st.OpSysRelease.id)
+            .all())
+
+    return dict(rows)
+
+
+def _report_hashes_filter(query, date_from=None, date_to=None, opsys=None, opsys_releases=None) -> Query:
+    """
+    Filter a query joining ReportHash and Report by operating system,
+    release and last occurrence.
     """
-    query = (db.session.query(st.ReportHash)
-             .join(st.Report)
-             .options(load_only("hash"))
-            )
 
     if opsys and opsys != "*":
         if opsys == "rhel":
@@ -1449,11 +2144,63 @@ def get_all_report_hashes(db, date_from=None,
     if date_to and date_to != "*":
         query = (query.filter(st.Report.last_occurrence <= date_to))
 
+    return query
+
+
+def get_all_report_hashes(db, date_from=None,
+                          date_to=None,
+                          opsys=None,
+                          opsys_releases=None,
+                          limit_from=None,
+                          limit_to=None
+                         ) -> List[st.ReportHash]:
+    """
+    Return ReportHash instance if there is at least one bug in database for selected date range
+    """
+    query = (db.session.query(st.ReportHash)
+             .join(st.Report)
+             .options(load_only("hash"))
+            )
+
+    query = _report_hashes_filter(query, date_from=date_from, date_to=date_to,
+                                  opsys=opsys, opsys_releases=opsys_releases)
+
     if limit_from is not None and limit_to is not None:
         query = (query.slice(limit_from, limit_to))
 
     return query.all()
 
+
+def get_report_hashes(db, date_from=None,
+                      date_to=None,
+                      opsys=None,
+                      opsys_releases=None,
+                      after=None,
+                      limit=None,
+                      yield_per=1000
+                     ) -> Iterator[str]:
+    """
+    Yield distinct report hashes in ascending order, optionally only those
+    following the hash `after`. Rows are fetched `yield_per` at a time
+    through a server-side cursor.
+    """
+    query = (db.session.query(st.ReportHash.hash)
+             .join(st.Report))
+
+    query = _report_hashes_filter(query, date_from=date_from, date_to=date_to,
+                                  opsys=opsys, opsys_releases=opsys_releases)
+
+    if after:
+        query = query.filter(st.ReportHash.hash > after)
+
+    query = query.distinct().order_by(st.ReportHash.hash)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    for (report_hash,) in query.yield_per(yield_per):
+        yield report_hash
+
 def get_user_by_mail(db, mail) -> Query:
     """
     Return query for User objects for given mail.
@@ -18,7 +18,7 @@
 
 import os
 
-from typing import Any, Dict
+from typing import Any, Dict, Iterable
 
 from pyfaf.common import FafError, Plugin, import_dir, load_plugin_types
 
@@ -49,13 +49,29 @@ class Repo(Plugin):
 
         super().__init__()
 
-    def list_packages(self, architectures) -> None:
+    def list_packages(self, architectures) -> Iterable[Dict[str, Any]]:
         """
-        Return list of packages available in this repository.
+        Yield packages available in this repository.
         """
 
         raise NotImplementedError
 
+    def list_changed_packages(self, architectures) -> Iterable[Dict[str, Any]]:
+        """
+        Yield packages added to or removed from this repository since
+        the last `mark_synced` call. Removed packages have a true `removed`
+        item. Plugins that do not track the repository state yield all
+        available packages.
+        """
+
+        return self.list_packages(architectures)
+
+    def mark_synced(self) -> None:
+        """
+        Make the repository state seen by the last `list_changed_packages`
+        the base of the next one.
+        """
+
     @property
     def cache_lifetime(self):
         """
@@ -21,9 +21,10 @@ from __future__ import absolute_import
 import os
 from urllib import request
 
-from typing import Dict, List, Union
+from typing import Dict, Generator, Union
 
 import dnf
+import hawkey
 
 from pyfaf.common import get_temp_dir
 from pyfaf.repos import Repo
@@ -85,12 +86,13 @@ class Dnf(Repo):
                     self.log_error("No mirrors available")
                     raise NameError("NoMirrorsAvailable")
 
-    def list_packages(self, architectures) -> List[Dict[str, Union[str, int]]]:
+    def list_packages(self, architectures) -> Generator[Dict[str, Union[str, int]], None, None]:
         """
-        Return list of packages present in this repository.
+        Yield packages present in this repository.
 
-        Returns dictionaries containing name, epoch, version,
-        release, arch, srpm_name, type, filename, url items.
+        Yields dictionaries containing name, epoch, version,
+        release, arch, srpm_name, type, filename, url and checksum
+        (a tuple of checksum type and hex digest, if known) items.
         """
 
         try:
@@ -98,12 +100,11 @@ class Dnf(Repo):
         except dnf.exceptions.RepoError as ex:
             self.log_error("Repo error: {}".format(ex))
 
-        result = []
         try:
             packagelist = self.dnf_base.sack.query().filterm(arch=architectures)
         except dnf.exceptions.RepoError as err:
             self.log_error("Repository listing failed: '{0}'".format(err))
-            return result
+            return
 
         pkgs = packagelist.available()
 
@@ -122,14 +123,16 @@ class Dnf(Repo):
                        filename=os.path.basename(package.location))
             pkg["url"] = os.path.join(package.repo.baseurl[0], package.location)
 
+            if package.chksum:
+                checksum_type, checksum = package.chksum
+                pkg["checksum"] = (hawkey.chksum_name(checksum_type), checksum.hex())
+
             pkg["type"] = "rpm"
 
-            result.append(pkg)
+            yield pkg
 
         self.dnf_base.close()
 
-        return result
-
     @property
     def cache_lifetime(self):
         return self.dnf_base.conf.metadata_expire
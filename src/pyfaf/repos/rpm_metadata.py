@@ -20,17 +20,19 @@
 
 import errno
 import gzip
+import json
 import os
 import time
 import xml.sax
 import zlib
-from typing import Dict, List, Optional, Union
+from typing import Dict, Generator, List, Optional, Tuple, Union
 from urllib.error import HTTPError
 from urllib.request import urlopen
 from xml.sax import SAXException
 
 from pyfaf.common import FafError
 from pyfaf.utils import parse
+from pyfaf.utils.hash import hash_file, hash_list
 from pyfaf.repos import Repo
 
 
@@ -38,17 +40,32 @@ class RepomdPrimaryLocationHandler(xml.sax.ContentHandler):
     def __init__(self) -> None:
         super().__init__()
         self._location = None
-        self._searching = "data"
+        self._checksum_type = None
+        self._checksum = ""
+        self._in_primary = False
+        self._current = None
 
     def startElement(self, name, attrs) -> None:
-        if self._searching is None or self._searching != name:
-            return
+        self._current = name
 
-        if name == "data" and attrs.get("type", "") == "primary":
-            self._searching = "location"
+        if name == "data":
+            self._in_primary = attrs.get("type", "") == "primary" and self._location is None
+        elif not self._in_primary:
+            return
         elif name == "location":
             self._location = attrs["href"]
-            self._searching = None
+        elif name == "checksum":
+            self._checksum_type = attrs.get("type", None)
+
+    def endElement(self, name) -> None:
+        self._current = None
+
+        if name == "data":
+            self._in_primary = False
+
+    def characters(self, content) -> None:
+        if self._in_primary and self._current == "checksum":
+            self._checksum += content
 
     @property
     def primary_location(self) -> str:
@@ -57,6 +74,16 @@ class RepomdPrimaryLocationHandler(xml.sax.ContentHandler):
                 "repomd.xml is missing data[@type='primary']/location@href")
         return self._location
 
+    @property
+    def primary_checksum(self) -> Optional[Tuple[str, str]]:
+        """
+        Checksum type and hex digest of the primary file, if known.
+        """
+
+        if self._checksum_type is None:
+            return None
+        return (self._checksum_type, self._checksum.strip())
+
 
 class PrimaryHandler(xml.sax.ContentHandler):
 
@@ -78,6 +105,8 @@ class PrimaryHandler(xml.sax.ContentHandler):
             self._package["epoch"] = attrs["epoch"]
             self._package["version"] = attrs["ver"]
             self._package["release"] = attrs["rel"]
+        elif name == "checksum":
+            self._package["checksum_type"] = attrs["type"]
         elif name == "location":
             relativepath = attrs["href"]
             self._package["filename"] = os.path.basename(relativepath)
@@ -96,6 +125,10 @@ class PrimaryHandler(xml.sax.ContentHandler):
             nvra = parse.parse_nvra(self._package["srpm"])
             self._package["base_package_name"] = nvra["name"]
 
+        if name == "checksum":
+            self._package["checksum"] = (self._package.pop("checksum_type"),
+                                         self._package.pop("checksum_value", "").strip())
+
         if name == "package":
             pkg = self._package
             self._package = None
@@ -107,9 +140,17 @@ class PrimaryHandler(xml.sax.ContentHandler):
                     self._package.get(self._current, "") + content
         elif self._current == "rpm:sourcerpm":
             self._package["srpm"] = self._package.get("srpm", "") + content
+        elif self._current == "checksum":
+            self._package["checksum_value"] = self._package.get("checksum_value", "") + content
 
-    def packages(self) -> List[Dict[str, Union[str, int]]]:
-        return self._result
+    def pop_packages(self) -> List[Dict[str, Union[str, int]]]:
+        """
+        Return the packages parsed since the last call.
+        """
+
+        result = self._result
+        self._result = []
+        return result
 
 
 class RpmMetadata(Repo):
@@ -123,6 +164,12 @@ class RpmMetadata(Repo):
 
     name = "rpmmetadata"
 
+    # Files kept in the cache directory of every repository URL
+    SNAPSHOT_FILE = "packages.jsonl"
+    SYNCED_REPOMD_FILE = "repomd.synced"
+
+    CHUNK_SIZE = 1 << 16
+
     cachedir: str
     cacheperiod: int
 
@@ -146,6 +193,13 @@ class RpmMetadata(Repo):
 
         self.name = name
         self.urls = urls
+        # (cache directory, repomd.xml checksum) of listings waiting for mark_synced
+        self._pending: List[Tuple[str, str]] = []
+
+    @staticmethod
+    def _get_cache_name(repourl) -> str:
+        # Variants of parametrized repositories share the name, not the URL
+        return hash_list([repourl])
 
     def _setup_dirs(self, reponame) -> str:
         dirname = os.path.join(self.cachedir, self.name, reponame)
@@ -158,7 +212,16 @@ class RpmMetadata(Repo):
         return dirname
 
     def _get_repo_file_path(self, reponame: str, repourl: str, remote: str,
-                            local: Optional[str] = None) -> str:
+                            local: Optional[str] = None,
+                            checksum: Optional[Tuple[str, str]] = None) -> str:
+        """
+        Return path of the local copy of the repository file `remote`.
+
+        Remote files are cached for `cacheperiod` seconds. If `checksum`
+        of the file is known, the cached copy is used for as long as
+        it matches instead.
+        """
+
         url = os.path.join(repourl, remote)
         if url.startswith("file://"):
             return url[len("file://"):]
@@ -173,15 +236,20 @@ class RpmMetadata(Repo):
                                  reponame,
                                  local)
 
-        last_modified: float = 0
-        try:
-            last_modified = os.path.getmtime(cachename)
-        except OSError as ex:
-            if errno.ENOENT != ex.errno:
-                raise FafError("Cannot access cache: {0}".format(str(ex))) from ex
+        if checksum is not None:
+            expired = not self._has_checksum(cachename, checksum)
+        else:
+            last_modified: float = 0
+            try:
+                last_modified = os.path.getmtime(cachename)
+            except OSError as ex:
+                if errno.ENOENT != ex.errno:
+                    raise FafError("Cannot access cache: {0}".format(str(ex))) from ex
+
+            # Check for cache expiration.
+            expired = (last_modified + self.cacheperiod) <= time.time()
 
-        # Check for cache expiration.
-        if (last_modified + self.cacheperiod) <= time.time():
+        if expired:
             try:
                 cache_file = open(cachename, "wb")
             except Exception as ex:
@@ -191,19 +259,36 @@ class RpmMetadata(Repo):
             with cache_file:
                 try:
                     with urlopen(url) as response:
-                        cache_file.write(response.read())
+                        while True:
+                            chunk = response.read(self.CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            cache_file.write(chunk)
                 except HTTPError as ex:
                     raise FafError("Downloading failed: {0}"
                                     .format(str(ex))) from ex
 
         return cachename
 
-    def _get_primary_file_path(self, reponame, repourl) -> str:
+    @staticmethod
+    def _has_checksum(filename: str, checksum: Tuple[str, str]) -> bool:
+        checksum_type, expected = checksum
+        try:
+            return hash_file(filename, checksum_type) == expected.lower()
+        except (OSError, ValueError):
+            return False
+
+    def _get_repomd_file_path(self, reponame, repourl) -> str:
         self._setup_dirs(reponame)
 
-        repomdfilename = self._get_repo_file_path(reponame,
-                                                  repourl,
-                                                  "repodata/repomd.xml")
+        return self._get_repo_file_path(reponame,
+                                        repourl,
+                                        "repodata/repomd.xml")
+
+    def _get_primary_file_path(self, reponame, repourl, repomdfilename=None) -> str:
+        if repomdfilename is None:
+            repomdfilename = self._get_repomd_file_path(reponame, repourl)
+
         rplh = RepomdPrimaryLocationHandler()
         repomdparser = xml.sax.make_parser()
         repomdparser.setContentHandler(rplh)
@@ -223,51 +308,136 @@ class RpmMetadata(Repo):
 
         return self._get_repo_file_path(reponame,
                                         repourl,
-                                        rplh.primary_location)
+                                        rplh.primary_location,
+                                        checksum=rplh.primary_checksum)
+
+    def _iter_primary_file(self, filename, repourl) -> Generator[Dict[str, Union[str, int]], None, None]:
+        """
+        Yield packages from the primary file as it is being parsed,
+        so that only a chunk of the file is held in memory at a time.
+        """
 
-    def _parse_primary_file(self, filename, repourl) -> List[Dict[str, Union[str, int]]]:
         primaryhandler = PrimaryHandler(repourl)
         primaryparser = xml.sax.make_parser()
         primaryparser.setContentHandler(primaryhandler)
 
-        pfp = None
         try:
-            # Cannot use 'with' statement because GzipFile does not support the
-            # context manager protocol in some version of Python.
             if filename.endswith(".gz"):
                 pfp = gzip.open(filename, "rb")
             else:
-                # The handle is closed below in the 'finally' clause.
-                pfp = open(filename, "r") # pylint: disable=consider-using-with
-            primaryparser.parse(pfp)
+                pfp = open(filename, "rb") # pylint: disable=consider-using-with
+
+            with pfp:
+                for chunk in iter(lambda: pfp.read(self.CHUNK_SIZE), b""):
+                    primaryparser.feed(chunk)
+                    yield from primaryhandler.pop_packages()
+
+                primaryparser.close()
         except (Exception, SAXException, zlib.error) as ex:
             raise FafError("Failed to parse primary.xml[.gz]: {0}"
                            .format(str(ex))) from ex
-        finally:
-            if pfp is not None:
-                pfp.close()
 
-        return primaryhandler.packages()
-
-    def list_packages(self, architectures) -> List[Dict[str, Union[str, int]]]:
+        yield from primaryhandler.pop_packages()
+
+    @staticmethod
+    def _package_key(pkg) -> str:
+        if "checksum" in pkg:
+            return "{0}:{1}".format(*pkg["checksum"])
+        return pkg["url"]
+
+    def _iter_snapshot(self, filename) -> Generator[Dict[str, Union[str, int]], None, None]:
+        with open(filename, "r", encoding="utf-8") as f:
+            for line in f:
+                pkg = json.loads(line)
+                if "checksum" in pkg:
+                    pkg["checksum"] = tuple(pkg["checksum"])
+                yield pkg
+
+    def _list_changed_packages(self, reponame, repourl) -> Generator[Dict[str, Union[str, int]], None, None]:
+        dirname = self._setup_dirs(reponame)
+        snapshot = os.path.join(dirname, self.SNAPSHOT_FILE)
+        synced_repomd = os.path.join(dirname, self.SYNCED_REPOMD_FILE)
+
+        repomdfilename = self._get_repomd_file_path(reponame, repourl)
+        repomd_checksum = hash_file(repomdfilename)
+
+        known = set()
+        if os.path.isfile(snapshot) and os.path.isfile(synced_repomd):
+            with open(synced_repomd, "r", encoding="utf-8") as f:
+                if f.read().strip() == repomd_checksum:
+                    self.log_info("Metadata of '{0}' have not changed since the last sync, skipping"
+                                  .format(repourl))
+                    return
+
+            known = set(self._package_key(pkg) for pkg in self._iter_snapshot(snapshot))
+
+        primaryfilename = self._get_primary_file_path(reponame, repourl, repomdfilename)
+        with open(snapshot + ".new", "w", encoding="utf-8") as new_snapshot:
+            for pkg in self._iter_primary_file(primaryfilename, repourl):
+                new_snapshot.write(json.dumps(pkg) + "\n")
+
+                key = self._package_key(pkg)
+                if key in known:
+                    # What remains in the set has been removed
+                    known.discard(key)
+                else:
+                    yield pkg
+
+        if known:
+            for pkg in self._iter_snapshot(snapshot):
+                if self._package_key(pkg) in known:
+                    pkg["removed"] = True
+                    yield pkg
+
+        self._pending.append((dirname, repomd_checksum))
+
+    def list_packages(self, architectures) -> Generator[Dict[str, Union[str, int]], None, None]:
         """
-        Return list of packages present in this repository.
+        Yield packages present in this repository.
 
-        Returns dictionaries containing name, epoch, version,
-        release, arch, srpm_name, type, filename, url items.
+        Yields dictionaries containing name, epoch, version,
+        release, arch, srpm_name, type, filename, url and checksum
+        (a tuple of checksum type and hex digest) items.
         """
 
-        result = []
-        for c, u in enumerate(self.urls):
+        for u in self.urls:
             try:
-                primaryfilename = self._get_primary_file_path(str(c), u)
-                result += self._parse_primary_file(primaryfilename, u)
+                primaryfilename = self._get_primary_file_path(self._get_cache_name(u), u)
+                yield from self._iter_primary_file(primaryfilename, u)
             except FafError as ex:
                 self.log_error(
                     "Repository listing failed for '{0}'['{1}']: {2}"
                     .format(self.name, u, str(ex)))
 
-        return result
+    def list_changed_packages(self, architectures) -> Generator[Dict[str, Union[str, int]], None, None]:
+        """
+        Yield packages added to or removed from this repository since
+        the last `mark_synced` call, with removed ones marked with a true
+        `removed` item. Repositories with unchanged repomd.xml are skipped
+        without reading their primary file.
+        """
+
+        for u in self.urls:
+            try:
+                yield from self._list_changed_packages(self._get_cache_name(u), u)
+            except (FafError, OSError) as ex:
+                self.log_error(
+                    "Repository listing failed for '{0}'['{1}']: {2}"
+                    .format(self.name, u, str(ex)))
+
+    def mark_synced(self) -> None:
+        """
+        Make the repository state seen by the last `list_changed_packages`
+        the base of the next one.
+        """
+
+        for dirname, repomd_checksum in self._pending:
+            os.replace(os.path.join(dirname, self.SNAPSHOT_FILE + ".new"),
+                       os.path.join(dirname, self.SNAPSHOT_FILE))
+            with open(os.path.join(dirname, self.SYNCED_REPOMD_FILE), "w", encoding="utf-8") as f:
+                f.write(repomd_checksum)
+
+        self._pending = []
 
     @property
     def cache_lifetime(self):
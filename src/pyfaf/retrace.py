@@ -1,4 +1,12 @@
+import mmap
+import multiprocessing
+import multiprocessing.util
+import os
 import re
+import shutil
+import struct
+import subprocess
+from collections import OrderedDict
 from concurrent import futures
 
 from typing import Any, Dict, List, Optional, Tuple, Union
@@ -7,6 +15,7 @@ from pyfaf.common import FafError, log, thread_logger
 from pyfaf.faf_rpm import unpack_rpm_to_tmp
 from pyfaf.queries import get_debug_files
 from pyfaf.storage import Database, Package, SymbolSource
+from pyfaf.utils.elf import iter_elf_symbols
 from pyfaf.utils.proc import safe_popen
 
 # Instance of 'RootLogger' has no 'getChild' member
@@ -22,9 +31,16 @@ RE_ADDR2LINE_LINE1 = re.compile(r"^([_0-9a-zA-Z\.~<>@:\*&,\)"
 
 RE_UNSTRIP_BASE_OFFSET = re.compile(r"^((0x)?[0-9a-f]+)")
 
+# Number of addresses below the retraced one tried by eu-addr2line
+ADDR2LINE_TRIES = 15
+
+# Expected ratio of unpacked to packed size of a package,
+# used to keep unpacked tasks under the disk budget
+UNPACK_SIZE_RATIO = 4
+
 __all__ = ["IncompleteTask", "RetraceTaskPackage", "RetraceTask",
-           "RetracePool", "addr2line", "demangle", "get_base_address",
-           "ssource2funcname", "usrmove"]
+           "RetracePool", "SymbolIndex", "Symbolizer", "addr2line", "demangle", "demangle_many",
+           "get_base_address", "ssource2funcname", "usrmove"]
 
 
 class IncompleteTask(FafError):
@@ -104,12 +120,70 @@ class RetraceTask:
 # pylint: enable-msg=R0903
 
 
+# Symbolizer shared by the tasks of a RetracePool worker process
+worker_symbolizer = None # pylint: disable=invalid-name
+
+
+def _init_symbolize_worker() -> None:
+    """
+    Create the Symbolizer of a RetracePool worker process. It is closed
+    when the worker exits.
+    """
+
+    global worker_symbolizer # pylint: disable=global-statement
+
+    worker_symbolizer = Symbolizer()
+    multiprocessing.util.Finalize(None, worker_symbolizer.close, exitpriority=10)
+
+
+def _symbolize_task(ptype, payload) -> Any:
+    """
+    Symbolize `payload` using the problem plugin `ptype`.
+    Executed in a worker process of RetracePool.
+    """
+
+    from pyfaf.problemtypes import problemtypes # pylint: disable=cyclic-import
+
+    # Unpacked directories of the previous tasks are gone by now
+    worker_symbolizer.prune()
+
+    return problemtypes[ptype].symbolize(payload, symbolizer=worker_symbolizer)
+
+
+def _get_dir_size(path) -> int:
+    """
+    Return the apparent size of all files under `path` in bytes.
+    """
+
+    result = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                result += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+
+    return result
+
+
 class RetracePool:
     """
-    A class representing a pool of workers that run the retracing job for given tasks.
+    A class representing a pipeline running the retracing job for given tasks.
+
+    Packages of the next tasks are unpacked by a pool of `workers` threads.
+    At most `prefetch` tasks wait unpacked on top of those being symbolized
+    and their unpacked size is kept under `disk_budget` bytes (0 means no
+    limit). Unpacked tasks are symbolized by a pool of `processes` worker
+    processes without database access. Only the thread calling `run` touches
+    the database session, it stores the results and flushes them after every
+    `commit_batch` tasks.
+
+    Problem plugins not supporting `get_symbolize_payload` are retraced
+    by the thread calling `run` as soon as they are unpacked.
     """
 
-    def __init__(self, db, tasks, problemplugin, workers) -> None:
+    def __init__(self, db, tasks, problemplugin, workers, processes=1,
+                 prefetch=2, disk_budget=0, commit_batch=10) -> None:
         self.name = "RetracePool"
         self.log = thread_logger.getChild(self.name)
         self.db = db
@@ -117,46 +191,138 @@ class RetracePool:
         self.tasks = tasks
         self.total = len(tasks)
         self.workers = workers
+        self.processes = processes
+        self.prefetch = prefetch
+        self.disk_budget = disk_budget
+        self.commit_batch = commit_batch
+
+        # RetraceTask -> bytes reserved on the disk
+        self._reserved: Dict[RetraceTask, int] = {}
+        self._finished = 0
+
+    def _estimate_size(self, task: RetraceTask) -> int:
+        """
+        Estimate the unpacked size of the task's packages in bytes.
+        """
+
+        paths = {task.debuginfo.path}
+        if task.source is not None:
+            paths.add(task.source.path)
+        paths.update(bin_pkg.path for bin_pkg in task.binary_packages.keys())
+
+        return sum(os.path.getsize(path) for path in paths if os.path.isfile(path)) * UNPACK_SIZE_RATIO
+
+    def _can_admit(self, task: RetraceTask, in_flight: int) -> bool:
+        if in_flight >= self.processes + self.prefetch:
+            return False
+
+        if not self.disk_budget or not self._reserved:
+            return True
+
+        return sum(self._reserved.values()) + self._estimate_size(task) <= self.disk_budget
 
     def run(self) -> None:
         """
-        Starts the executors job and schedules tasks for workers when they are available.
+        Runs the pipeline until all tasks are processed.
         """
+
         taskid = 0
-        name = "Worker"
-
-        with futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name) as executor:
-            while self.tasks:
-                taskid += 1
-                task = self.tasks.popleft()
-                try:
-                    future = executor.submit(self._process_task, task, taskid)
-                    future.add_done_callback(self._future_done_callback)
-                except RuntimeError as ex:
-                    self.log.error("Failed to submit retracing task: {0}".format(str(ex)))
-
-    def _process_task(self, task: RetraceTask, num: int) -> None:
+        unpacking = {}
+        symbolizing = {}
+
+        # Use fresh interpreters rather than forked copies that would share
+        # the database connection of this process
+        context = multiprocessing.get_context("spawn")
+        with futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="Unpacker") as unpacker, \
+                futures.ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                            initializer=_init_symbolize_worker) as symbolizer:
+            while self.tasks or unpacking or symbolizing:
+                while self.tasks and self._can_admit(self.tasks[0], len(unpacking) + len(symbolizing)):
+                    taskid += 1
+                    task = self.tasks.popleft()
+                    self.log.info("[{0} / {1}] Retracing {2}".format(taskid, self.total, task.debuginfo.nvra))
+                    self._reserved[task] = self._estimate_size(task)
+                    unpacking[unpacker.submit(self._unpack_task_pkg, task)] = task
+
+                done, _ = futures.wait(list(unpacking) + list(symbolizing),
+                                       return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    if future in unpacking:
+                        task = unpacking.pop(future)
+                        future = self._symbolize(symbolizer, task, future)
+                        if future is not None:
+                            symbolizing[future] = task
+                    else:
+                        task = symbolizing.pop(future)
+                        self._store(task, future)
+
+        self.db.session.flush()
+
+    def _symbolize(self, symbolizer, task: RetraceTask, future) -> Optional[futures.Future]:
         """
-        Helper method for processing future tasks.
+        Schedule symbolization of an unpacked task. Return the future or None
+        if the task was already finished.
         """
-        self.log.info("[{0} / {1}] Retracing {2}".format(num, self.total, task.debuginfo.nvra))
-        self._unpack_task_pkg(task)
-        self.plugin.retrace(self.db, task)
 
-    def _future_done_callback(self, future) -> None:
+        exception = future.exception()
+        if exception is not None:
+            self.log.warn("Unpacking task encountered an exception: {0}".format(str(exception)))
+            self._finish_task(task)
+            return None
+
+        self._reserved[task] = sum(_get_dir_size(path) for path in self._unpacked_paths(task))
+
+        try:
+            payload = self.plugin.get_symbolize_payload(task)
+            if payload is None:
+                self.plugin.retrace(self.db, task)
+                self._finish_task(task)
+                return None
+
+            return symbolizer.submit(_symbolize_task, self.plugin.name, payload)
+        except Exception as ex: # pylint: disable=broad-except
+            self.log.warn("Retracing task encountered an exception: {0}".format(str(ex)))
+            self._finish_task(task)
+            return None
+
+    def _store(self, task: RetraceTask, future) -> None:
+        """
+        Store the symbolization result of a task.
         """
-        Helper callback for completed futures.
 
-        Flushes the data to db when the task ends successfully.
+        exception = future.exception()
+        if exception is not None:
+            self.log.warn("Retracing task encountered an exception: {0}".format(str(exception)))
+        else:
+            try:
+                self.plugin.apply_retrace(self.db, task, future.result())
+            except Exception as ex: # pylint: disable=broad-except
+                self.log.warn("Retracing task encountered an exception: {0}".format(str(ex)))
+
+        self._finish_task(task)
+
+    def _finish_task(self, task: RetraceTask) -> None:
         """
-        if future.cancelled():
-            self.log.warn("Retracing task cancelled: {0}".format(str(future.cancelled())))
-        elif future.done():
-            exception = future.exception()
-            if exception is not None:
-                self.log.warn("Retracing task encountered an exception: {0}".format(str(exception)))
-            else:
-                self.db.session.flush()
+        Remove the task's unpacked packages and flush
+        the session after every `commit_batch` tasks.
+        """
+
+        for path in self._unpacked_paths(task):
+            self.log.debug("Removing %s", path)
+            shutil.rmtree(path, ignore_errors=True)
+
+        self._reserved.pop(task, None)
+
+        self._finished += 1
+        if self._finished % self.commit_batch == 0:
+            self.log.debug("Flushing results of %d tasks", self._finished)
+            self.db.session.flush()
+
+    @staticmethod
+    def _unpacked_paths(task: RetraceTask) -> List[str]:
+        pkgs = [task.debuginfo, task.source] + list(task.binary_packages.keys())
+        return [pkg.unpacked_path for pkg in pkgs
+                if pkg is not None and pkg.unpacked_path is not None]
 
     def _unpack_task_pkg(self, task: RetraceTask) -> None:
         """
@@ -184,13 +350,11 @@ class RetracePool:
                                                           prefix=bin_pkg.nvra)
 
 
-def addr2line(binary_path: str, address: int, debuginfo_dir: str) -> List[Tuple[str, Any, int]]:
+def _parse_addr2line(outputs) -> List[Tuple[str, Any, int]]:
     """
-    Calls eu-addr2line on a binary, address and directory with debuginfo.
-    Returns an ordered list of triplets (function name, source file, line no).
-    The last element is always the symbol given to retrace. The elements
-    before are inlined symbols that should be placed above the given symbol
-    (assuming that entry point is on the bottom of the stacktrace).
+    Parse `outputs` of eu-addr2line --functions, an iterable of its two
+    output lines for the addresses address, address - 1, address - 2, ...
+    See `addr2line` for the result.
     """
 
     result = []
@@ -201,21 +365,7 @@ def addr2line(binary_path: str, address: int, debuginfo_dir: str) -> List[Tuple[
     # eu-addr2line often finds the symbol if we decrement the address by one.
     # we try several addresses that maps to no file or to the same source file
     # and source line as the original address.
-    for addr_enh in range(0, 15):
-        if addr_enh > address:
-            break
-
-        addr = "0x{0:x}".format(address - addr_enh)
-        child = safe_popen("eu-addr2line",
-                           "--executable", binary_path,
-                           "--debuginfo-path", debuginfo_dir,
-                           "--functions", addr,
-                           encoding="utf-8")
-
-        if child is None:
-            raise FafError("eu-add2line failed")
-
-        line1, line2 = child.stdout.splitlines()
+    for line1, line2 in outputs:
         # format of the line2 is filename:lineno[:columnno]
         line2_parts = line2.split(":")
         line2_srcfile = line2_parts[0]
@@ -255,6 +405,39 @@ def addr2line(binary_path: str, address: int, debuginfo_dir: str) -> List[Tuple[
     return result
 
 
+def _addr2line_addresses(address: int) -> List[int]:
+    return [address - addr_enh for addr_enh in range(0, ADDR2LINE_TRIES)
+            if addr_enh <= address]
+
+
+def addr2line(binary_path: str, address: int, debuginfo_dir: str) -> List[Tuple[str, Any, int]]:
+    """
+    Calls eu-addr2line on a binary, address and directory with debuginfo.
+    Returns an ordered list of triplets (function name, source file, line no).
+    The last element is always the symbol given to retrace. The elements
+    before are inlined symbols that should be placed above the given symbol
+    (assuming that entry point is on the bottom of the stacktrace).
+
+    Starts a new eu-addr2line process for every tried address,
+    use `Symbolizer` to retrace many addresses.
+    """
+
+    def _outputs():
+        for addr in _addr2line_addresses(address):
+            child = safe_popen("eu-addr2line",
+                               "--executable", binary_path,
+                               "--debuginfo-path", debuginfo_dir,
+                               "--functions", "0x{0:x}".format(addr),
+                               encoding="utf-8")
+
+            if child is None:
+                raise FafError("eu-add2line failed")
+
+            yield child.stdout.splitlines()
+
+    return _parse_addr2line(_outputs())
+
+
 def get_base_address(binary_path: str) -> int:
     """
     Runs eu-unstrip on a binary to get the address used
@@ -290,6 +473,185 @@ def demangle(mangled: str) -> Union[None, str]:
     return result
 
 
+def demangle_many(mangled_names: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Demangle C++ symbol names using a single c++filt process.
+    Return a dictionary mapping each name to its demangled form,
+    or to None if c++filt failed.
+    """
+
+    mangled_names = list(set(mangled_names))
+    if not mangled_names:
+        return {}
+
+    # c++filt reads one name per line, a name can not span lines
+    if any("\n" in name for name in mangled_names):
+        return {name: demangle(name) for name in mangled_names}
+
+    try:
+        child = subprocess.run(["c++filt"], input="\n".join(mangled_names) + "\n",
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               encoding="utf-8", check=False)
+    except OSError as ex:
+        log.error("Failed to execute c++filt: {0}".format(str(ex)))
+        return dict.fromkeys(mangled_names)
+
+    demangled = child.stdout.splitlines()
+    if child.returncode != 0 or len(demangled) != len(mangled_names):
+        log.error("c++filt failed with return code {0}: {1}"
+                  .format(child.returncode, child.stderr))
+        return dict.fromkeys(mangled_names)
+
+    return dict(zip(mangled_names, (name.strip() for name in demangled)))
+
+
+class Addr2lineProcess:
+    """
+    A long-lived eu-addr2line process for one binary and debuginfo
+    directory reading addresses from its standard input.
+    """
+
+    def __init__(self, binary_path: str, debuginfo_dir: str) -> None:
+        self.binary_path = binary_path
+        # pylint: disable=consider-using-with
+        self.proc = subprocess.Popen(["eu-addr2line",
+                                      "--executable", binary_path,
+                                      "--debuginfo-path", debuginfo_dir,
+                                      "--functions"],
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL,
+                                     close_fds=True,
+                                     encoding="utf-8")
+
+    def lookup(self, addresses: List[int]) -> List[List[str]]:
+        """
+        Return the two output lines for each of `addresses`.
+        """
+
+        try:
+            self.proc.stdin.write("".join("0x{0:x}\n".format(addr) for addr in addresses))
+            self.proc.stdin.flush()
+
+            result = []
+            for _ in addresses:
+                lines = [self.proc.stdout.readline(), self.proc.stdout.readline()]
+                if not lines[1]:
+                    raise FafError("eu-addr2line terminated unexpectedly for '{0}'"
+                                   .format(self.binary_path))
+
+                result.append([line.rstrip("\n") for line in lines])
+        except OSError as ex:
+            raise FafError("eu-addr2line failed for '{0}': {1}"
+                           .format(self.binary_path, str(ex))) from ex
+
+        return result
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+        self.proc.stdout.close()
+
+
+class Symbolizer:
+    """
+    Retraces addresses with as few processes as possible. Keeps one
+    eu-addr2line process per (binary, debuginfo directory), at most
+    `max_processes` of them at a time, and caches base addresses
+    of binaries. Use as a context manager to stop the processes.
+    """
+
+    def __init__(self, max_processes: int = 16) -> None:
+        self.max_processes = max_processes
+        self._processes: "OrderedDict[Tuple[str, str], Addr2lineProcess]" = OrderedDict()
+        # binary path -> base address or FafError
+        self._base_addresses: Dict[str, Union[int, FafError]] = {}
+
+    def __enter__(self) -> "Symbolizer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_process(self, binary_path: str, debuginfo_dir: str) -> Addr2lineProcess:
+        key = (binary_path, debuginfo_dir)
+        if key in self._processes:
+            self._processes.move_to_end(key)
+            return self._processes[key]
+
+        if len(self._processes) >= self.max_processes:
+            _, proc = self._processes.popitem(last=False)
+            proc.close()
+
+        try:
+            proc = Addr2lineProcess(binary_path, debuginfo_dir)
+        except OSError as ex:
+            raise FafError("eu-addr2line failed: {0}".format(str(ex))) from ex
+
+        self._processes[key] = proc
+        return proc
+
+    def addr2line(self, binary_path: str, address: int, debuginfo_dir: str) -> List[Tuple[str, Any, int]]:
+        """
+        Same as `pyfaf.retrace.addr2line`, all tried addresses are sent
+        to the eu-addr2line process of the binary at once.
+        """
+
+        proc = self._get_process(binary_path, debuginfo_dir)
+        try:
+            outputs = proc.lookup(_addr2line_addresses(address))
+        except FafError:
+            # Start a new process next time
+            self._processes.pop((binary_path, debuginfo_dir), None)
+            proc.close()
+            raise
+
+        return _parse_addr2line(outputs)
+
+    def get_base_address(self, binary_path: str) -> int:
+        """
+        Same as `pyfaf.retrace.get_base_address` but cached per binary.
+        """
+
+        if binary_path not in self._base_addresses:
+            try:
+                self._base_addresses[binary_path] = get_base_address(binary_path)
+            except FafError as ex:
+                self._base_addresses[binary_path] = ex
+
+        result = self._base_addresses[binary_path]
+        if isinstance(result, FafError):
+            raise result
+
+        return result
+
+    def prune(self) -> None:
+        """
+        Stop the processes and forget the base addresses of binaries
+        that no longer exist, e.g. of already retraced tasks.
+        """
+
+        for key in [key for key in self._processes if not os.path.exists(key[0])]:
+            self._processes.pop(key).close()
+
+        for binary_path in [path for path in self._base_addresses if not os.path.exists(path)]:
+            del self._base_addresses[binary_path]
+
+    def close(self) -> None:
+        while self._processes:
+            _, proc = self._processes.popitem()
+            proc.close()
+
+
 def usrmove(path: str) -> str:
     """
     Adds or cuts off /usr prefix from the path.
@@ -314,6 +676,12 @@ def ssource2funcname(db_ssource: SymbolSource) -> str:
 
 
 def get_function_offset_map(files: List[str]) -> Dict[str, Dict[str, int]]:
+    """
+    Return a dictionary mapping kernel module names to dictionaries
+    mapping names of functions defined in the module to their offsets.
+    `files` are paths to *.ko.debug files of the modules.
+    """
+
     result: Dict[str, Dict[str, int]] = {}
 
     for filename in files:
@@ -324,18 +692,138 @@ def get_function_offset_map(files: List[str]) -> Dict[str, Dict[str, int]]:
         if modulename not in result:
             result[modulename] = {}
 
-        child = safe_popen("eu-readelf", "-s", filename, encoding="utf-8")
-        if child is None:
-            continue
+        try:
+            for name, value in iter_elf_symbols(filename):
+                result[modulename][name.lstrip("_")] = value
+        except (OSError, FafError) as ex:
+            log.warning("Unable to read symbols of '%s': %s", filename, ex)
 
-        for line in child.stdout.splitlines():
-            if not "FUNC" in line and not "NOTYPE" in line:
-                continue
+    return result
 
-            spl = line.split()
+
+class SymbolIndex:
+    """
+    Function offsets of kernel modules stored in a file that is
+    memory-mapped and binary-searched in place, so that lookups
+    do not need to load the whole index.
+
+    The file contains a header, a table of modules sorted by name,
+    a table of symbols sorted by name within each module and a blob
+    of UTF-8 encoded names referred to by (offset, length) pairs.
+    """
+
+    MAGIC = b"FAFSYMI1"
+    # magic, module count, symbol count
+    HEADER = struct.Struct("<8sII")
+    # name offset, name length, index of the first symbol, symbol count
+    MODULE = struct.Struct("<IIII")
+    # name offset, name length, address
+    SYMBOL = struct.Struct("<IIQ")
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as fobj:
             try:
-                result[modulename][spl[7].lstrip("_")] = int(spl[1], 16)
-            except IndexError:
-                continue
+                self._data = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as ex:
+                raise FafError("Unable to map symbol index '{0}': {1}".format(path, ex)) from ex
+
+        if len(self._data) < SymbolIndex.HEADER.size:
+            self.close()
+            raise FafError("'{0}' is not a symbol index".format(path))
+
+        magic, self._module_count, self._symbol_count = SymbolIndex.HEADER.unpack_from(self._data)
+        if magic != SymbolIndex.MAGIC:
+            self.close()
+            raise FafError("'{0}' is not a symbol index".format(path))
+
+        self._modules = SymbolIndex.HEADER.size
+        self._symbols = self._modules + self._module_count * SymbolIndex.MODULE.size
+        self._names = self._symbols + self._symbol_count * SymbolIndex.SYMBOL.size
+
+    def __enter__(self) -> "SymbolIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._data.close()
+
+    def _find(self, table: struct.Struct, base: int, low: int, high: int,
+              name: bytes) -> Optional[Tuple[int, ...]]:
+        while low < high:
+            mid = (low + high) // 2
+            entry = table.unpack_from(self._data, base + mid * table.size)
+            start = self._names + entry[0]
+            key = self._data[start:start + entry[1]]
+            if key < name:
+                low = mid + 1
+            elif key > name:
+                high = mid
+            else:
+                return entry
 
-    return result
+        return None
+
+    def _find_module(self, module: str) -> Optional[Tuple[int, ...]]:
+        return self._find(SymbolIndex.MODULE, self._modules, 0, self._module_count,
+                          module.encode("utf-8"))
+
+    def __contains__(self, module: str) -> bool:
+        return self._find_module(module) is not None
+
+    def lookup(self, module: str, symbol: str) -> Optional[int]:
+        """
+        Return the offset of `symbol` in `module` or None if not found.
+        """
+
+        entry = self._find_module(module)
+        if entry is None:
+            return None
+
+        _, _, first, count = entry
+        entry = self._find(SymbolIndex.SYMBOL, self._symbols, first, first + count,
+                           symbol.encode("utf-8"))
+        if entry is None:
+            return None
+
+        return entry[2]
+
+    @staticmethod
+    def serialize(offset_map: Dict[str, Dict[str, int]]) -> bytes:
+        """
+        Return the symbol index of `offset_map` as returned by
+        `get_function_offset_map`.
+        """
+
+        names = bytearray()
+        name_offsets: Dict[bytes, int] = {}
+
+        def add_name(name: str) -> Tuple[int, int]:
+            encoded = name.encode("utf-8")
+            if encoded not in name_offsets:
+                name_offsets[encoded] = len(names)
+                names.extend(encoded)
+
+            return name_offsets[encoded], len(encoded)
+
+        modules = []
+        symbols = []
+        for module in sorted(offset_map, key=lambda name: name.encode("utf-8")):
+            module_symbols = sorted(offset_map[module].items(),
+                                    key=lambda item: item[0].encode("utf-8"))
+            modules.append(SymbolIndex.MODULE.pack(*add_name(module), len(symbols),
+                                                   len(module_symbols)))
+            for name, address in module_symbols:
+                symbols.append(SymbolIndex.SYMBOL.pack(*add_name(name), address))
+
+        return b"".join([SymbolIndex.HEADER.pack(SymbolIndex.MAGIC, len(modules), len(symbols))]
+                        + modules + symbols + [bytes(names)])
+
+    @staticmethod
+    def build(files: List[str]) -> bytes:
+        """
+        Return the symbol index of kernel modules from their *.ko.debug `files`.
+        """
+
+        return SymbolIndex.serialize(get_function_offset_map(files))
@@ -0,0 +1,238 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+import random
+
+from collections import defaultdict
+from operator import itemgetter
+from typing import Any, Dict, List
+
+from sqlalchemy import desc, func
+
+from pyfaf.queries import db_utcnow, get_problem_snapshot_changes, get_stale_problem_snapshot_ids
+from pyfaf.storage import (Arch,
+                           Build,
+                           OpSys,
+                           OpSysRelease,
+                           Package,
+                           ProblemSnapshot,
+                           Report,
+                           ReportArch,
+                           ReportBacktrace,
+                           ReportExecutable,
+                           ReportHash,
+                           ReportOpSysRelease,
+                           ReportPackage,
+                           ReportUnknownPackage)
+
+__all__ = ["SNAPSHOT_VERSION", "build_problem_snapshots", "get_problem_snapshot",
+           "refresh_problem_snapshots"]
+
+
+# Bump whenever the snapshot format changes, outdated
+# snapshots are built again on the next access
+SNAPSHOT_VERSION = 1
+
+# Number of problems whose snapshots are built with one set of queries
+SNAPSHOT_BATCH_SIZE = 500
+
+# Maximal number of backtrace hashes in the permalink of a problem
+PERMALINK_HASHES = 10
+
+
+def _empty_snapshot() -> Dict[str, Any]:
+    return {"report_ids": [],
+            "crash_function": "??",
+            "osreleases": [],
+            "arches": [],
+            "exes": [],
+            "package_counts": [],
+            "permalink_hashes": []}
+
+
+def _package_counts(packages) -> List[Any]:
+    """
+    Return a list of (package name, count, [(package version, count in
+    the version)]) from (name, version, count) tuples.
+    """
+
+    names = defaultdict(lambda: {"count": 0, "versions": defaultdict(int)})
+    for name, evr, cnt in packages:
+        names[name]["name"] = name
+        names[name]["count"] += cnt
+        names[name]["versions"][evr] += cnt
+
+    package_counts = []
+    for pkg in sorted(names.values(), key=itemgetter("count"), reverse=True):
+        package_counts.append((
+            pkg["name"],
+            pkg["count"],
+            sorted(pkg["versions"].items(), key=itemgetter(1), reverse=True)))
+
+    return package_counts
+
+
+def build_problem_snapshots(db, problem_ids) -> Dict[int, Dict[str, Any]]:
+    """
+    Return a dictionary mapping IDs from `problem_ids` to snapshots of the
+    problem details: report IDs, the most common crash function, counts
+    by release, architecture, executable and package and backtrace hashes
+    for the permalink. Every value is computed for all the problems with
+    a single query.
+    """
+
+    problem_ids = list(problem_ids)
+    if not problem_ids:
+        return {}
+
+    snapshots = {problem_id: _empty_snapshot() for problem_id in problem_ids}
+    in_problems = Report.problem_id.in_(problem_ids)
+
+    for problem_id, report_id in (db.session.query(Report.problem_id, Report.id)
+                                  .filter(in_problems)
+                                  .order_by(Report.id)):
+        snapshots[problem_id]["report_ids"].append(report_id)
+
+    crash_functions = defaultdict(lambda: defaultdict(int))
+    for problem_id, crashfn, cnt in (db.session.query(Report.problem_id,
+                                                      ReportBacktrace.crashfn,
+                                                      func.count(ReportBacktrace.id))
+                                     .join(ReportBacktrace, ReportBacktrace.report_id == Report.id)
+                                     .filter(in_problems)
+                                     .group_by(Report.problem_id, ReportBacktrace.crashfn)):
+        # See pyfaf.storage.ReportBacktrace.crash_function
+        crash_functions[problem_id][crashfn or "unknown function"] += cnt
+
+    for problem_id, counts in crash_functions.items():
+        snapshots[problem_id]["crash_function"] = max(counts.items(), key=itemgetter(1))[0]
+
+    cnt = func.sum(ReportOpSysRelease.count).label("cnt")
+    for problem_id, opsys, version, count in (db.session.query(Report.problem_id, OpSys.name,
+                                                               OpSysRelease.version, cnt)
+                                              .join(ReportOpSysRelease,
+                                                    ReportOpSysRelease.report_id == Report.id)
+                                              .join(OpSysRelease,
+                                                    OpSysRelease.id == ReportOpSysRelease.opsysrelease_id)
+                                              .join(OpSys, OpSys.id == OpSysRelease.opsys_id)
+                                              .filter(in_problems)
+                                              .group_by(Report.problem_id, OpSysRelease.id,
+                                                        OpSys.name, OpSysRelease.version)
+                                              .order_by(desc("cnt"))):
+        snapshots[problem_id]["osreleases"].append(("{0} {1}".format(opsys, version), count))
+
+    cnt = func.sum(ReportArch.count).label("cnt")
+    for problem_id, arch, count in (db.session.query(Report.problem_id, Arch.name, cnt)
+                                    .join(ReportArch, ReportArch.report_id == Report.id)
+                                    .join(Arch, Arch.id == ReportArch.arch_id)
+                                    .filter(in_problems)
+                                    .group_by(Report.problem_id, Arch.name)
+                                    .order_by(desc("cnt"))):
+        snapshots[problem_id]["arches"].append((arch, count))
+
+    cnt = func.sum(ReportExecutable.count).label("cnt")
+    for problem_id, path, count in (db.session.query(Report.problem_id, ReportExecutable.path, cnt)
+                                    .join(ReportExecutable, ReportExecutable.report_id == Report.id)
+                                    .filter(in_problems)
+                                    .group_by(Report.problem_id, ReportExecutable.path)
+                                    .order_by(desc("cnt"))):
+        snapshots[problem_id]["exes"].append((path, count))
+
+    packages = defaultdict(list)
+    for problem_id, name, epoch, version, release, count in (
+            db.session.query(Report.problem_id, Package.name, Build.epoch,
+                             Build.version, Build.release, func.sum(ReportPackage.count))
+            .join(ReportPackage, ReportPackage.report_id == Report.id)
+            .join(Package, Package.id == ReportPackage.installed_package_id)
+            .join(Build, Build.id == Package.build_id)
+            .filter(in_problems)
+            .group_by(Report.problem_id, Package.name, Build.epoch,
+                      Build.version, Build.release)):
+        # See pyfaf.storage.Package.evr
+        packages[problem_id].append((name, "{0}:{1}-{2}".format(epoch, version, release), count))
+
+    for problem_id, name, epoch, version, release, count in (
+            db.session.query(Report.problem_id, ReportUnknownPackage.name,
+                             ReportUnknownPackage.epoch, ReportUnknownPackage.version,
+                             ReportUnknownPackage.release, func.sum(ReportUnknownPackage.count))
+            .join(ReportUnknownPackage, ReportUnknownPackage.report_id == Report.id)
+            .filter(in_problems)
+            .group_by(Report.problem_id, ReportUnknownPackage.name, ReportUnknownPackage.epoch,
+                      ReportUnknownPackage.version, ReportUnknownPackage.release)):
+        # See pyfaf.storage.ReportUnknownPackage.evr
+        packages[problem_id].append((name, "{0}:{1}-{2}".format(epoch, version, release), count))
+
+    for problem_id, problem_packages in packages.items():
+        snapshots[problem_id]["package_counts"] = _package_counts(problem_packages)
+
+    hashes = defaultdict(list)
+    for problem_id, bthash in (db.session.query(Report.problem_id, ReportHash.hash)
+                               .join(ReportHash, ReportHash.report_id == Report.id)
+                               .filter(in_problems)
+                               .distinct()
+                               .order_by(Report.problem_id, ReportHash.hash)):
+        hashes[problem_id].append(bthash)
+
+    for problem_id, problem_hashes in hashes.items():
+        # Uniformly pick hashes so that they are more or less representative
+        # of the problem. A hint of determinism in this uncertain world.
+        r = random.Random(problem_id)
+        snapshots[problem_id]["permalink_hashes"] = r.sample(
+            problem_hashes, min(len(problem_hashes), PERMALINK_HASHES))
+
+    return snapshots
+
+
+def refresh_problem_snapshots(db, problem_ids=None) -> int:
+    """
+    Build and store snapshots of problems from `problem_ids` or of the
+    problems whose snapshots were marked as outdated if not given.
+    Return the number of refreshed snapshots.
+    """
+
+    if problem_ids is None:
+        problem_ids = get_stale_problem_snapshot_ids(db)
+
+    problem_ids = sorted(set(problem_ids))
+    for i in range(0, len(problem_ids), SNAPSHOT_BATCH_SIZE):
+        batch = problem_ids[i:i + SNAPSHOT_BATCH_SIZE]
+        # Read before building, marks made while building keep the snapshot stale
+        changed = get_problem_snapshot_changes(db, batch)
+        created = db.session.query(db_utcnow()).scalar()
+        snapshots = build_problem_snapshots(db, batch)
+        db.session.execute(ProblemSnapshot.save_statement(SNAPSHOT_VERSION, snapshots, created, changed))
+
+    return len(problem_ids)
+
+
+def get_problem_snapshot(db, problem_id) -> Dict[str, Any]:
+    """
+    Return the snapshot of problem details for `problem_id`. A missing
+    or outdated one is built and stored first.
+    """
+
+    db_snapshot = (db.session.query(ProblemSnapshot)
+                   .filter(ProblemSnapshot.problem_id == problem_id)
+                   .first())
+    if (db_snapshot is not None and db_snapshot.version == SNAPSHOT_VERSION
+            and db_snapshot.changed is None):
+        return db_snapshot.data
+
+    changed = {problem_id: db_snapshot.changed} if db_snapshot is not None else {}
+    created = db.session.query(db_utcnow()).scalar()
+    snapshots = build_problem_snapshots(db, [problem_id])
+    db.session.execute(ProblemSnapshot.save_statement(SNAPSHOT_VERSION, snapshots, created, changed))
+    return snapshots[problem_id]
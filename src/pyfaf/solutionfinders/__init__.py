@@ -98,6 +98,28 @@ class SolutionFinder(Plugin):
     def find_solution_db_report(self, db, db_report, osr=None) -> None: # pylint: disable=unused-argument
         return None
 
+    def find_solutions_db_reports(self, db, db_reports, osrs=None) -> Dict[int, List[Solution]]:
+        """
+        Return a dictionary mapping IDs of pyfaf.storage.Report objects
+        from `db_reports` to lists of their solutions. `osrs` optionally
+        maps the report IDs to pyfaf.storage.OpSysRelease objects.
+        Plugins may override this to look up solutions of many reports
+        with a few queries.
+        """
+
+        if osrs is None:
+            osrs = {}
+
+        result = {}
+        for db_report in db_reports:
+            solution = self.find_solution_db_report(db, db_report, osrs.get(db_report.id)) # pylint: disable=assignment-from-none
+            if solution:
+                if not isinstance(solution, list):
+                    solution = [solution, ]
+                result[db_report.id] = solution
+
+        return result
+
     def find_solutions_problem(self, db, problem, osr=None) -> List:
         solutions = []
         for report in problem.reports:
@@ -179,6 +201,43 @@ def find_solutions_report(report, db=None, finders=None, osr=None) -> Optional[L
     return None
 
 
+def find_solutions_reports(reports, db=None, finders=None, osrs=None) -> Dict[int, List[Solution]]:
+    """
+    Batched variant of find_solutions_report for a list of
+    pyfaf.storage.Report objects. Return a dictionary mapping IDs of the
+    reports having a solution to lists of Solution objects sorted by
+    priority. `osrs` optionally maps the report IDs to
+    pyfaf.storage.OpSysRelease objects.
+    """
+
+    if db is None:
+        db = getDatabase()
+
+    if finders is None:
+        finders = list(solution_finders.keys())
+
+    solutions = {}
+    for finder_name in finders:
+        solution_finder = solution_finders[finder_name]
+        found = solution_finder.find_solutions_db_reports(db, reports, osrs)
+        for report_id, solution_list in found.items():
+            solutions.setdefault(report_id, []).append(
+                (solution_finder.solution_priority, solution_list))
+
+    result = {}
+    for report_id, report_solutions in solutions.items():
+        sorted_solutions = []
+        for solution_list in sorted(report_solutions, key=lambda solution: solution[0]):
+            sorted_solutions += solution_list[1]
+
+        # Make sure all solutions are proper
+        sorted_solutions = [s for s in sorted_solutions if hasattr(s, "cause")]
+        if sorted_solutions:
+            result[report_id] = sorted_solutions
+
+    return result
+
+
 def find_solutions_problem(problem, db=None, finders=None, osr=None) -> List[Solution]:
     """
     Return a list of Solution objects for a given `problem` sorted from highest
@@ -17,29 +17,209 @@
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
 import re
+import threading
 
-from typing import Dict, Optional, Pattern
+from collections import defaultdict, namedtuple
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import joinedload
 
 from pyfaf.solutionfinders import SolutionFinder
+from pyfaf.btcache import load_cached_reports
 from pyfaf.common import log
 from pyfaf.opsys import systems
 from pyfaf.problemtypes import problemtypes
 from pyfaf.queries import (get_sf_prefilter_btpaths, get_sf_prefilter_pkgnames,
-                           get_opsys_by_name)
+                           get_opsys_by_name, get_cache_generation)
 from pyfaf.solutionfinders import Solution
-from pyfaf.storage import SfPrefilterSolution
+from pyfaf.storage import Package, ReportPackage
+from pyfaf.storage.events import SF_PREFILTER_DATASET
 from pyfaf.ureport_compat import ureport1to2
 from pyfaf.ureport import validate
 
 
+# Detached copy of pyfaf.storage.SfPrefilterSolution shared by all sessions
+RuleSolution = namedtuple("RuleSolution", ["cause", "url", "note_text", "note_html"])
+
+# Patterns whose meaning would change inside a combined expression: named
+# groups, back references, conditionals and global inline flags
+STANDALONE_PATTERN_PARSER = re.compile(r"\(\?P|\(\?\(|\\[1-9]|\(\?[aiLmsux]+\)")
+
+
+class RuleSet:
+    """
+    Compiled patterns of one kind of knowledgebase rules for one operating
+    system. Combinable patterns are joined into a single alternation so that
+    a string is matched against all of them at once; the remaining ones are
+    tried one by one.
+    """
+
+    def __init__(self, rules) -> None:
+        """
+        `rules` is a list of (pattern, RuleSolution) tuples ordered by
+        priority.
+        """
+
+        self.solutions: List[RuleSolution] = []
+        self.standalone: List[Tuple[int, re.Pattern]] = []
+        self.combined = None
+        alternatives = []
+        parsers = []
+        for pattern, solution in rules:
+            try:
+                parser = re.compile(pattern)
+            except re.error as ex:
+                log.warning("Unable to compile pattern '%s': %s", pattern, str(ex))
+                continue
+
+            index = len(self.solutions)
+            self.solutions.append(solution)
+            if STANDALONE_PATTERN_PARSER.search(pattern):
+                self.standalone.append((index, parser))
+            else:
+                alternatives.append("(?P<r{0}>{1})".format(index, pattern))
+                parsers.append((index, parser))
+
+        if alternatives:
+            try:
+                self.combined = re.compile("|".join(alternatives))
+            except re.error as ex:
+                log.warning("Unable to combine patterns, matching them one by one: %s", str(ex))
+                self.standalone = sorted(self.standalone + parsers, key=lambda item: item[0])
+
+    def __len__(self) -> int:
+        return len(self.solutions)
+
+    def match_index(self, string) -> Optional[int]:
+        """
+        Return the index of the first rule matching the beginning of `string`
+        or None if no rule matches.
+        """
+
+        result = None
+        if self.combined is not None:
+            match = self.combined.match(string)
+            if match is not None:
+                # Python's alternation tries the alternatives from left
+                # to right, so this is the first matching combined rule
+                result = int(match.lastgroup[1:])
+
+        for index, parser in self.standalone:
+            if result is not None and index > result:
+                break
+
+            if parser.match(string) is not None:
+                return index
+
+        return result
+
+    def matcher(self) -> "RuleMatcher":
+        return RuleMatcher(self)
+
+
+class RuleMatcher:
+    """
+    Object passed to plugins' check_pkgname_match and check_btpath_match
+    methods in place of a compiled pattern. It remembers the first rule
+    matching any of the strings it has seen and reports no match to make
+    the plugin go through all of them.
+    """
+
+    def __init__(self, ruleset) -> None:
+        self.ruleset = ruleset
+        self.index = None
+
+    def match(self, string) -> None:
+        if string is None:
+            return None
+
+        index = self.ruleset.match_index(string)
+        if index is not None and (self.index is None or index < self.index):
+            self.index = index
+
+        return None
+
+    @property
+    def solution(self) -> Optional[RuleSolution]:
+        if self.index is None:
+            return None
+
+        return self.ruleset.solutions[self.index]
+
+
+class RuleIndex:
+    """
+    Process-wide cache of the compiled knowledgebase rules. It is rebuilt
+    whenever the generation of the rules stored in the database changes,
+    i.e. after any process modified them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._rulesets: Dict[Tuple[str, Optional[int]], RuleSet] = {}
+
+    def _get_stamp(self, db) -> Tuple[int, object]:
+        db_generation = get_cache_generation(db, SF_PREFILTER_DATASET)
+        if db_generation is None:
+            return (0, None)
+
+        return (db_generation.generation, db_generation.changed)
+
+    def get(self, db, kind, db_opsys=None) -> RuleSet:
+        """
+        Return a RuleSet of `kind` ("btpath" or "pkgname") rules applying
+        to the pyfaf.storage.OpSys `db_opsys`.
+        """
+
+        stamp = self._get_stamp(db)
+        key = (kind, db_opsys.id if db_opsys is not None else None)
+        with self._lock:
+            if stamp != self._stamp:
+                self._rulesets = {}
+                self._stamp = stamp
+
+            ruleset = self._rulesets.get(key)
+
+        if ruleset is not None:
+            return ruleset
+
+        if kind == "btpath":
+            db_rules = get_sf_prefilter_btpaths(db, db_opsys=db_opsys)
+        else:
+            db_rules = get_sf_prefilter_pkgnames(db, db_opsys=db_opsys)
+
+        ruleset = RuleSet([(db_rule.pattern,
+                            RuleSolution(cause=db_rule.solution.cause,
+                                         url=db_rule.solution.url,
+                                         note_text=db_rule.solution.note_text,
+                                         note_html=db_rule.solution.note_html))
+                           for db_rule in db_rules])
+
+        with self._lock:
+            # Do not store rules built from an outdated generation
+            if stamp == self._stamp:
+                self._rulesets[key] = ruleset
+
+        return ruleset
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._rulesets = {}
+            self._stamp = None
+
+
+rule_index = RuleIndex()
+
+
 class PrefilterSolutionFinder(SolutionFinder):
     name = "sf-prefilter"
     nice_name = "Prefilter Solution"
 
-    def _sfps_to_solution(self, sfps: SfPrefilterSolution) -> Solution:
+    def _sfps_to_solution(self, sfps) -> Solution:
         '''
-        This method convert pyfaf.storage.SfPrefilterSolution info
-        pyfaf.solutionfinder.Solution
+        This method convert pyfaf.storage.SfPrefilterSolution or RuleSolution
+        info pyfaf.solutionfinder.Solution
         '''
         return Solution(cause=sfps.cause,
                         url=sfps.url,
@@ -50,52 +230,26 @@ class PrefilterSolutionFinder(SolutionFinder):
                         certainty=Solution.BINGO
                        )
 
-    def _get_btpath_parsers(self, db, db_opsys=None) -> Dict[Pattern, Solution]:
+    def _get_btpath_parsers(self, db, db_opsys=None) -> RuleSet:
         """
-        Query pyfaf.storage.SfPrefilterBacktracePath objects and turn them into
-        python regexp parsers. Return a dictionary {parser: solution}.
+        Return a RuleSet of pyfaf.storage.SfPrefilterBacktracePath patterns
+        applying to the given operating system.
         """
 
-        result = {}
+        return rule_index.get(db, "btpath", db_opsys=db_opsys)
 
-        db_btpaths = get_sf_prefilter_btpaths(db, db_opsys=db_opsys)
-        for db_btpath in db_btpaths:
-            try:
-                parser = re.compile(db_btpath.pattern)
-            except re.error as ex:
-                log.warning("Unable to compile pattern '%s': %s",
-                            db_btpath.pattern, str(ex))
-                continue
-
-            result[parser] = db_btpath.solution
-
-        return result
-
-    def _get_pkgname_parsers(self, db, db_opsys=None) -> Dict[Pattern, Solution]:
+    def _get_pkgname_parsers(self, db, db_opsys=None) -> RuleSet:
         """
-        Query pyfaf.storage.SfPrefilterPackageName objects and turn them into
-        python regexp parsers. Return a dictionary {parser: solution}.
+        Return a RuleSet of pyfaf.storage.SfPrefilterPackageName patterns
+        applying to the given operating system.
         """
 
-        result = {}
-
-        db_pkgnames = get_sf_prefilter_pkgnames(db, db_opsys=db_opsys)
-        for db_pkgname in db_pkgnames:
-            try:
-                parser = re.compile(db_pkgname.pattern)
-            except re.error as ex:
-                log.warning("Unable to compile pattern '%s': %s",
-                            db_pkgname.pattern, str(ex))
-                continue
+        return rule_index.get(db, "pkgname", db_opsys=db_opsys)
 
-            result[parser] = db_pkgname.solution
-
-        return result
-
-    def find_solution_ureport(self, db, ureport, osr=None) -> Optional[SfPrefilterSolution]:
+    def find_solution_ureport(self, db, ureport, osr=None) -> Optional[Solution]:
         """
         Check whether uReport matches a knowledgebase
-        entry. Return a pyfaf.storage.SfPrefilterSolution object or None.
+        entry. Return a pyfaf.solutionfinders.Solution object or None.
         """
 
         if "ureport_version" in ureport and ureport["ureport_version"] == 1:
@@ -117,9 +271,11 @@ class PrefilterSolutionFinder(SolutionFinder):
                             osplugin.nice_name)
             else:
                 pkgname_parsers = self._get_pkgname_parsers(db, db_opsys=db_opsys)
-                for parser, solution in pkgname_parsers.items():
-                    if osplugin.check_pkgname_match(ureport["packages"], parser):
-                        return self._sfps_to_solution(solution)
+                if pkgname_parsers:
+                    matcher = pkgname_parsers.matcher()
+                    osplugin.check_pkgname_match(ureport["packages"], matcher)
+                    if matcher.solution is not None:
+                        return self._sfps_to_solution(matcher.solution)
 
         ptype = ureport["problem"]["type"]
         if ptype not in problemtypes:
@@ -127,16 +283,18 @@ class PrefilterSolutionFinder(SolutionFinder):
         else:
             problemplugin = problemtypes[ptype]
             btpath_parsers = self._get_btpath_parsers(db, db_opsys=db_opsys)
-            for parser, solution in btpath_parsers.items():
-                if problemplugin.check_btpath_match(ureport["problem"], parser):
-                    return self._sfps_to_solution(solution)
+            if btpath_parsers:
+                matcher = btpath_parsers.matcher()
+                problemplugin.check_btpath_match(ureport["problem"], matcher)
+                if matcher.solution is not None:
+                    return self._sfps_to_solution(matcher.solution)
 
         return None
 
-    def find_solution_db_report(self, db, db_report, osr=None) -> Optional[SfPrefilterSolution]:
+    def find_solution_db_report(self, db, db_report, osr=None) -> Optional[Solution]:
         """
         Check whether a pyfaf.storage.Report object matches a knowledgebase
-        entry. Return a pyfaf.storage.SfPrefilterSolution object or None.
+        entry. Return a pyfaf.solutionfinders.Solution object or None.
         """
 
         db_opsys = None
@@ -144,21 +302,94 @@ class PrefilterSolutionFinder(SolutionFinder):
             db_opsys = osr.opsys
 
         pkgname_parsers = self._get_pkgname_parsers(db, db_opsys=db_opsys)
-        for parser, solution in pkgname_parsers.items():
+        if pkgname_parsers:
+            matcher = pkgname_parsers.matcher()
             for db_report_package in db_report.packages:
+                matcher.match(db_report_package.installed_package.nvra())
 
-                if parser.match(db_report_package.installed_package.nvra()):
-                    return self._sfps_to_solution(solution)
+            if matcher.solution is not None:
+                return self._sfps_to_solution(matcher.solution)
 
         btpath_parsers = self._get_btpath_parsers(db, db_opsys=db_opsys)
-        for parser, solution in btpath_parsers.items():
-            for db_backtrace in db_report.backtraces:
+        if not btpath_parsers:
+            return None
+
+        matcher = btpath_parsers.matcher()
+        cached_report = load_cached_reports(db, [db_report.id])[db_report.id]
+        for db_backtrace in cached_report.backtraces:
+            for db_thread in db_backtrace.threads:
+                if not db_thread.crashthread:
+                    continue
+
+                for db_frame in db_thread.frames:
+                    matcher.match(db_frame.symbolsource.path)
+
+        if matcher.solution is not None:
+            return self._sfps_to_solution(matcher.solution)
+
+        return None
+
+    def find_solutions_db_reports(self, db, db_reports, osrs=None) -> Dict[int, List[Solution]]:
+        """
+        Check which of pyfaf.storage.Report objects from `db_reports` match
+        a knowledgebase entry. Packages and backtraces of all the reports
+        are loaded at once. Return a dictionary mapping report IDs to lists
+        holding one pyfaf.solutionfinders.Solution object.
+        """
+
+        if osrs is None:
+            osrs = {}
+
+        rulesets = {}
+        report_rulesets = {}
+        for db_report in db_reports:
+            db_opsys = None
+            osr = osrs.get(db_report.id)
+            if osr is not None:
+                db_opsys = osr.opsys
+
+            key = db_opsys.id if db_opsys is not None else None
+            if key not in rulesets:
+                rulesets[key] = (self._get_pkgname_parsers(db, db_opsys=db_opsys),
+                                 self._get_btpath_parsers(db, db_opsys=db_opsys))
+            report_rulesets[db_report.id] = rulesets[key]
+
+        nvras = defaultdict(list)
+        pkgname_ids = [report_id for report_id, (pkgname_parsers, _) in report_rulesets.items()
+                       if pkgname_parsers]
+        if pkgname_ids:
+            rows = (db.session.query(ReportPackage.report_id, Package)
+                    .join(Package, Package.id == ReportPackage.installed_package_id)
+                    .options(joinedload(Package.arch), joinedload(Package.build))
+                    .filter(ReportPackage.report_id.in_(pkgname_ids))
+                    .order_by(ReportPackage.id)
+                    .all())
+            for report_id, db_package in rows:
+                nvras[report_id].append(db_package.nvra())
+
+        result = {}
+        for report_id in pkgname_ids:
+            matcher = report_rulesets[report_id][0].matcher()
+            for nvra in nvras[report_id]:
+                matcher.match(nvra)
+
+            if matcher.solution is not None:
+                result[report_id] = [self._sfps_to_solution(matcher.solution)]
+
+        btpath_ids = [report_id for report_id, (_, btpath_parsers) in report_rulesets.items()
+                      if btpath_parsers and report_id not in result]
+        cached_reports = load_cached_reports(db, btpath_ids)
+        for report_id in btpath_ids:
+            matcher = report_rulesets[report_id][1].matcher()
+            for db_backtrace in cached_reports[report_id].backtraces:
                 for db_thread in db_backtrace.threads:
                     if not db_thread.crashthread:
                         continue
 
                     for db_frame in db_thread.frames:
-                        if parser.match(db_frame.symbolsource.path):
-                            return self._sfps_to_solution(solution)
+                        matcher.match(db_frame.symbolsource.path)
 
-        return None
+            if matcher.solution is not None:
+                result[report_id] = [self._sfps_to_solution(matcher.solution)]
+
+        return result
@@ -36,11 +36,15 @@ from .bugzilla import *
 from .mantisbt import *
 from .externalfaf import *
 from .report import *
+from .history import *
 from .llvm import *
 from .sf_prefilter import *
 from .debug import *
 from .user import *
 from .task import *
+from .cache import *
+from .outbox import *
+from .snapshot import *
 
 
 def column_len(cls, name) -> int:
@@ -105,8 +109,11 @@ class TemporaryDatabase:
 
 
 class DatabaseFactory:
-    def __init__(self, autocommit=False) -> None:
-        self.engine = create_engine(get_connect_string(), echo=False)
+    def __init__(self, autocommit=False, connect_string=None) -> None:
+        if connect_string is None:
+            connect_string = get_connect_string()
+
+        self.engine = create_engine(connect_string, echo=False)
         self.sessionmaker = sessionmaker(bind=self.engine, autocommit=autocommit)
 
     def get_database(self) -> TemporaryDatabase:
@@ -19,7 +19,7 @@
 from typing import Optional
 
 from sqlalchemy.sql.schema import Column
-from sqlalchemy.types import Integer, String
+from sqlalchemy.types import DateTime, Integer, String
 
 from pyfaf.config import config
 
@@ -31,6 +31,8 @@ class Bugtracker(GenericTable):
 
     id = Column(Integer, primary_key=True)
     name = Column(String(64), nullable=False)
+    # last_change_time of the newest bug seen by an incremental update-bugs run
+    synced_until = Column(DateTime, nullable=True)
 
     def __str__(self) -> str:
         return str(self.name)
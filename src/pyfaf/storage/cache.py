@@ -0,0 +1,51 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql.dml import Insert
+from sqlalchemy.sql.schema import Column
+from sqlalchemy.types import DateTime, Integer, String
+
+from .generic_table import GenericTable
+
+
+class CacheGeneration(GenericTable):
+    __tablename__ = "cachegenerations"
+
+    # name of a dataset cached by webfaf, e.g. "reports"
+    dataset = Column(String(32), primary_key=True)
+    # bumped whenever the dataset changes to invalidate the cached responses
+    generation = Column(Integer, nullable=False, default=0)
+    changed = Column(DateTime, nullable=False)
+
+    @classmethod
+    def bump_statement(cls, datasets) -> Insert:
+        """
+        Return a statement increasing generations of `datasets`.
+        """
+
+        now = datetime.datetime.utcnow()
+        stmt = insert(cls.__table__).values(
+            [{"dataset": dataset, "generation": 1, "changed": now}
+             for dataset in sorted(set(datasets))])
+        return stmt.on_conflict_do_update(
+            index_elements=["dataset"],
+            set_={"generation": cls.__table__.c.generation + 1,
+                  "changed": stmt.excluded.changed})
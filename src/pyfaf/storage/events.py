@@ -1,10 +1,22 @@
-from sqlalchemy import event
+from typing import Optional
+
+from sqlalchemy import event, inspect, or_
 from sqlalchemy.orm import mapper
+from sqlalchemy.orm.query import Query
 from sqlalchemy.orm.session import Session
 
+from pyfaf.utils.cache import cached_classes, invalidate_caches
 from . import Build
+from . import CacheGeneration
 from . import ReportBacktrace
 from . import ReportBtFrame
+from . import ReportBtThread
+from . import ReportClusterSignature
+from . import SfPrefilterBacktracePath
+from . import SfPrefilterPackageName
+from . import SfPrefilterSolution
+from . import Symbol
+from . import SymbolSource
 
 
 @event.listens_for(ReportBtFrame, "init")
@@ -39,6 +51,120 @@ def before_delete(_, connection, target) -> None: # pylint: disable=unused-argum
             target.del_lob(lobname)
 
 
+# Attributes stored in serialized backtraces besides those used for clustering
+SERIALIZED_SYMBOL_ATTRS = ("nice_name", "normalized_path")
+SERIALIZED_SSOURCE_ATTRS = ("build_id", "path", "offset", "func_offset", "source_path",
+                            "line_number", "srcline")
+
+
+def _has_changes(obj, *attrs) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+def _get_affected_reports(session, symbol_ids, ssource_ids, thread_ids) -> Optional[Query]:
+    conditions = []
+    if symbol_ids:
+        conditions.append(SymbolSource.symbol_id.in_(symbol_ids))
+    if ssource_ids:
+        conditions.append(SymbolSource.id.in_(ssource_ids))
+    if thread_ids:
+        conditions.append(ReportBtThread.id.in_(thread_ids))
+
+    if not conditions:
+        return None
+
+    return (session.query(ReportBacktrace.report_id)
+            .join(ReportBtThread)
+            .join(ReportBtFrame)
+            .join(SymbolSource)
+            .filter(or_(*conditions)))
+
+
+@event.listens_for(Session, "before_flush")
+def invalidate_backtrace_derivatives(session, flush_context, instances) -> None: # pylint: disable=unused-argument
+    """
+    Remove clustering signatures and serialized backtraces of reports
+    whose backtrace frames changed, e.g. by retracing, so that they
+    are computed again
+    """
+
+    # Changes affecting clustering signatures
+    symbol_ids = set()
+    ssource_ids = set()
+    thread_ids = set()
+    # Changes affecting only serialized backtraces
+    symbol_ids_ser = set()
+    ssource_ids_ser = set()
+    for obj in session.dirty:
+        if isinstance(obj, Symbol):
+            if _has_changes(obj, "name"):
+                symbol_ids.add(obj.id)
+            elif _has_changes(obj, *SERIALIZED_SYMBOL_ATTRS):
+                symbol_ids_ser.add(obj.id)
+        elif isinstance(obj, SymbolSource):
+            if _has_changes(obj, "symbol_id", "symbol"):
+                ssource_ids.add(obj.id)
+            elif _has_changes(obj, *SERIALIZED_SSOURCE_ATTRS):
+                ssource_ids_ser.add(obj.id)
+        elif isinstance(obj, ReportBtFrame) and _has_changes(obj, "symbolsource_id", "symbolsource",
+                                                             "inlined", "reliable"):
+            thread_ids.add(obj.thread_id)
+
+    # New frames of existing threads, e.g. inlined frames found by retracing
+    for obj in session.new:
+        if (isinstance(obj, ReportBtFrame) and obj.thread is not None and
+                inspect(obj.thread).persistent):
+            thread_ids.add(obj.thread.id)
+
+    report_ids = _get_affected_reports(session, symbol_ids, ssource_ids, thread_ids)
+    if report_ids is not None:
+        (session.query(ReportClusterSignature)
+         .filter(ReportClusterSignature.report_id.in_(report_ids.subquery()))
+         .delete(synchronize_session=False))
+
+    report_ids = _get_affected_reports(session,
+                                       symbol_ids | symbol_ids_ser,
+                                       ssource_ids | ssource_ids_ser,
+                                       thread_ids)
+    if report_ids is not None:
+        (session.query(ReportBacktrace)
+         .filter(ReportBacktrace.report_id.in_(report_ids.subquery()))
+         .update({ReportBacktrace.serialized: None}, synchronize_session=False))
+
+
+@event.listens_for(Session, "after_flush")
+def invalidate_lookup_caches(session, flush_context) -> None: # pylint: disable=unused-argument
+    """
+    Drop cached lookups of the classes whose rows were modified or deleted
+    """
+
+    cached = cached_classes()
+    classes = set(type(obj) for obj in session.deleted if type(obj) in cached)
+    classes.update(type(obj) for obj in session.dirty
+                   if type(obj) in cached and
+                   session.is_modified(obj, include_collections=False))
+    if classes:
+        invalidate_caches(classes)
+
+
+# Dataset whose generation tracks changes of the prefilter solution finder rules
+SF_PREFILTER_DATASET = "sf-prefilter"
+SF_PREFILTER_CLASSES = (SfPrefilterSolution, SfPrefilterBacktracePath, SfPrefilterPackageName)
+
+
+@event.listens_for(Session, "before_flush")
+def bump_sf_prefilter_generation(session, flush_context, instances) -> None: # pylint: disable=unused-argument
+    """
+    Invalidate rule indices of the prefilter solution finder in all processes
+    whenever its rules or solutions change
+    """
+
+    objects = session.new.union(session.dirty, session.deleted)
+    if any(isinstance(obj, SF_PREFILTER_CLASSES) for obj in objects):
+        session.execute(CacheGeneration.bump_statement([SF_PREFILTER_DATASET]))
+
+
 @event.listens_for(Build.version, "set")
 def store_semantic_version_for_build(target, value, oldvalue, initiator) -> None: # pylint: disable=unused-argument
     """
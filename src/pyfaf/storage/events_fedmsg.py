@@ -22,87 +22,49 @@ from pyfaf.utils.parse import str2bool
 notify_reports = str2bool(config.get("fedmsg.realtime_reports", "false"))
 notify_problems = str2bool(config.get("fedmsg.realtime_problems", "false"))
 
+levels = tuple(10**n for n in range(7))
+
 # pylint: disable=ungrouped-imports
 if notify_reports or notify_problems:
+    import datetime
     from sqlalchemy import event
-    from fedora_messaging.api import publish
-    from fedora_messaging.exceptions import ConnectionException, PublishReturned
-    from . import Report
-    from faf_schema.schema import FafReportMessage, FafProblemMessage
-    from pyfaf.utils import web
+    from sqlalchemy.orm import object_session
+    from . import NotificationOutbox, Report
     from pyfaf.common import log
     logger = log.getChild(__name__)
 
-    levels = tuple(10**n for n in range(7))
-
     @event.listens_for(Report.count, "set")
     def fedmsg_report(target, value, oldvalue, initiator) -> None: # pylint: disable=unused-argument
         """
-        Send Fedora Messaging notifications when Report.count reaches specified threshold.
+        Record Report.count changes that may reach a notification threshold.
+
+        The change is stored in the notification outbox within the transaction
+        saving the report and published later by the fedmsg-drain action, so
+        saving reports neither waits for the broker nor loads relationships.
         """
         try:
-            db_report = target
-            if notify_reports:
-                oldcount = oldvalue
-                newcount = value
-                for level in levels:
-                    if oldcount < level <= newcount:
-                        logger.info("Notifying about report #{0} level {1}"
-                                    .format(db_report.id, level))
-                        msg_body = {
-                            "report_id": db_report.id,
-                            "function": db_report.crash_function,
-                            "components": [db_report.component.name],
-                            "first_occurrence": db_report.first_occurrence
-                                                .strftime("%Y-%m-%d"),
-                            "count": newcount,
-                            "type": db_report.type,
-                            "level": level,
-                        }
-                        if web.webfaf_installed() and db_report.hashes:
-                            msg_body["url"] = web.reverse("reports.bthash_forward",
-                                                          bthash=db_report.hashes[0].hash)
+            # a new report's count is set for the first time
+            if not isinstance(oldvalue, int):
+                oldvalue = 0
 
-                        if db_report.problem_id:
-                            msg_body["problem_id"] = db_report.problem_id
+            if value <= oldvalue:
+                return
 
-                        try:
-                            msg = FafReportMessage(topic="faf.report.threshold{0}".format(level),
-                                                   body=msg_body)
-                            publish(msg)
-                        except PublishReturned as e:
-                            logger.exception("Fedora Messaging broker rejected message {0}: {1}".format(msg.id, e))
-                        except ConnectionException as e:
-                            logger.exception("Error sending message {0}: {1}".format(msg.id, e))
+            record = notify_problems and target.problem_id is not None
+            if not record and notify_reports:
+                record = any(oldvalue < level <= value for level in levels)
 
-            if notify_problems and db_report.problem is not None:
-                oldcount = db_report.problem.reports_count
-                newcount = oldcount + value - oldvalue
-                for level in levels:
-                    if oldcount < level <= newcount:
-                        logger.info("Notifying about problem #{0} level {1}"
-                                    .format(db_report.problem.id, level))
-                        msg_body = {
-                            "problem_id": db_report.problem.id,
-                            "function": db_report.problem.crash_function,
-                            "components": list(db_report.problem.unique_component_names),
-                            "first_occurrence": db_report.problem.first_occurrence
-                                                .strftime("%Y-%m-%d"),
-                            "count": newcount,
-                            "type": db_report.type,
-                            "level": level,
-                        }
-                        if web.webfaf_installed():
-                            msg_body["url"] = web.reverse("problems.item", problem_id=db_report.problem.id)
+            session = object_session(target)
+            if not record or session is None:
+                return
 
-                        try:
-                            msg = FafProblemMessage(topic="faf.problem.threshold{0}".format(level),
-                                                    body=msg_body)
-                            publish(msg)
-                        except PublishReturned as e:
-                            logger.exception("Fedora Messaging broker rejected message {0}: {1}".format(msg.id, e))
-                        except ConnectionException as e:
-                            logger.exception("Error sending message {0}: {1}".format(msg.id, e))
+            db_outbox = NotificationOutbox()
+            db_outbox.report = target
+            db_outbox.problem_id = target.problem_id
+            db_outbox.old_count = oldvalue
+            db_outbox.new_count = value
+            db_outbox.created = datetime.datetime.utcnow()
+            session.add(db_outbox)
 
         # Catch any exception. This is non-critical and mustn't break stuff
         # elsewhere.
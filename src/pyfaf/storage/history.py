@@ -0,0 +1,142 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql.schema import Column, ForeignKey, Index
+from sqlalchemy.types import Date, Integer
+
+from .generic_table import GenericTable
+from .opsys import OpSysComponent, OpSysRelease
+from .problem import Problem
+
+# Rollups of ReportHistory(Daily|Weekly|Monthly) summed over all reports of
+# a problem, a component or a release. They are maintained incrementally
+# when uReports are saved and rebuilt by the rollup-history action.
+
+
+class ProblemHistoryMonthly(GenericTable):
+    __tablename__ = "problemhistorymonthly"
+
+    problem_id = Column(Integer, ForeignKey("{0}.id".format(Problem.__tablename__), ondelete="CASCADE"),
+                        primary_key=True)
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    month = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False)
+    problem = relationship(Problem)
+    # covers the sums ranking problems in a date range
+    Index("ix_problemhistorymonthly_ranking", month, opsysrelease_id, problem_id, count)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class ProblemHistoryWeekly(GenericTable):
+    __tablename__ = "problemhistoryweekly"
+
+    problem_id = Column(Integer, ForeignKey("{0}.id".format(Problem.__tablename__), ondelete="CASCADE"),
+                        primary_key=True)
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    week = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False)
+    problem = relationship(Problem)
+    # covers the sums ranking problems in a date range
+    Index("ix_problemhistoryweekly_ranking", week, opsysrelease_id, problem_id, count)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class ProblemHistoryDaily(GenericTable):
+    __tablename__ = "problemhistorydaily"
+
+    problem_id = Column(Integer, ForeignKey("{0}.id".format(Problem.__tablename__), ondelete="CASCADE"),
+                        primary_key=True)
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False)
+    problem = relationship(Problem)
+    # covers the sums ranking problems in a date range
+    Index("ix_problemhistorydaily_ranking", day, opsysrelease_id, problem_id, count)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class ComponentHistoryMonthly(GenericTable):
+    __tablename__ = "componenthistorymonthly"
+
+    component_id = Column(Integer, ForeignKey("{0}.id".format(OpSysComponent.__tablename__), ondelete="CASCADE"),
+                          primary_key=True)
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    month = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False)
+    component = relationship(OpSysComponent)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class ComponentHistoryWeekly(GenericTable):
+    __tablename__ = "componenthistoryweekly"
+
+    component_id = Column(Integer, ForeignKey("{0}.id".format(OpSysComponent.__tablename__), ondelete="CASCADE"),
+                          primary_key=True)
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    week = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False)
+    component = relationship(OpSysComponent)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class ComponentHistoryDaily(GenericTable):
+    __tablename__ = "componenthistorydaily"
+
+    component_id = Column(Integer, ForeignKey("{0}.id".format(OpSysComponent.__tablename__), ondelete="CASCADE"),
+                          primary_key=True)
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False)
+    component = relationship(OpSysComponent)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class OpSysReleaseHistoryMonthly(GenericTable):
+    __tablename__ = "opsysreleasehistorymonthly"
+
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    month = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class OpSysReleaseHistoryWeekly(GenericTable):
+    __tablename__ = "opsysreleasehistoryweekly"
+
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    week = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
+    opsysrelease = relationship(OpSysRelease)
+
+
+class OpSysReleaseHistoryDaily(GenericTable):
+    __tablename__ = "opsysreleasehistorydaily"
+
+    opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__), ondelete="CASCADE"),
+                             primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
+    opsysrelease = relationship(OpSysRelease)
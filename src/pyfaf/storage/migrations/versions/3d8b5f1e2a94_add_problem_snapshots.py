@@ -0,0 +1,49 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Add problem snapshots
+
+Revision ID: 3d8b5f1e2a94
+Revises: 9e2f4b7a1c58
+Create Date: 2026-10-18 21:12:47.530918
+"""
+
+from alembic.op import create_table, drop_table
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3d8b5f1e2a94"
+down_revision = "9e2f4b7a1c58"
+
+
+def upgrade() -> None:
+    # Snapshots are built by create-problems, save-reports and on the first
+    # visit of a problem page
+    create_table("problemsnapshots",
+                 sa.Column("problem_id", sa.Integer(), nullable=False),
+                 sa.Column("version", sa.Integer(), nullable=False),
+                 sa.Column("created", sa.DateTime(), nullable=False),
+                 sa.Column("changed", sa.DateTime(), nullable=True),
+                 sa.Column("data", sa.UnicodeText(), nullable=False),
+                 sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+                 sa.PrimaryKeyConstraint("problem_id"))
+
+
+def downgrade() -> None:
+    drop_table("problemsnapshots")
@@ -0,0 +1,44 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Add cache generations
+
+Revision ID: 5b1c9e7d3a20
+Revises: d27b5e0c48f1
+Create Date: 2026-10-18 11:02:48.196305
+"""
+
+from alembic.op import create_table, drop_table
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b1c9e7d3a20"
+down_revision = "d27b5e0c48f1"
+
+
+def upgrade() -> None:
+    create_table("cachegenerations",
+                 sa.Column("dataset", sa.String(length=32), nullable=False),
+                 sa.Column("generation", sa.Integer(), nullable=False),
+                 sa.Column("changed", sa.DateTime(), nullable=False),
+                 sa.PrimaryKeyConstraint("dataset"))
+
+
+def downgrade() -> None:
+    drop_table("cachegenerations")
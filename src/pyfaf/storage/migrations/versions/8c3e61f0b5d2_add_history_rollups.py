@@ -0,0 +1,89 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Add history rollups
+
+Revision ID: 8c3e61f0b5d2
+Revises: 5b1c9e7d3a20
+Create Date: 2026-10-18 14:21:09.582731
+"""
+
+from alembic.op import create_index, create_table, drop_table, execute
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8c3e61f0b5d2"
+down_revision = "5b1c9e7d3a20"
+
+PERIODS = [("daily", "day"), ("weekly", "week"), ("monthly", "month")]
+
+
+def upgrade() -> None:
+    for suffix, period in PERIODS:
+        create_table("problemhistory{0}".format(suffix),
+                     sa.Column("problem_id", sa.Integer(), nullable=False),
+                     sa.Column("opsysrelease_id", sa.Integer(), nullable=False),
+                     sa.Column(period, sa.Date(), nullable=False),
+                     sa.Column("count", sa.Integer(), nullable=False),
+                     sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+                     sa.ForeignKeyConstraint(["opsysrelease_id"], ["opsysreleases.id"], ondelete="CASCADE"),
+                     sa.PrimaryKeyConstraint("problem_id", "opsysrelease_id", period))
+        create_index("ix_problemhistory{0}_{1}".format(suffix, period),
+                     "problemhistory{0}".format(suffix), [period])
+
+        create_table("componenthistory{0}".format(suffix),
+                     sa.Column("component_id", sa.Integer(), nullable=False),
+                     sa.Column("opsysrelease_id", sa.Integer(), nullable=False),
+                     sa.Column(period, sa.Date(), nullable=False),
+                     sa.Column("count", sa.Integer(), nullable=False),
+                     sa.ForeignKeyConstraint(["component_id"], ["opsyscomponents.id"], ondelete="CASCADE"),
+                     sa.ForeignKeyConstraint(["opsysrelease_id"], ["opsysreleases.id"], ondelete="CASCADE"),
+                     sa.PrimaryKeyConstraint("component_id", "opsysrelease_id", period))
+        create_index("ix_componenthistory{0}_{1}".format(suffix, period),
+                     "componenthistory{0}".format(suffix), [period])
+
+        create_table("opsysreleasehistory{0}".format(suffix),
+                     sa.Column("opsysrelease_id", sa.Integer(), nullable=False),
+                     sa.Column(period, sa.Date(), nullable=False),
+                     sa.Column("count", sa.Integer(), nullable=False),
+                     sa.ForeignKeyConstraint(["opsysrelease_id"], ["opsysreleases.id"], ondelete="CASCADE"),
+                     sa.PrimaryKeyConstraint("opsysrelease_id", period))
+
+        # Fill the rollups from the existing per-report history
+        execute("INSERT INTO problemhistory{0} (problem_id, opsysrelease_id, {1}, count) "
+                "SELECT reports.problem_id, h.opsysrelease_id, h.{1}, SUM(h.count) "
+                "FROM reporthistory{0} h JOIN reports ON reports.id = h.report_id "
+                "WHERE reports.problem_id IS NOT NULL "
+                "GROUP BY reports.problem_id, h.opsysrelease_id, h.{1}".format(suffix, period))
+        execute("INSERT INTO componenthistory{0} (component_id, opsysrelease_id, {1}, count) "
+                "SELECT reports.component_id, h.opsysrelease_id, h.{1}, SUM(h.count) "
+                "FROM reporthistory{0} h JOIN reports ON reports.id = h.report_id "
+                "GROUP BY reports.component_id, h.opsysrelease_id, h.{1}".format(suffix, period))
+        execute("INSERT INTO opsysreleasehistory{0} (opsysrelease_id, {1}, count) "
+                "SELECT h.opsysrelease_id, h.{1}, SUM(h.count) "
+                "FROM reporthistory{0} h "
+                "GROUP BY h.opsysrelease_id, h.{1}".format(suffix, period))
+
+
+def downgrade() -> None:
+    for suffix, _ in PERIODS:
+        drop_table("opsysreleasehistory{0}".format(suffix))
+        drop_table("componenthistory{0}".format(suffix))
+        drop_table("problemhistory{0}".format(suffix))
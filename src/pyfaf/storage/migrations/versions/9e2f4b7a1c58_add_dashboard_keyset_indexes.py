@@ -0,0 +1,58 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Add dashboard keyset indexes
+
+Revision ID: 9e2f4b7a1c58
+Revises: e4a7c2d9f613
+Create Date: 2026-10-18 19:12:40.736215
+"""
+
+from alembic.op import create_index, drop_index
+
+
+# revision identifiers, used by Alembic.
+revision = "9e2f4b7a1c58"
+down_revision = "e4a7c2d9f613"
+
+INDEXES = [
+    ("ix_reports_last_occurrence_id", "reports", ["last_occurrence", "id"]),
+    ("ix_reports_first_occurrence_id", "reports", ["first_occurrence", "id"]),
+    ("ix_reports_count_id", "reports", ["count", "id"]),
+    ("ix_reports_component_id_last_occurrence_id", "reports", ["component_id", "last_occurrence", "id"]),
+    ("ix_reports_type_last_occurrence_id", "reports", ["type", "last_occurrence", "id"]),
+    ("ix_reportopsysreleases_opsysrelease_id_report_id", "reportopsysreleases", ["opsysrelease_id", "report_id"]),
+    ("ix_reportarchs_arch_id_report_id", "reportarchs", ["arch_id", "report_id"]),
+    ("ix_problemscomponents_component_id_problem_id", "problemscomponents", ["component_id", "problem_id"]),
+    ("ix_problemhistorydaily_ranking", "problemhistorydaily",
+     ["day", "opsysrelease_id", "problem_id", "count"]),
+    ("ix_problemhistoryweekly_ranking", "problemhistoryweekly",
+     ["week", "opsysrelease_id", "problem_id", "count"]),
+    ("ix_problemhistorymonthly_ranking", "problemhistorymonthly",
+     ["month", "opsysrelease_id", "problem_id", "count"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        drop_index(name, table_name=table)
@@ -0,0 +1,40 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Add serialized backtraces
+
+Revision ID: a6f31c2d9b07
+Revises: c9341b80f21b
+Create Date: 2026-10-18 04:12:37.518204
+"""
+
+from alembic.op import add_column, drop_column
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a6f31c2d9b07"
+down_revision = "c9341b80f21b"
+
+
+def upgrade() -> None:
+    add_column("reportbacktraces", sa.Column("serialized", sa.UnicodeText(), nullable=True))
+
+
+def downgrade() -> None:
+    drop_column("reportbacktraces", "serialized")
@@ -0,0 +1,56 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Add report cluster signatures
+
+Revision ID: c9341b80f21b
+Revises: e1e54ec3137d
+Create Date: 2026-10-18 02:43:15.079088
+"""
+
+from alembic.op import create_index, create_table, drop_index, drop_table
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c9341b80f21b"
+down_revision = "e1e54ec3137d"
+
+
+def upgrade() -> None:
+    create_table("reportclustersignatures",
+                 sa.Column("report_id", sa.Integer(), nullable=False),
+                 sa.Column("version", sa.Integer(), nullable=False),
+                 sa.Column("functions", sa.UnicodeText(), nullable=False),
+                 sa.ForeignKeyConstraint(["report_id"], ["reports.id"], ondelete="CASCADE"),
+                 sa.PrimaryKeyConstraint("report_id"))
+    create_table("reportclusterfunctions",
+                 sa.Column("report_id", sa.Integer(), nullable=False),
+                 sa.Column("function_hash", sa.String(length=40), nullable=False),
+                 sa.ForeignKeyConstraint(["report_id"], ["reportclustersignatures.report_id"],
+                                         ondelete="CASCADE"),
+                 sa.PrimaryKeyConstraint("report_id", "function_hash"))
+    create_index("ix_reportclusterfunctions_function_hash", "reportclusterfunctions",
+                 ["function_hash"])
+
+
+def downgrade() -> None:
+    drop_index("ix_reportclusterfunctions_function_hash", table_name="reportclusterfunctions")
+    drop_table("reportclusterfunctions")
+    drop_table("reportclustersignatures")
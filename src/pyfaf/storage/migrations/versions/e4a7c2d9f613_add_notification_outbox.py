@@ -0,0 +1,52 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Add notification outbox
+
+Revision ID: e4a7c2d9f613
+Revises: 8c3e61f0b5d2
+Create Date: 2026-10-18 17:45:31.208114
+"""
+
+from alembic.op import create_index, create_table, drop_index, drop_table
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e4a7c2d9f613"
+down_revision = "8c3e61f0b5d2"
+
+
+def upgrade() -> None:
+    create_table("notificationoutbox",
+                 sa.Column("id", sa.Integer(), nullable=False),
+                 sa.Column("report_id", sa.Integer(), nullable=False),
+                 sa.Column("problem_id", sa.Integer(), nullable=True),
+                 sa.Column("old_count", sa.Integer(), nullable=False),
+                 sa.Column("new_count", sa.Integer(), nullable=False),
+                 sa.Column("created", sa.DateTime(), nullable=False),
+                 sa.ForeignKeyConstraint(["report_id"], ["reports.id"], ondelete="CASCADE"),
+                 sa.PrimaryKeyConstraint("id"))
+    create_index("ix_notificationoutbox_report_id", "notificationoutbox", ["report_id"])
+    create_index("ix_notificationoutbox_problem_id", "notificationoutbox", ["problem_id"])
+
+
+def downgrade() -> None:
+    drop_index("ix_notificationoutbox_problem_id", table_name="notificationoutbox")
+    drop_index("ix_notificationoutbox_report_id", table_name="notificationoutbox")
+    drop_table("notificationoutbox")
@@ -0,0 +1,40 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.types import DateTime, Integer
+
+from .generic_table import GenericTable
+from .report import Report
+
+
+class NotificationOutbox(GenericTable):
+    __tablename__ = "notificationoutbox"
+
+    # Report.count changes recorded in the ingest transaction by
+    # storage/events_fedmsg.py and published later by the fedmsg-drain action.
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, ForeignKey("{0}.id".format(Report.__tablename__), ondelete="CASCADE"),
+                       nullable=False, index=True)
+    # not a foreign key, problems are recreated by create-problems while
+    # the row waits to be published
+    problem_id = Column(Integer, nullable=True, index=True)
+    old_count = Column(Integer, nullable=False)
+    new_count = Column(Integer, nullable=False)
+    created = Column(DateTime, nullable=False)
+    report = relationship(Report)
@@ -19,7 +19,7 @@
 from typing import Any, Dict, List
 
 from sqlalchemy.orm import backref, relationship
-from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.sql.schema import Column, ForeignKey, Index
 from sqlalchemy.types import Date, DateTime, Integer, String
 
 from pyfaf.utils.storage import most_common_crash_function
@@ -50,6 +50,7 @@ class ProblemComponent(GenericTable):
     order = Column(Integer, nullable=False)
     problem = relationship("Problem")
     component = relationship(OpSysComponent)
+    Index("ix_problemscomponents_component_id_problem_id", component_id, problem_id)
 
 
 class Problem(GenericTable):
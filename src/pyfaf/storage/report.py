@@ -20,7 +20,7 @@ from string import ascii_uppercase #pylint: disable=deprecated-module
 from datetime import date, datetime
 from typing import Any, Dict, List, Optional, Union
 
-from sqlalchemy.orm import backref, relationship, synonym
+from sqlalchemy.orm import backref, deferred, relationship, synonym
 from sqlalchemy.sql.schema import Column, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.types import Boolean, Date, DateTime, Enum, Integer, String
 
@@ -31,6 +31,7 @@ from .bugzilla import BzBug
 from .externalfaf import ExternalFafInstance
 from .custom_types import Semver
 from .generic_table import GenericTable
+from .jsontype import JSONType
 from .mantisbt import MantisBug
 from .opsys import Arch, OpSysComponent, OpSysRelease, Package
 from .problem import Problem
@@ -46,8 +47,8 @@ class Report(GenericTable):
     type = Column(String(64), nullable=False, index=True)
     first_occurrence = Column(DateTime)
     last_occurrence = Column(DateTime)
-    # Watch out, there's a "set" event handler on count that can send out fedmsg
-    # notifications.
+    # Watch out, there's a "set" event handler on count that can queue fedmsg
+    # notifications in NotificationOutbox.
     count = Column(Integer, nullable=False)
     errname = Column(String(256), nullable=True)
     component_id = Column(Integer, ForeignKey("{0}.id".format(OpSysComponent.__tablename__)),
@@ -56,6 +57,12 @@ class Report(GenericTable):
     component = relationship(OpSysComponent)
     problem = relationship(Problem, backref="reports")
     max_certainty = Column(Integer, nullable=True)
+    # keyset pagination of the report list by each sort order
+    Index("ix_reports_last_occurrence_id", last_occurrence, id)
+    Index("ix_reports_first_occurrence_id", first_occurrence, id)
+    Index("ix_reports_count_id", count, id)
+    Index("ix_reports_component_id_last_occurrence_id", component_id, last_occurrence, id)
+    Index("ix_reports_type_last_occurrence_id", type, last_occurrence, id)
 
     def to_json(self) -> Dict[str, Any]:
         return {
@@ -177,6 +184,9 @@ class ReportBacktrace(GenericTable):
     report = relationship(Report, backref="backtraces")
     crashfn = Column(String(1024), nullable=True)
     quality = Column(Integer, nullable=False)
+    # Compact representation of threads and frames maintained by pyfaf.btcache,
+    # removed whenever the frames change
+    serialized = deferred(Column(JSONType, nullable=True))
 
     @property
     def crash_function(self) -> str:
@@ -304,6 +314,7 @@ class ReportOpSysRelease(GenericTable):
     opsysrelease_id = Column(Integer, ForeignKey("{0}.id".format(OpSysRelease.__tablename__)), primary_key=True)
     count = Column(Integer, nullable=False)
     report = relationship(Report, backref="opsysreleases")
+    Index("ix_reportopsysreleases_opsysrelease_id_report_id", opsysrelease_id, report_id)
     opsysrelease = relationship(OpSysRelease)
 
     def __str__(self) -> str:
@@ -318,6 +329,7 @@ class ReportArch(GenericTable):
     arch_id = Column(Integer, ForeignKey("{0}.id".format(Arch.__tablename__)), nullable=False, primary_key=True)
     count = Column(Integer, nullable=False)
     report = relationship(Report, backref="arches")
+    Index("ix_reportarchs_arch_id_report_id", arch_id, report_id)
     arch = relationship(Arch)
 
     def __str__(self) -> str:
@@ -656,3 +668,27 @@ class ReportArchive(GenericTable):
         User.__tablename__)), nullable=False)
     report = relationship(Report, backref=backref("archive", uselist=False, passive_deletes=True))
     user = relationship(User, backref="archives")
+
+
+# Normalized function names of the crash thread used by incremental
+# clustering. Removed when backtrace frames of the report change.
+# Reports that can not be clustered have an empty list of functions.
+class ReportClusterSignature(GenericTable):
+    __tablename__ = "reportclustersignatures"
+
+    report_id = Column(Integer, ForeignKey("{0}.id".format(Report.__tablename__), ondelete="CASCADE"),
+                       primary_key=True)
+    version = Column(Integer, nullable=False)
+    functions = Column(JSONType, nullable=False, default=list)
+    report = relationship(Report, backref=backref("cluster_signature", uselist=False, passive_deletes=True))
+
+
+# Inverted index of clustering signatures. Function names are hashed
+# because symbol names are too long to be indexed.
+class ReportClusterFunction(GenericTable):
+    __tablename__ = "reportclusterfunctions"
+
+    report_id = Column(Integer, ForeignKey("{0}.report_id".format(ReportClusterSignature.__tablename__),
+                                           ondelete="CASCADE"),
+                       primary_key=True)
+    function_hash = Column(String(40), nullable=False, primary_key=True, index=True)
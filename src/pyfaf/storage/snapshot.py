@@ -0,0 +1,65 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+from sqlalchemy import case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql.dml import Insert
+from sqlalchemy.orm import backref, relationship
+from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.types import DateTime, Integer
+
+from .generic_table import GenericTable
+from .jsontype import JSONType
+from .problem import Problem
+
+
+class ProblemSnapshot(GenericTable):
+    __tablename__ = "problemsnapshots"
+
+    problem_id = Column(Integer, ForeignKey("{0}.id".format(Problem.__tablename__), ondelete="CASCADE"),
+                        primary_key=True)
+    # format of `data`, see pyfaf.snapshots.SNAPSHOT_VERSION
+    version = Column(Integer, nullable=False)
+    created = Column(DateTime, nullable=False)
+    # time the problem's reports changed since the snapshot was created,
+    # NULL while the snapshot is up to date
+    changed = Column(DateTime, nullable=True)
+    data = Column(JSONType, nullable=False)
+    problem = relationship(Problem, backref=backref("snapshot", uselist=False, passive_deletes=True))
+
+    @classmethod
+    def save_statement(cls, version, snapshots, created, changed=None) -> Insert:
+        """
+        Return a statement storing `snapshots`, a dictionary mapping
+        problem IDs to snapshot data built at `created`. `changed` maps
+        problem IDs to the marks of their stale snapshots read before
+        building them. Snapshots marked again since are kept stale.
+        """
+
+        changed = changed or {}
+        stmt = insert(cls.__table__).values(
+            [{"problem_id": problem_id, "version": version, "created": created,
+              "changed": changed.get(problem_id), "data": data}
+             for problem_id, data in sorted(snapshots.items())])
+        column = cls.__table__.c.changed
+        return stmt.on_conflict_do_update(
+            index_elements=["problem_id"],
+            set_={"version": stmt.excluded.version,
+                  "created": stmt.excluded.created,
+                  "data": stmt.excluded.data,
+                  "changed": case([(column.is_distinct_from(stmt.excluded.changed), column)],
+                                  else_=None)})
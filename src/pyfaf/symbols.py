@@ -0,0 +1,192 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from pyfaf.common import FafError
+from pyfaf.config import config
+from pyfaf.queries import (get_ssources_by_bpo,
+                           get_ssources_by_symbol_path_offset,
+                           get_symbols_by_name_path,
+                           insert_ignore_conflicts)
+from pyfaf.storage import Symbol, SymbolSource
+from pyfaf.utils.cache import IdentityCache
+
+__all__ = ["SymbolResolver", "symbol_cache"]
+
+
+# Symbols referenced by frames of recently saved uReports
+symbol_cache = IdentityCache("symbol", Symbol,
+                             maxsize=int(config.get("cache.symbolsize", 65536)),
+                             ttl=float(config.get("cache.lookupttl", 3600)) or None)
+
+
+class SymbolResolver:
+    """
+    Resolve pyfaf.storage.Symbol and pyfaf.storage.SymbolSource objects
+    of backtrace frames in bulk.
+
+    Frames of one or more uReports are registered first and then resolved
+    together: existing rows are fetched with a single keyed query per table,
+    missing rows are inserted with a single statement per table. Rows
+    inserted by a concurrent process in the meantime are skipped and fetched
+    instead. Symbols are also kept in `symbol_cache` across reports.
+
+    Symbol sources are identified either by (build id, path, offset),
+    or by (symbol, path, offset) for problem types without build ids.
+    """
+
+    def __init__(self, db) -> None:
+        self.db = db
+        # (name, normalized path) -> Symbol
+        self._symbols: Dict[Tuple[str, str], Optional[Symbol]] = {}
+        # ("bpo", build id, path, offset) or ("symbol", symbol key, path, offset)
+        # -> [SymbolSource, symbol key, additional column values]
+        self._ssources: Dict[Tuple, List] = {}
+
+    def add_symbol(self, name, normalized_path) -> Tuple[str, str]:
+        """
+        Register a symbol and return its key.
+        """
+
+        key = (name, normalized_path)
+        self._symbols.setdefault(key, None)
+        return key
+
+    def add_ssource_by_bpo(self, build_id, path, offset, symbol=None,
+                           **values) -> Tuple:
+        """
+        Register a symbol source identified by build id, path and offset.
+        `symbol` is an optional key returned by `add_symbol` that is assigned
+        to a newly created symbol source together with column `values`.
+        Return the key of the symbol source.
+        """
+
+        key = ("bpo", build_id, path, offset)
+        self._ssources.setdefault(key, [None, symbol, values])
+        return key
+
+    def add_ssource_by_symbol(self, symbol, path, offset, **values) -> Tuple:
+        """
+        Register a symbol source identified by the symbol key returned
+        by `add_symbol`, path and offset. Column `values` are used when
+        a new symbol source is created. Return the key of the symbol source.
+        """
+
+        key = ("symbol", symbol, path, offset)
+        self._ssources.setdefault(key, [None, symbol, values])
+        return key
+
+    def get_symbol(self, key) -> Symbol:
+        """
+        Return a resolved symbol by its key.
+        """
+
+        return self._symbols[key]
+
+    def get_ssource(self, key) -> SymbolSource:
+        """
+        Return a resolved symbol source by its key.
+        """
+
+        return self._ssources[key][0]
+
+    def resolve(self) -> None:
+        """
+        Fetch or create all registered symbols and symbol sources
+        that have not been resolved yet.
+        """
+
+        self._resolve_symbols()
+        self._resolve_ssources()
+
+    def _resolve_symbols(self) -> None:
+        missing = []
+        for key, db_symbol in self._symbols.items():
+            if db_symbol is None:
+                db_symbol = symbol_cache.lookup(self.db, key)
+                if db_symbol is None:
+                    missing.append(key)
+                else:
+                    self._symbols[key] = db_symbol
+
+        if not missing:
+            return
+
+        found = get_symbols_by_name_path(self.db, missing)
+        new = sorted(key for key in missing if key not in found)
+        if new:
+            insert_ignore_conflicts(self.db, Symbol,
+                                    [{"name": name, "normalized_path": path}
+                                     for name, path in new])
+            found.update(get_symbols_by_name_path(self.db, new))
+
+        for key in missing:
+            if key not in found:
+                raise FafError("Unable to store symbol '{0}' from '{1}'"
+                               .format(*key))
+
+            self._symbols[key] = found[key]
+            symbol_cache.store(key, found[key])
+
+    def _fetch_ssources(self, keys) -> Dict[Tuple, SymbolSource]:
+        bpo_keys = [key[1:] for key in keys if key[0] == "bpo"]
+        spo_keys = {(self._symbols[key[1]].id,) + key[2:]: key
+                    for key in keys if key[0] == "symbol"}
+
+        found = {("bpo",) + bpo: db_ssource for bpo, db_ssource
+                 in get_ssources_by_bpo(self.db, bpo_keys).items()}
+        found.update((spo_keys[spo], db_ssource) for spo, db_ssource
+                     in get_ssources_by_symbol_path_offset(self.db,
+                                                           spo_keys).items())
+        return found
+
+    def _new_ssource_row(self, key) -> Dict[str, Any]:
+        _, symbol, values = self._ssources[key]
+        row = {"build_id": key[1] if key[0] == "bpo" else None,
+               "path": key[2],
+               "offset": key[3],
+               "symbol_id": self._symbols[symbol].id if symbol else None}
+        row.update(values)
+        return row
+
+    def _resolve_ssources(self) -> None:
+        missing = [key for key, entry in self._ssources.items()
+                   if entry[0] is None]
+        if not missing:
+            return
+
+        found = self._fetch_ssources(missing)
+        new = [key for key in missing if key not in found]
+        if new:
+            rows = [self._new_ssource_row(key) for key in new]
+            # A multi-row insert requires the same columns in every row
+            columns = set().union(*rows)
+            rows = sorted(({column: row.get(column) for column in columns}
+                           for row in rows),
+                          key=lambda row: (row["build_id"] or "", row["path"],
+                                           row["offset"]))
+            insert_ignore_conflicts(self.db, SymbolSource, rows)
+            found.update(self._fetch_ssources(new))
+
+        for key in missing:
+            if key not in found:
+                raise FafError("Unable to store symbol source '{0}' "
+                               "at offset {1}".format(key[2], key[3]))
+
+            self._ssources[key][0] = found[key]
@@ -18,6 +18,7 @@
 
 import datetime
 
+from collections import defaultdict
 from typing import Any, Dict, Optional, Union
 
 from sqlalchemy.exc import IntegrityError
@@ -33,22 +34,29 @@ from pyfaf.config import config
 from pyfaf.opsys import systems
 from pyfaf.problemtypes import problemtypes
 from pyfaf.queries import (get_arch_by_name,
+                           get_archs_by_names,
                            get_bz_bug,
                            get_reportbz_by_major_version,
                            get_component_by_name,
+                           get_components_by_names,
                            get_contact_email,
                            get_history_day,
                            get_history_month,
                            get_history_week,
                            get_osrelease,
+                           get_osreleases_by_names,
                            get_mantis_bug,
                            get_report,
+                           get_reports_by_hashes,
                            get_report_contact_email,
                            get_reportarch,
                            get_reportreason,
                            get_reportosrelease,
                            get_bugtracker_by_name,
-                           get_reportbz)
+                           get_reportbz,
+                           mark_problem_snapshots_stale,
+                           update_history_rollups,
+                           upsert_counts)
 from pyfaf.storage import (Arch,
                            ContactEmail,
                            OpSysComponent,
@@ -67,11 +75,12 @@ from pyfaf.storage import (Arch,
                            ReportReason,
                            ReportURL,
                            column_len)
+from pyfaf.symbols import SymbolResolver
 from pyfaf.ureport_compat import ureport1to2
 
 log = log.getChild(__name__)
 
-__all__ = ["get_version", "save", "ureport2",
+__all__ = ["get_version", "save", "save_batch", "ureport2",
            "validate", "validate_attachment"]
 
 
@@ -193,7 +202,7 @@ def save_ureport2(db, ureport, create_component=False, timestamp=None, count=1)
     problemplugin = problemtypes[ureport["problem"]["type"]]
 
     db_osrelease = get_osrelease(db, osplugin.nice_name,
-                                 ureport["os"]["version"])
+                                 ureport["os"]["version"], cached=True)
     if db_osrelease is None:
         raise FafError("Operating system '{0} {1}' not found in storage"
                        .format(osplugin.nice_name, ureport["os"]["version"]))
@@ -203,7 +212,7 @@ def save_ureport2(db, ureport, create_component=False, timestamp=None, count=1)
     if db_report is None:
         component_name = problemplugin.get_component_name(ureport["problem"])
         db_component = get_component_by_name(db, component_name,
-                                             osplugin.nice_name)
+                                             osplugin.nice_name, cached=True)
         if db_component is None:
             if create_component:
                 log.info("Creating an unsupported component '{0}' in "
@@ -243,7 +252,8 @@ def save_ureport2(db, ureport, create_component=False, timestamp=None, count=1)
 
     db_reportosrelease.count += count
 
-    db_arch = get_arch_by_name(db, ureport["os"]["architecture"])
+    db_arch = get_arch_by_name(db, ureport["os"]["architecture"],
+                               cached=True)
     if db_arch is None:
         raise FafError("Architecture '{0}' is not supported"
                        .format(ureport["os"]["architecture"]))
@@ -324,6 +334,14 @@ def save_ureport2(db, ureport, create_component=False, timestamp=None, count=1)
 
     db.session.flush()
 
+    for period, date in [("day", day), ("week", week), ("month", month)]:
+        update_history_rollups(db, period, [(db_report.problem_id,
+                                             db_report.component_id,
+                                             db_osrelease.id, date, count)])
+
+    if db_report.problem_id is not None:
+        mark_problem_snapshots_stale(db, [db_report.problem_id])
+
     problemplugin.save_ureport_post_flush()
 
 
@@ -350,6 +368,249 @@ def save(db, ureport, create_component=False, timestamp=None, count=1) -> None:
     db.session.flush()
 
 
+def _history_rows(deltas, date_column):
+    """
+    Split accumulated history deltas into rows whose first uReport in the
+    batch was a serial one and the rest. The per-report path creates a new
+    history row with unique = 1 and increments it for every following
+    serial uReport, so the two groups need different conflict handling.
+    """
+
+    first_serial, first_other = [], []
+    for (report_id, osrelease_id, date), (count, first, serials) in deltas.items():
+        row = {"report_id": report_id,
+               "opsysrelease_id": osrelease_id,
+               date_column: date,
+               "count": count,
+               "unique": 1 + serials - first}
+        if first:
+            first_serial.append(row)
+        else:
+            first_other.append(row)
+
+    return first_serial, first_other
+
+
+def save_batch(db, ureports, create_component=False) -> Dict[int, FafError]:
+    """
+    Save a batch of valid uReports. `ureports` is a list of
+    (ureport, timestamp, count) tuples.
+
+    Reports, releases, architectures and components are resolved with
+    a few set-based queries for the whole batch. Counters of the per-report
+    tables are accumulated in memory and applied with multi-row upserts
+    at the end, producing the same counts as saving the uReports one by one.
+    All of them are written in a single transaction.
+
+    Return a dictionary mapping indices of the uReports that could not be
+    saved to the FafError describing the failure.
+    """
+
+    failed = {}
+    items = []
+    for i, (ureport, timestamp, count) in enumerate(ureports):
+        try:
+            ureport = ureport2(ureport)
+        except FafError as ex:
+            failed[i] = ex
+            continue
+
+        if timestamp is None:
+            timestamp = datetime.datetime.utcnow()
+
+        osplugin = systems[ureport["os"]["name"]]
+        problemplugin = problemtypes[ureport["problem"]["type"]]
+        items.append({
+            "index": i,
+            "ureport": ureport,
+            "timestamp": timestamp,
+            "count": count,
+            "osplugin": osplugin,
+            "problemplugin": problemplugin,
+            "hash": problemplugin.hash_ureport(ureport["problem"]),
+        })
+
+    db_osreleases = get_osreleases_by_names(
+        db, {(item["osplugin"].nice_name, item["ureport"]["os"]["version"])
+             for item in items})
+    db_archs = get_archs_by_names(
+        db, {item["ureport"]["os"]["architecture"] for item in items})
+    db_reports = get_reports_by_hashes(db, {item["hash"] for item in items})
+    db_components = get_components_by_names(
+        db, {(item["osplugin"].nice_name,
+              item["problemplugin"].get_component_name(item["ureport"]["problem"]))
+             for item in items if item["hash"] not in db_reports})
+
+    # Report counts and the per-release, arch, reason and history counts
+    # are committed together, also when the session runs in autocommit mode
+    with db.session.begin(subtransactions=True):
+        # Frames of new reports are resolved together for the whole batch
+        resolver = SymbolResolver(db)
+        for item in items:
+            if item["hash"] not in db_reports:
+                item["problemplugin"].collect_symbols(item["ureport"]["problem"],
+                                                      resolver)
+        try:
+            resolver.resolve()
+        except FafError as ex:
+            # The affected uReports fail individually below
+            log.warning("Unable to resolve symbols of the batch: {0}".format(str(ex)))
+
+        osrelease_deltas = defaultdict(int)
+        arch_deltas = defaultdict(int)
+        reason_deltas = defaultdict(int)
+        history_deltas = {"day": {}, "week": {}, "month": {}}
+
+        for item in items:
+            ureport = item["ureport"]
+            timestamp = item["timestamp"]
+            count = item["count"]
+            osplugin = item["osplugin"]
+            problemplugin = item["problemplugin"]
+            report_hash = item["hash"]
+
+            db_osrelease = db_osreleases.get((osplugin.nice_name,
+                                              ureport["os"]["version"]))
+            if db_osrelease is None:
+                failed[item["index"]] = FafError(
+                    "Operating system '{0} {1}' not found in storage"
+                    .format(osplugin.nice_name, ureport["os"]["version"]))
+                continue
+
+            db_arch = db_archs.get(ureport["os"]["architecture"])
+            if db_arch is None:
+                failed[item["index"]] = FafError(
+                    "Architecture '{0}' is not supported"
+                    .format(ureport["os"]["architecture"]))
+                continue
+
+            db_report = db_reports.get(report_hash)
+            if db_report is None:
+                component_name = problemplugin.get_component_name(ureport["problem"])
+                db_component = db_components.get((osplugin.nice_name, component_name))
+                if db_component is None:
+                    if not create_component:
+                        failed[item["index"]] = FafError(
+                            "Unknown component '{0}' in operating system {1}"
+                            .format(component_name, osplugin.nice_name))
+                        continue
+
+                    log.info("Creating an unsupported component '{0}' in "
+                             "operating system '{1}'".format(component_name,
+                                                             osplugin.nice_name))
+                    db_component = OpSysComponent()
+                    db_component.name = component_name
+                    db_component.opsys = db_osrelease.opsys
+                    db.session.add(db_component)
+                    db_components[(osplugin.nice_name, component_name)] = db_component
+
+                db_report = Report()
+                db_report.type = problemplugin.name
+                db_report.first_occurrence = timestamp
+                db_report.last_occurrence = timestamp
+                db_report.count = 0
+                db_report.component = db_component
+                db.session.add(db_report)
+
+                db_report_hash = ReportHash()
+                db_report_hash.report = db_report
+                db_report_hash.hash = report_hash
+                db.session.add(db_report_hash)
+
+                db_reports[report_hash] = db_report
+
+            try:
+                osplugin.save_ureport(db, db_report, ureport["os"],
+                                      ureport["packages"], count=count)
+                problemplugin.save_ureport(db, db_report, ureport["problem"],
+                                           count=count, resolver=resolver)
+            except FafError as ex:
+                failed[item["index"]] = ex
+                continue
+
+            # Plugins look up their rows by report, so anything they have just
+            # created must be visible to the next uReport of the batch.
+            if db.session.new:
+                db.session.flush()
+
+            problemplugin.save_ureport_post_flush()
+
+            db_report.first_occurrence = min(timestamp, db_report.first_occurrence)
+            db_report.last_occurrence = max(timestamp, db_report.last_occurrence)
+
+            # Deltas are keyed by report ids, several hashes of the batch may
+            # belong to the same report. The report has been flushed above.
+            report_id = db_report.id
+            osrelease_deltas[(report_id, db_osrelease.id)] += count
+            arch_deltas[(report_id, db_arch.id)] += count
+            reason_deltas[(report_id, ureport["reason"])] += count
+
+            day = timestamp.date()
+            serial = int(ureport["problem"].get("serial") == 1)
+            for period, date in [("day", day),
+                                 ("week", day - datetime.timedelta(days=day.weekday())),
+                                 ("month", day.replace(day=1))]:
+                key = (report_id, db_osrelease.id, date)
+                delta = history_deltas[period].get(key)
+                if delta is None:
+                    history_deltas[period][key] = [count, serial, serial]
+                else:
+                    delta[0] += count
+                    delta[2] += serial
+
+            # Update count as last, so that handlers listening to its "set" event
+            # have as much information as possible
+            db_report.count += count
+
+        db.session.flush()
+
+        reports_by_id = {db_report.id: db_report for db_report in db_reports.values()}
+
+        upsert_counts(db, ReportOpSysRelease,
+                      [{"report_id": report_id,
+                        "opsysrelease_id": osrelease_id,
+                        "count": count}
+                       for (report_id, osrelease_id), count in osrelease_deltas.items()],
+                      ["report_id", "opsysrelease_id"])
+
+        upsert_counts(db, ReportArch,
+                      [{"report_id": report_id,
+                        "arch_id": arch_id,
+                        "count": count}
+                       for (report_id, arch_id), count in arch_deltas.items()],
+                      ["report_id", "arch_id"])
+
+        upsert_counts(db, ReportReason,
+                      [{"report_id": report_id,
+                        "reason": reason,
+                        "count": count}
+                       for (report_id, reason), count in reason_deltas.items()],
+                      ["report_id", "reason"])
+
+        for period, hist_table in [("day", ReportHistoryDaily),
+                                   ("week", ReportHistoryWeekly),
+                                   ("month", ReportHistoryMonthly)]:
+            first_serial, first_other = _history_rows(history_deltas[period], period)
+            index_elements = ["report_id", "opsysrelease_id", period]
+
+            upsert_counts(db, hist_table, first_serial, index_elements,
+                          lambda c, excluded: {
+                              "unique": c["unique"] + excluded["unique"]})
+            upsert_counts(db, hist_table, first_other, index_elements,
+                          lambda c, excluded: {
+                              "unique": c["unique"] + excluded["unique"] - 1})
+
+            update_history_rollups(
+                db, period,
+                [(reports_by_id[report_id].problem_id, reports_by_id[report_id].component_id,
+                  osrelease_id, date, count)
+                 for (report_id, osrelease_id, date), (count, _, _) in history_deltas[period].items()])
+
+        mark_problem_snapshots_stale(db, [db_report.problem_id for db_report in db_reports.values()])
+
+    return failed
+
+
 def ureport2(ureport) -> Dict[str, Any]:
     """
     Takes `ureport` and converts it to uReport2 if necessary.
@@ -562,12 +823,20 @@ def valid_known_type(known_type) -> bool:
     return True
 
 
-def is_known(ureport, db, return_report=False, opsysrelease_id=None) -> Optional[Union[bool, Report]]:
-    ureport = ureport2(ureport)
-    validate(ureport)
+def is_known(ureport, db, return_report=False, opsysrelease_id=None,
+             report_hash=None) -> Optional[Union[bool, Report]]:
+    """
+    Check whether a report matching `ureport` is known. Callers that have
+    already validated the uReport2 and computed its hash pass `report_hash`
+    to skip both.
+    """
 
-    problemplugin = problemtypes[ureport["problem"]["type"]]
-    report_hash = problemplugin.hash_ureport(ureport["problem"])
+    if report_hash is None:
+        ureport = ureport2(ureport)
+        validate(ureport)
+
+        problemplugin = problemtypes[ureport["problem"]["type"]]
+        report_hash = problemplugin.hash_ureport(ureport["problem"])
 
     known_type = []
 
@@ -0,0 +1,206 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import functools
+import threading
+import time
+
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from pyfaf.config import config
+
+__all__ = ["IdentityCache", "cache_stats", "cached_classes", "cached_lookup",
+           "invalidate_caches"]
+
+
+# All lookup caches created in this process, indexed by name
+_caches: Dict[str, "IdentityCache"] = {}
+
+
+def _snapshot(obj) -> Any:
+    """
+    Return a detached copy of the ORM object `obj` holding the values
+    of its column attributes. The copy never belongs to any session
+    and may be merged into an arbitrary one without reloading.
+    """
+
+    mapper = inspect(obj).mapper
+    copy = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(copy, attr.key, getattr(obj, attr.key))
+
+    make_transient_to_detached(copy)
+    return copy
+
+
+class IdentityCache:
+    """
+    Bounded least-recently-used cache of rows that almost never change,
+    such as architectures, operating systems or their releases.
+
+    Rows are stored as detached snapshots and merged into the caller's
+    session on every hit, so one cache can be shared by multiple sessions
+    (e.g. web requests). Negative results are not cached because the rows
+    may be created by a different process at any time.
+    """
+
+    def __init__(self, name, cls, maxsize=1024, ttl=3600) -> None:
+        self.name = name
+        self.cls = cls
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, db, key: Hashable) -> Any:
+        """
+        Return the row cached under `key` attached to `db.session`
+        or None if it is not cached.
+        """
+
+        snapshot = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or
+                                      entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                snapshot = entry[1]
+            else:
+                self.misses += 1
+
+        if snapshot is None:
+            return None
+
+        return db.session.merge(snapshot, load=False)
+
+    def store(self, key: Hashable, obj) -> None:
+        """
+        Cache a snapshot of the persistent row `obj` under `key`.
+        Rows that have not been flushed yet are ignored.
+        """
+
+        if inspect(obj).identity is None:
+            return
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, _snapshot(obj))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, db, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the row cached under `key` attached to `db.session`.
+        Call `loader` to fetch the row from the database on a miss.
+        """
+
+        obj = self.lookup(db, key)
+        if obj is None:
+            obj = loader()
+            if obj is not None:
+                self.store(key, obj)
+
+        return obj
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Drop the entry cached under `key` or all entries if `key` is None.
+        """
+
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return a dictionary with hit and miss counters and the current size.
+        """
+
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._entries)}
+
+
+def cached_lookup(name, cls) -> Callable[..., Callable]:
+    """
+    Decorate a `func(db, *args)` query returning a single `cls` row
+    or None. The decorated function accepts an additional `cached`
+    keyword argument. When it is True, the result is served from
+    an IdentityCache keyed by `args`.
+
+    Cache size and time to live in seconds are read from the
+    `cache.lookupsize` and `cache.lookupttl` configuration options.
+    """
+
+    maxsize = int(config.get("cache.lookupsize", 1024))
+    ttl = float(config.get("cache.lookupttl", 3600)) or None
+    cache = IdentityCache(name, cls, maxsize=maxsize, ttl=ttl)
+
+    def decorator(func) -> Callable:
+        @functools.wraps(func)
+        def wrapper(db, *args, cached=False) -> Any:
+            if not cached:
+                return func(db, *args)
+
+            return cache.get(db, args, lambda: func(db, *args))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def cached_classes() -> FrozenSet[type]:
+    """
+    Return the set of ORM classes held by lookup caches.
+    """
+
+    return frozenset(cache.cls for cache in _caches.values())
+
+
+def invalidate_caches(classes=None) -> None:
+    """
+    Drop all cached rows of the given ORM `classes`
+    or of all lookup caches if `classes` is None.
+    """
+
+    for cache in _caches.values():
+        if classes is None or cache.cls in classes:
+            cache.invalidate()
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Return hit/miss statistics of all lookup caches indexed by cache name.
+    """
+
+    return {name: cache.stats() for name, cache in sorted(_caches.items())}
@@ -0,0 +1,158 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+import hashlib
+import os
+import shutil
+import time
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pyfaf.common import FafError, ensure_dirs, log
+from pyfaf.utils.hash import hash_file
+
+log = log.getChild(__name__)
+
+__all__ = ["Downloader"]
+
+
+class Downloader:
+    """
+    Download files concurrently over kept-alive HTTP connections.
+
+    A file is downloaded to `<partdir>/<hash of the URL>.part` first, so
+    an attempt that failed, even in a previous run, is resumed with
+    a range request. Complete files are verified against the expected
+    checksum before they are moved to their destination. `file://` URLs
+    are copied from the local file system.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, partdir: str, workers: int = 4, tries: int = 3,
+                 delay: float = 5, backoff: float = 3, timeout: float = 60) -> None:
+        self.partdir = partdir
+        self.tries = tries
+        self.delay = delay
+        self.backoff = backoff
+        self.timeout = timeout
+
+        ensure_dirs([self.partdir])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def get_part_path(self, url: str) -> str:
+        return os.path.join(self.partdir,
+                            "{0}.part".format(hashlib.sha1(url.encode("utf-8")).hexdigest()))
+
+    def download(self, url: str, dest: str, checksum: Optional[Tuple[str, str]] = None,
+                 maxlen: int = 0) -> None:
+        """
+        Download `url` to `dest`. `checksum` is an optional tuple of checksum
+        type and expected hex digest, files longer than a positive `maxlen`
+        are refused. Retries with exponential backoff and raises FafError
+        when all attempts fail or the file cannot be moved to `dest`.
+
+        Safe to call from multiple threads for distinct URLs.
+        """
+
+        part = self.get_part_path(url)
+        delay = self.delay
+
+        for attempt in range(1, self.tries + 1):
+            try:
+                self._fetch(url, part)
+                self._verify(part, checksum)
+                break
+            except (OSError, requests.RequestException, FafError) as ex:
+                if attempt == self.tries:
+                    raise FafError("Unable to download '{0}': {1}".format(url, ex)) from ex
+
+                log.warning("Download of '%s' failed, retrying in %d seconds %d/%d: %s",
+                            url, delay, attempt, self.tries, ex)
+                time.sleep(delay)
+                delay *= self.backoff
+
+        if os.path.getsize(part) > maxlen > 0:
+            os.unlink(part)
+            raise FafError("'{0}' is longer than {1} bytes".format(url, maxlen))
+
+        try:
+            shutil.move(part, dest)
+        except OSError as ex:
+            raise FafError("Unable to move '{0}' to '{1}': {2}".format(url, dest, ex)) from ex
+
+    def _fetch(self, url: str, part: str) -> None:
+        offset = 0
+        if os.path.isfile(part):
+            offset = os.path.getsize(part)
+
+        parsed = urlparse(url)
+        if parsed.scheme == "file":
+            with open(url2pathname(parsed.path), "rb") as src, open(part, "ab") as dest:
+                src.seek(offset)
+                shutil.copyfileobj(src, dest, self.CHUNK_SIZE)
+            return
+
+        headers = {}
+        if offset:
+            headers["Range"] = "bytes={0}-".format(offset)
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if offset and response.status_code == 416:
+                # The partial file is complete already, or broken, which
+                # the verification finds out
+                return
+
+            if response.status_code == 206 and offset:
+                mode = "ab"
+            elif response.status_code == 200:
+                # The server does not support ranges
+                mode = "wb"
+            else:
+                raise FafError("Unexpected HTTP response code {0}"
+                               .format(response.status_code))
+
+            with open(part, mode) as dest:
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    dest.write(chunk)
+
+    def _verify(self, part: str, checksum: Optional[Tuple[str, str]]) -> None:
+        if checksum is None:
+            return
+
+        checksum_type, expected = checksum
+        try:
+            digest = hash_file(part, checksum_type, self.CHUNK_SIZE)
+        except ValueError as ex:
+            raise FafError("Unsupported checksum type '{0}'".format(checksum_type)) from ex
+
+        if digest != expected.lower():
+            # Start over next time
+            os.unlink(part)
+            raise FafError("Checksum mismatch, expected {0} {1}, got {2}"
+                           .format(checksum_type, expected, digest))
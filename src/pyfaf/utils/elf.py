@@ -0,0 +1,124 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+import mmap
+import struct
+from typing import Generator, Tuple
+
+from pyfaf.common import FafError
+
+__all__ = ["iter_elf_symbols", "STT_NOTYPE", "STT_FUNC"]
+
+SHT_SYMTAB = 2
+SHT_DYNSYM = 11
+
+SHN_UNDEF = 0
+
+STT_NOTYPE = 0
+STT_FUNC = 2
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+
+# (offset of e_shoff, format of e_shoff, offset of e_shentsize, section header, symbol)
+# for every ELF class, all without the byte order
+ELF_LAYOUTS = {
+    ELFCLASS32: (0x20, "I", 0x2E, "IIIIIIIIII", "IIIBBH"),
+    ELFCLASS64: (0x28, "Q", 0x3A, "IIQQQQIIQQ", "IBBHQQ"),
+}
+
+
+def _read_name(data, offset) -> str:
+    end = data.find(b"\0", offset)
+    if end < 0:
+        raise FafError("Unterminated string in ELF string table")
+
+    return data[offset:end].decode("utf-8", errors="replace")
+
+
+def _iter_symbols(data, types) -> Generator[Tuple[str, int], None, None]:
+    if data[:4] != b"\x7fELF":
+        raise FafError("Not an ELF file")
+
+    elfclass, byteorder = data[4], data[5]
+    if elfclass not in ELF_LAYOUTS:
+        raise FafError("Unknown ELF class {0}".format(elfclass))
+
+    shoff_offset, shoff_format, shentsize_offset, shdr_format, sym_format = ELF_LAYOUTS[elfclass]
+    endian = "<" if byteorder == ELFDATA2LSB else ">"
+    shdr = struct.Struct(endian + shdr_format)
+    sym = struct.Struct(endian + sym_format)
+
+    shoff, = struct.unpack_from(endian + shoff_format, data, shoff_offset)
+    shentsize, shnum, _ = struct.unpack_from(endian + "HHH", data, shentsize_offset)
+    if shoff == 0:
+        return
+
+    if shentsize != shdr.size:
+        raise FafError("Unexpected ELF section header size {0}".format(shentsize))
+
+    if shnum == 0:
+        # Extended numbering, the real count is the size of the first section
+        shnum = shdr.unpack_from(data, shoff)[5]
+
+    # (type, offset, size, link, entsize) of all sections
+    sections = []
+    for i in range(shnum):
+        _, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, sh_entsize = \
+            shdr.unpack_from(data, shoff + i * shdr.size)
+        sections.append((sh_type, sh_offset, sh_size, sh_link, sh_entsize))
+
+    for sh_type, sh_offset, sh_size, sh_link, sh_entsize in sections:
+        if sh_type not in (SHT_SYMTAB, SHT_DYNSYM) or sh_link >= len(sections):
+            continue
+
+        if sh_entsize != sym.size:
+            raise FafError("Unexpected ELF symbol size {0}".format(sh_entsize))
+
+        strtab_offset = sections[sh_link][1]
+        for entry in sym.iter_unpack(data[sh_offset:sh_offset + sh_size - sh_size % sym.size]):
+            if elfclass == ELFCLASS64:
+                st_name, st_info, _, st_shndx, st_value, _ = entry
+            else:
+                st_name, st_value, _, st_info, _, st_shndx = entry
+
+            if st_name == 0 or st_shndx == SHN_UNDEF or st_info & 0xf not in types:
+                continue
+
+            yield _read_name(data, strtab_offset + st_name), st_value
+
+
+def iter_elf_symbols(path, types=(STT_NOTYPE, STT_FUNC)) -> Generator[Tuple[str, int], None, None]:
+    """
+    Yield (name, value) tuples of symbols defined in the symbol tables
+    of the ELF file at `path` whose type is one of `types`. The file is
+    memory-mapped and only the symbol and string tables are read.
+    Raises FafError if the file is not a valid ELF file.
+    """
+
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as ex:
+            raise FafError("Unable to map '{0}': {1}".format(path, ex)) from ex
+
+    with data:
+        try:
+            yield from _iter_symbols(data, types)
+        except struct.error as ex:
+            raise FafError("Malformed ELF file '{0}': {1}".format(path, ex)) from ex
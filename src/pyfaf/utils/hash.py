@@ -18,7 +18,26 @@
 
 import hashlib
 
-__all__ = ["hash_list", "hash_path"]
+__all__ = ["hash_file", "hash_list", "hash_path"]
+
+# Checksum types of RPM repository metadata known to hashlib by a different name
+HASH_TYPE_ALIASES = {"sha": "sha1"}
+
+
+def hash_file(path, hash_type="sha256", bufsize=1 << 16) -> str:
+    """
+    Return hex digest of the contents of the file at `path`.
+
+    `hash_type` is a name known to hashlib or a checksum type used in RPM
+    repository metadata. Raises ValueError for unknown types.
+    """
+
+    digest = hashlib.new(HASH_TYPE_ALIASES.get(hash_type, hash_type))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bufsize), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
 
 
 def hash_list(inlist) -> str:
@@ -16,15 +16,16 @@
 # You should have received a copy of the GNU General Public License
 # along with faf.  If not, see <http://www.gnu.org/licenses/>.
 
+import json
 import re
 
-from typing import Dict, List
+from typing import Any, Dict, Generator, Iterable, List
 
 from rpm import labelCompare
 
 BOOL_TRUE_STRINGS = ["1", "y", "t", "yes", "true"]
 
-__all__ = ["parse_nvra", "str2bool", "words2list"]
+__all__ = ["iter_json_array", "parse_nvra", "str2bool", "words2list"]
 
 
 def parse_nvra(pkg) -> Dict[str, str]:
@@ -114,3 +115,52 @@ def signal2name(signal, with_number=False) -> str:
         return SIGNAL_TO_NAME_DICT[int(signal)]+number
     except (ValueError, KeyError):
         return "UNKNOWN_SIGNAL"+number
+
+
+def iter_json_array(chunks: Iterable[str]) -> Generator[Any, None, None]:
+    """
+    Yield items of a JSON array read from `chunks` of text one by one,
+    without holding the whole document in memory.
+
+    Raises ValueError if the document is not a JSON array or ends early.
+    """
+
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    started = False
+    for chunk in chunks:
+        buf = buf[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos == len(buf):
+                break
+
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # the item continues in the next chunk
+                break
+
+            # a number might continue in the next chunk as well,
+            # the closing bracket is always yet to come
+            if end == len(buf):
+                break
+
+            pos = end
+            yield item
+
+    raise ValueError("Unexpected end of JSON array")
@@ -1,22 +1,20 @@
-from collections import defaultdict
 import datetime
 from itertools import groupby
 import json
 import logging
 from operator import itemgetter
-import random
 
 from typing import List, Union
 from dateutil.relativedelta import relativedelta
 from flask import (Blueprint, render_template, request, abort, url_for,
                    redirect, jsonify, g, flash, Response)
 from werkzeug.wrappers import Response as WzResponse
-from sqlalchemy import desc, func, and_, or_
+from sqlalchemy import desc, func, and_, or_, tuple_
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
 
 from pyfaf.common import FafError
-from pyfaf.storage import (Arch,
-                           Build,
+from pyfaf.storage import (Build,
                            BuildComponent,
                            BzBug,
                            MantisBug,
@@ -38,20 +36,21 @@ from pyfaf.storage import (Arch,
                            ReportHistoryDaily,
                            ReportHistoryWeekly,
                            ReportHistoryMonthly,
-                           ReportExecutable,
                            ReportHash,
                            ReportMantis,
-                           ReportOpSysRelease,
                            ReportPackage,
                            ReportUnknownPackage,
                            Symbol,
                            SymbolSource)
-from pyfaf.queries import (get_history_target, get_report,
+from pyfaf.btcache import load_cached_reports
+from pyfaf.bugtrackers import report_backref_names
+from pyfaf.queries import (get_history_rollup_target, get_history_target, get_report,
                            get_external_faf_instances,
-                           get_report_opsysrelease)
-from pyfaf.solutionfinders import find_solution
+                           get_reports_opsysreleases)
+from pyfaf.snapshots import get_problem_snapshot
+from pyfaf.solutionfinders import find_solutions_reports
 
-from webfaf.webfaf_main import db, flask_cache
+from webfaf.webfaf_main import db, response_cache
 from webfaf.forms import (ProblemFilterForm, BacktraceDiffForm,
                           ProblemComponents, component_names_to_ids)
 from webfaf.utils import (Pagination, request_wants_json, metric,
@@ -62,7 +61,7 @@ logger = logging.getLogger("webfaf.problems")
 
 
 # pylint: disable=too-many-arguments,dangerous-default-value
-def query_problems(_, hist_table,
+def query_problems(_, resolution,
                    opsysrelease_ids=[], component_ids=[],
                    associate_id=None, arch_ids=[], exclude_taintflag_ids=[],
                    types=[], rank_filter_fn=None, post_process_fn=None,
@@ -70,67 +69,82 @@ def query_problems(_, hist_table,
                    since_version=None, since_release=None,
                    to_version=None, to_release=None,
                    probable_fix_osr_ids=[], bug_filter=None,
-                   limit=None, offset=None, solution=None) -> List[int]:
+                   limit=None, offset=None, solution=None,
+                   after=None, before=None) -> List[int]:
     """
-    Return problems ordered by history counts
+    Return problems ordered by history counts. `rank_filter_fn` is called
+    with the query summing the history and its date field. Pages are
+    selected either by `offset` or by the (count, id) tuples of the row
+    preceding the page (`after`) or following it (`before`).
     """
 
-    rank_query = (db.session.query(Problem.id.label("id"),
-                                   func.sum(hist_table.count).label("rank"))
-                  .join(Report, Report.problem_id == Problem.id)
-                  .join(hist_table))
+    hist_table, hist_field = get_history_rollup_target("problem", resolution)
+    rank_query = (db.session.query(hist_table.problem_id.label("id"),
+                                   func.sum(hist_table.count).label("rank")))
     if opsysrelease_ids:
         rank_query = rank_query.filter(
             hist_table.opsysrelease_id.in_(opsysrelease_ids))
 
     if rank_filter_fn:
-        rank_query = rank_filter_fn(rank_query)
-
-    if solution:
-        if not solution.data:
-            rank_query = rank_query.filter(or_(Report.max_certainty < 100, Report.max_certainty.is_(None)))
-
-    rank_query = rank_query.group_by(Problem.id).subquery()
+        rank_query = rank_filter_fn(rank_query, hist_field)
+
+    rank_query = rank_query.group_by(hist_table.problem_id)
+
+    if solution and not solution.data:
+        # Solutions are found for single reports, leave out occurrences
+        # of the solved ones
+        report_table, report_field = get_history_target(resolution)
+        solved_query = (db.session.query(Report.problem_id.label("id"),
+                                         func.sum(report_table.count).label("rank"))
+                        .join(report_table)
+                        .filter(Report.problem_id.isnot(None))
+                        .filter(Report.max_certainty >= 100))
+        if opsysrelease_ids:
+            solved_query = solved_query.filter(
+                report_table.opsysrelease_id.in_(opsysrelease_ids))
+
+        if rank_filter_fn:
+            solved_query = rank_filter_fn(solved_query, report_field)
+
+        solved_query = solved_query.group_by(Report.problem_id).subquery()
+        total_query = rank_query.subquery()
+        unsolved_rank = total_query.c.rank - func.coalesce(solved_query.c.rank, 0)
+        rank_query = (db.session.query(total_query.c.id.label("id"),
+                                       unsolved_rank.label("rank"))
+                      .outerjoin(solved_query, solved_query.c.id == total_query.c.id)
+                      .filter(unsolved_rank > 0))
+
+    rank_query = rank_query.subquery()
 
     final_query = (
         db.session.query(Problem,
                          rank_query.c.rank.label("count"),
                          rank_query.c.rank)
-        .filter(rank_query.c.id == Problem.id)
-        .order_by(desc(rank_query.c.rank)))
+        .filter(rank_query.c.id == Problem.id))
 
     if component_ids:
-        comp_query = (
-            db.session.query(ProblemComponent.problem_id.label("problem_id"))
+        final_query = final_query.filter(
+            db.session.query(ProblemComponent)
+            .filter(ProblemComponent.problem_id == Problem.id)
             .filter(ProblemComponent.component_id.in_(component_ids))
-            .distinct(ProblemComponent.problem_id)
-            .subquery())
-
-        final_query = final_query.filter(Problem.id == comp_query.c.problem_id)
+            .exists())
 
     if associate_id:
-        assoc_query = (
-            db.session.query(ProblemComponent.problem_id.label("problem_id"))
-            .distinct(ProblemComponent.problem_id)
-            .join(OpSysComponent)
-            .join(OpSysComponentAssociate)
-            .filter(
-                OpSysComponentAssociate.associatepeople_id ==
-                associate_id)
-            .subquery())
-
         final_query = final_query.filter(
-            Problem.id == assoc_query.c.problem_id)
+            db.session.query(ProblemComponent)
+            .join(OpSysComponentAssociate,
+                  OpSysComponentAssociate.opsyscomponent_id == ProblemComponent.component_id)
+            .filter(ProblemComponent.problem_id == Problem.id)
+            .filter(OpSysComponentAssociate.associatepeople_id == associate_id)
+            .exists())
 
     if arch_ids:
-        arch_query = (
-            db.session.query(Report.problem_id.label("problem_id"))
+        final_query = final_query.filter(
+            db.session.query(Report)
             .join(ReportArch)
+            .filter(Report.problem_id == Problem.id)
             .filter(ReportArch.arch_id.in_(arch_ids))
-            .distinct(Report.problem_id)
-            .subquery())
-
-        final_query = final_query.filter(Problem.id == arch_query.c.problem_id)
+            .exists())
 
     if exclude_taintflag_ids:
         etf_sq1 = (
@@ -142,21 +156,17 @@ def query_problems(_, hist_table,
             .filter(~etf_sq1.exists())
             .filter(Report.id == ReportBacktrace.report_id))
         etf_sq3 = (
-            db.session.query(Report.problem_id.label("problem_id"))
+            db.session.query(Report)
             .filter(etf_sq2.exists())
-            .filter(Problem.id == Report.problem_id)
-            .distinct(Report.problem_id)
-            .subquery())
-        final_query = final_query.filter(Problem.id == etf_sq3.c.problem_id)
+            .filter(Problem.id == Report.problem_id))
+        final_query = final_query.filter(etf_sq3.exists())
 
     if types:
-        type_query = (
-            db.session.query(Report.problem_id.label("problem_id"))
+        final_query = final_query.filter(
+            db.session.query(Report)
+            .filter(Report.problem_id == Problem.id)
             .filter(Report.type.in_(types))
-            .distinct(Report.problem_id)
-            .subquery())
-
-        final_query = final_query.filter(Problem.id == type_query.c.problem_id)
+            .exists())
 
     if function_names or binary_names or source_file_names:
         names_query = (
@@ -278,13 +288,12 @@ def query_problems(_, hist_table,
         final_query = final_query.filter(Problem.id == ver_sq.c.problem_id)
 
     if probable_fix_osr_ids:
-        pf_query = (
-            db.session.query(ProblemOpSysRelease.problem_id.label("problem_id"))
+        final_query = final_query.filter(
+            db.session.query(ProblemOpSysRelease)
+            .filter(ProblemOpSysRelease.problem_id == Problem.id)
             .filter(ProblemOpSysRelease.opsysrelease_id.in_(probable_fix_osr_ids))
             .filter(ProblemOpSysRelease.probable_fix_build_id.isnot(None))
-            .distinct(ProblemOpSysRelease.problem_id)
-            .subquery())
-        final_query = final_query.filter(Problem.id == pf_query.c.problem_id)
+            .exists())
 
     if bug_filter == "HAS_BUG":
         # Has bugzilla
@@ -382,12 +391,24 @@ def query_problems(_, hist_table,
         # unions and intersects so we need to access through items()
         final_query = final_query.filter(Problem.id == list(bug_query.c.items())[0][1])
 
+    if after is not None:
+        final_query = final_query.filter(tuple_(rank_query.c.rank, Problem.id) < tuple_(*after))
+    elif before is not None:
+        final_query = final_query.filter(tuple_(rank_query.c.rank, Problem.id) > tuple_(*before))
+
+    if before is not None:
+        final_query = final_query.order_by(rank_query.c.rank, Problem.id)
+    else:
+        final_query = final_query.order_by(desc(rank_query.c.rank), desc(Problem.id))
+
     if limit > 0:
         final_query = final_query.limit(limit)
-    if offset >= 0:
+    if offset >= 0 and after is None and before is None:
         final_query = final_query.offset(offset)
 
     problem_tuples = final_query.all()
+    if before is not None:
+        problem_tuples.reverse()
 
     if post_process_fn:
         problem_tuples = post_process_fn(problem_tuples)
@@ -419,53 +440,70 @@ def get_problems(filter_form, pagination) -> List[int]:
         resolution = "weekly"
     else:
         resolution = "monthly"
-    hist_table, hist_field = get_history_target(resolution)
 
     probable_fix_osr_ids = [
         osr.id for osr in (filter_form.probable_fix_osrs.data or [])]
 
-    p = query_problems(db,
-                       hist_table,
-                       opsysrelease_ids,
-                       component_ids,
-                       associate_id,
-                       arch_ids,
-                       exclude_taintflag_ids,
-                       types,
-                       lambda query: (
-                           query.filter(hist_field >= since_date)
-                           .filter(hist_field <= to_date)),
-                       function_names=filter_form.function_names.data,
-                       binary_names=filter_form.binary_names.data,
-                       source_file_names=filter_form.source_file_names.data,
-                       since_version=filter_form.since_version.data,
-                       since_release=filter_form.since_release.data,
-                       to_version=filter_form.to_version.data,
-                       to_release=filter_form.to_release.data,
-                       probable_fix_osr_ids=probable_fix_osr_ids,
-                       bug_filter=filter_form.bug_filter.data,
-                       limit=pagination.limit,
-                       offset=pagination.offset,
-                       solution=filter_form.solution)
+    after, before = pagination.get_cursors(int)
+
+    def query(after=None, before=None):
+        return query_problems(db,
+                              resolution,
+                              opsysrelease_ids,
+                              component_ids,
+                              associate_id,
+                              arch_ids,
+                              exclude_taintflag_ids,
+                              types,
+                              lambda query, hist_field: (
+                                  query.filter(hist_field >= since_date)
+                                  .filter(hist_field <= to_date)),
+                              function_names=filter_form.function_names.data,
+                              binary_names=filter_form.binary_names.data,
+                              source_file_names=filter_form.source_file_names.data,
+                              since_version=filter_form.since_version.data,
+                              since_release=filter_form.since_release.data,
+                              to_version=filter_form.to_version.data,
+                              to_release=filter_form.to_release.data,
+                              probable_fix_osr_ids=probable_fix_osr_ids,
+                              bug_filter=filter_form.bug_filter.data,
+                              limit=pagination.limit,
+                              offset=pagination.offset,
+                              solution=filter_form.solution,
+                              after=after,
+                              before=before)
+
+    p = query(after=after, before=before)
+    if before is not None and len(p) < pagination.limit:
+        # went back past the first page
+        pagination.before = None
+        p = query()
+
+    pagination.set_cursors(p, lambda problem: (problem.count, problem.id))
     return p
 
 
+# problem listings show report counts as well
+response_cache.register("problems.list_table_rows", ["problems", "reports"])
+
+
 def problems_list_table_rows_cache(filter_form, pagination) -> Response:
     key = ",".join((filter_form.caching_key(),
                     str(pagination.limit),
-                    str(pagination.offset)))
-
-    cached = flask_cache.get(key)
-    if cached is not None:
-        return cached
-
-    p = get_problems(filter_form, pagination)
+                    str(pagination.offset),
+                    str(pagination.after),
+                    str(pagination.before)))
 
-    cached = (render_template("problems/list_table_rows.html",
-                              problems=p), len(p))
+    def compute():
+        p = get_problems(filter_form, pagination)
+        return (render_template("problems/list_table_rows.html",
+                                problems=p), len(p),
+                pagination.first_cursor, pagination.last_cursor)
 
-    flask_cache.set(key, cached, timeout=60*60)
-    return cached
+    (list_table_rows, problem_count,
+     pagination.first_cursor, pagination.last_cursor) = \
+        response_cache.get("problems.list_table_rows", key, compute)
+    return list_table_rows, problem_count
 
 
 @problems.route("/")
@@ -503,8 +541,16 @@ def dashboard() -> str:
 def item(problem_id, component_names=None) -> Union[Response, str]:
     components_form = ProblemComponents()
 
-    problem = db.session.query(Problem).filter(
-        Problem.id == problem_id).first()
+    # Reports of the problem and what the page shows for each of them
+    # are loaded with a few queries
+    load_reports = selectinload(Problem.reports)
+    options = [load_reports.selectinload(Report.archive)]
+    options += [load_reports.selectinload(getattr(Report, backref_name))
+                for backref_name in report_backref_names]
+    problem = (db.session.query(Problem)
+               .options(*options)
+               .filter(Problem.id == problem_id)
+               .first())
 
     if problem is None:
         abort(404)
@@ -545,100 +591,31 @@ def item(problem_id, component_names=None) -> Union[Response, str]:
             db.session.rollback()
             flash(str(e), "error")
 
-    report_ids = [report.id for report in problem.reports]
+    snapshot = get_problem_snapshot(db, problem_id)
+    report_ids = snapshot["report_ids"]
 
     solutions = []
     equal_solution = lambda s: [x for x in solutions if s.cause == x.cause]
-    for report in problem.reports:
-        if report.max_certainty is not None:
-            osr = get_report_opsysrelease(db=db, report_id=report.id)
-            solution = find_solution(report, db=db, osr=osr)
-            if solution and not equal_solution(solution):
+    solved_reports = [report for report in problem.reports
+                      if report.max_certainty is not None]
+    osrs = get_reports_opsysreleases(db, [report.id for report in solved_reports])
+    report_solutions = find_solutions_reports(solved_reports, db=db, osrs=osrs)
+    for report in solved_reports:
+        if report.id in report_solutions:
+            solution = report_solutions[report.id][0]
+            if not equal_solution(solution):
                 solutions.append(solution)
 
-    sub = (db.session.query(ReportOpSysRelease.opsysrelease_id,
-                            func.sum(ReportOpSysRelease.count).label("cnt"))
-           .join(Report)
-           .filter(Report.id.in_(report_ids))
-           .group_by(ReportOpSysRelease.opsysrelease_id)
-           .subquery())
-
-    osreleases = (db.session.query(OpSysRelease, sub.c.cnt)
-                  .join(sub)
-                  .order_by(desc("cnt"))
-                  .all())
-
-    sub = (db.session.query(ReportArch.arch_id,
-                            func.sum(ReportArch.count).label("cnt"))
-           .join(Report)
-           .filter(Report.id.in_(report_ids))
-           .group_by(ReportArch.arch_id)
-           .subquery())
-
-    arches = (db.session.query(Arch, sub.c.cnt).join(sub)
-              .order_by(desc("cnt"))
-              .all())
-
-    exes = (db.session.query(ReportExecutable.path,
-                             func.sum(ReportExecutable.count).label("cnt"))
-            .join(Report)
-            .filter(Report.id.in_(report_ids))
-            .group_by(ReportExecutable.path)
-            .order_by(desc("cnt"))
-            .all())
-
-    sub = (db.session.query(ReportPackage.installed_package_id,
-                            func.sum(ReportPackage.count).label("cnt"))
-           .join(Report)
-           .filter(Report.id.in_(report_ids))
-           .group_by(ReportPackage.installed_package_id)
-           .subquery())
-    packages_known = db.session.query(Package, sub.c.cnt).join(sub).all()
-
-    packages_unknown = (db.session.query(ReportUnknownPackage,
-                                         ReportUnknownPackage.count)
-                        .join(Report)
-                        .filter(Report.id.in_(report_ids))).all()
-
-    packages = packages_known + packages_unknown
-
-    # creates a package_counts list with this structure:
-    # [(package name, count, [(package version, count in the version)])]
-    names = defaultdict(lambda: {"count": 0, "versions": defaultdict(int)})
-    for (pkg, cnt) in packages:
-        names[pkg.name]["name"] = pkg.name
-        names[pkg.name]["count"] += cnt
-        names[pkg.name]["versions"][pkg.evr()] += cnt
-
-    package_counts = []
-    for pkg in sorted(names.values(), key=itemgetter("count"), reverse=True):
-        package_counts.append((
-            pkg["name"],
-            pkg["count"],
-            sorted(pkg["versions"].items(), key=itemgetter(1), reverse=True)))
-
-    for report in problem.reports:
-        for backtrace in report.backtraces:
-            fid = 0
-            for frame in backtrace.frames:
-                fid += 1
-                frame.nice_order = fid
-
-    bt_hashes = (db.session.query(ReportHash.hash)
-                 .join(Report)
-                 .join(Problem)
-                 .filter(Problem.id == problem_id)
-                 .distinct(ReportHash.hash).all())
-
     daily_history = precompute_history(report_ids, "day")
     weekly_history = precompute_history(report_ids, "week")
     monthly_history = precompute_history(report_ids, "month")
 
     forward = {"problem": problem,
-               "osreleases": metric(osreleases),
-               "arches": metric(arches),
-               "exes": metric(exes),
-               "package_counts": package_counts,
+               "crash_function": snapshot["crash_function"],
+               "osreleases": metric(snapshot["osreleases"]),
+               "arches": metric(snapshot["arches"]),
+               "exes": metric(snapshot["exes"]),
+               "package_counts": snapshot["package_counts"],
                "solutions": solutions,
                "components_form": components_form,
                "daily_history": daily_history,
@@ -646,24 +623,39 @@ def item(problem_id, component_names=None) -> Union[Response, str]:
                "monthly_history": monthly_history
               }
 
-    if not bt_hashes:
+    if not snapshot["permalink_hashes"]:
         logger.warning("No backtrace hashes found for problem #%d", problem_id)
     else:
-        # Generate a permalink for this problem. We do this by uniformly picking
-        # (at most) 10 hashes from the list. This ensures the selected hashes are
-        # more or less representative of the problem.
-        k = min(len(bt_hashes), 10)
-        # A hint of determinism in this uncertain world.
-        r = random.Random(problem_id)
-        hashes_sampled = r.sample(bt_hashes, k)
-        permalink_query = "&".join("bth={}".format(bth) for (bth,) in hashes_sampled)
+        # Generate a permalink for this problem from the hashes picked
+        # when the snapshot was built
+        permalink_query = "&".join("bth={}".format(bth) for bth in snapshot["permalink_hashes"])
         forward["permalink_query"] = permalink_query
 
     if request_wants_json():
         del forward["components_form"]
-        return Response(response=json.dumps(forward, cls=WebfafJSONEncoder),
-                        status=200,
-                        mimetype="application/json")
+        del forward["crash_function"]
+        response = Response(response=json.dumps(forward, cls=WebfafJSONEncoder),
+                            status=200,
+                            mimetype="application/json")
+        # Keep the snapshot built by this request
+        db.session.commit()
+        return response
+
+    # Frames of the first backtraces of all shown reports are read at once
+    active_reports = problem.active_reports
+    cached_reports = load_cached_reports(db, [report.id for report in active_reports])
+    backtraces = {}
+    for report_id, cached_report in cached_reports.items():
+        frames = []
+        if cached_report.backtraces:
+            frames = cached_report.backtraces[0].frames
+
+        for fid, frame in enumerate(frames, start=1):
+            frame.nice_order = fid
+
+        backtraces[report_id] = frames
+
+    forward["backtraces"] = backtraces
 
     is_maintainer = is_problem_maintainer(db, g.user, problem)
     forward["is_maintainer"] = is_maintainer
@@ -676,7 +668,10 @@ def item(problem_id, component_names=None) -> Union[Response, str]:
         bt_diff_form.rhs.choices = bt_diff_form.lhs.choices
         forward["bt_diff_form"] = bt_diff_form
 
-    return render_template("problems/item.html", **forward)
+    result = render_template("problems/item.html", **forward)
+    # Keep the snapshot and the backtraces serialized by this request
+    db.session.commit()
+    return result
 
 
 @problems.route("/bthash/", endpoint="bthash_permalink", methods=["GET", "POST"])
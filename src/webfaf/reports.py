@@ -4,7 +4,7 @@ import logging
 import os
 import uuid
 from collections import defaultdict
-from itertools import groupby
+from itertools import groupby, islice
 from operator import attrgetter, itemgetter
 from urllib.parse import urlencode
 
@@ -12,8 +12,8 @@ from typing import Any, Dict, List, Tuple, Union
 
 from dateutil.relativedelta import relativedelta
 from flask import (Blueprint, render_template, request, abort, redirect,
-                   url_for, flash, jsonify, g, Response)
-from sqlalchemy import desc, literal, or_, inspect
+                   url_for, flash, jsonify, g, Response, stream_with_context)
+from sqlalchemy import desc, literal, or_, inspect, tuple_
 from sqlalchemy.exc import (SQLAlchemyError, DatabaseError, InterfaceError)
 from sqlalchemy.orm import joinedload
 
@@ -25,9 +25,7 @@ from pyfaf.storage import (AssociatePeople,
                            ContactEmail,
                            InvalidUReport,
                            Report,
-                           OpSys,
                            OpSysComponent,
-                           OpSysRelease,
                            OpSysComponentAssociate,
                            Package,
                            ReportHash,
@@ -56,8 +54,10 @@ from pyfaf.queries import (get_report,
                            get_crashed_package_for_report,
                            get_crashed_unknown_package_nevr_for_report,
                            get_bugtracker_report,
+                           get_osrelease,
                           )
 from pyfaf import ureport
+from pyfaf.btcache import load_cached_reports
 from pyfaf.opsys import systems
 from pyfaf.bugtrackers import bugtrackers
 from pyfaf.config import paths
@@ -73,66 +73,61 @@ from webfaf.utils import (Pagination,
                           metric,
                           request_wants_json,
                           is_component_maintainer)
-from webfaf.webfaf_main import db, flask_cache
+from webfaf.webfaf_main import db, response_cache
 from webfaf.forms import (ReportFilterForm, NewReportForm, NewAttachmentForm,
                           component_names_to_ids, AssociateBzForm, DissociateBzForm)
 
 reports = Blueprint("reports", __name__)
 
+# number of report hashes fetched from the database and sent at once by get_hash
+HASH_CHUNK_SIZE = 1000
+
+
 def query_reports(_, opsysrelease_ids=[], component_ids=[], #pylint: disable=dangerous-default-value
                   associate_id=None, arch_ids=[], types=[],
                   occurrence_since=None, occurrence_to=None,
                   limit=None, offset=None, order_by="last_occurrence",
-                  solution=None) -> List[int]:
-
-    comp_query = (db.session.query(Report.id.label("report_id"),
-                                   OpSysComponent.name.label("component"))
-                  .join(ReportOpSysRelease)
-                  .join(OpSysComponent)
-                  .distinct(Report.id)).subquery()
-
-    bt_query = (db.session.query(Report.id.label("report_id"),
-                                 ReportBacktrace.crashfn.label("crashfn"))
-                .join(ReportBacktrace)
-                .distinct(Report.id)
-                .subquery())
-
-    final_query = (db.session.query(Report, bt_query.c.crashfn)
-                   .join(comp_query, Report.id == comp_query.c.report_id)
-                   .join(bt_query, Report.id == bt_query.c.report_id)
-                   .order_by(desc(order_by)))
+                  solution=None, after=None, before=None) -> List[int]:
+    """
+    Return reports sorted by `order_by` and id in descending order. Pages
+    are selected either by `offset` or by the (value, id) tuples of the row
+    preceding the page (`after`) or following it (`before`).
+    """
+
+    order_column = getattr(Report, order_by)
+
+    final_query = (db.session.query(Report)
+                   .filter(db.session.query(ReportOpSysRelease)
+                           .filter(ReportOpSysRelease.report_id == Report.id)
+                           .exists())
+                   .filter(db.session.query(ReportBacktrace)
+                           .filter(ReportBacktrace.report_id == Report.id)
+                           .exists()))
 
     if opsysrelease_ids:
-        osr_query = (
-            db.session.query(ReportOpSysRelease.report_id.label("report_id"))
+        final_query = final_query.filter(
+            db.session.query(ReportOpSysRelease)
+            .filter(ReportOpSysRelease.report_id == Report.id)
             .filter(ReportOpSysRelease.opsysrelease_id.in_(opsysrelease_ids))
-            .distinct(ReportOpSysRelease.report_id)
-            .subquery())
-        final_query = final_query.filter(Report.id == osr_query.c.report_id)
+            .exists())
 
     if component_ids:
         final_query = final_query.filter(
             Report.component_id.in_(component_ids))
 
     if arch_ids:
-        arch_query = (db.session.query(ReportArch.report_id.label("report_id"))
-                      .filter(ReportArch.arch_id.in_(arch_ids))
-                      .distinct(ReportArch.report_id)
-                      .subquery())
-        final_query = final_query.filter(Report.id == arch_query.c.report_id)
+        final_query = final_query.filter(
+            db.session.query(ReportArch)
+            .filter(ReportArch.report_id == Report.id)
+            .filter(ReportArch.arch_id.in_(arch_ids))
+            .exists())
 
     if associate_id:
-        assoc_query = (
-            db.session.query(
-                OpSysComponent.id.label("components_id"))
-            .join(OpSysComponentAssociate)
-            .filter(OpSysComponentAssociate.associatepeople_id ==
-                    associate_id)
-            .distinct(OpSysComponent.id)
-            .subquery())
-
         final_query = final_query.filter(
-            Report.component_id == assoc_query.c.components_id)
+            db.session.query(OpSysComponentAssociate)
+            .filter(OpSysComponentAssociate.opsyscomponent_id == Report.component_id)
+            .filter(OpSysComponentAssociate.associatepeople_id == associate_id)
+            .exists())
 
     if types:
         final_query = final_query.filter(Report.type.in_(types))
@@ -148,16 +143,33 @@ def query_reports(_, opsysrelease_ids=[], component_ids=[], #pylint: disable=dan
         if not solution.data:
             final_query = final_query.filter(or_(Report.max_certainty < 100, Report.max_certainty.is_(None)))
 
+    if after is not None:
+        final_query = final_query.filter(tuple_(order_column, Report.id) < tuple_(*after))
+    elif before is not None:
+        final_query = final_query.filter(tuple_(order_column, Report.id) > tuple_(*before))
+
+    if before is not None:
+        final_query = final_query.order_by(order_column, Report.id)
+    else:
+        final_query = final_query.order_by(desc(order_column), desc(Report.id))
+
     if limit > 0:
         final_query = final_query.limit(limit)
-    if offset >= 0:
+    if offset >= 0 and after is None and before is None:
         final_query = final_query.offset(offset)
 
-    report_tuples = final_query.all()
-    for report, crashfn in report_tuples:
-        report.crashfn = crashfn
+    report_list = final_query.all()
+    if before is not None:
+        report_list.reverse()
 
-    return [x[0] for x in report_tuples]
+    if report_list:
+        crashfns = dict(db.session.query(ReportBacktrace.report_id, ReportBacktrace.crashfn)
+                        .filter(ReportBacktrace.report_id.in_([report.id for report in report_list]))
+                        .distinct(ReportBacktrace.report_id))
+        for report in report_list:
+            report.crashfn = crashfns.get(report.id)
+
+    return report_list
 
 
 def get_reports(filter_form, pagination) -> List[int]:
@@ -179,39 +191,59 @@ def get_reports(filter_form, pagination) -> List[int]:
         since_date = None
         to_date = None
 
-    r = query_reports(
-        db,
-        opsysrelease_ids=opsysrelease_ids,
-        component_ids=component_ids,
-        associate_id=associate_id,
-        arch_ids=arch_ids,
-        types=types,
-        occurrence_since=since_date,
-        occurrence_to=to_date,
-        limit=pagination.limit,
-        offset=pagination.offset,
-        order_by=filter_form.order_by.data,
-        solution=filter_form.solution)
-
+    order_by = filter_form.order_by.data
+    if order_by == "count":
+        after, before = pagination.get_cursors(int)
+    else:
+        after, before = pagination.get_cursors(datetime.datetime.fromisoformat)
+
+    def query(after=None, before=None):
+        return query_reports(
+            db,
+            opsysrelease_ids=opsysrelease_ids,
+            component_ids=component_ids,
+            associate_id=associate_id,
+            arch_ids=arch_ids,
+            types=types,
+            occurrence_since=since_date,
+            occurrence_to=to_date,
+            limit=pagination.limit,
+            offset=pagination.offset,
+            order_by=order_by,
+            solution=filter_form.solution,
+            after=after,
+            before=before)
+
+    r = query(after=after, before=before)
+    if before is not None and len(r) < pagination.limit:
+        # went back past the first page
+        pagination.before = None
+        r = query()
+
+    pagination.set_cursors(r, lambda report: (getattr(report, order_by), report.id))
     return r
 
 
+response_cache.register("reports.list_table_rows", ["reports"])
+
+
 def reports_list_table_rows_cache(filter_form, pagination) -> Response:
     key = ",".join((filter_form.caching_key(),
                     str(pagination.limit),
-                    str(pagination.offset)))
-
-    cached = flask_cache.get(key)
-    if cached is not None:
-        return cached
+                    str(pagination.offset),
+                    str(pagination.after),
+                    str(pagination.before)))
 
-    r = get_reports(filter_form, pagination)
+    def compute():
+        r = get_reports(filter_form, pagination)
+        return (render_template("reports/list_table_rows.html",
+                                reports=r), len(r),
+                pagination.first_cursor, pagination.last_cursor)
 
-    cached = (render_template("reports/list_table_rows.html",
-                              reports=r), len(r))
-
-    flask_cache.set(key, cached, timeout=60*60)
-    return cached
+    (list_table_rows, report_count,
+     pagination.first_cursor, pagination.last_cursor) = \
+        response_cache.get("reports.list_table_rows", key, compute)
+    return list_table_rows, report_count
 
 
 @reports.route("/")
@@ -323,40 +355,63 @@ def items():
 @reports.route("/get_hash/<opsys>/<release>/<since>", endpoint="since")
 @reports.route("/get_hash/<opsys>/<release>/<since>/<to>", endpoint="to")
 def get_hash(opsys=None, release=None, since=None, to=None):
+    """
+    Export report hashes sorted in ascending order, streamed as one JSON
+    document or as newline-delimited hashes if application/x-ndjson is
+    accepted. Clients resume an interrupted or limited export by passing
+    the last received hash in the "after" query argument.
+    """
+
+    ndjson = any(mimetype == "application/x-ndjson"
+                 for mimetype, _ in request.accept_mimetypes)
+    if not ndjson and not request_wants_json():
+        return abort(405)
+
     if to:
         to = datetime.datetime.strptime(to, "%Y-%m-%d")
+    if since:
         since = datetime.datetime.strptime(since, "%Y-%m-%d")
 
-        report_hash = queries.get_all_report_hashes(db, opsys=opsys,
-                                                    opsys_releases=release,
-                                                    date_from=since,
-                                                    date_to=to)
-
-    elif since:
-        since = datetime.datetime.strptime(since, "%Y-%m-%d")
-
-        report_hash = queries.get_all_report_hashes(db, opsys=opsys,
-                                                    opsys_releases=release,
-                                                    date_from=since)
-
-    elif release:
-        report_hash = queries.get_all_report_hashes(db, opsys=opsys,
-                                                    opsys_releases=release)
-
-    elif opsys:
-        report_hash = queries.get_all_report_hashes(db, opsys=opsys)
-    else:
-        report_hash = queries.get_all_report_hashes(db)
-
-    r_hash = []
-
-    for rh in report_hash:
-        r_hash.append(rh.hash)
+    after = request.args.get("after")
+    limit = request.args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return abort(400)
+        if limit < 0:
+            return abort(400)
+
+    report_hashes = queries.get_report_hashes(db, opsys=opsys,
+                                              opsys_releases=release,
+                                              date_from=since,
+                                              date_to=to,
+                                              after=after,
+                                              limit=limit,
+                                              yield_per=HASH_CHUNK_SIZE)
+
+    def generate():
+        if not ndjson:
+            yield '{"data": ['
+
+        separator = ""
+        while True:
+            chunk = list(islice(report_hashes, HASH_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            if ndjson:
+                yield "".join(report_hash + "\n" for report_hash in chunk)
+            else:
+                yield separator + ", ".join(json.dumps(report_hash) for report_hash in chunk)
+                separator = ", "
 
-    if request_wants_json():
-        return jsonify({"data": r_hash})
+        if not ndjson:
+            yield "]}"
 
-    return abort(405)
+    return Response(stream_with_context(generate()),
+                    status=200,
+                    mimetype="application/x-ndjson" if ndjson else "application/json")
 
 
 @reports.route("/<int:report_id>/")
@@ -693,21 +748,20 @@ def diff() -> str:
     lhs_id = int(request.args.get("lhs", 0))
     rhs_id = int(request.args.get("rhs", 0))
 
-    lhs = (db.session.query(Report)
-           .filter(Report.id == lhs_id)
-           .first())
-
-    rhs = (db.session.query(Report)
-           .filter(Report.id == rhs_id)
-           .first())
+    cached_reports = load_cached_reports(db, [lhs_id, rhs_id])
+    lhs = cached_reports.get(lhs_id)
+    rhs = cached_reports.get(rhs_id)
 
-    if lhs is None or rhs is None:
+    if lhs is None or rhs is None or not lhs.backtraces or not rhs.backtraces:
         abort(404)
 
+    # Keep backtraces serialized by this request
+    db.session.commit()
+
     frames_diff = seq_diff(lhs.backtraces[0].frames,
                            rhs.backtraces[0].frames,
                            lambda lhs, rhs:
-                           lhs.symbolsource.symbol == rhs.symbolsource.symbol)
+                           lhs.symbolsource.symbol_id == rhs.symbolsource.symbol_id)
 
     return render_template("reports/diff.html",
                            diff=frames_diff,
@@ -775,8 +829,11 @@ def new() -> Union[Dict[str, bool], Tuple[str, int], str, Response]:
                 _save_invalid_ureport(db, raw_data, str(ex))
                 raise InvalidUsage("Couldn't parse JSON data.", 400) from ex
 
+            # uReport1 is converted, validated, normalized by the problem
+            # plugin and hashed just once here
             try:
-                ureport.validate(data)
+                report = ureport2(data)
+                ureport.validate(report)
             except Exception as exp: # pylint: disable=broad-except
                 reporter = None
                 if ("reporter" in data and
@@ -795,11 +852,9 @@ def new() -> Union[Dict[str, bool], Tuple[str, int], str, Response]:
                     _save_unknown_opsys(db, data["os"])
                 raise InvalidUsage(str(exp), 400) from exp
 
-            report = data
-
             max_ureport_length = InvalidUReport.__lobs__["ureport"]
 
-            if len(str(report)) > max_ureport_length:
+            if len(raw_data) > max_ureport_length:
                 raise InvalidUsage("uReport may only be {0} bytes long"
                                    .format(max_ureport_length), 413)
 
@@ -807,13 +862,9 @@ def new() -> Union[Dict[str, bool], Tuple[str, int], str, Response]:
             osr = None
             if report["os"]["name"] in systems:
                 try:
-                    osr = (db.session.query(OpSysRelease)
-                           .join(OpSys)
-                           .filter(OpSys.name ==
-                                   systems[report["os"]["name"]].nice_name)
-                           .filter(OpSysRelease.version ==
-                                   report["os"]["version"])
-                           .first())
+                    osr = get_osrelease(db,
+                                        systems[report["os"]["name"]].nice_name,
+                                        report["os"]["version"], cached=True)
                 except (DatabaseError, InterfaceError) as e:
                     flash("Database unreachable. The uReport couldn't be saved. Please try again later.",
                           "danger")
@@ -823,9 +874,20 @@ def new() -> Union[Dict[str, bool], Tuple[str, int], str, Response]:
 
                 if osr:
                     osr_id = osr.id
+
             try:
-                dbreport = ureport.is_known(report, db, return_report=True,
-                                            opsysrelease_id=osr_id)
+                problemplugin = problemtypes[report["problem"]["type"]]
+                report_hash = problemplugin.hash_ureport(report["problem"])
+            except Exception as e: # pylint: disable=broad-except
+                logging.exception(e)
+                report_hash = None
+
+            try:
+                dbreport = None
+                if report_hash is not None:
+                    dbreport = ureport.is_known(report, db, return_report=True,
+                                                opsysrelease_id=osr_id,
+                                                report_hash=report_hash)
             except Exception as e: # pylint: disable=broad-except
                 logging.exception(e)
                 dbreport = None
@@ -839,15 +901,9 @@ def new() -> Union[Dict[str, bool], Tuple[str, int], str, Response]:
             if request_wants_json():
                 response = {"result": known}
 
-                try:
-                    report2 = ureport2(report)
-                    ureport.validate(report2)
-                except FafError:
-                    report2 = None
-
-                if report2 is not None:
+                if report_hash is not None:
                     try:
-                        solution = find_solution(report2, db=db, osr=osr)
+                        solution = find_solution(report, db=db, osr=osr)
                     except (DatabaseError, InterfaceError) as e:
                         flash("Database unreachable. The solution couldn't be retrieved. Please try again later.",
                               "danger")
@@ -872,13 +928,7 @@ def new() -> Union[Dict[str, bool], Tuple[str, int], str, Response]:
                         response["solutions"] = [solution_dict]
                         response["result"] = True
 
-                    try:
-                        problemplugin = problemtypes[
-                            report2["problem"]["type"]]
-                        response["bthash"] = problemplugin.hash_ureport(
-                            report2["problem"])
-                    except Exception as e: # pylint: disable=broad-except
-                        logging.exception(e)
+                    response["bthash"] = report_hash
 
                 if known:
                     url = url_for("reports.item", report_id=dbreport.id,
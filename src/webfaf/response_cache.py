@@ -0,0 +1,147 @@
+# Copyright (C) 2026  ABRT Team
+# Copyright (C) 2026  Red Hat, Inc.
+#
+# This file is part of faf.
+#
+# faf is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# faf is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with faf.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from pyfaf import queries
+
+
+class ResponseCache:
+    """
+    Cache of expensive responses shared by all webfaf processes through
+    `backend`, a cachelib cache.
+
+    Every endpoint depends on a list of datasets. A dataset changes its
+    generation whenever save-reports or create-problems commit new data,
+    which makes all responses computed from the older generation stale.
+    A stale or expired response is recomputed by a single process
+    while the others keep serving the stale copy.
+    """
+
+    # Seconds the recomputing process may hold the lock
+    LOCK_TIMEOUT = 300
+    # Seconds a request without any cached copy waits for another
+    # process computing the same key before computing it as well
+    WAIT_TIMEOUT = 10
+    WAIT_INTERVAL = 0.1
+    # Seconds the stale copies are kept by the backend
+    STORE_TIMEOUT = 7 * 24 * 60 * 60
+
+    KEY_PREFIX = "response-cache"
+    COUNTERS = ["hits", "stale_hits", "coalesced", "misses", "recompute_ms"]
+
+    def __init__(self, backend, db, max_age: int = 60 * 60,
+                 generations_ttl: int = 10) -> None:
+        """
+        Responses are recomputed after `max_age` seconds even if their
+        datasets did not change. Generations are read from the database
+        at most once per `generations_ttl` seconds.
+        """
+
+        self.backend = backend
+        self.db = db
+        self.max_age = max_age
+        self.generations_ttl = generations_ttl
+        self.endpoints: Dict[str, List[str]] = {}
+        self._generations: Dict[str, int] = {}
+        self._generations_time = 0.0
+
+    def register(self, endpoint: str, datasets: Iterable[str]) -> None:
+        self.endpoints[endpoint] = sorted(datasets)
+
+    def _get_generations(self) -> Dict[str, int]:
+        now = time.time()
+        if now - self._generations_time >= self.generations_ttl:
+            self._generations = queries.get_cache_generations(self.db)
+            self._generations_time = now
+
+        return self._generations
+
+    def _count(self, endpoint: str, counter: str, delta: int = 1) -> None:
+        key = "{0}:stats:{1}:{2}".format(ResponseCache.KEY_PREFIX, endpoint, counter)
+        # memcached only increments existing keys
+        if self.backend.inc(key, delta) is None:
+            self.backend.add(key, delta, timeout=0)
+
+    def get(self, endpoint: str, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Return the response of `endpoint` identified by `key`, calling
+        `compute` to get a fresh one if needed.
+        """
+
+        generations = self._get_generations()
+        stamp: Tuple[int, ...] = tuple(generations.get(dataset, 0)
+                                       for dataset in self.endpoints[endpoint])
+
+        cache_key = "{0}:{1}:{2}".format(ResponseCache.KEY_PREFIX, endpoint, key)
+        entry = self.backend.get(cache_key)
+        if (entry is not None and entry[0] == stamp and
+                time.time() - entry[1] < self.max_age):
+            self._count(endpoint, "hits")
+            return entry[2]
+
+        lock_key = "{0}:lock".format(cache_key)
+        locked = self.backend.add(lock_key, True, timeout=ResponseCache.LOCK_TIMEOUT)
+        if not locked:
+            if entry is not None:
+                self._count(endpoint, "stale_hits")
+                return entry[2]
+
+            deadline = time.time() + ResponseCache.WAIT_TIMEOUT
+            while time.time() < deadline:
+                time.sleep(ResponseCache.WAIT_INTERVAL)
+                entry = self.backend.get(cache_key)
+                if entry is not None:
+                    self._count(endpoint, "coalesced")
+                    return entry[2]
+
+        try:
+            start = time.time()
+            value = compute()
+            self.backend.set(cache_key, (stamp, time.time(), value),
+                             timeout=ResponseCache.STORE_TIMEOUT)
+        finally:
+            if locked:
+                self.backend.delete(lock_key)
+
+        self._count(endpoint, "misses")
+        self._count(endpoint, "recompute_ms", int((time.time() - start) * 1000))
+        return value
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return counters of every endpoint together with its hit rate
+        and average time spent by recomputing a response.
+        """
+
+        result = {}
+        for endpoint in sorted(self.endpoints):
+            counters = {}
+            for counter in ResponseCache.COUNTERS:
+                key = "{0}:stats:{1}:{2}".format(ResponseCache.KEY_PREFIX, endpoint, counter)
+                counters[counter] = int(self.backend.get(key) or 0)
+
+            served = counters["hits"] + counters["stale_hits"] + counters["coalesced"]
+            total = served + counters["misses"]
+            counters["hit_rate"] = served / total if total else 0.0
+            counters["avg_recompute_ms"] = (counters["recompute_ms"] / counters["misses"]
+                                            if counters["misses"] else 0.0)
+            result[endpoint] = counters
+
+        return result
@@ -71,12 +71,12 @@ def by_daterange(since, to) -> str:
     if day_count > 360:
         history = "monthly"
 
-    def date_filter(query) -> queries:
+    def date_filter(query, level) -> queries:
+        _, hist_field = queries.get_history_rollup_target(level, history)
         return query.filter(hist_field >= since).filter(hist_field < to)
 
-    _, hist_field = queries.get_history_target(history)
     total_query = queries.get_history_sum(db, history=history)
-    total = date_filter(total_query).one()[0]
+    total = date_filter(total_query, "release").one()[0]
 
     release_data = []
 
@@ -84,7 +84,7 @@ def by_daterange(since, to) -> str:
         release_sum = queries.get_history_sum(
             db, release.opsys.name, release.version, history=history)
 
-        release_sum = date_filter(release_sum).one()[0]
+        release_sum = date_filter(release_sum, "release").one()[0]
         if not release_sum:
             continue
 
@@ -94,7 +94,7 @@ def by_daterange(since, to) -> str:
             db, release.opsys.name, release.version, history=history)
 
         comp_data = []
-        for comp, count in date_filter(comps).all():
+        for comp, count in date_filter(comps, "component").all():
             comp_percentage = int(count * 100.0 / release_sum)
             comp_data.append((comp, count, comp_percentage))
 
@@ -6,10 +6,9 @@ from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import INTERVAL
 
 from pyfaf.storage import (OpSys,
-                           OpSysRelease,
-                           Report)
-from pyfaf.queries import get_history_target
-from webfaf.webfaf_main import db, flask_cache
+                           OpSysRelease)
+from pyfaf.queries import get_history_rollup_target
+from webfaf.webfaf_main import db, response_cache
 from webfaf.forms import SummaryForm, component_names_to_ids
 
 summary = Blueprint("summary", __name__)
@@ -35,7 +34,10 @@ def compute_totals(summary_form):
     component_ids = component_names_to_ids(summary_form.component_names.data)
     from_date, to_date = summary_form.daterange.data
     resolution = summary_form.resolution.data
-    table, date_column = get_history_target(summary_form.resolution.data)
+    if component_ids:
+        table, date_column = get_history_rollup_target("component", resolution)
+    else:
+        table, date_column = get_history_rollup_target("release", resolution)
 
     # Generate sequence of days/weeks/months in the specified range.
     from_date, to_date, delta = interval_delta(from_date, to_date, resolution)
@@ -64,7 +66,7 @@ def compute_totals(summary_form):
                .group_by(table.opsysrelease_id, date_column))
 
     if component_ids:
-        history = history.join(Report).filter(Report.component_id.in_(component_ids))
+        history = history.filter(table.component_id.in_(component_ids))
 
     history = history.subquery()
 
@@ -90,20 +92,19 @@ def compute_totals(summary_form):
     return result
 
 
+response_cache.register("summary.index_plot_data", ["reports"])
+
+
 def index_plot_data_cache(summary_form):
     key = summary_form.caching_key()
 
-    cached = flask_cache.get(key)
-    if cached is not None:
-        return cached
-
-    history = compute_totals(summary_form)
-    cached = render_template("summary/index_plot_data.html",
-                             history=history,
-                             resolution=summary_form.resolution.data[0])
+    def compute():
+        history = compute_totals(summary_form)
+        return render_template("summary/index_plot_data.html",
+                               history=history,
+                               resolution=summary_form.resolution.data[0])
 
-    flask_cache.set(key, cached, timeout=60 * 60)
-    return cached
+    return response_cache.get("summary.index_plot_data", key, compute)
 
 
 @summary.route("/")
@@ -17,33 +17,99 @@ from pyfaf import queries
 
 
 class Pagination:
+    """
+    Page through a listing by offset or, for listings supporting it, by
+    the "after" and "before" cursors identifying the last row of the previous
+    page and the first row of the next page, respectively.
+    """
 
     def __init__(self, r, default_limit=40):
         # copies ImmutableMultiDict to MultiDict
         self.get_args = r.args.copy()
         self.limit = max(int(self.get_args.get("limit", default_limit)), 0)
         self.offset = max(int(self.get_args.get("offset", 0)), 0)
+        self.after = self.get_args.get("after")
+        self.before = self.get_args.get("before")
         self.request = r
+        # cursors of the first and the last row shown, set by keyset paginated
+        # listings, the first one only if there is a previous page
+        self.first_cursor = None
+        self.last_cursor = None
+
+    def get_cursors(self, parse) -> Tuple:
+        """
+        Return the "after" and "before" cursors decoded into a (value, id)
+        tuple or None. `parse` converts the value from its string form.
+        """
+
+        try:
+            return tuple(None if cursor is None else decode_cursor(cursor, parse)
+                         for cursor in (self.after, self.before))
+        except ValueError:
+            return abort(400)
+
+    def set_cursors(self, rows, key) -> None:
+        """
+        Remember cursors of the first and the last of `rows` shown on the page,
+        `key` returns the (value, id) tuple the rows are sorted by.
+        """
+
+        paged = self.after is not None or self.before is not None or self.offset > 0
+        self.first_cursor = encode_cursor(*key(rows[0])) if rows and paged else None
+        self.last_cursor = encode_cursor(*key(rows[-1])) if rows else None
+
+    def _url(self):
+        return (url_for(self.request.endpoint,
+                        **dict(list(self.request.view_args.items()))) +
+                "?"+urllib.parse.urlencode(list(self.get_args.items(multi=True))))
 
     def url_next_page(self, query_count=None):
-        if query_count == self.limit or query_count is None:
-            self.get_args["offset"] = self.offset + self.limit
-            return (url_for(self.request.endpoint,
-                            **dict(list(self.request.view_args.items()))) +
-                    "?"+urllib.parse.urlencode(list(self.get_args.items(multi=True))))
+        if query_count == self.limit or query_count is None or self.before is not None:
+            if self.last_cursor is not None:
+                self.get_args.pop("offset", None)
+                self.get_args.pop("before", None)
+                self.get_args["after"] = self.last_cursor
+            else:
+                self.get_args["offset"] = self.offset + self.limit
+            return self._url()
 
         return None
 
     def url_prev_page(self):
+        if self.first_cursor is not None:
+            self.get_args.pop("offset", None)
+            self.get_args.pop("after", None)
+            self.get_args["before"] = self.first_cursor
+            return self._url()
+
         if self.offset > 0:
             self.get_args["offset"] = max(self.offset - self.limit, 0)
-            return (url_for(self.request.endpoint,
-                            **dict(list(self.request.view_args.items()))) +
-                    "?"+urllib.parse.urlencode(list(self.get_args.items(multi=True))))
+            return self._url()
 
         return None
 
 
+def encode_cursor(value, row_id) -> str:
+    """
+    Return a pagination cursor of a row sorted by `value` and `row_id`.
+    """
+
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+
+    return "{0},{1}".format(value, row_id)
+
+
+def decode_cursor(cursor, parse) -> Tuple:
+    """
+    Return the (value, id) tuple of a pagination cursor, `parse` converts
+    the value from its string form. Raises ValueError for malformed cursors.
+    """
+
+    value, _, row_id = cursor.rpartition(",")
+    return parse(value), int(row_id)
+
+
 def diff(lhs_seq, rhs_seq, eq=None) -> Sequence[Tuple]:
     """
     Computes a diff of two sequences.
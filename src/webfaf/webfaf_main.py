@@ -45,6 +45,9 @@ elif app.config["CACHE_TYPE"].lower() == "simple":
 else:
     flask_cache = NullCache()
 
+from webfaf.response_cache import ResponseCache # pylint: disable=wrong-import-position
+response_cache = ResponseCache(flask_cache, db)
+
 if app.config["PROXY_SETUP"]:
     app.wsgi_app = ProxyFix(app.wsgi_app)
 
@@ -117,7 +120,8 @@ app.jinja_env.filters["memory_address"] = memory_address
 app.jinja_env.filters["readable_int"] = readable_int
 # pylint: enable=no-member
 
-from webfaf.utils import cache, fed_raw_name, WebfafJSONEncoder # pylint: disable=wrong-import-position, cyclic-import
+from webfaf.utils import (admin_required, cache, fed_raw_name, # pylint: disable=wrong-import-position, cyclic-import
+                          WebfafJSONEncoder)
 app.json_encoder = WebfafJSONEncoder
 
 
@@ -150,6 +154,14 @@ def component_names_json():
                     mimetype="application/json")
 
 
+@app.route("/cache_stats.json")
+@admin_required
+def cache_stats_json():
+    return Response(response=json.dumps(response_cache.stats()),
+                    status=200,
+                    mimetype="application/json")
+
+
 # Serve static files from system-wide RPM files
 @app.route("/system_static/<component>/<path:filename>")
 @app.route("/system_static/<path:filename>")
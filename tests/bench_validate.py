@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Micro-benchmark of uReport validation on the sample reports, comparing
+the compiled checkers with walking the checker trees.
+
+    ./bench_validate.py [--number N]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import timeit
+
+cpath = os.path.dirname(os.path.realpath(__file__))
+# alter path so we can import pyfaf
+sys.path.insert(1, os.path.abspath(os.path.join(cpath, "..", "src")))
+os.environ["FAF_CONFIG_FILE"] = os.path.join(cpath, "faftests", "test_config.conf")
+
+# pylint: disable=wrong-import-position
+from pyfaf.common import FafError
+from pyfaf.opsys import systems
+from pyfaf.problemtypes import problemtypes
+from pyfaf.ureport import UREPORT_CHECKER, ureport2, validate
+
+
+def load_reports():
+    reports_path = os.path.join(cpath, "sample_reports")
+    reports = []
+    for filename in sorted(os.listdir(reports_path)):
+        path = os.path.join(reports_path, filename)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                report = ureport2(json.load(file))
+            # validation normalizes the report in place
+            validate(report)
+        except (ValueError, FafError):
+            continue
+
+        reports.append(report)
+
+    return reports
+
+
+def checks(report):
+    osplugin = type(systems[report["os"]["name"]])
+    problemplugin = type(problemtypes[report["problem"]["type"]])
+    return [(UREPORT_CHECKER, report),
+            (osplugin.ureport_checker, report["os"]),
+            (osplugin.packages_checker, report["packages"]),
+            (problemplugin.checker, report["problem"])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=1000,
+                        help="Validations of the whole corpus to time")
+    args = parser.parse_args()
+
+    reports = load_reports()
+    work = [check for report in reports for check in checks(report)]
+    print("{0} valid sample reports, {1} checks each round".format(len(reports), len(work)))
+
+    def walk():
+        for checker, obj in work:
+            checker.diagnose(obj)
+
+    def compiled():
+        for checker, obj in work:
+            checker.check(obj)
+
+    def full():
+        for report in reports:
+            validate(copy.deepcopy(report))
+
+    def deepcopy():
+        for report in reports:
+            copy.deepcopy(report)
+
+    results = {}
+    for name, func in (("tree walk", walk), ("compiled", compiled),
+                       ("validate", full), ("deepcopy", deepcopy)):
+        results[name] = min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+        print("{0:>10}: {1:9.1f} us per round".format(name, results[name] * 1e6))
+
+    print("checkers: {0:.1f}x faster compiled".format(results["tree walk"] / results["compiled"]))
+    print("validate without copying: {0:.1f} us per round"
+          .format((results["validate"] - results["deepcopy"]) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
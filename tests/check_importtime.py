@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Import-time check of the faf command line. Runs a cheap action through
+bin/faf under `python -X importtime` with the configuration faf would use
+(FAF_CONFIG_FILE or the installed one, so plugins are auto-enabled as
+configured), prints the slowest imports and fails if a heavy module gets
+imported or the total import time exceeds the budget.
+
+    ./check_importtime.py [--budget MS] [--top N] [action ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+cpath = os.path.dirname(os.path.realpath(__file__))
+srcpath = os.path.abspath(os.path.join(cpath, "..", "src"))
+fafpath = os.path.join(srcpath, "bin", "faf")
+
+# modules only the actions that need them may import
+FORBIDDEN = ["satyr", "rpm", "dnf", "bugzilla", "koji",
+             "pyfaf.bugtrackers", "pyfaf.opsys", "pyfaf.problemtypes",
+             "pyfaf.repos", "pyfaf.solutionfinders"]
+
+
+def measure(args):
+    """
+    Return the list of (self us, cumulative us, module) tuples
+    reported by -X importtime while running faf with `args`.
+    """
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [srcpath, env.get("PYTHONPATH")]))
+
+    proc = subprocess.run([sys.executable, "-X", "importtime", fafpath] + list(args),
+                          env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=False)
+
+    imports = []
+    errors = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if len(fields) != 3 or not fields[0].isdigit():
+            continue
+
+        imports.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+
+    if proc.returncode != 0:
+        raise RuntimeError("Running faf {0} failed:\n{1}".format(" ".join(args), "\n".join(errors)))
+
+    return imports
+
+
+def forbidden_imports(imports):
+    result = []
+    for _, _, module in imports:
+        for forbidden in FORBIDDEN:
+            if module == forbidden or module.startswith(forbidden + "."):
+                result.append(module)
+                break
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1000.0,
+                        help="Maximum total import time in milliseconds")
+    parser.add_argument("--top", type=int, default=15,
+                        help="Number of the slowest imports to print")
+    parser.add_argument("action", nargs="*", default=["releaselist"],
+                        help="Command line to run")
+    args = parser.parse_args()
+
+    imports = measure(args.action)
+    total = sum(selftime for selftime, _, _ in imports) / 1000.0
+
+    print("{0} modules imported in {1:.1f} ms".format(len(imports), total))
+    for selftime, cumulative, module in sorted(imports, reverse=True)[:args.top]:
+        print("{0:9.1f} ms {1:9.1f} ms  {2}".format(selftime / 1000.0, cumulative / 1000.0, module))
+
+    result = 0
+    forbidden = forbidden_imports(imports)
+    if forbidden:
+        print("Forbidden imports: {0}".format(", ".join(sorted(forbidden))))
+        result = 1
+
+    if total > args.budget:
+        print("Import time {0:.1f} ms exceeds the budget of {1:.1f} ms".format(total, args.budget))
+        result = 1
+
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(main())
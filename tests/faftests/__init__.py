@@ -26,6 +26,7 @@ TEST_DIR = "/tmp/faf_test_data"
 from pyfaf import storage, ureport, config
 from pyfaf.cmdline import CmdlineParser
 from pyfaf.actions.init import Init
+from pyfaf.utils.cache import invalidate_caches
 from pyfaf.utils.contextmanager import captured_output
 from pyfaf.storage import fixtures
 from pyfaf.storage.symbol import SymbolSource
@@ -140,6 +141,9 @@ class DatabaseCase(TestCase):
             "autoflush": False,
             "autocommit": False})
 
+        # rows cached in-process belong to the previous database
+        invalidate_caches()
+
         # required due to mixing of sqlalchemy and flask-sqlalchemy
         # fixed in flask-sqlalchemy >= 2.0
         self.db.session._model_changes = {}
@@ -51,6 +51,7 @@ class Mockzilla(object):
                 removed='Low')])
 
         self.last_query_params = {}
+        self.getbugs_calls = []
 
     def login(self, *args, **kwargs):
         pass
@@ -58,6 +59,15 @@ class Mockzilla(object):
     def query(self, params_dict):
         self.last_query_params = params_dict
 
+        if "id" in params_dict:
+            bugs = [self.bugs[bug_id] for bug_id in params_dict["id"]
+                    if bug_id in self.bugs]
+            if "last_change_time" in params_dict:
+                since = datetime.datetime.strptime(
+                    params_dict["last_change_time"], "%Y-%m-%dT%H:%M:%SZ")
+                bugs = [bug for bug in bugs if bug.last_change_time >= since]
+            return bugs
+
         if self.first:
             self.first = False
             return list(self.bugs.values())
@@ -66,10 +76,25 @@ class Mockzilla(object):
     def getuser(self, user_email):
         return self.user
 
+    def getusers(self, userlist):
+        return [self.user] if self.user.email in userlist else []
+
     def getbug(self, bug_id,
                include_fields=None, exclude_fields=None, extra_fields=None):
         return self.bugs[bug_id]
 
+    def getbugs(self, idlist,
+                include_fields=None, exclude_fields=None, extra_fields=None,
+                permissive=True):
+        self.getbugs_calls.append(list(idlist))
+        return [self.bugs.get(bug_id) for bug_id in idlist]
+
+    def bugs_history_raw(self, idlist):
+        return dict(bugs=[dict(id=bug_id,
+                               history=self.bugs[bug_id].get_history_raw()
+                               ['bugs'][0]['history'])
+                          for bug_id in idlist if bug_id in self.bugs])
+
     def createbug(self, **data):
         self.id += 1
         now = datetime.datetime.now()
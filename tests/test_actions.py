@@ -29,6 +29,7 @@ from pyfaf.storage.opsys import (Arch,
                                  Build,
                                  BuildArch,
                                  Package,
+                                 PackageDependency,
                                  )
 from pyfaf.storage.debug import InvalidUReport
 from pyfaf.storage.user import User
@@ -437,6 +438,17 @@ class ActionsTestCase(faftests.DatabaseCase):
             self.assertEqual(bosra, init_bosra + 2)
             package_count = self.db.session.query(Package).count()
             self.assertEqual(init_package_count + 2, package_count)
+            build_count = self.db.session.query(Build).count()
+
+            # Re-syncing an unchanged repository must not add anything
+            time.sleep(1)
+            reposync("sample_repo", tmpdir, [], reuse=True, force_resync=True)
+
+            bosra = self.db.session.query(BuildOpSysReleaseArch).count()
+            self.assertEqual(bosra, init_bosra + 2)
+            package_count = self.db.session.query(Package).count()
+            self.assertEqual(init_package_count + 2, package_count)
+            self.assertEqual(self.db.session.query(Build).count(), build_count)
 
         self.call_action_ordered_args("repoadd", [
             "fail_repo", # NAME
@@ -498,6 +510,16 @@ class ActionsTestCase(faftests.DatabaseCase):
         }), 0)
 
         self.assertEqual(packages + 1, self.db.session.query(Package).count())
+
+        package = (self.db.session.query(Package)
+                   .filter(Package.name == "sample")
+                   .order_by(Package.id.desc())
+                   .first())
+        self.assertTrue(package.has_lob("package"))
+        provides = (self.db.session.query(PackageDependency.name)
+                    .filter(PackageDependency.package_id == package.id)
+                    .filter(PackageDependency.type == "PROVIDES"))
+        self.assertIn("sample", [name for name, in provides])
         shutil.rmtree(self.tmpdir)
 
     def test_assign_release_to_builds(self):
@@ -957,6 +979,74 @@ class ActionsTestCase(faftests.DatabaseCase):
 
         shutil.rmtree(self.tmpdir)
 
+    def test_pull_reports(self):
+        master_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(master_dir, "report"))
+
+        names = ["pulled-{0}".format(i) for i in range(10)]
+        for name in names:
+            with open(os.path.join(master_dir, "report", name), "w") as f:
+                f.write(name)
+
+        def write_manifest(names):
+            with open(os.path.join(master_dir, "reports"), "w") as f:
+                json.dump(names, f)
+
+        incoming = os.path.join(config["ureport.directory"], "reports", "incoming")
+
+        def pulled():
+            return set(fname for fname in os.listdir(incoming)
+                       if fname.startswith("pulled-"))
+
+        handler_class = functools.partial(http.server.SimpleHTTPRequestHandler,
+                                          directory=master_dir)
+
+        with http.server.HTTPServer(("localhost", 0), handler_class) as server:
+            server_thread = threading.Thread(target=server.serve_forever)
+            server_thread.daemon = True
+            server_thread.start()
+
+            master = "http://%s:%d" % (server.server_address[0], server.server_address[1])
+
+            # reports missing at the master are skipped
+            write_manifest(names + ["missing"])
+            self.assertEqual(self.call_action("pull-reports", {
+                "master": master,
+                "workers": 3,
+            }), 0)
+            self.assertEqual(pulled(), set(names))
+            for name in names:
+                with open(os.path.join(incoming, name)) as f:
+                    self.assertEqual(f.read(), name)
+
+            # known reports are not pulled again
+            for name in names:
+                os.remove(os.path.join(incoming, name))
+
+            names.append("pulled-10")
+            with open(os.path.join(master_dir, "report", "pulled-10"), "w") as f:
+                f.write("pulled-10")
+
+            write_manifest(names)
+            self.assertEqual(self.call_action("pull-reports", {"master": master}), 0)
+            self.assertEqual(pulled(), set(["pulled-10"]))
+
+            # a broken report list leaves the known reports intact
+            with open(os.path.join(master_dir, "reports"), "w") as f:
+                f.write('["pulled-0", ')
+            self.assertEqual(self.call_action("pull-reports", {"master": master}), 1)
+
+            write_manifest(names)
+            self.assertEqual(self.call_action("pull-reports", {"master": master}), 0)
+            self.assertEqual(pulled(), set(["pulled-10"]))
+
+            server.shutdown()
+
+        for fname in pulled():
+            os.remove(os.path.join(incoming, fname))
+
+        shutil.rmtree(master_dir)
+
     def test_sar(self):
         # faker1
         self.create_user(usrnum=1)
@@ -11,6 +11,7 @@ from pyfaf.common import FafError
 from pyfaf.bugtrackers import bugzilla
 
 from pyfaf.storage.bugtracker import Bugtracker
+from pyfaf.storage.bugzilla import BzBug, BzBugCc, BzBugHistory
 from pyfaf.storage.opsys import (OpSysComponent,
                                  OpSysRelease,
                                  OpSysReleaseComponent)
@@ -38,6 +39,7 @@ class BugzillaTestCase(faftests.DatabaseCase):
         self.bz = cls()
         self.mz = mockzilla.Mockzilla()
         self.bz.bz = self.mz
+        self.bz._create_client = lambda: self.mz
         self.bz.connected = True
 
     def create_dummy_bug(self):
@@ -279,6 +281,60 @@ class BugzillaTestCase(faftests.DatabaseCase):
         self.assertEqual(new.creation_time, orig.creation_time)
         self.assertEqual(new.last_change_time, orig.last_change_time)
 
+    def test_sync_bugs(self):
+        """
+        Check if sync_bugs downloads only changed bugs in batches
+        and does not duplicate CCs and history events.
+        """
+        for _ in range(3):
+            self.create_dummy_bug()
+
+        mark = self.bz.sync_bugs(self.db, [1, 2, 3], batch_size=2, workers=2)
+        self.assertEqual(mark, max(self.bz._convert_datetime(bug.last_change_time)
+                                   for bug in self.mz.bugs.values()))
+        self.assertEqual(sorted(sum(self.mz.getbugs_calls, [])), [1, 2, 3])
+        self.assertEqual(self.db.session.query(BzBug).count(), 3)
+        self.assertEqual(self.db.session.query(BzBugCc).count(), 3)
+        self.assertEqual(self.db.session.query(BzBugHistory).count(), 3)
+
+        # nothing changed since the mark
+        self.mz.getbugs_calls = []
+        self.assertEqual(self.bz.sync_bugs(self.db, [1, 2, 3], since=mark), mark)
+        self.assertEqual(self.mz.getbugs_calls, [])
+
+        self.mz.bugs[2].setwhiteboard("abrt_hash:456", "status", "test comment")
+        mark2 = self.bz.sync_bugs(self.db, [1, 2, 3], since=mark)
+        self.assertEqual(mark2, self.bz._convert_datetime(self.mz.bugs[2].last_change_time))
+        self.assertEqual(self.mz.getbugs_calls, [[2]])
+
+        dbbug = self.db.session.query(BzBug).filter(BzBug.id == 2).one()
+        self.assertEqual(dbbug.whiteboard, "abrt_hash:456")
+        self.assertEqual(dbbug.last_change_time, mark2)
+        self.assertEqual(len(dbbug.ccs), 1)
+        self.assertEqual(len(dbbug.history), 1)
+
+    def test_sync_bugs_skipped(self):
+        """
+        Check if sync_bugs keeps the mark at bugs that could not be saved
+        and returns a mark when there is nothing to synchronize.
+        """
+        self.assertIsNotNone(self.bz.sync_bugs(self.db, []))
+
+        self.bz.create_bug(component="will-crash", product="Fedora", version="99",
+                           summary="Crashed...", description="Desc",
+                           status_whiteboard="abrt_hash:123", groups="")
+        self.create_dummy_bug()
+        self.mz.bugs[2].setwhiteboard("abrt_hash:456", "status", "test comment")
+
+        mark = self.bz.sync_bugs(self.db, [1, 2])
+        self.assertEqual(mark, self.bz._convert_datetime(self.mz.bugs[1].last_change_time))
+        self.assertEqual(self.db.session.query(BzBug).count(), 1)
+
+        # the skipped bug is downloaded again
+        self.mz.getbugs_calls = []
+        self.bz.sync_bugs(self.db, [1, 2], since=mark)
+        self.assertEqual(self.mz.getbugs_calls, [[1]])
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
     unittest.main()
@@ -52,6 +52,53 @@ class CheckerTestCase(faftests.TestCase):
         self.assertRaises(CheckError, chk.check, invalid1)
         self.assertRaises(CheckError, chk.check, invalid2)
 
+    def test_compiled(self):
+        """
+        Test if the compiled predicate agrees with the tree walk
+        """
+
+        chk = DictChecker({
+            "name": StringChecker(pattern=r"^[a-z]+$", maxlen=8),
+            "flag": Checker(bool, mandatory=False),
+            "kind": StringChecker(allowed=["a", "b"], mandatory=False),
+            "items": ListChecker(DictChecker({
+                "num": IntChecker(minval=0, maxval=10),
+            }), minlen=1, maxlen=3),
+        })
+
+        valid = {"name": "abc", "kind": "a", "items": [{"num": 0}, {"num": 10}]}
+
+        invalid = [
+            {"name": "abc"},
+            {"name": "ABC", "items": [{"num": 1}]},
+            {"name": "abcdefghi", "items": [{"num": 1}]},
+            {"name": "abc", "flag": 1, "items": [{"num": 1}]},
+            {"name": "abc", "kind": "c", "items": [{"num": 1}]},
+            {"name": "abc", "items": []},
+            {"name": "abc", "items": [{"num": 1}] * 4},
+            {"name": "abc", "items": [{"num": 11}]},
+            {"name": "abc", "items": [{"num": "1"}]},
+            {"name": "abc", "items": [{}]},
+        ]
+
+        self.assertTrue(chk.compile()(valid))
+        chk.check(valid)
+        chk.diagnose(valid)
+
+        for obj in invalid:
+            self.assertFalse(chk.compile()(obj))
+            self.assertRaises(CheckError, chk.check, obj)
+            self.assertRaises(CheckError, chk.diagnose, obj)
+
+        with self.assertRaisesRegex(CheckError, "Expected number lesser or equal to 10"):
+            chk.check(invalid[7])
+
+        # an object rejected by the predicate never passes
+        chk = IntChecker(maxval=10)
+        chk._valid = lambda obj: False
+        with self.assertRaisesRegex(CheckError, "does not pass the check"):
+            chk.check(1)
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -5,7 +5,7 @@ import logging
 
 import faftests
 
-from pyfaf.common import import_dir, load_plugins, load_plugin_types
+from pyfaf.common import import_dir, load_plugins, load_plugin_types, PluginRegistry
 
 from sample_plugin_dir.base import Base
 from sample_plugin_dir.plugin import Sub
@@ -44,6 +44,39 @@ class CommonsTestCase(faftests.DatabaseCase):
         self.assertIn('sub', types)
         self.assertIs(issubclass(types['sub'], Base), True)
 
+    def test_plugin_registry(self):
+        """
+        Test if PluginRegistry loads listed and unlisted plugins on demand
+        """
+
+        plugins = PluginRegistry(Base, "sample_plugin_dir",
+                                 {"sub-plugin": "plugin:Sub",
+                                  "missing-plugin": "missing:Missing"})
+        self.assertIn("sub-plugin", plugins)
+        self.assertIsInstance(plugins["sub-plugin"], Sub)
+        self.assertIs(plugins["sub-plugin"], plugins["sub-plugin"])
+
+        with self.assertRaises(KeyError):
+            plugins["missing-plugin"] # pylint: disable=pointless-statement
+        self.assertNotIn("missing-plugin", plugins)
+        self.assertEqual(list(plugins), ["sub-plugin"])
+        self.assertEqual(len(plugins), 1)
+
+        # plugins not listed in the manifest are found by importing the package
+        plugins = PluginRegistry(Base, "sample_plugin_dir", {})
+        self.assertIn("sub-plugin", plugins)
+        self.assertNotIn("should-not-be-loaded", plugins)
+        self.assertEqual([name for name, _ in plugins.items()], ["sub-plugin"])
+
+    def test_cmdline_importtime(self):
+        """
+        Test that a cheap action does not import heavy plugins
+        """
+
+        from check_importtime import forbidden_imports, measure
+
+        self.assertEqual(forbidden_imports(measure(["releaselist"])), [])
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     unittest.main()
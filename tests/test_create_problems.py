@@ -7,9 +7,9 @@ import random
 from collections import namedtuple
 
 import faftests
-from pyfaf.storage import Problem
-from pyfaf.actions.create_problems import CreateProblems
-from pyfaf.queries import get_reports_for_problems
+from pyfaf.storage import Problem, Report, ReportClusterFunction, ReportClusterSignature
+from pyfaf.actions.create_problems import CreateProblems, CLUSTER_SIGNATURE_VERSION
+from pyfaf.queries import get_reports_for_problems, get_reports_for_clustering
 
 
 class CreateProblemsTestCase(faftests.DatabaseCase):
@@ -96,12 +96,63 @@ class CreateProblemsTestCase(faftests.DatabaseCase):
     def test_create_problems_clustering2(self):
         self.create_problems_clustering(2)
 
+    def test_create_problems_clustering_incremental(self):
+        self.create_problems_clustering(3)
+
+    def test_create_problems_clustering_processes(self):
+        self.create_problems_clustering(4)
+
+    def test_create_problems_incremental_signatures(self):
+        """
+        Test incremental create problems stores clustering signatures
+        and only clusters reports without a valid signature
+        """
+
+        self.save_report("ureport_core")
+        self.call_action("create-problems", {"incremental": ""})
+        self.assertEqual(self.db.session.query(Problem).count(), 1)
+        self.assertEqual(self.db.session.query(ReportClusterSignature).count(), 1)
+        self.assertTrue(self.db.session.query(ReportClusterFunction).count() > 0)
+
+        self.assertEqual(get_reports_for_clustering(self.db, "core",
+                                                    CLUSTER_SIGNATURE_VERSION), [])
+        self.assertEqual(len(get_reports_for_clustering(self.db, "core",
+                                                        CLUSTER_SIGNATURE_VERSION + 1)), 1)
+
+    def test_create_problems_unclusterable_signatures(self):
+        """
+        Test reports with an empty clustering signature are not clustered
+        again until the signature is removed
+        """
+
+        self.save_report("ureport_core")
+        report = self.db.session.query(Report).one()
+        signature = ReportClusterSignature(report_id=report.id,
+                                           version=CLUSTER_SIGNATURE_VERSION)
+        self.db.session.add(signature)
+        self.db.session.flush()
+
+        self.assertEqual(signature.functions, [])
+        self.assertEqual(get_reports_for_clustering(self.db, "core",
+                                                    CLUSTER_SIGNATURE_VERSION), [])
+
+        signature.functions = ["main"]
+        self.db.session.flush()
+        self.assertEqual(get_reports_for_clustering(self.db, "core",
+                                                    CLUSTER_SIGNATURE_VERSION), [report])
+
     def create_problems_action(self, speedup):
         if speedup == 0:
             self.call_action("create-problems")
         elif speedup == 1:
             self.call_action("create-problems",
                     {"speedup": ""})
+        elif speedup == 3:
+            self.call_action("create-problems",
+                    {"incremental": ""})
+        elif speedup == 4:
+            self.call_action("create-problems",
+                    {"processes": 2})
         else:
             self.create_problems_action(random.randint(0, 1))
 
@@ -32,7 +32,7 @@ class DnfTestCase(faftests.TestCase):
         self.assertTrue(b"Workers Finished" in proc.stdout or b"Pool finished" in proc.stdout)
 
         dnf = Dnf("test_repo_name", tmpdir)
-        pkgs = dnf.list_packages(["noarch"])
+        pkgs = list(dnf.list_packages(["noarch"]))
         self.assertEqual(len(pkgs), 1)
         pkg = pkgs.pop()
         self.assertEqual(pkg["name"], "sample")
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import importlib
+import unittest
+import logging
+from unittest import mock
+
+import faftests
+
+from fedora_messaging.exceptions import ConnectionException
+from sqlalchemy import event
+
+from pyfaf.actions import fedmsg_drain
+from pyfaf.actions.fedmsg_drain import FedmsgDrain
+from pyfaf.config import config
+from pyfaf.storage import events_fedmsg
+from pyfaf.storage.outbox import NotificationOutbox
+from pyfaf.storage.report import Report
+
+
+class FedmsgDrainTestCase(faftests.DatabaseCase):
+    """
+    Test case for the notification outbox and pyfaf.actions.fedmsg_drain
+    """
+
+    def setUp(self):
+        super(FedmsgDrainTestCase, self).setUp()
+        self.basic_fixtures()
+
+        # the Report.count listener is only registered when enabled
+        self.saved_config = dict(config)
+        config["fedmsg.realtime_reports"] = "true"
+        config["fedmsg.realtime_problems"] = "true"
+        importlib.reload(events_fedmsg)
+
+        self.patches = [mock.patch.object(fedmsg_drain, "notify_reports", True),
+                        mock.patch.object(fedmsg_drain, "notify_problems", True),
+                        mock.patch.object(fedmsg_drain.web, "webfaf_installed", return_value=False)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+        event.remove(Report.count, "set", events_fedmsg.fedmsg_report)
+        config.clear()
+        config.update(self.saved_config)
+        importlib.reload(events_fedmsg)
+
+        super(FedmsgDrainTestCase, self).tearDown()
+
+    def _outbox(self):
+        return (self.db.session.query(NotificationOutbox.old_count,
+                                      NotificationOutbox.new_count)
+                .order_by(NotificationOutbox.id)
+                .all())
+
+    def _clear_outbox(self):
+        self.db.session.query(NotificationOutbox).delete()
+        self.db.session.commit()
+
+    def test_threshold_crossing_recorded(self):
+        self.save_report("ureport1")
+        self.assertEqual(self._outbox(), [(0, 1)])
+
+        self._clear_outbox()
+        report = self.db.session.query(Report).one()
+        report.count += 9
+        self.db.session.flush()
+        self.assertEqual(self._outbox(), [(1, 10)])
+
+    def test_rolled_back_count_not_recorded(self):
+        self.save_report("ureport1")
+        self._clear_outbox()
+
+        self.db.session.begin_nested()
+        report = self.db.session.query(Report).one()
+        report.count += 9
+        self.db.session.flush()
+        self.assertEqual(len(self._outbox()), 1)
+
+        self.db.session.rollback()
+        self.assertEqual(self._outbox(), [])
+
+    def test_drain(self):
+        self.save_report("ureport1")
+        self.call_action("create-problems")
+        self._clear_outbox()
+
+        report = self.db.session.query(Report).one()
+        report.count += 9
+        self.db.session.commit()
+
+        with mock.patch.object(fedmsg_drain, "publish") as publish:
+            self.assertEqual(FedmsgDrain()._drain(self.db, 10, 1, 0), 1)
+
+        topics = sorted(call[0][0].topic for call in publish.call_args_list)
+        self.assertEqual(topics, ["faf.problem.threshold10", "faf.report.threshold10"])
+        self.assertEqual(self._outbox(), [])
+
+        # the batch is kept when publishing fails
+        report = self.db.session.query(Report).one()
+        report.count += 90
+        self.db.session.commit()
+
+        with mock.patch.object(fedmsg_drain, "publish",
+                               side_effect=ConnectionException(reason="down")) as publish:
+            with self.assertRaises(ConnectionException):
+                FedmsgDrain()._drain(self.db, 10, 2, 0)
+
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(self._outbox(), [(10, 100)])
+
+        with mock.patch.object(fedmsg_drain, "publish") as publish:
+            self.assertEqual(FedmsgDrain()._drain(self.db, 10, 1, 0), 1)
+
+        topics = sorted(call[0][0].topic for call in publish.call_args_list)
+        self.assertEqual(topics, ["faf.problem.threshold100", "faf.report.threshold100"])
+        self.assertEqual(self._outbox(), [])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
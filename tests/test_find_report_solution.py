@@ -5,6 +5,9 @@ import logging
 
 import faftests
 from pyfaf.storage import *
+from pyfaf.queries import get_reports_opsysreleases
+from pyfaf.solutionfinders import find_solutions_report, find_solutions_reports
+from pyfaf.solutionfinders.prefilter_solution_finder import rule_index
 from datetime import datetime
 from sqlalchemy import desc
 
@@ -65,6 +68,50 @@ class FindReportSolutionTestCase(faftests.DatabaseCase):
         self.assertEqual(report.max_certainty, 100)
         self.assertEqual(probably_fix_report.max_certainty, 99)
 
+        # Solutions of all reports at once match the ones of single reports
+        reports = self.db.session.query(Report).order_by(Report.id).all()
+        osrs = get_reports_opsysreleases(self.db, [r.id for r in reports])
+        batched = find_solutions_reports(reports, db=self.db, osrs=osrs)
+        for r in reports:
+            solutions = find_solutions_report(r, db=self.db, osr=osrs.get(r.id))
+            if solutions is None:
+                self.assertNotIn(r.id, batched)
+            else:
+                self.assertEqual([s.cause for s in batched[r.id]],
+                                 [s.cause for s in solutions])
+        self.assertEqual(batched[report.id][0].cause, "will-crash")
+
+    def test_rule_index(self):
+        opsys = self.db.session.query(OpSys).first()
+        sps = self.db.session.query(SfPrefilterSolution).first()
+        self.db.session.add(SfPrefilterPackageName(pattern="(?i)crash-me", solution=sps))
+        self.db.session.add(SfPrefilterPackageName(pattern="^crash-(.*)$", solution=sps,
+                                                   opsys=opsys))
+        self.db.session.flush()
+
+        ruleset = rule_index.get(self.db, "pkgname")
+        self.assertEqual(len(ruleset), 2)
+        self.assertIs(rule_index.get(self.db, "pkgname"), ruleset)
+        self.assertEqual(ruleset.match_index("will-crash-0.5-1.x86_64"), 0)
+        self.assertEqual(ruleset.match_index("CRASH-ME-1-1.noarch"), 1)
+        self.assertIsNone(ruleset.match_index("crash-1-1.noarch"))
+
+        ruleset = rule_index.get(self.db, "pkgname", db_opsys=opsys)
+        self.assertEqual(len(ruleset), 3)
+        self.assertEqual(ruleset.match_index("crash-1-1.noarch"), 2)
+
+        matcher = ruleset.matcher()
+        for nvra in ["crash-1-1.noarch", "will-crash-0.5-1.x86_64", "glibc-2.0-1.x86_64"]:
+            self.assertIsNone(matcher.match(nvra))
+        self.assertEqual(matcher.solution.cause, "will-crash")
+
+        # Changing the rules invalidates the index
+        self.db.session.add(SfPrefilterPackageName(pattern="^glibc-", solution=sps))
+        self.db.session.flush()
+        ruleset = rule_index.get(self.db, "pkgname")
+        self.assertEqual(len(ruleset), 3)
+        self.assertEqual(ruleset.match_index("glibc-2.0-1.x86_64"), 2)
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.ERROR)
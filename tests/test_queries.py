@@ -5,11 +5,27 @@ import logging
 
 import faftests
 
+from sqlalchemy import func
+
+from pyfaf.storage.history import (ComponentHistoryWeekly,
+                                   OpSysReleaseHistoryDaily,
+                                   ProblemHistoryMonthly)
 from pyfaf.storage.opsys import Arch, Build, Package, OpSys, OpSysComponent
-from pyfaf.storage.report import ReportUnknownPackage, Report
+from pyfaf.storage.report import (ReportHistoryDaily,
+                                  ReportHistoryMonthly,
+                                  ReportHistoryWeekly,
+                                  ReportUnknownPackage,
+                                  Report)
 from pyfaf.storage.problem import Problem
-from pyfaf.queries import (get_packages_and_their_reports_unknown_packages,
+from pyfaf.storage.snapshot import ProblemSnapshot
+from pyfaf.snapshots import SNAPSHOT_VERSION, refresh_problem_snapshots
+from pyfaf.queries import (get_arch_by_name,
+                           get_packages_and_their_reports_unknown_packages,
+                           get_problem_snapshot_changes,
                            get_unassigned_reports,
+                           mark_problem_snapshots_stale,
+                           move_history_rollups,
+                           rebuild_history_rollups,
                            unassign_reports)
 
 
@@ -186,6 +202,173 @@ class QueriesTestCase(faftests.DatabaseCase):
             (pkg2, report_unknown2), packages_and_their_reports_unknown_packages)
 
 
+    def test_get_arch_by_name_cached(self):
+        self.basic_fixtures()
+
+        cache = get_arch_by_name.cache
+        cache.invalidate()
+        hits, misses = cache.hits, cache.misses
+
+        arch = get_arch_by_name(self.db, "x86_64", cached=True)
+        self.assertIs(arch, self.arch_x86_64)
+        self.assertEqual(cache.misses, misses + 1)
+        self.assertEqual(len(cache), 1)
+
+        arch = get_arch_by_name(self.db, "x86_64", cached=True)
+        self.assertIs(arch, self.arch_x86_64)
+        self.assertEqual(cache.hits, hits + 1)
+
+        # unknown rows are not cached
+        self.assertIsNone(get_arch_by_name(self.db, "sparc", cached=True))
+        self.assertEqual(len(cache), 1)
+
+        # modified rows are dropped from the cache on flush
+        arch.name = "x86_64_v2"
+        self.db.session.flush()
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(get_arch_by_name(self.db, "x86_64", cached=True))
+
+    def _history_rows(self, query):
+        return sorted(tuple(row) for row in query.all())
+
+    def test_history_rollups(self):
+        self.basic_fixtures()
+
+        self.save_report("ureport1")
+        self.save_report("ureport1")
+        self.save_report("ureport_f20")
+        self.call_action("create-problems")
+
+        daily = self._history_rows(
+            self.db.session.query(OpSysReleaseHistoryDaily.opsysrelease_id,
+                                  OpSysReleaseHistoryDaily.day,
+                                  OpSysReleaseHistoryDaily.count))
+        expected = self._history_rows(
+            self.db.session.query(ReportHistoryDaily.opsysrelease_id,
+                                  ReportHistoryDaily.day,
+                                  func.sum(ReportHistoryDaily.count))
+            .group_by(ReportHistoryDaily.opsysrelease_id, ReportHistoryDaily.day))
+        self.assertEqual(daily, expected)
+
+        weekly = self._history_rows(
+            self.db.session.query(ComponentHistoryWeekly.component_id,
+                                  ComponentHistoryWeekly.opsysrelease_id,
+                                  ComponentHistoryWeekly.week,
+                                  ComponentHistoryWeekly.count))
+        expected = self._history_rows(
+            self.db.session.query(Report.component_id,
+                                  ReportHistoryWeekly.opsysrelease_id,
+                                  ReportHistoryWeekly.week,
+                                  func.sum(ReportHistoryWeekly.count))
+            .join(ReportHistoryWeekly)
+            .group_by(Report.component_id, ReportHistoryWeekly.opsysrelease_id,
+                      ReportHistoryWeekly.week))
+        self.assertEqual(weekly, expected)
+        self.assertEqual(sum(row[-1] for row in weekly), 3)
+
+        # problems are assigned by create-problems
+        monthly_query = self.db.session.query(ProblemHistoryMonthly.problem_id,
+                                              ProblemHistoryMonthly.opsysrelease_id,
+                                              ProblemHistoryMonthly.month,
+                                              ProblemHistoryMonthly.count)
+        monthly = self._history_rows(monthly_query)
+        expected = self._history_rows(
+            self.db.session.query(Report.problem_id,
+                                  ReportHistoryMonthly.opsysrelease_id,
+                                  ReportHistoryMonthly.month,
+                                  func.sum(ReportHistoryMonthly.count))
+            .join(ReportHistoryMonthly)
+            .group_by(Report.problem_id, ReportHistoryMonthly.opsysrelease_id,
+                      ReportHistoryMonthly.month))
+        self.assertEqual(monthly, expected)
+        self.assertEqual(sum(row[-1] for row in monthly), 3)
+
+        # rebuilding fixes stale and missing rows
+        row = self.db.session.query(ProblemHistoryMonthly).first()
+        row.count += 10
+        self.db.session.add(ProblemHistoryMonthly(problem_id=row.problem_id,
+                                                  opsysrelease_id=row.opsysrelease_id,
+                                                  month=row.month.replace(year=2000),
+                                                  count=1))
+        self.db.session.flush()
+        self.assertNotEqual(self._history_rows(monthly_query), monthly)
+
+        rebuild_history_rollups(self.db, "problem", "monthly")
+        self.db.session.expire_all()
+        self.assertEqual(self._history_rows(monthly_query), monthly)
+
+    def test_move_history_rollups(self):
+        self.basic_fixtures()
+
+        self.save_report("ureport1")
+        self.save_report("ureport1")
+        self.save_report("ureport_f20")
+        self.call_action("create-problems")
+
+        monthly_query = self.db.session.query(ProblemHistoryMonthly.problem_id,
+                                              ProblemHistoryMonthly.opsysrelease_id,
+                                              ProblemHistoryMonthly.month,
+                                              ProblemHistoryMonthly.count)
+        expected_query = (self.db.session.query(Report.problem_id,
+                                                ReportHistoryMonthly.opsysrelease_id,
+                                                ReportHistoryMonthly.month,
+                                                func.sum(ReportHistoryMonthly.count))
+                          .join(ReportHistoryMonthly)
+                          .filter(Report.problem_id.isnot(None))
+                          .group_by(Report.problem_id, ReportHistoryMonthly.opsysrelease_id,
+                                    ReportHistoryMonthly.month))
+
+        report = self.db.session.query(Report).first()
+        old_problem_id = report.problem_id
+        problem = Problem()
+        self.db.session.add(problem)
+        self.db.session.flush()
+
+        report.problem_id = problem.id
+        self.db.session.flush()
+        move_history_rollups(self.db, {report.id: (old_problem_id, problem.id)})
+        self.db.session.expire_all()
+        self.assertEqual(self._history_rows(monthly_query),
+                         self._history_rows(expected_query))
+        self.assertEqual(sum(row[-1] for row in self._history_rows(monthly_query)), 3)
+
+        # unassigned reports are dropped from the rollups
+        report.problem_id = None
+        self.db.session.flush()
+        move_history_rollups(self.db, {report.id: (problem.id, None)})
+        self.db.session.expire_all()
+        self.assertEqual(self._history_rows(monthly_query),
+                         self._history_rows(expected_query))
+        self.assertFalse(self.db.session.query(ProblemHistoryMonthly)
+                         .filter(ProblemHistoryMonthly.problem_id == problem.id)
+                         .count())
+
+    def test_problem_snapshot_marks(self):
+        self.basic_fixtures()
+
+        self.save_report("ureport1")
+        self.call_action("create-problems")
+
+        problem_id = self.db.session.query(Problem.id).scalar()
+        refresh_problem_snapshots(self.db, [problem_id])
+        self.assertEqual(get_problem_snapshot_changes(self.db, [problem_id]), {})
+
+        mark_problem_snapshots_stale(self.db, [problem_id])
+        changed = get_problem_snapshot_changes(self.db, [problem_id])
+        self.assertIn(problem_id, changed)
+
+        # a snapshot built before the second mark keeps the problem stale
+        mark_problem_snapshots_stale(self.db, [problem_id])
+        self.assertGreater(get_problem_snapshot_changes(self.db, [problem_id])[problem_id],
+                           changed[problem_id])
+        self.db.session.execute(ProblemSnapshot.save_statement(SNAPSHOT_VERSION, {problem_id: {}},
+                                                               changed[problem_id], changed))
+        self.assertIn(problem_id, get_problem_snapshot_changes(self.db, [problem_id]))
+
+        self.assertEqual(refresh_problem_snapshots(self.db), 1)
+        self.assertEqual(get_problem_snapshot_changes(self.db, [problem_id]), {})
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     unittest.main()
@@ -2,11 +2,13 @@
 # -*- encoding: utf-8 -*-
 import os
 import logging
+import tempfile
 import unittest
+from types import SimpleNamespace
 
 import faftests
 from pyfaf.common import FafError
-from pyfaf.retrace import addr2line
+from pyfaf.retrace import RetracePool, SymbolIndex, Symbolizer, UNPACK_SIZE_RATIO, addr2line
 
 
 class RetraceTestCase(faftests.TestCase):
@@ -68,6 +70,87 @@ class RetraceTestCase(faftests.TestCase):
         self.assertEqual(f, "Source/WTF/wtf/MessageQueue.c")
         self.assertEqual(l, 1234)
 
+    def test_symbolizer(self):
+        """
+        Check that the long-lived eu-addr2line process
+        gives the same results as addr2line.
+        """
+
+        with Symbolizer() as symbolizer:
+            for binary, address in [("last_chance", 0x3), ("last_chance", 0xf),
+                                    ("third_full", 0xf), ("complex", 0xffff)]:
+                self.assertEqual(symbolizer.addr2line(binary, address, "debug"),
+                                 addr2line(binary, address, "debug"))
+
+            for binary, address in [("last_chance", 0x0), ("other_source", 0xf)]:
+                with self.assertRaises(FafError) as cm:
+                    symbolizer.addr2line(binary, address, "debug")
+                self.assertEqual(str(cm.exception),
+                                 "eu-addr2line cannot find function name")
+
+            # one process per binary
+            self.assertEqual(len(symbolizer._processes), 4)
+
+            # the sample binaries do not exist, as if their task was finished
+            symbolizer.prune()
+            self.assertEqual(len(symbolizer._processes), 0)
+
+    def test_symbol_index(self):
+        offset_map = {
+            "ext4": {"ext4_fill_super": 0x1000, "init_module": 0x10},
+            "btrfs": {"btrfs_sync_fs": 0x2000, "init_module": 0x20, "ž": 0x30},
+            "empty": {},
+        }
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(SymbolIndex.serialize(offset_map))
+            f.flush()
+
+            with SymbolIndex(f.name) as index:
+                for module, symbols in offset_map.items():
+                    self.assertIn(module, index)
+                    for name, address in symbols.items():
+                        self.assertEqual(index.lookup(module, name), address)
+
+                self.assertNotIn("xfs", index)
+                self.assertIsNone(index.lookup("xfs", "init_module"))
+                self.assertIsNone(index.lookup("ext4", "btrfs_sync_fs"))
+                self.assertIsNone(index.lookup("empty", "init_module"))
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b"\x80\x04}q\x00.")
+            f.flush()
+
+            with self.assertRaises(FafError):
+                SymbolIndex(f.name)
+
+    def test_retrace_pool_admission(self):
+        """
+        Check that tasks are admitted only within the prefetch limit
+        and the disk budget.
+        """
+
+        with tempfile.NamedTemporaryFile() as pkg:
+            pkg.write(b"x" * 1024)
+            pkg.flush()
+
+            task = SimpleNamespace(debuginfo=SimpleNamespace(path=pkg.name),
+                                   source=None, binary_packages={})
+            size = 1024 * UNPACK_SIZE_RATIO
+
+            pool = RetracePool(None, [], None, 1, processes=2, prefetch=1,
+                               disk_budget=2 * size)
+            self.assertEqual(pool._estimate_size(task), size)
+
+            # nothing in flight, always admitted
+            self.assertTrue(pool._can_admit(task, 0))
+            self.assertFalse(pool._can_admit(task, 3))
+
+            pool._reserved["other"] = size
+            self.assertTrue(pool._can_admit(task, 1))
+            pool._reserved["another"] = size
+            self.assertFalse(pool._can_admit(task, 2))
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -2,6 +2,7 @@
 # -*- encoding: utf-8 -*-
 # vim: set makeprg=python3-flake8\ %
 
+import hashlib
 import unittest
 import os
 import time
@@ -99,6 +100,7 @@ class RpmMetadataTestCase(faftests.TestCase):
         shutil.rmtree(self.cachedir)
 
     def verify_result(self, pkgs, url):
+        pkgs = list(pkgs)
         self.assertEqual(len(pkgs), 1)
         pkg = pkgs.pop()
         self.assertEqual(pkg["name"], "sample")
@@ -112,6 +114,9 @@ class RpmMetadataTestCase(faftests.TestCase):
 
         self.assertEqual(pkg["type"], "rpm")
 
+        with open(self.rpm, "rb") as f:
+            self.assertEqual(pkg["checksum"], ("sha256", hashlib.sha256(f.read()).hexdigest()))
+
     def test_list_packages_absolute_repo(self):
         """
         Test whether list_packages lists our ad-hoc
@@ -194,7 +199,35 @@ class RpmMetadataTestCase(faftests.TestCase):
 
             httpd.shutdown()
 
-            self.assertEqual(httpd.requests, 6)
+            # primary.xml is downloaded again only when its checksum changes
+            self.assertEqual(httpd.requests, 4)
+
+    def test_list_changed_packages(self):
+        rpm_metadata = RpmMetadata("test_repo_changes", ["file://" + self.tmpdir])
+        rpm_metadata.cachedir = self.cachedir
+
+        url = "file://{0}".format(os.path.join(self.tmpdir, os.path.basename(self.rpm)))
+        self.verify_result(rpm_metadata.list_changed_packages(["noarch"]), url)
+
+        # Not synced yet
+        self.verify_result(rpm_metadata.list_changed_packages(["noarch"]), url)
+        rpm_metadata.mark_synced()
+
+        # Unchanged metadata
+        self.assertEqual(list(rpm_metadata.list_changed_packages(["noarch"])), [])
+
+        rpm2 = "sample_rpms/sample2-2.0-1.fc32.noarch.rpm"
+        shutil.copyfile(rpm2, os.path.join(self.tmpdir, os.path.basename(rpm2)))
+        os.unlink(os.path.join(self.tmpdir, os.path.basename(self.rpm)))
+        proc = popen("createrepo_c", "--verbose", self.tmpdir)
+        self.assertTrue(b"Workers Finished" in proc.stdout or b"Pool finished" in proc.stdout)
+
+        pkgs = list(rpm_metadata.list_changed_packages(["noarch"]))
+        self.assertEqual([(pkg["name"], pkg.get("removed", False)) for pkg in pkgs],
+                         [("sample2", False), ("sample", True)])
+        rpm_metadata.mark_synced()
+
+        self.assertEqual(list(rpm_metadata.list_changed_packages(["noarch"])), [])
 
 
 if __name__ == "__main__":
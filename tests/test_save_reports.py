@@ -7,12 +7,43 @@ import json
 import faftests
 import os
 import shutil
+import signal
+from pyfaf.actions.save_reports import SaveReports, shard_for_hash
+from pyfaf.common import FafError
 from pyfaf.common import ensure_dirs
 from pyfaf.config import paths
-from pyfaf.storage import Report, OpSysComponent, ReportBacktrace
+from pyfaf.queries import get_cache_generations
+from pyfaf.storage import (Report,
+                           OpSysComponent,
+                           ReportArch,
+                           ReportBacktrace,
+                           ReportHistoryDaily,
+                           ReportOpSysRelease)
 from pyfaf.ureport import ureport2
 
 
+class DaemonSaveReports(SaveReports):
+    """
+    Stops the --daemon mode once the incoming directory has been emptied,
+    optionally failing the first `fail_batches` batches.
+    """
+
+    def __init__(self, fail_batches=0):
+        super(DaemonSaveReports, self).__init__()
+        self.fail_batches = fail_batches
+
+    def _save_batch(self, db, batch):
+        try:
+            if self.fail_batches > 0:
+                self.fail_batches -= 1
+                raise FafError("Batch failed")
+
+            super(DaemonSaveReports, self)._save_batch(db, batch)
+        finally:
+            if not os.listdir(self.dir_report_incoming):
+                os.kill(os.getpid(), signal.SIGTERM)
+
+
 class ActionsTestCase(faftests.DatabaseCase):
 
     """
@@ -22,6 +53,8 @@ class ActionsTestCase(faftests.DatabaseCase):
     def setUp(self):
         super(ActionsTestCase, self).setUp()
         self.basic_fixtures()
+        # start with an empty spool, files of the previous test included
+        shutil.rmtree(paths["reports"], ignore_errors=True)
         ensure_dirs([paths["reports_incoming"]])
         ensure_dirs([paths["reports_saved"]])
         ensure_dirs([paths["reports_deferred"]])
@@ -60,8 +93,14 @@ class ActionsTestCase(faftests.DatabaseCase):
     def test_save_by_pattern(self):
         self.assertEqual(self.call_action("save-reports", {"pattern": "ureport1*"}), 0)
         self.assertEqual(self.db.session.query(Report).count(), 1)
-        self.assertEqual(self.call_action("save-reports", {"pattern": "foobar"}), 0)
+        generations = get_cache_generations(self.db)
+        self.assertIn("reports", generations)
+
+        # cached views are kept when nothing was saved
+        self.assertEqual(self.call_action("save-reports", {"pattern": "foobar",
+                                                           "no-attachments": ""}), 0)
         self.assertEqual(self.db.session.query(Report).count(), 1)
+        self.assertEqual(get_cache_generations(self.db), generations)
         self.assertEqual(self.call_action("save-reports", {"pattern": "ureport_k*"}), 0)
         self.assertEqual(self.db.session.query(Report).count(), 3)
         self.assertEqual(self.call_action("save-reports", {"pattern": "*"}), 0)
@@ -72,6 +111,55 @@ class ActionsTestCase(faftests.DatabaseCase):
         self.assertEqual(self.call_action("save-reports", {"speedup": ""}), 0)
         self.after_save_reports()
 
+    def test_save_reports_batch(self):
+        self.assertEqual(self.call_action("save-reports", {"batch-size": 4}), 0)
+        self.after_save_reports()
+
+    def test_save_reports_speedup_batch(self):
+        self.assertEqual(self.call_action("save-reports", {"speedup": "",
+                                                           "batch-size": 4}), 0)
+        self.after_save_reports()
+
+    def test_save_reports_parallel(self):
+        # the workers use their own database connections
+        self.db.session.commit()
+
+        self.assertEqual(self.call_action("save-reports", {"processes": 2}), 0)
+        self.db.session.expire_all()
+        self.after_save_reports()
+        self.assertEqual(os.listdir(paths["reports_incoming"]), [])
+
+        for report in self.db.session.query(Report):
+            for table in [ReportArch, ReportOpSysRelease, ReportHistoryDaily]:
+                total = sum(row.count for row in
+                            self.db.session.query(table)
+                            .filter(table.report_id == report.id))
+                self.assertEqual(total, report.count)
+
+    def test_save_reports_daemon(self):
+        # keeps less file names in memory than there are files in incoming
+        DaemonSaveReports()._save_reports_daemon(self.db, 2, 0.1, max_pending=3)
+        self.after_save_reports()
+        self.assertEqual(os.listdir(paths["reports_incoming"]), [])
+        self.assertEqual(len(os.listdir(paths["reports_saved"])), 28)
+
+    def test_save_reports_daemon_failed_batch(self):
+        # the failed batch is rolled back
+        self.db.session.commit()
+
+        DaemonSaveReports(fail_batches=1)._save_reports_daemon(self.db, 2, 0.1)
+        self.assertEqual(os.listdir(paths["reports_incoming"]), [])
+        self.assertEqual(len(os.listdir(paths["reports_deferred"])), 2)
+        self.assertEqual(len(os.listdir(paths["reports_saved"])), 26)
+        self.assertEqual(sum(count for count, in self.db.session.query(Report.count)), 26)
+
+    def test_shard_for_hash(self):
+        hashes = ["{0:040x}".format(i * 7919) for i in range(100)]
+        shards = [shard_for_hash(h, 4) for h in hashes]
+        self.assertEqual(shards, [shard_for_hash(h, 4) for h in hashes])
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+        self.assertTrue(all(shard_for_hash(h, 1) == 0 for h in hashes))
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
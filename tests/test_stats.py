@@ -31,7 +31,8 @@ class StatsTestCase(faftests.DatabaseCase):
 
     def make_up_history(self, report, over_days):
         """
-        Make up history counts for report for `over_days` days.
+        Make up history counts for report for `over_days` days
+        and rebuild the history rollups.
         """
 
         total = 0
@@ -73,6 +74,9 @@ class StatsTestCase(faftests.DatabaseCase):
         report.first_occurrence = daily[0].day
         report.last_occurrence = daily[-1].day
 
+        self.db.session.flush()
+        self.call_action("rollup-history")
+
         return total
 
     def test_stats_components_good_report(self):
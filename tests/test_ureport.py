@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 # -*- encoding: utf-8 -*-
+import copy
 import json
 import datetime
 
@@ -10,13 +11,23 @@ import faftests
 
 from pyfaf.config import config
 from pyfaf.bugtrackers import bugtrackers
+from pyfaf.problemtypes import problemtypes
 from pyfaf.ureport import (attachment_type_allowed,
                            save,
                            save_attachment,
+                           save_batch,
                            validate,
                            validate_attachment)
 
-from pyfaf.storage.report import Report, ContactEmail
+from pyfaf.storage.report import (Report,
+                                  ContactEmail,
+                                  ReportArch,
+                                  ReportHash,
+                                  ReportHistoryDaily,
+                                  ReportOpSysRelease)
+from pyfaf.storage.symbol import Symbol, SymbolSource
+from pyfaf.symbols import SymbolResolver
+from pyfaf.btcache import BTCACHE_VERSION, load_cached_reports
 from pyfaf.storage.bugtracker import Bugtracker
 from pyfaf.storage.bugzilla import BzBug, BzUser
 
@@ -102,6 +113,125 @@ class UreportTestCase(faftests.DatabaseCase):
         for report_name in self.sample_report_names:
             save(self.db, self.sample_reports[report_name])
 
+    def test_ureport_batch_saving(self):
+        """
+        Check if saving uReports in a batch produces the same counts
+        as saving them one by one.
+        """
+
+        timestamp = datetime.datetime.utcnow()
+        batch = []
+        for report_name in self.sample_report_names:
+            batch.append((self.sample_reports[report_name], timestamp, 1))
+            batch.append((self.sample_reports[report_name], timestamp, 2))
+
+        self.assertEqual(save_batch(self.db, batch), {})
+
+        for report_name in self.sample_report_names:
+            save(self.db, self.sample_reports[report_name], timestamp=timestamp)
+
+        self.db.session.expire_all()
+
+        for report in self.db.session.query(Report).all():
+            self.assertEqual(report.count % 4, 0)
+            for table in [ReportArch, ReportOpSysRelease, ReportHistoryDaily]:
+                total = sum(row.count for row in
+                            self.db.session.query(table)
+                            .filter(table.report_id == report.id))
+                self.assertEqual(total, report.count)
+
+            for daily in (self.db.session.query(ReportHistoryDaily)
+                          .filter(ReportHistoryDaily.report_id == report.id)):
+                self.assertEqual(daily.unique, 1)
+
+    def test_ureport_batch_saving_compat_hashes(self):
+        """
+        Check if uReports of one batch matching different hashes
+        of the same report are counted together.
+        """
+
+        ureport = self.sample_reports["ureport_python"]
+        save(self.db, ureport)
+
+        compat = copy.deepcopy(ureport)
+        compat["problem"]["stacktrace"][0]["file_line"] += 1
+
+        report = self.db.session.query(Report).one()
+        report_hash = ReportHash()
+        report_hash.report = report
+        report_hash.hash = problemtypes["python"].hash_ureport(compat["problem"])
+        self.db.session.add(report_hash)
+        self.db.session.flush()
+
+        timestamp = datetime.datetime.utcnow()
+        self.assertEqual(save_batch(self.db, [(ureport, timestamp, 1),
+                                              (compat, timestamp, 2)]), {})
+
+        self.db.session.expire_all()
+        report = self.db.session.query(Report).one()
+        self.assertEqual(report.count, 4)
+        for table in [ReportArch, ReportOpSysRelease, ReportHistoryDaily]:
+            total = sum(row.count for row in
+                        self.db.session.query(table)
+                        .filter(table.report_id == report.id))
+            self.assertEqual(total, report.count)
+
+    def test_symbol_resolver(self):
+        """
+        Check if symbols and symbol sources registered by multiple
+        resolvers are stored only once.
+        """
+
+        ids = []
+        for _ in range(2):
+            resolver = SymbolResolver(self.db)
+            symbol = resolver.add_symbol("main", "/usr/bin/will_segfault")
+            keys = [resolver.add_ssource_by_bpo("d5f6", "/usr/bin/will_segfault",
+                                                16, symbol=symbol),
+                    resolver.add_ssource_by_bpo(None, "/usr/bin/will_segfault",
+                                                32, symbol=symbol),
+                    resolver.add_ssource_by_symbol(symbol, "will_segfault.c",
+                                                   48, line_number=48)]
+            # registering a frame twice does not create a new key
+            self.assertEqual(resolver.add_symbol("main", "/usr/bin/will_segfault"),
+                             symbol)
+            resolver.resolve()
+
+            self.assertEqual(resolver.get_symbol(symbol).name, "main")
+            self.assertEqual(resolver.get_ssource(keys[2]).line_number, 48)
+            ids.append([resolver.get_ssource(key).id for key in keys])
+
+        self.assertEqual(ids[0], ids[1])
+        self.assertEqual(self.db.session.query(Symbol).count(), 1)
+        self.assertEqual(self.db.session.query(SymbolSource).count(), 3)
+
+    def test_backtrace_cache(self):
+        """
+        Check if serialized backtraces match the stored frames and are
+        removed when the frames change.
+        """
+
+        save(self.db, self.sample_reports['ureport2'])
+        self.db.session.flush()
+        report = self.db.session.query(Report).first()
+        db_frames = report.backtraces[0].frames
+
+        cached = load_cached_reports(self.db, [report.id])[report.id]
+        self.assertEqual(cached.type, report.type)
+        self.assertEqual([(f.order, f.symbolsource.path, f.symbolsource.offset)
+                          for f in cached.backtraces[0].frames],
+                         [(f.order, f.symbolsource.path, f.symbolsource.offset)
+                          for f in db_frames])
+
+        db_backtrace = report.backtraces[0]
+        self.db.session.refresh(db_backtrace)
+        self.assertEqual(db_backtrace.serialized["version"], BTCACHE_VERSION)
+
+        db_frames[0].symbolsource.line_number = 1234
+        self.db.session.flush()
+        self.db.session.refresh(db_backtrace)
+        self.assertIsNone(db_backtrace.serialized)
+
     def test_attachment_validation(self):
         """
         Check if attachment validation works correctly.
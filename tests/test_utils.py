@@ -2,14 +2,47 @@
 # -*- encoding: utf-8 -*-
 import logging
 import datetime
+import hashlib
+import os
+import struct
+import tempfile
 import unittest
 
 import faftests
 
+from pyfaf.common import FafError
 from pyfaf.utils.date import daterange
 from pyfaf.utils.decorators import retry
+from pyfaf.utils.download import Downloader
+from pyfaf.utils.elf import STT_FUNC, STT_NOTYPE, iter_elf_symbols
 from pyfaf.utils.hash import hash_list, hash_path
-from pyfaf.utils.parse import words2list
+from pyfaf.utils.inotify import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO
+from pyfaf.utils.parse import iter_json_array, words2list
+
+
+def make_elf(symbols):
+    """
+    Return a minimal little endian ELF64 file with a symbol table
+    of `symbols`, a list of (name, value, type, section index) tuples.
+    """
+
+    strtab = bytearray(b"\0")
+    symtab = bytearray(struct.pack("<IBBHQQ", 0, 0, 0, 0, 0, 0))
+    for name, value, sym_type, shndx in symbols:
+        symtab += struct.pack("<IBBHQQ", len(strtab), sym_type, 0, shndx, value, 0)
+        strtab += name.encode("utf-8") + b"\0"
+
+    symtab_offset = 64
+    strtab_offset = symtab_offset + len(symtab)
+    shoff = strtab_offset + len(strtab)
+
+    header = struct.pack("<4sBBBB8sHHIQQQIHHHHHH", b"\x7fELF", 2, 1, 1, 0, b"",
+                         1, 62, 1, 0, 0, shoff, 0, 64, 0, 0, 64, 3, 0)
+    sections = struct.pack("<IIQQQQIIQQ", 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    sections += struct.pack("<IIQQQQIIQQ", 0, 2, 0, 0, symtab_offset, len(symtab), 2, 1, 8, 24)
+    sections += struct.pack("<IIQQQQIIQQ", 0, 3, 0, 0, strtab_offset, len(strtab), 0, 0, 1, 0)
+
+    return header + bytes(symtab) + bytes(strtab) + sections
 
 
 class CommonTestCase(faftests.TestCase):
@@ -99,6 +132,102 @@ class CommonTestCase(faftests.TestCase):
         self.assertEqual(hash_path("/home/user_a/src/main.c", prefixes),
                          hash_path("/home/user_b/src/main.c", prefixes))
 
+    def test_inotify(self):
+        with tempfile.TemporaryDirectory() as dirname, Inotify() as inotify:
+            wd = inotify.add_watch(dirname, IN_CLOSE_WRITE | IN_MOVED_TO)
+            self.assertEqual(inotify.read_events(0), [])
+
+            with open(os.path.join(dirname, "written"), "w") as fil:
+                fil.write("{}")
+            os.rename(os.path.join(dirname, "written"),
+                      os.path.join(dirname, "moved"))
+
+            events = inotify.read_events(1)
+            self.assertEqual([(e[0], e[1], e[3]) for e in events],
+                             [(wd, IN_CLOSE_WRITE, "written"),
+                              (wd, IN_MOVED_TO, "moved")])
+
+    def test_iter_json_array(self):
+        """
+        Test that iter_json_array handles items split between chunks.
+        """
+
+        doc = ' [ "abc", 123, {"a": [1, 2]},"d\\"e" ] '
+        for size in range(1, len(doc) + 1):
+            chunks = [doc[i:i + size] for i in range(0, len(doc), size)]
+            self.assertEqual(list(iter_json_array(chunks)),
+                             ["abc", 123, {"a": [1, 2]}, 'd"e'])
+
+        self.assertEqual(list(iter_json_array(["[]"])), [])
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['{"a": 1}']))
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['["abc", "de']))
+
+    def test_downloader(self):
+        rpm = os.path.abspath("sample_rpms/sample-1.0-1.fc18.noarch.rpm")
+        with open(rpm, "rb") as f:
+            data = f.read()
+        checksum = ("sha256", hashlib.sha256(data).hexdigest())
+        url = "file://" + rpm
+
+        with tempfile.TemporaryDirectory() as dirname:
+            downloader = Downloader(os.path.join(dirname, "parts"), delay=0)
+            dest = os.path.join(dirname, "sample.rpm")
+
+            # A partial download is resumed
+            with open(downloader.get_part_path(url), "wb") as f:
+                f.write(data[:100])
+
+            downloader.download(url, dest, checksum)
+            with open(dest, "rb") as f:
+                self.assertEqual(f.read(), data)
+            self.assertFalse(os.path.exists(downloader.get_part_path(url)))
+
+            # A corrupted download is discarded
+            with open(downloader.get_part_path(url), "wb") as f:
+                f.write(b"garbage")
+
+            with self.assertRaises(FafError):
+                downloader.download(url, dest, ("sha256", "0" * 64))
+            self.assertFalse(os.path.exists(downloader.get_part_path(url)))
+
+            downloader.download(url, dest, checksum)
+            with open(dest, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+            # Files too long or impossible to move are failures
+            with self.assertRaises(FafError):
+                downloader.download(url, dest, checksum, maxlen=len(data) - 1)
+            self.assertFalse(os.path.exists(downloader.get_part_path(url)))
+
+            with self.assertRaises(FafError):
+                downloader.download(url, os.path.join(dirname, "missing", "sample.rpm"), checksum)
+
+            downloader.close()
+
+    def test_iter_elf_symbols(self):
+        symbols = [("init_module", 0x10, STT_FUNC, 1),
+                   ("__local_label", 0x20, STT_NOTYPE, 1),
+                   ("some_object", 0x30, 1, 2),
+                   ("printk", 0, STT_FUNC, 0)]
+
+        with tempfile.NamedTemporaryFile() as elf:
+            elf.write(make_elf(symbols))
+            elf.flush()
+
+            self.assertEqual(list(iter_elf_symbols(elf.name)),
+                             [("init_module", 0x10), ("__local_label", 0x20)])
+
+        with tempfile.NamedTemporaryFile() as elf:
+            elf.write(b"not an ELF file")
+            elf.flush()
+
+            with self.assertRaises(FafError):
+                list(iter_elf_symbols(elf.name))
+
     def test_words2list_empty(self):
         self.assertEqual(words2list(""), [])
 
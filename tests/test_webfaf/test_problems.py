@@ -6,9 +6,11 @@ import unittest
 from webfaftests import WebfafTestCase
 
 from pyfaf.queries import get_releases, get_problem_by_id
+from pyfaf.snapshots import SNAPSHOT_VERSION
 from pyfaf.solutionfinders import find_solutions_problem
 from pyfaf.storage.opsys import Build, Package
 from pyfaf.storage.problem import ProblemOpSysRelease
+from pyfaf.storage.snapshot import ProblemSnapshot
 
 
 class ProblemsTestCase(WebfafTestCase):
@@ -61,6 +63,34 @@ class ProblemsTestCase(WebfafTestCase):
         self.assertIn(b"Fedora 20", r.data)
         self.assertIn(b"0:3.12.10-300.fc20", r.data)
 
+    def test_problem_snapshot(self):
+        """
+        Test if problem details are rendered from an up to date snapshot
+        """
+
+        snapshot = self.db.session.query(ProblemSnapshot).get(1)
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(snapshot.version, SNAPSHOT_VERSION)
+        self.assertIsNone(snapshot.changed)
+        self.assertEqual(snapshot.data["osreleases"], [["Fedora 20", 1]])
+        self.assertTrue(snapshot.data["permalink_hashes"])
+
+        # Another occurrence of the report outdates the snapshot
+        self.save_report("ureport_kerneloops")
+        self.db.session.commit()
+        self.db.session.expire_all()
+        snapshot = self.db.session.query(ProblemSnapshot).get(1)
+        self.assertIsNotNone(snapshot.changed)
+
+        r = self.app.get("/problems/1/")
+        self.assertIn(b"Fedora 20", r.data)
+        self.assertIn(b"bth=", r.data)
+
+        self.db.session.expire_all()
+        snapshot = self.db.session.query(ProblemSnapshot).get(1)
+        self.assertIsNone(snapshot.changed)
+        self.assertEqual(snapshot.data["osreleases"], [["Fedora 20", 2]])
+
     def test_problem_version_filter(self):
         """
         Test if version filtering yields problem
@@ -1,7 +1,9 @@
 #!/usr/bin/python3
 # -*- encoding: utf-8 -*-
+import html
 import os
 import json
+import re
 import unittest
 
 import sys
@@ -389,6 +391,70 @@ class ReportTestCase(WebfafTestCase):
         self.assertIsNotNone(report8)
         self.assertIsNotNone(report9)
 
+    def test_get_hash(self):
+        self.clear_reports()
+
+        for name in ["ureport1", "ureport2"]:
+            path = os.path.join(self.reports_path, name)
+            with open(path, "r", encoding="utf-8") as file:
+                self.post_report(file.read())
+
+        self.assertEqual(self.call_action("save-reports"), 0)
+        self.db.session.commit()
+
+        hashes = sorted(set(rh.hash for rh in get_all_report_hashes(self.db)))
+        self.assertEqual(len(hashes), 2)
+
+        r = self.app.get("/reports/get_hash/", headers={"Accept": "application/json"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data)["data"], hashes)
+
+        r = self.app.get("/reports/get_hash/?limit=1", headers={"Accept": "application/json"})
+        self.assertEqual(json.loads(r.data)["data"], hashes[:1])
+
+        r = self.app.get("/reports/get_hash/?after={0}".format(hashes[0]),
+                         headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(r.mimetype, "application/x-ndjson")
+        self.assertEqual(r.data.decode("utf-8").splitlines(), hashes[1:])
+
+        r = self.app.get("/reports/get_hash/?limit=x", headers={"Accept": "application/json"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_dashboard_keyset_pagination(self):
+        self.clear_reports()
+
+        for name in ["ureport1", "ureport2"]:
+            path = os.path.join(self.reports_path, name)
+            with open(path, "r", encoding="utf-8") as file:
+                self.post_report(file.read())
+
+        self.assertEqual(self.call_action("save-reports"), 0)
+        self.db.session.commit()
+
+        reports = sorted(self.db.session.query(Report).all(),
+                         key=lambda report: (report.last_occurrence, report.id),
+                         reverse=True)
+        self.assertEqual(len(reports), 2)
+        first, second = ["/reports/{0}/".format(report.id).encode("utf-8") for report in reports]
+
+        r = self.app.get("/reports/?limit=1")
+        self.assertIn(first, r.data)
+        self.assertNotIn(second, r.data)
+        self.assertNotIn(b"before=", r.data)
+
+        next_url = html.unescape(re.search(r'href="([^"]*after=[^"]*)"', r.data.decode("utf-8")).group(1))
+        r = self.app.get(next_url)
+        self.assertIn(second, r.data)
+        self.assertNotIn(first, r.data)
+
+        prev_url = html.unescape(re.search(r'href="([^"]*before=[^"]*)"', r.data.decode("utf-8")).group(1))
+        r = self.app.get(prev_url)
+        self.assertIn(first, r.data)
+        self.assertNotIn(second, r.data)
+
+        r = self.app.get("/reports/?limit=1&after=x")
+        self.assertEqual(r.status_code, 400)
+
     def test_known_type(self):
         result = ureport.valid_known_type("EQUAL_UREPORT_EXISTS".split(" "))
         result1 = ureport.valid_known_type("BUG_OS_MINOR_VERSION".split(" "))
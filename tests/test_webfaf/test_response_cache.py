@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+from webfaftests import WebfafTestCase
+
+from cachelib import SimpleCache
+
+from pyfaf.queries import bump_cache_generations, get_cache_generations
+from webfaf.response_cache import ResponseCache
+
+
+class ResponseCacheTestCase(WebfafTestCase):
+    """
+    Tests for webfaf.response_cache
+    """
+
+    def setUp(self):
+        super(ResponseCacheTestCase, self).setUp()
+        self.cache = ResponseCache(SimpleCache(), self.db, generations_ttl=0)
+        self.cache.register("test", ["reports"])
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return "value {0}".format(self.computed)
+
+    def test_generations(self):
+        self.assertEqual(get_cache_generations(self.db), {})
+        bump_cache_generations(self.db, ["reports", "problems"])
+        bump_cache_generations(self.db, ["reports"])
+        self.assertEqual(get_cache_generations(self.db),
+                         {"reports": 2, "problems": 1})
+
+    def test_invalidation(self):
+        self.assertEqual(self.cache.get("test", "key", self.compute), "value 1")
+        self.assertEqual(self.cache.get("test", "key", self.compute), "value 1")
+        self.assertEqual(self.cache.get("test", "other", self.compute), "value 2")
+
+        # datasets the endpoint does not depend on are ignored
+        bump_cache_generations(self.db, ["problems"])
+        self.assertEqual(self.cache.get("test", "key", self.compute), "value 1")
+
+        bump_cache_generations(self.db, ["reports"])
+        self.assertEqual(self.cache.get("test", "key", self.compute), "value 3")
+
+        stats = self.cache.stats()["test"]
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 3)
+        self.assertAlmostEqual(stats["hit_rate"], 0.4)
+
+    def test_stale_while_recomputing(self):
+        self.assertEqual(self.cache.get("test", "key", self.compute), "value 1")
+        bump_cache_generations(self.db, ["reports"])
+
+        # another process is recomputing the key
+        lock_key = "{0}:test:key:lock".format(ResponseCache.KEY_PREFIX)
+        self.cache.backend.add(lock_key, True)
+        self.assertEqual(self.cache.get("test", "key", self.compute), "value 1")
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(self.cache.stats()["test"]["stale_hits"], 1)
+
+        self.cache.backend.delete(lock_key)
+        self.assertEqual(self.cache.get("test", "key", self.compute), "value 2")
+
+
+if __name__ == "__main__":
+    unittest.main()